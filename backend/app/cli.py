@@ -0,0 +1,606 @@
+"""
+Linha de comando para classificar emails em lote, sem subir a API
+
+Lê arquivos .mbox, .eml, .txt e .pdf (ou pastas, incluindo maildir) em streaming:
+uma mensagem por vez sai do gerador de entradas, passa pelos mesmos serviços da API
+(classificador local, similaridade, cache e Gemini) com concorrência limitada e é
+gravada no arquivo de saída (JSONL ou CSV) assim que fica pronta.
+
+Com --retomar, os ids já classificados com sucesso no arquivo de saída são pulados
+(o arquivo funciona como checkpoint) e os novos resultados são acrescentados nele.
+
+Exemplos (a partir da pasta backend/):
+    python -m app.cli classify caixa.mbox -o resultados.jsonl
+    python -m app.cli classify ~/Maildir anexos/ -o resultados.csv --concorrencia 8
+    python -m app.cli classify caixa.mbox -o resultados.jsonl --retomar
+"""
+import argparse
+import asyncio
+import csv
+import html
+import json
+import logging
+import os
+import re
+import signal
+import sys
+import time
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from app.config.configuracao import CHAVES_API_GEMINI, LOTE_MAX_CONCORRENCIA, JOBS_MAX_TENTATIVAS
+from app.config.logs import configurar_logs, encerrar_logs
+from app.services.extrator_servico import extrair_texto_de_arquivo_async, encerrar_executor_extracao
+from app.services.jobs_servico import segundos_retry_after
+from app.services.processamento_servico import processar_email_async
+
+logger = logging.getLogger(__name__)
+
+# Extensões lidas como mensagem de email / extraídas pelo extrator da API
+EXTENSOES_EMAIL = {".eml"}
+EXTENSOES_MBOX = {".mbox", ".mbx"}
+EXTENSOES_ARQUIVO = {".txt", ".pdf"}
+
+# Pastas de um maildir cujos arquivos (sem extensão) são mensagens
+PASTAS_MAILDIR = {"cur", "new"}
+
+# Colunas do CSV de saída (mesmos campos do JSONL)
+COLUNAS_SAIDA = [
+    "id", "origem", "sucesso", "label", "confidence", "reason", "tier", "suggested_reply", "erro", "status_code",
+]
+
+# Intervalo das linhas de progresso quando a saída não é um terminal
+INTERVALO_PROGRESSO_SEGUNDOS = 10.0
+
+_PADRAO_TAG_HTML = re.compile(r"<(?:script|style)\b.*?</(?:script|style)>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+_PADRAO_LINHAS_VAZIAS = re.compile(r"\n\s*\n\s*\n+")
+
+
+class ItemEntrada:
+    """
+    Email lido das entradas
+    
+    Args:
+        id_item: Identificador estável (caminho do arquivo, "#índice" para mensagens de mbox)
+        origem: Arquivo de onde o email veio
+        texto: Texto já extraído (mensagens de email)
+        caminho: Arquivo .txt/.pdf a extrair no worker
+        erro: Erro conhecido na leitura (o item é gravado como falha)
+    """
+    
+    def __init__(
+        self,
+        id_item: str,
+        origem: str,
+        texto: Optional[str] = None,
+        caminho: Optional[str] = None,
+        erro: Optional[str] = None,
+    ):
+        self.id = id_item
+        self.origem = origem
+        self.texto = texto
+        self.caminho = caminho
+        self.erro = erro
+
+
+# =============================================================================
+# LEITURA DAS ENTRADAS (geradores: uma mensagem em memória por vez)
+# =============================================================================
+
+def _eh_separador_mbox(linha: bytes, anterior: Optional[bytes]) -> bool:
+    """Linha "From " no início do arquivo ou depois de uma linha em branco"""
+    return linha.startswith(b"From ") and (anterior is None or not anterior.strip())
+
+
+def iterar_mbox(caminho: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Lê um arquivo mbox mensagem por mensagem, sem carregá-lo inteiro
+    
+    Args:
+        caminho: Arquivo mbox
+    
+    Yields:
+        Tupla (índice da mensagem, bytes da mensagem sem a linha "From ")
+    """
+    with open(caminho, "rb") as arquivo:
+        linhas: List[bytes] = []
+        indice, anterior = 0, None
+        for linha in arquivo:
+            if _eh_separador_mbox(linha, anterior):
+                if linhas:
+                    yield indice, b"".join(linhas)
+                    indice += 1
+                linhas = []
+            else:
+                # mboxrd: ">From " no corpo é o "From " original escapado
+                linhas.append(linha[1:] if linha.startswith(b">") and linha.lstrip(b">").startswith(b"From ") else linha)
+            anterior = linha
+        if linhas:
+            yield indice, b"".join(linhas)
+
+
+def contar_mensagens_mbox(caminho: str) -> int:
+    """Quantidade de mensagens do mbox (só conta os separadores)"""
+    total, anterior = 0, None
+    with open(caminho, "rb") as arquivo:
+        for linha in arquivo:
+            if _eh_separador_mbox(linha, anterior):
+                total += 1
+            anterior = linha
+    return total
+
+
+def _html_para_texto(conteudo: str) -> str:
+    texto = html.unescape(_PADRAO_TAG_HTML.sub(" ", re.sub(r"(?i)<br\s*/?>|</p>|</div>", "\n", conteudo)))
+    return _PADRAO_LINHAS_VAZIAS.sub("\n\n", texto)
+
+
+def texto_da_mensagem(mensagem: EmailMessage) -> str:
+    """
+    Texto a classificar de uma mensagem: assunto + corpo (texto puro ou HTML convertido)
+    
+    Args:
+        mensagem: Mensagem lida com email.policy.default
+    
+    Returns:
+        Texto da mensagem (vazio se ela não tiver corpo de texto)
+    """
+    partes = []
+    assunto = mensagem.get("subject")
+    if assunto:
+        partes.append(f"Assunto: {assunto}")
+    corpo = mensagem.get_body(preferencelist=("plain", "html"))
+    if corpo is not None:
+        try:
+            conteudo = corpo.get_content()
+        except (LookupError, UnicodeDecodeError):
+            # Charset desconhecido: decodifica como UTF-8, trocando os bytes inválidos
+            conteudo = (corpo.get_payload(decode=True) or b"").decode("utf-8", errors="replace")
+        if corpo.get_content_type() == "text/html":
+            conteudo = _html_para_texto(conteudo)
+        partes.append(conteudo.strip())
+    return "\n\n".join(parte for parte in partes if parte)
+
+
+def _item_de_mensagem(id_item: str, origem: str, dados: bytes) -> ItemEntrada:
+    try:
+        mensagem = BytesParser(policy=policy.default).parsebytes(dados)
+        return ItemEntrada(id_item, origem, texto=texto_da_mensagem(mensagem))
+    except Exception as e:
+        return ItemEntrada(id_item, origem, erro=f"Mensagem inválida: {type(e).__name__}: {e}")
+
+
+def _comeca_com_from(caminho: str) -> bool:
+    with open(caminho, "rb") as arquivo:
+        return arquivo.read(5) == b"From "
+
+
+def _itens_do_arquivo(caminho: str, explicito: bool) -> Iterator[ItemEntrada]:
+    """
+    Itens de um arquivo, conforme a extensão
+    
+    Args:
+        caminho: Arquivo a ler
+        explicito: Arquivo passado na linha de comando ou mensagem de maildir (sem
+            extensão conhecida, é lido como mbox se começar com "From " ou como EML)
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    try:
+        if extensao in EXTENSOES_ARQUIVO:
+            yield ItemEntrada(caminho, caminho, caminho=caminho)
+        elif extensao in EXTENSOES_MBOX or (
+            explicito and extensao not in EXTENSOES_EMAIL and _comeca_com_from(caminho)
+        ):
+            for indice, dados in iterar_mbox(caminho):
+                yield _item_de_mensagem(f"{caminho}#{indice}", caminho, dados)
+        elif extensao in EXTENSOES_EMAIL or explicito:
+            with open(caminho, "rb") as arquivo:
+                dados = arquivo.read()
+            yield _item_de_mensagem(caminho, caminho, dados)
+        else:
+            logger.debug("⏭️ Ignorando %s (extensão não suportada)", caminho)
+    except OSError as e:
+        yield ItemEntrada(caminho, caminho, erro=f"Erro ao ler o arquivo: {e}")
+
+
+def _arquivos_da_pasta(pasta: str) -> Iterator[Tuple[str, bool]]:
+    """Arquivos da pasta em ordem estável (sem ocultos e sem o tmp/ do maildir)"""
+    for raiz, pastas, arquivos in os.walk(pasta):
+        # tmp/ do maildir guarda mensagens ainda sendo entregues
+        ignoradas = {"tmp"} if PASTAS_MAILDIR.issubset(pastas) else set()
+        pastas[:] = sorted(nome for nome in pastas if not nome.startswith(".") and nome not in ignoradas)
+        em_maildir = os.path.basename(raiz) in PASTAS_MAILDIR
+        for nome in sorted(arquivos):
+            if not nome.startswith("."):
+                yield os.path.join(raiz, nome), em_maildir
+
+
+def iterar_entradas(caminhos: Iterable[str]) -> Iterator[ItemEntrada]:
+    """
+    Gera os emails de arquivos e pastas, um por vez
+    
+    Args:
+        caminhos: Arquivos (.mbox, .eml, .txt, .pdf, mensagem de maildir) ou pastas
+    
+    Yields:
+        ItemEntrada de cada email (ou de cada arquivo que não pôde ser lido)
+    """
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for arquivo, em_maildir in _arquivos_da_pasta(caminho):
+                yield from _itens_do_arquivo(arquivo, explicito=em_maildir)
+        elif os.path.isfile(caminho):
+            yield from _itens_do_arquivo(caminho, explicito=True)
+        else:
+            yield ItemEntrada(caminho, caminho, erro="Arquivo ou pasta não encontrado")
+
+
+def contar_entradas(caminhos: Iterable[str]) -> int:
+    """Total de emails das entradas (para a barra de progresso), sem interpretar as mensagens"""
+    total = 0
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            arquivos = list(_arquivos_da_pasta(caminho))
+        else:
+            arquivos = [(caminho, True)]
+        for arquivo, explicito in arquivos:
+            extensao = os.path.splitext(arquivo)[1].lower()
+            try:
+                if extensao in EXTENSOES_MBOX or (
+                    explicito and extensao not in EXTENSOES_EMAIL | EXTENSOES_ARQUIVO and _comeca_com_from(arquivo)
+                ):
+                    total += contar_mensagens_mbox(arquivo)
+                elif extensao in EXTENSOES_EMAIL | EXTENSOES_ARQUIVO or explicito:
+                    total += 1
+            except OSError:
+                total += 1
+    return total
+
+
+# =============================================================================
+# SAÍDA E CHECKPOINT
+# =============================================================================
+
+def detectar_formato(caminho_saida: str, formato: Optional[str]) -> str:
+    """Formato pedido ou, se não houver, o da extensão do arquivo de saída (padrão: jsonl)"""
+    if formato:
+        return formato
+    return "csv" if caminho_saida.lower().endswith(".csv") else "jsonl"
+
+
+def ler_concluidos(caminho_saida: str, formato: str) -> Set[str]:
+    """
+    Ids classificados com sucesso em um arquivo de saída anterior
+    
+    Itens com erro não entram: são classificados de novo ao retomar. Uma última linha
+    incompleta (processo interrompido no meio da escrita) é ignorada.
+    
+    Args:
+        caminho_saida: Arquivo de saída (JSONL ou CSV)
+        formato: "jsonl" ou "csv"
+    
+    Returns:
+        Conjunto de ids já concluídos
+    """
+    concluidos: Set[str] = set()
+    if caminho_saida == "-" or not os.path.exists(caminho_saida):
+        return concluidos
+    with open(caminho_saida, encoding="utf-8", newline="") as arquivo:
+        if formato == "csv":
+            for linha in csv.DictReader(arquivo):
+                if linha.get("sucesso") == "true" and linha.get("id"):
+                    concluidos.add(linha["id"])
+        else:
+            for linha in arquivo:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue
+                if registro.get("sucesso"):
+                    concluidos.add(registro["id"])
+    return concluidos
+
+
+class EscritorResultados:
+    """
+    Grava cada resultado assim que fica pronto (uma linha por email, com flush)
+    
+    Args:
+        caminho_saida: Arquivo de saída ("-" para a saída padrão)
+        formato: "jsonl" ou "csv"
+        acrescentar: Acrescenta ao arquivo existente (retomada) em vez de sobrescrever
+    """
+    
+    def __init__(self, caminho_saida: str, formato: str, acrescentar: bool = False):
+        self.formato = formato
+        if caminho_saida == "-":
+            self._arquivo = sys.stdout
+            self._fechar = False
+            existente = False
+        else:
+            existente = acrescentar and os.path.exists(caminho_saida) and os.path.getsize(caminho_saida) > 0
+            if existente:
+                _terminar_ultima_linha(caminho_saida)
+            self._arquivo = open(caminho_saida, "a" if acrescentar else "w", encoding="utf-8", newline="")
+            self._fechar = True
+        self._csv = None
+        if formato == "csv":
+            self._csv = csv.DictWriter(self._arquivo, fieldnames=COLUNAS_SAIDA, extrasaction="ignore")
+            if not existente:
+                self._csv.writeheader()
+    
+    def escrever(self, resultado: dict):
+        if self._csv is not None:
+            self._csv.writerow({
+                chave: ("true" if valor else "false") if isinstance(valor, bool) else valor
+                for chave, valor in resultado.items()
+            })
+        else:
+            self._arquivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        self._arquivo.flush()
+    
+    def fechar(self):
+        if self._fechar:
+            self._arquivo.close()
+
+
+def _terminar_ultima_linha(caminho: str):
+    """Garante que o arquivo termina com quebra de linha (a última escrita pode ter sido interrompida)"""
+    with open(caminho, "rb+") as arquivo:
+        arquivo.seek(-1, os.SEEK_END)
+        if arquivo.read(1) != b"\n":
+            arquivo.write(b"\n")
+
+
+# =============================================================================
+# PROGRESSO
+# =============================================================================
+
+class Progresso:
+    """
+    Barra de progresso no stderr (em terminal) ou uma linha a cada INTERVALO_PROGRESSO_SEGUNDOS
+    
+    Args:
+        total: Total de emails esperado (0 se desconhecido)
+        habilitado: False para não mostrar nada
+    """
+    
+    def __init__(self, total: int, habilitado: bool = True):
+        self.total = total
+        self.habilitado = habilitado
+        self.sucesso = 0
+        self.falhas = 0
+        self.pulados = 0
+        self._inicio = time.perf_counter()
+        self._ultima_linha = 0.0
+        self._terminal = sys.stderr.isatty()
+    
+    @property
+    def feitos(self) -> int:
+        return self.sucesso + self.falhas + self.pulados
+    
+    def pular(self):
+        self.pulados += 1
+        self._mostrar()
+    
+    def avancar(self, sucesso: bool):
+        if sucesso:
+            self.sucesso += 1
+        else:
+            self.falhas += 1
+        self._mostrar()
+    
+    def _texto(self) -> str:
+        decorrido = time.perf_counter() - self._inicio
+        classificados = self.sucesso + self.falhas
+        taxa = classificados / decorrido if decorrido > 0 else 0.0
+        restantes = max(0, self.total - self.feitos)
+        eta = f"{restantes / taxa:.0f}s" if taxa > 0 and self.total else "?"
+        if self.total:
+            fracao = min(1.0, self.feitos / self.total)
+            barra = "█" * int(fracao * 30) + "░" * (30 - int(fracao * 30))
+            inicio = f"{barra} {fracao:6.1%} {self.feitos}/{self.total}"
+        else:
+            inicio = f"{self.feitos}"
+        return f"{inicio} | ✅ {self.sucesso} ❌ {self.falhas} ⏭️ {self.pulados} | {taxa:.1f} emails/s | ETA {eta}"
+    
+    def _mostrar(self, final: bool = False):
+        if not self.habilitado:
+            return
+        if self._terminal:
+            sys.stderr.write("\r" + self._texto() + ("\n" if final else ""))
+            sys.stderr.flush()
+        elif final or time.perf_counter() - self._ultima_linha >= INTERVALO_PROGRESSO_SEGUNDOS:
+            self._ultima_linha = time.perf_counter()
+            print(self._texto(), file=sys.stderr, flush=True)
+    
+    def finalizar(self):
+        self._mostrar(final=True)
+
+
+# =============================================================================
+# CLASSIFICAÇÃO
+# =============================================================================
+
+def _falha(resultado: dict, erro: str, status_code: int) -> dict:
+    resultado.update({"sucesso": False, "erro": erro, "status_code": status_code})
+    return resultado
+
+
+async def classificar_item(item: ItemEntrada, max_tentativas: int = JOBS_MAX_TENTATIVAS) -> dict:
+    """
+    Classifica um item e monta a linha de resultado
+    
+    Itens que recebem 429/503 (cota ou serviço indisponível) esperam o Retry-After e
+    são tentados de novo, até max_tentativas vezes.
+    
+    Args:
+        item: Email lido das entradas
+        max_tentativas: Tentativas por item após 429/503
+    
+    Returns:
+        Dicionário com id, origem, sucesso e a classificação (ou o erro)
+    """
+    resultado = {"id": item.id, "origem": item.origem}
+    if item.erro:
+        return _falha(resultado, item.erro, 400)
+    try:
+        texto = item.texto
+        if item.caminho is not None:
+            with open(item.caminho, "rb") as arquivo:
+                texto = await extrair_texto_de_arquivo_async(item.caminho, arquivo)
+        if not texto or not texto.strip():
+            return _falha(resultado, "Email sem texto para classificar", 400)
+        
+        for tentativa in range(1, max_tentativas + 1):
+            try:
+                resposta = await processar_email_async(texto)
+                break
+            except HTTPException as he:
+                if he.status_code not in (429, 503) or tentativa == max_tentativas:
+                    raise
+                espera = segundos_retry_after(he)
+                logger.warning("⏳ %s recebeu %s, nova tentativa em %.0fs", item.id, he.status_code, espera)
+                await asyncio.sleep(espera)
+        resultado.update({"sucesso": True, **resposta.model_dump(exclude={"all_scores"})})
+        return resultado
+    except HTTPException as he:
+        detalhe = he.detail if isinstance(he.detail, str) else json.dumps(he.detail, ensure_ascii=False)
+        return _falha(resultado, detalhe, he.status_code)
+    except (ValueError, OSError) as e:
+        return _falha(resultado, str(e), 400)
+    except Exception as e:
+        logger.error("❌ Erro ao classificar %s: %s - %s", item.id, type(e).__name__, e)
+        return _falha(resultado, f"Erro interno: {type(e).__name__}", 500)
+
+
+async def classificar_entradas(
+    entradas: Iterator[ItemEntrada],
+    escritor: EscritorResultados,
+    progresso: Progresso,
+    concluidos: Optional[Set[str]] = None,
+    concorrencia: int = LOTE_MAX_CONCORRENCIA,
+    max_tentativas: int = JOBS_MAX_TENTATIVAS,
+):
+    """
+    Classifica os itens com concorrência limitada, gravando cada resultado ao terminar
+    
+    A leitura roda em uma thread (o gerador faz I/O de disco) e alimenta uma fila
+    limitada: no máximo 2 × concorrencia emails ficam em memória esperando um worker.
+    
+    Args:
+        entradas: Gerador de ItemEntrada
+        escritor: Onde gravar os resultados
+        progresso: Barra de progresso
+        concluidos: Ids a pular (já classificados em uma execução anterior)
+        concorrencia: Emails classificados ao mesmo tempo
+        max_tentativas: Tentativas por item após 429/503
+    """
+    concluidos = concluidos or set()
+    concorrencia = max(1, concorrencia)
+    fila: asyncio.Queue = asyncio.Queue(maxsize=concorrencia * 2)
+    
+    async def produzir():
+        while (item := await asyncio.to_thread(next, entradas, None)) is not None:
+            if item.id in concluidos:
+                progresso.pular()
+                continue
+            await fila.put(item)
+        for _ in range(concorrencia):
+            await fila.put(None)
+    
+    async def trabalhar():
+        while (item := await fila.get()) is not None:
+            resultado = await classificar_item(item, max_tentativas)
+            escritor.escrever(resultado)
+            progresso.avancar(resultado["sucesso"])
+    
+    await asyncio.gather(produzir(), *(trabalhar() for _ in range(concorrencia)))
+
+
+def _interromper(numero_sinal, quadro):
+    raise KeyboardInterrupt
+
+
+def _comando_classificar(args: argparse.Namespace) -> int:
+    """Classifica as entradas e grava os resultados no arquivo de saída"""
+    if not CHAVES_API_GEMINI:
+        print(
+            "⚠️ Nenhuma API key do Gemini (GEMINI_API_KEY): só cache, classificador local e "
+            "similaridade classificam; os demais emails terminam com erro 503",
+            file=sys.stderr,
+        )
+    formato = detectar_formato(args.saida, args.formato)
+    concluidos = ler_concluidos(args.saida, formato) if args.retomar else set()
+    if concluidos:
+        print(f"⏭️ Retomando: {len(concluidos)} emails já classificados em {args.saida}", file=sys.stderr)
+    
+    progresso = Progresso(0 if args.sem_progresso else contar_entradas(args.entradas), not args.sem_progresso)
+    escritor = EscritorResultados(args.saida, formato, acrescentar=args.retomar)
+    signal.signal(signal.SIGTERM, _interromper)
+    try:
+        asyncio.run(classificar_entradas(
+            iterar_entradas(args.entradas), escritor, progresso, concluidos, args.concorrencia, args.max_tentativas,
+        ))
+    except KeyboardInterrupt:
+        progresso.finalizar()
+        print(f"\n⚠️ Interrompido. Para continuar: mesmo comando com --retomar (saída: {args.saida})", file=sys.stderr)
+        return 130
+    finally:
+        escritor.fechar()
+        encerrar_executor_extracao()
+    
+    progresso.finalizar()
+    print(
+        f"✅ {progresso.sucesso} classificados, ❌ {progresso.falhas} com erro, ⏭️ {progresso.pulados} pulados",
+        file=sys.stderr,
+    )
+    return 1 if progresso.falhas else 0
+
+
+def _inteiro_positivo(valor: str) -> int:
+    """Tipo do argparse para opções que precisam ser >= 1"""
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inteiro inválido: {valor!r}")
+    if numero < 1:
+        raise argparse.ArgumentTypeError(f"precisa ser pelo menos 1 (recebido: {numero})")
+    return numero
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Classificação de emails em lote, sem a API")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostra os logs INFO dos serviços")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    
+    classificar = subparsers.add_parser(
+        "classificar", aliases=["classify"], help="Classifica emails de arquivos .mbox/.eml/.txt/.pdf ou pastas (maildir)"
+    )
+    classificar.add_argument("entradas", nargs="+", help="Arquivos ou pastas com os emails")
+    classificar.add_argument("-o", "--saida", required=True, help="Arquivo de resultados (.jsonl ou .csv; '-' para stdout)")
+    classificar.add_argument("--formato", choices=["jsonl", "csv"], help="Formato da saída (padrão: pela extensão)")
+    classificar.add_argument(
+        "--concorrencia", type=_inteiro_positivo, default=max(1, LOTE_MAX_CONCORRENCIA), help="Emails classificados ao mesmo tempo"
+    )
+    classificar.add_argument(
+        "--max-tentativas", type=_inteiro_positivo, default=max(1, JOBS_MAX_TENTATIVAS), help="Tentativas por email após 429/503"
+    )
+    classificar.add_argument("--retomar", "--resume", action="store_true", help="Pula os ids já classificados na saída e acrescenta os novos")
+    classificar.add_argument("--sem-progresso", action="store_true", help="Não mostra a barra de progresso")
+    
+    args = parser.parse_args(argv)
+    if args.retomar and args.saida == "-":
+        parser.error("--retomar precisa de um arquivo de saída")
+    # Logs dos serviços só a partir de WARNING, para não quebrar a barra de progresso
+    configurar_logs(nivel="INFO" if args.verbose else "WARNING")
+    try:
+        return _comando_classificar(args)
+    finally:
+        encerrar_logs()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
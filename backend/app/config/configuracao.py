@@ -6,10 +6,35 @@ from dotenv import load_dotenv
 
 load_dotenv(override=False)
 
+
+def _env_bool(nome: str, padrao: bool = False) -> bool:
+    """Lê uma variável de ambiente booleana (aceita 1/true/sim/yes)"""
+    valor = os.getenv(nome)
+    if valor is None:
+        return padrao
+    return valor.strip().lower() in ("1", "true", "sim", "yes", "on")
+
+
 # Configurações da API Gemini
-CHAVE_API_GEMINI = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-if not CHAVE_API_GEMINI:
-    raise RuntimeError("Defina GEMINI_API_KEY (ou GOOGLE_API_KEY) nas variáveis de ambiente.")
+# Para somar a cota de várias API keys, liste-as separadas por vírgula em GEMINI_API_KEYS:
+# GEMINI_API_KEYS=chave1,chave2,chave3
+# A chave de GEMINI_API_KEY (ou GOOGLE_API_KEY), se existir, entra no início da lista.
+# Sem nenhuma chave a API sobe mesmo assim (health check, cache, classificador local e
+# similaridade funcionam); as chamadas ao Gemini respondem 503. A validação é feita na
+# inicialização da API (lifespan): com GEMINI_EXIGIR_CHAVE=true, a API não sobe sem chave.
+_chave_principal = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+CHAVES_API_GEMINI = list(dict.fromkeys(
+    chave.strip()
+    for chave in [_chave_principal or "", *os.getenv("GEMINI_API_KEYS", "").split(",")]
+    if chave.strip()
+))
+CHAVE_API_GEMINI = CHAVES_API_GEMINI[0] if CHAVES_API_GEMINI else ""
+GEMINI_EXIGIR_CHAVE = _env_bool("GEMINI_EXIGIR_CHAVE", False)
+
+# Uma chave que retorna 429 (RESOURCE_EXHAUSTED) fica em espera por GEMINI_CHAVE_ESPERA_SEGUNDOS
+# (ou pelo tempo sugerido pela API, se vier no erro) e as chamadas passam para a próxima chave.
+# O 429 só chega ao usuário quando todas as chaves estão esgotadas.
+GEMINI_CHAVE_ESPERA_SEGUNDOS = float(os.getenv("GEMINI_CHAVE_ESPERA_SEGUNDOS", "60"))
 
 # Modelos disponíveis do Gemini:
 # - "gemini-2.5-flash" (padrão) - Mais rápido, menor custo
@@ -33,4 +58,195 @@ MODELO_GEMINI = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 # Configurações de arquivo
 EXTENSOES_PERMITIDAS = [".txt", ".pdf"]
 TAMANHO_MAXIMO_ARQUIVO = 10 * 1024 * 1024  # 10MB
- 
\ No newline at end of file
+
+# Modo de chamada única: classificação + resposta sugerida em UMA chamada ao Gemini
+# (metade da latência e metade da cota por email). Se a resposta da IA não for um
+# JSON válido, o sistema volta automaticamente ao fluxo de duas chamadas.
+# Para ativar, defina no .env:
+# GEMINI_CHAMADA_UNICA=true
+MODO_CHAMADA_UNICA = _env_bool("GEMINI_CHAMADA_UNICA", False)
+
+# Resposta especulativa (fluxo de duas chamadas): a resposta sugerida começa junto com a
+# classificação, para um label previsto sem IA (modelo local, se houver, ou os sinais de
+# pedido/cortesia do email). Se o Gemini classificar com outro label, a resposta
+# especulativa é cancelada e gerada de novo. Acertos economizam a espera pela resposta;
+# erros gastam uma chamada a mais. Acompanhe em /metrics (resposta_especulativa_total).
+RESPOSTA_ESPECULATIVA = _env_bool("RESPOSTA_ESPECULATIVA", False)
+
+# Resposta da classificação: o Gemini recebe o schema do JSON ({label, confidence, reason})
+# e a resposta é validada direto do texto. Se vier fora do formato (texto em volta, aspas
+# simples, vírgula sobrando), um reparo local tenta corrigi-la; só se o reparo falhar a
+# pergunta é refeita, até CLASSIFICACAO_NOVAS_TENTATIVAS vezes (0 = erro 500 na hora).
+# A chamada única ({..., suggested_reply}) segue o mesmo caminho e, se ainda assim
+# falhar, volta para o fluxo de duas chamadas.
+# Acompanhe em /metrics (classificacao_parse_total por prompt e caminho).
+CLASSIFICACAO_NOVAS_TENTATIVAS = max(0, int(os.getenv("CLASSIFICACAO_NOVAS_TENTATIVAS", "1")))
+
+# Cache de resultados (classificação e resposta sugerida)
+# A chave é um hash do texto normalizado + modelo + versão do prompt, então emails
+# idênticos (encaminhamentos, newsletters, "obrigado!") não gastam cota de novo.
+# - Camada 1: memória (LRU com TTL e tamanho máximo)
+# - Camada 2 (opcional): SQLite em disco, sobrevive a reinícios. Defina CACHE_SQLITE_CAMINHO
+#   no .env para ativar, ex.: CACHE_SQLITE_CAMINHO=cache_resultados.db
+#   A tabela guarda no máximo CACHE_TAMANHO_MAXIMO itens não expirados (os gravados há
+#   mais tempo saem primeiro).
+# Ao alterar os prompts, incremente PROMPT_VERSAO para invalidar o cache antigo.
+CACHE_HABILITADO = _env_bool("CACHE_HABILITADO", True)
+CACHE_TAMANHO_MAXIMO = int(os.getenv("CACHE_TAMANHO_MAXIMO", "1000"))
+CACHE_TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", str(24 * 60 * 60)))  # 24h
+CACHE_SQLITE_CAMINHO = os.getenv("CACHE_SQLITE_CAMINHO", "")
+VERSAO_PROMPT = os.getenv("PROMPT_VERSAO", "3")
+
+# Coalescência (single-flight): requisições idênticas que chegam juntas, antes de o cache
+# ter o resultado (ex.: um email em massa), aguardam a mesma chamada ao Gemini em vez de
+# fazer uma cada. A chave é a mesma do cache. Para desativar: COALESCER_CHAMADAS=false
+COALESCER_CHAMADAS = _env_bool("COALESCER_CHAMADAS", True)
+
+# Texto do email dentro dos prompts, medido em tokens estimados (~4 caracteres por token)
+# PROMPT_LIMPAR_EMAIL: remove citações de respostas anteriores, assinaturas e avisos legais
+# PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO / PROMPT_ORCAMENTO_TOKENS_RESPOSTA: se o email limpo
+# passar do orçamento, só as frases mais informativas (pedidos, perguntas, números de
+# chamado) são enviadas, em vez dos primeiros N caracteres
+PROMPT_LIMPAR_EMAIL = _env_bool("PROMPT_LIMPAR_EMAIL", True)
+PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO = int(os.getenv("PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO", "500"))
+PROMPT_ORCAMENTO_TOKENS_RESPOSTA = int(os.getenv("PROMPT_ORCAMENTO_TOKENS_RESPOSTA", "375"))
+
+# Respostas por modelo (sem chamar o Gemini para a resposta sugerida)
+# Emails dos labels em RESPOSTA_MODELOS_LABELS (separados por vírgula) que forem só um
+# agradecimento, uma felicitação, votos de festas ou uma confirmação de recebimento
+# recebem a resposta de um modelo local, com o nome do remetente e os números de
+# chamado/protocolo citados no email. Emails com pedido ou pergunta, ou com mais de
+# RESPOSTA_MODELOS_MAXIMO_PALAVRAS palavras, continuam com a resposta do Gemini.
+# Vazio desativa: RESPOSTA_MODELOS_LABELS=
+RESPOSTA_MODELOS_LABELS = [
+    label.strip() for label in os.getenv("RESPOSTA_MODELOS_LABELS", "Improdutivo").split(",") if label.strip()
+]
+RESPOSTA_MODELOS_MAXIMO_PALAVRAS = int(os.getenv("RESPOSTA_MODELOS_MAXIMO_PALAVRAS", "80"))
+
+# Instruções de sistema e cache de contexto do Gemini
+# A parte fixa de cada prompt (papel, definições, diretrizes e formato da resposta) vai em
+# system_instruction, antes do email; só o trecho com o email muda entre as chamadas.
+# Com GEMINI_CACHE_CONTEXTO=true, cada instrução é registrada uma vez por API key como
+# cached content (caches.create) e as chamadas enviam só o email. O registro vale por
+# GEMINI_CACHE_CONTEXTO_TTL_SEGUNDOS e é renovado quando faltar menos de
+# GEMINI_CACHE_CONTEXTO_RENOVAR_SEGUNDOS para expirar.
+# ⚠️ O Gemini exige um mínimo de tokens por cached content (ex.: 1024 no gemini-2.5-flash).
+# Se a instrução for menor (ou o registro falhar), ela continua indo em system_instruction
+# e o registro só é tentado de novo depois do TTL.
+GEMINI_CACHE_CONTEXTO = _env_bool("GEMINI_CACHE_CONTEXTO", False)
+GEMINI_CACHE_CONTEXTO_TTL_SEGUNDOS = int(os.getenv("GEMINI_CACHE_CONTEXTO_TTL_SEGUNDOS", "3600"))
+GEMINI_CACHE_CONTEXTO_RENOVAR_SEGUNDOS = int(os.getenv("GEMINI_CACHE_CONTEXTO_RENOVAR_SEGUNDOS", "300"))
+
+# Número máximo de chamadas simultâneas ao Gemini (caminho assíncrono).
+# Chamadas além desse limite aguardam na fila em vez de abrir mais conexões.
+GEMINI_MAX_CONCORRENCIA = int(os.getenv("GEMINI_MAX_CONCORRENCIA", "8"))
+
+# Limite de taxa no cliente (token bucket por API key), para não estourar a cota do plano.
+# GEMINI_RPM: requisições por minuto por chave; GEMINI_RPD: requisições por dia por chave
+# (0 = sem limite). No plano gratuito, ex.: GEMINI_RPM=10 e GEMINI_RPD=20.
+# Se a espera por um token passar de GEMINI_ESPERA_MAXIMA_SEGUNDOS, a chave é tratada como
+# sem cota (passa para a próxima) em vez de segurar a requisição.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "0"))
+GEMINI_RPD = int(os.getenv("GEMINI_RPD", "0"))
+GEMINI_ESPERA_MAXIMA_SEGUNDOS = float(os.getenv("GEMINI_ESPERA_MAXIMA_SEGUNDOS", "30"))
+
+# Novas tentativas para falhas temporárias (429 com todas as chaves sem cota, 5xx, rede):
+# espera exponencial com jitter (GEMINI_RETRY_BASE_SEGUNDOS * 2^n, até GEMINI_RETRY_MAXIMO_SEGUNDOS),
+# respeitando o tempo sugerido pela API (retryDelay) quando ele existir.
+GEMINI_MAX_TENTATIVAS = int(os.getenv("GEMINI_MAX_TENTATIVAS", "3"))
+GEMINI_RETRY_BASE_SEGUNDOS = float(os.getenv("GEMINI_RETRY_BASE_SEGUNDOS", "0.5"))
+GEMINI_RETRY_MAXIMO_SEGUNDOS = float(os.getenv("GEMINI_RETRY_MAXIMO_SEGUNDOS", "20"))
+
+# Circuit breaker: após GEMINI_DISJUNTOR_FALHAS falhas seguidas do Gemini (5xx/rede), as chamadas
+# falham na hora (503) por GEMINI_DISJUNTOR_ABERTO_SEGUNDOS; depois, uma chamada de teste decide
+# se o circuito fecha de novo.
+GEMINI_DISJUNTOR_FALHAS = int(os.getenv("GEMINI_DISJUNTOR_FALHAS", "5"))
+GEMINI_DISJUNTOR_ABERTO_SEGUNDOS = float(os.getenv("GEMINI_DISJUNTOR_ABERTO_SEGUNDOS", "30"))
+
+# Classificação em lote (/api/emails/classify-batch)
+# LOTE_MAX_ITENS: máximo de emails por requisição
+# LOTE_TAMANHO_MAXIMO_CORPO: tamanho máximo do corpo (bytes); acima disso a requisição é
+# rejeitada com 413 sem ser lida por inteiro
+# LOTE_MAX_CONCORRENCIA: quantos emails do lote são processados ao mesmo tempo
+# (as chamadas ao Gemini continuam limitadas por GEMINI_MAX_CONCORRENCIA)
+LOTE_MAX_ITENS = int(os.getenv("LOTE_MAX_ITENS", "5000"))
+LOTE_TAMANHO_MAXIMO_CORPO = int(os.getenv("LOTE_TAMANHO_MAXIMO_CORPO", str(20 * 1024 * 1024)))  # 20MB
+LOTE_MAX_CONCORRENCIA = int(os.getenv("LOTE_MAX_CONCORRENCIA", str(GEMINI_MAX_CONCORRENCIA)))
+
+# Empacotamento de vários emails em UM prompt de classificação (usado no lote)
+# Em vez de uma chamada por email, os emails são agrupados até atingir o orçamento
+# de caracteres do prompt (não um número fixo de emails). Itens que faltarem ou
+# vierem malformados na resposta são reenviados automaticamente.
+LOTE_EMPACOTAR_PROMPTS = _env_bool("LOTE_EMPACOTAR_PROMPTS", False)
+LOTE_PROMPT_ORCAMENTO_CARACTERES = int(os.getenv("LOTE_PROMPT_ORCAMENTO_CARACTERES", "12000"))
+LOTE_PROMPT_MAX_TENTATIVAS = int(os.getenv("LOTE_PROMPT_MAX_TENTATIVAS", "2"))
+
+# Jobs de classificação em lote (/api/emails/jobs): envia, acompanha o progresso e busca
+# os resultados depois, sem manter a conexão aberta
+# JOBS_SQLITE_CAMINHO: banco com os jobs e seus itens (retomados após reiniciar a API);
+# vazio (padrão) desativa os endpoints de jobs. Para ativar, ex.: JOBS_SQLITE_CAMINHO=jobs.sqlite3
+# JOBS_WORKERS: workers assíncronos que processam os itens (dividem o pool de chaves,
+# o limite de taxa e GEMINI_MAX_CONCORRENCIA com o resto da API)
+# JOBS_MAX_TENTATIVAS: vezes que um item volta para a fila após 429/503 antes de virar erro
+# JOBS_TAMANHO_MAXIMO_CORPO: tamanho máximo do corpo JSON/NDJSON de /jobs (413 sem ler
+# o corpo inteiro)
+# JOBS_TAMANHO_MAXIMO_UPLOAD: tamanho máximo da requisição com arquivos (/jobs/files);
+# cada arquivo continua limitado a TAMANHO_MAXIMO_ARQUIVO
+JOBS_SQLITE_CAMINHO = os.getenv("JOBS_SQLITE_CAMINHO", "")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_MAX_ITENS = int(os.getenv("JOBS_MAX_ITENS", "50000"))
+JOBS_MAX_TENTATIVAS = int(os.getenv("JOBS_MAX_TENTATIVAS", "3"))
+JOBS_TAMANHO_MAXIMO_CORPO = int(os.getenv("JOBS_TAMANHO_MAXIMO_CORPO", str(100 * 1024 * 1024)))  # 100MB
+JOBS_TAMANHO_MAXIMO_UPLOAD = int(os.getenv("JOBS_TAMANHO_MAXIMO_UPLOAD", str(100 * 1024 * 1024)))  # 100MB
+
+# Detecção de emails quase duplicados (MinHash + LSH)
+# Emails de modelo (mesmo texto com outro nome, número de chamado ou data) não acertam o
+# cache, que exige texto idêntico. Com SIMILARIDADE_HABILITADA=true, os emails classificados
+# pelo Gemini entram em um índice em memória; um email novo com similaridade de Jaccard
+# estimada >= SIMILARIDADE_LIMIAR reaproveita a classificação guardada.
+# SIMILARIDADE_TAMANHO_MAXIMO: emails no índice (LRU; a validade é CACHE_TTL_SEGUNDOS)
+# SIMILARIDADE_PERMUTACOES / SIMILARIDADE_BANDAS: tamanho da assinatura MinHash e número
+# de bandas do LSH (mais bandas = mais candidatos comparados, menos parecidos perdidos)
+# SIMILARIDADE_REUTILIZAR_RESPOSTA: reaproveita também a resposta sugerida (que pode citar
+# nomes e números do email original); por padrão só a classificação é reaproveitada
+SIMILARIDADE_HABILITADA = _env_bool("SIMILARIDADE_HABILITADA", False)
+SIMILARIDADE_LIMIAR = float(os.getenv("SIMILARIDADE_LIMIAR", "0.7"))
+SIMILARIDADE_TAMANHO_MAXIMO = int(os.getenv("SIMILARIDADE_TAMANHO_MAXIMO", "10000"))
+SIMILARIDADE_PERMUTACOES = int(os.getenv("SIMILARIDADE_PERMUTACOES", "120"))
+SIMILARIDADE_BANDAS = int(os.getenv("SIMILARIDADE_BANDAS", "24"))
+SIMILARIDADE_REUTILIZAR_RESPOSTA = _env_bool("SIMILARIDADE_REUTILIZAR_RESPOSTA", False)
+
+# Classificador local (offline) - decide emails óbvios sem chamar o Gemini
+# Treine o modelo com um CSV rotulado (colunas: texto,label):
+#   python -m app.services.classificador_local_servico treinar dados.csv modelo_local.npz
+# e defina CLASSIFICADOR_LOCAL_MODELO=modelo_local.npz no .env. Só emails com confiança
+# >= CLASSIFICADOR_LOCAL_LIMIAR são decididos localmente; os incertos vão para o Gemini.
+CLASSIFICADOR_LOCAL_MODELO = os.getenv("CLASSIFICADOR_LOCAL_MODELO", "")
+CLASSIFICADOR_LOCAL_LIMIAR = float(os.getenv("CLASSIFICADOR_LOCAL_LIMIAR", "0.9"))
+
+# Extração de texto de PDFs
+# EXTRACAO_LIMITE_CARACTERES: para de ler páginas quando esse total de caracteres é
+# atingido (a IA só usa o início do email; 0 = extrai o PDF inteiro)
+# EXTRACAO_EXECUTOR: "thread" ou "process" - onde a extração roda (fora do event loop)
+# EXTRACAO_MAX_WORKERS: tamanho do pool de extração
+EXTRACAO_LIMITE_CARACTERES = int(os.getenv("EXTRACAO_LIMITE_CARACTERES", "20000"))
+EXTRACAO_EXECUTOR = os.getenv("EXTRACAO_EXECUTOR", "thread").strip().lower()
+EXTRACAO_MAX_WORKERS = int(os.getenv("EXTRACAO_MAX_WORKERS", "2"))
+
+# Métricas (contadores, histogramas e tempo por etapa) expostas em /metrics no formato
+# do Prometheus e no cabeçalho Server-Timing. Com METRICAS_HABILITADAS=false nada é medido.
+METRICAS_HABILITADAS = _env_bool("METRICAS_HABILITADAS", True)
+
+# Logs
+# LOG_NIVEL: DEBUG, INFO, WARNING, ERROR (DEBUG registra trechos dos emails e das respostas da IA)
+# LOG_FORMATO: "texto" (legível) ou "json" (uma linha JSON por registro, com request_id)
+# LOG_ASSINCRONO: grava os logs em uma thread separada (QueueHandler), fora da thread da requisição
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+LOG_FORMATO = os.getenv("LOG_FORMATO", "texto").lower()
+LOG_ASSINCRONO = _env_bool("LOG_ASSINCRONO", True)
+
+# Inicialização
+# PRE_CARREGAR_MODULOS: depois que a API sobe, importa o SDK do Gemini e o pdfplumber em
+# segundo plano, para a primeira chamada ao Gemini / primeiro PDF não pagar esse custo.
+# A API já atende (ex.: /health) enquanto isso acontece.
+PRE_CARREGAR_MODULOS = _env_bool("PRE_CARREGAR_MODULOS", True)
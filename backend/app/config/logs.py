@@ -0,0 +1,154 @@
+"""
+Configuração dos logs da aplicação
+
+- Nível e formato vêm do .env (LOG_NIVEL, LOG_FORMATO)
+- Formato "json": uma linha JSON por registro, com o request_id da requisição
+- IdRequisicaoMiddleware: gera (ou reaproveita o X-Request-ID recebido) um id por
+  requisição, incluído em todos os logs e devolvido no cabeçalho X-Request-ID
+- LOG_ASSINCRONO: os registros vão para uma fila (QueueHandler) e uma thread separada
+  (QueueListener) formata e escreve, então a requisição não espera pelo I/O do log
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from app.config.configuracao import LOG_NIVEL, LOG_FORMATO, LOG_ASSINCRONO
+
+# Formato do modo texto (o mesmo de antes, com o id da requisição)
+FORMATO_TEXTO = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+FORMATO_DATA = "%Y-%m-%d %H:%M:%S"
+
+# Bibliotecas que registram cada requisição HTTP em DEBUG/INFO
+LOGGERS_RUIDOSOS = ("urllib3", "httpx", "httpcore", "google_genai", "pdfminer", "multipart")
+
+# Id da requisição atual ("-" fora de requisições)
+_id_requisicao: ContextVar[str] = ContextVar("id_requisicao", default="-")
+
+# X-Request-ID aceito do cliente (evita injeção de texto arbitrário nos logs)
+_PADRAO_ID_REQUISICAO = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+# Listener da fila (modo assíncrono), parado em encerrar_logs()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def obter_id_requisicao() -> str:
+    """Retorna o id da requisição atual ("-" fora de uma requisição)"""
+    return _id_requisicao.get()
+
+
+class FiltroIdRequisicao(logging.Filter):
+    """Adiciona request_id ao registro (roda na thread que gerou o log)"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _id_requisicao.get()
+        return True
+
+
+class FormatadorJSON(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FilaHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não formata a mensagem antes de enfileirar
+    
+    O QueueHandler padrão chama format() na thread de origem (para poder enviar o
+    registro a outro processo). Aqui a fila é do mesmo processo, então a formatação
+    fica para a thread do listener; só o traceback é resolvido antes, porque o
+    objeto da exceção pode mudar depois.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+def configurar_logs(nivel: str = LOG_NIVEL, formato: str = LOG_FORMATO, assincrono: bool = LOG_ASSINCRONO):
+    """
+    Configura o logger raiz da aplicação (substitui handlers configurados antes)
+    
+    Args:
+        nivel: Nível mínimo (DEBUG, INFO, WARNING, ERROR)
+        formato: "texto" ou "json"
+        assincrono: Se True, escreve os logs em uma thread separada
+    """
+    global _listener
+    encerrar_logs()
+    
+    formatador = FormatadorJSON() if formato == "json" else logging.Formatter(FORMATO_TEXTO, FORMATO_DATA)
+    saida = logging.StreamHandler()
+    saida.setFormatter(formatador)
+    
+    if assincrono:
+        handler = FilaHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(handler.queue, saida, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = saida
+    handler.addFilter(FiltroIdRequisicao())
+    
+    raiz = logging.getLogger()
+    for antigo in list(raiz.handlers):
+        raiz.removeHandler(antigo)
+    raiz.addHandler(handler)
+    raiz.setLevel(getattr(logging, nivel, logging.INFO))
+    
+    # Mesmo em DEBUG, as bibliotecas HTTP ficam em WARNING
+    for nome in LOGGERS_RUIDOSOS:
+        logging.getLogger(nome).setLevel(logging.WARNING)
+
+
+def encerrar_logs():
+    """Para o listener da fila, escrevendo os registros pendentes"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class IdRequisicaoMiddleware:
+    """
+    Middleware ASGI que define o id da requisição
+    
+    Usa o cabeçalho X-Request-ID recebido (se for válido) ou gera um novo, e devolve
+    o id no cabeçalho X-Request-ID da resposta.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        recebido = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+        id_requisicao = recebido if _PADRAO_ID_REQUISICAO.match(recebido) else uuid.uuid4().hex
+        token = _id_requisicao.set(id_requisicao)
+        
+        async def send_com_id(mensagem):
+            if mensagem["type"] == "http.response.start":
+                mensagem = {**mensagem, "headers": [*mensagem.get("headers", []), (b"x-request-id", id_requisicao.encode("latin-1"))]}
+            await send(mensagem)
+        
+        try:
+            await self.app(scope, receive, send_com_id)
+        finally:
+            _id_requisicao.reset(token)
@@ -1,13 +1,28 @@
 """
 Controlador de Emails - Gerencia os endpoints da API
 """
+import json
 import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from typing import List, Union
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.models.schemas import RequisicaoEmailTexto, RespostaClassificacao
-from app.services.extrator_servico import extrair_texto_de_arquivo
-from app.services.classificador_servico import classificar_email_com_ia, obter_cliente_gemini
-from app.services.resposta_servico import gerar_resposta_sugerida
+from app.config.configuracao import JOBS_MAX_ITENS, SIMILARIDADE_HABILITADA
+from app.models.schemas import (
+    RequisicaoEmailTexto,
+    RespostaClassificacao,
+    RespostaLote,
+    StatusJob,
+    PaginaResultadosJob,
+)
+from app.services.extrator_servico import extrair_texto_de_arquivo_async
+from app.services.upload_servico import ler_upload_limitado
+from app.services.gemini_servico import obter_cliente_gemini, estatisticas_gemini
+from app.services.processamento_servico import processar_email_async, processar_email_stream
+from app.services.cache_servico import cache_resultados
+from app.services.coalescencia_servico import grupo_chamadas
+from app.services.lote_servico import ErroItemLote, interpretar_corpo_lote, processar_lote_async
+from app.services.jobs_servico import fila_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -53,8 +68,41 @@ def teste_gemini_direto(payload: TesteGeminiRequest):
         )
 
 
+@router.get("/cache/stats")
+def estatisticas_cache():
+    """
+    Retorna as estatísticas do cache de resultados
+    
+    Inclui hits (memória e disco), misses, evicções e taxa de acerto, e em
+    "similaridade" os mesmos números do índice de emails quase duplicados (só
+    {"habilitado": false} com o índice desligado: ele nem chega a ser carregado). Em
+    "coalescencia", quantas chamadas aguardaram uma chamada idêntica em andamento
+    em vez de chamar o Gemini de novo.
+    """
+    similaridade = {"habilitado": False}
+    if SIMILARIDADE_HABILITADA:
+        from app.services.similaridade_servico import indice_similaridade
+        similaridade = indice_similaridade.estatisticas()
+    return {
+        **cache_resultados.estatisticas(),
+        "similaridade": similaridade,
+        "coalescencia": grupo_chamadas.estatisticas(),
+    }
+
+
+@router.get("/pool/stats")
+def estatisticas_pool_chaves():
+    """
+    Retorna o estado do pool de API keys do Gemini
+    
+    Para cada chave: requisições, sucessos, erros de cota, outros erros, cooldown restante
+    e limite de taxa. Inclui também o estado do disjuntor e as novas tentativas.
+    """
+    return estatisticas_gemini()
+
+
 @router.get("/classify-text-get")
-def classificar_texto_get(texto: str = Query(..., description="Texto do email para classificar")):
+async def classificar_texto_get(texto: str = Query(..., description="Texto do email para classificar")):
     """
     Endpoint GET alternativo para classificar texto
     Útil para testar com URLs diretas ou quando JSON dá problema
@@ -62,19 +110,8 @@ def classificar_texto_get(texto: str = Query(..., description="Texto do email pa
     Exemplo: /api/emails/classify-text-get?texto=Olá, preciso de ajuda
     """
     try:
-        # 1. Classifica o email usando IA
-        resultado_classificacao = classificar_email_com_ia(texto)
-        
-        # 2. Gera resposta sugerida personalizada usando IA (baseada no conteúdo do email)
-        resposta_sugerida = gerar_resposta_sugerida(resultado_classificacao["label"], texto)
-        
-        # 3. Retorna o resultado
-        return RespostaClassificacao(
-            label=resultado_classificacao["label"],
-            confidence=resultado_classificacao["confidence"],
-            suggested_reply=resposta_sugerida,
-            all_scores=None
-        )
+        # Classifica o email e gera a resposta sugerida (chamada única ou duas chamadas)
+        return await processar_email_async(texto)
     except HTTPException:
         raise
     except Exception as e:
@@ -85,7 +122,7 @@ def classificar_texto_get(texto: str = Query(..., description="Texto do email pa
 
 
 @router.post("/classify-text", response_model=RespostaClassificacao)
-def classificar_texto(payload: RequisicaoEmailTexto):
+async def classificar_texto(payload: RequisicaoEmailTexto):
     """
     Endpoint para classificar texto de email diretamente
     
@@ -99,49 +136,29 @@ def classificar_texto(payload: RequisicaoEmailTexto):
         "texto": "Olá, gostaria de saber o status da minha requisição"
     }
     """
-    logger.info("=" * 80)
-    logger.info("📧 NOVA REQUISIÇÃO DE CLASSIFICAÇÃO DE TEXTO")
-    logger.info("=" * 80)
-    logger.info(f"Tamanho do texto recebido: {len(payload.texto)} caracteres")
-    logger.debug(f"Texto recebido (primeiros 200 chars): {payload.texto[:200]}...")
+    logger.info("📧 Nova requisição de classificação de texto (%d caracteres)", len(payload.texto))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Texto recebido (primeiros 200 chars): %s...", payload.texto[:200])
     
     try:
-        logger.info("🔍 PASSO 1: Iniciando classificação do email com IA...")
-        # 1. Classifica o email usando IA
-        resultado_classificacao = classificar_email_com_ia(payload.texto)
-        logger.info(f"✅ Classificação concluída: {resultado_classificacao.get('label')} (confiança: {resultado_classificacao.get('confidence')})")
-        logger.debug(f"Resultado completo da classificação: {resultado_classificacao}")
-        
-        logger.info("💬 PASSO 2: Gerando resposta sugerida com IA...")
-        # 2. Gera resposta sugerida personalizada usando IA (baseada no conteúdo do email)
-        resposta_sugerida = gerar_resposta_sugerida(resultado_classificacao["label"], payload.texto)
-        logger.info(f"✅ Resposta gerada com sucesso (tamanho: {len(resposta_sugerida)} caracteres)")
-        logger.debug(f"Resposta sugerida: {resposta_sugerida[:200]}...")
-        
-        logger.info("📤 PASSO 3: Montando resposta final...")
-        # 3. Retorna o resultado
-        resultado_final = RespostaClassificacao(
-            label=resultado_classificacao["label"],
-            confidence=resultado_classificacao["confidence"],
-            suggested_reply=resposta_sugerida,
-            all_scores=None
-        )
-        logger.info("✅ Requisição processada com SUCESSO!")
-        logger.info("=" * 80)
+        # Classifica o email e gera a resposta sugerida (chamada única ou duas chamadas)
+        resultado_final = await processar_email_async(payload.texto)
+        logger.info("✅ Classificação concluída: %s (confiança: %s)", resultado_final.label, resultado_final.confidence)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Resposta sugerida: %s...", resultado_final.suggested_reply[:200])
         return resultado_final
     except HTTPException as he:
         # Re-lança exceções HTTP (já estão formatadas)
-        logger.error(f"❌ HTTPException capturada: {he.status_code} - {he.detail}")
-        logger.error("=" * 80)
+        logger.error("❌ HTTPException capturada: %s - %s", he.status_code, he.detail)
         raise
     except Exception as e:
         # Captura outros erros inesperados
         logger.error("=" * 80)
-        logger.error(f"❌ ERRO INESPERADO no endpoint classificar_texto!")
-        logger.error(f"Tipo de exceção: {type(e).__name__}")
-        logger.error(f"Mensagem: {str(e)}")
+        logger.error("❌ ERRO INESPERADO no endpoint classificar_texto!")
+        logger.error("Tipo de exceção: %s", type(e).__name__)
+        logger.error("Mensagem: %s", e)
         import traceback
-        logger.error(f"Traceback completo:\n{traceback.format_exc()}")
+        logger.error("Traceback completo:\n%s", traceback.format_exc())
         logger.error("=" * 80)
         raise HTTPException(
             status_code=500, 
@@ -149,6 +166,50 @@ def classificar_texto(payload: RequisicaoEmailTexto):
         )
 
 
+@router.post("/classify-text/stream")
+async def classificar_texto_stream(payload: RequisicaoEmailTexto):
+    """
+    Classifica o texto e transmite a resposta sugerida via Server-Sent Events
+    
+    Eventos (text/event-stream, dados em JSON):
+    - classificacao: {label, confidence, reason, tier}, assim que a classificação sai
+    - resposta: {texto, substituir}, trechos da resposta sugerida conforme o Gemini gera
+      (substituir=true: o texto substitui o que veio antes, ex.: resposta padrão)
+    - fim: resultado completo, no mesmo formato de /classify-text
+    - erro: {erro}, se algo falhar depois do início do stream
+    
+    Erros da classificação (429, 503...) são devolvidos como resposta HTTP normal.
+    """
+    logger.info("📧 Nova requisição de classificação em stream (%d caracteres)", len(payload.texto))
+    eventos = processar_email_stream(payload.texto)
+    # O primeiro evento (classificação) sai antes da resposta HTTP começar, para que
+    # erros de cota/disjuntor mantenham o status HTTP
+    primeiro = await anext(eventos)
+    return StreamingResponse(
+        _transmitir_eventos(primeiro, eventos),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _transmitir_eventos(primeiro, eventos):
+    """Formata os eventos de processar_email_stream como Server-Sent Events"""
+    try:
+        yield _formatar_evento_sse(*primeiro)
+        async for evento, dados in eventos:
+            yield _formatar_evento_sse(evento, dados)
+    except Exception as e:
+        logger.error("❌ Erro durante o stream da resposta: %s - %s", type(e).__name__, e)
+        detalhe = e.detail if isinstance(e, HTTPException) else f"Erro ao processar solicitação: {str(e)}"
+        yield _formatar_evento_sse("erro", {"erro": detalhe})
+    finally:
+        await eventos.aclose()
+
+
+def _formatar_evento_sse(evento: str, dados: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
 @router.post("/classify-file", response_model=RespostaClassificacao)
 async def classificar_arquivo(file: UploadFile = File(...)):
     """
@@ -160,14 +221,14 @@ async def classificar_arquivo(file: UploadFile = File(...)):
     - Resposta sugerida
     """
     try:
-        # 1. Lê o conteúdo do arquivo
-        conteudo = await file.read()
-        
-        if not conteudo:
-            raise HTTPException(status_code=400, detail="Arquivo vazio ou não foi possível ler")
+        # 1. Valida a extensão e o tamanho do arquivo (413 se passar do limite)
+        buffer = await ler_upload_limitado(file)
         
-        # 2. Extrai o texto do arquivo
-        texto_extraido = extrair_texto_de_arquivo(file.filename or "unknown", conteudo)
+        # 2. Extrai o texto do buffer (no pool de extração, para não bloquear o event loop)
+        try:
+            texto_extraido = await extrair_texto_de_arquivo_async(file.filename or "unknown", buffer)
+        finally:
+            buffer.close()
         
         if not texto_extraido or not texto_extraido.strip():
             raise HTTPException(
@@ -175,19 +236,8 @@ async def classificar_arquivo(file: UploadFile = File(...)):
                 detail="Não foi possível extrair texto do arquivo. Verifique se o arquivo contém texto válido."
             )
         
-        # 3. Classifica o email usando IA
-        resultado_classificacao = classificar_email_com_ia(texto_extraido)
-        
-        # 4. Gera resposta sugerida personalizada usando IA (baseada no conteúdo do email)
-        resposta_sugerida = gerar_resposta_sugerida(resultado_classificacao["label"], texto_extraido)
-        
-        # 5. Retorna o resultado
-        return RespostaClassificacao(
-            label=resultado_classificacao["label"],
-            confidence=resultado_classificacao["confidence"],
-            suggested_reply=resposta_sugerida,
-            all_scores=None
-        )
+        # 3. Classifica o email e gera a resposta sugerida (chamada única ou duas chamadas)
+        return await processar_email_async(texto_extraido)
     except HTTPException:
         # Re-lança exceções HTTP
         raise
@@ -200,3 +250,162 @@ async def classificar_arquivo(file: UploadFile = File(...)):
             status_code=500, 
             detail=f"Erro ao processar arquivo: {str(e)}"
         )
+
+
+@router.post(
+    "/classify-batch",
+    response_model=RespostaLote,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": RequisicaoEmailTexto.model_json_schema()},
+                    "example": [
+                        {"texto": "Olá, qual o status da requisição #12345?"},
+                        {"texto": "Obrigado pelo atendimento!"}
+                    ],
+                },
+                "application/x-ndjson": {
+                    "schema": {"type": "string"},
+                    "example": '{"texto": "Olá, qual o status da requisição #12345?"}\n{"texto": "Obrigado!"}',
+                },
+            },
+        }
+    },
+)
+async def classificar_lote(request: Request):
+    """
+    Endpoint para classificar vários emails em uma única requisição
+    
+    Aceita um array JSON de objetos {"texto": "..."} ou NDJSON (um objeto por linha,
+    Content-Type: application/x-ndjson). Os emails são processados em paralelo com
+    concorrência limitada.
+    
+    Cada item retorna seu próprio resultado ou erro (ex.: 429, JSON inválido), então
+    uma falha isolada não derruba o lote. A resposta inclui estatísticas de throughput.
+    """
+    corpo = await request.body()
+    itens = interpretar_corpo_lote(corpo, request.headers.get("content-type", ""))
+    return await processar_lote_async(itens)
+
+
+@router.post(
+    "/jobs",
+    response_model=StatusJob,
+    status_code=202,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": RequisicaoEmailTexto.model_json_schema()},
+                    "example": [
+                        {"texto": "Olá, qual o status da requisição #12345?"},
+                        {"texto": "Obrigado pelo atendimento!"}
+                    ],
+                },
+                "application/x-ndjson": {
+                    "schema": {"type": "string"},
+                    "example": '{"texto": "Olá, qual o status da requisição #12345?"}\n{"texto": "Obrigado!"}',
+                },
+            },
+        }
+    },
+)
+async def criar_job(request: Request):
+    """
+    Cria um job de classificação em lote (processado em segundo plano)
+    
+    Aceita o mesmo corpo de /classify-batch (array JSON ou NDJSON). Retorna na hora o
+    job_id; acompanhe em GET /jobs/{job_id} e busque os resultados em
+    GET /jobs/{job_id}/resultados.
+    """
+    corpo = await request.body()
+    itens = interpretar_corpo_lote(corpo, request.headers.get("content-type", ""), max_itens=JOBS_MAX_ITENS)
+    return await fila_jobs.submeter([
+        (item if isinstance(item, ErroItemLote) else item.texto, None) for item in itens
+    ])
+
+
+@router.post("/jobs/files", response_model=StatusJob, status_code=202)
+async def criar_job_arquivos(files: List[UploadFile] = File(...)):
+    """
+    Cria um job de classificação a partir de vários arquivos (.txt ou .pdf)
+    
+    O texto de cada arquivo é extraído no envio; arquivos inválidos viram itens com erro
+    (o job continua com os demais). Cada resultado traz o nome do arquivo em "origem".
+    """
+    if len(files) > JOBS_MAX_ITENS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Arquivos demais: {len(files)} (máximo: {JOBS_MAX_ITENS})"
+        )
+    itens = [(await _extrair_arquivo_job(file), file.filename) for file in files]
+    return await fila_jobs.submeter(itens)
+
+
+async def _extrair_arquivo_job(file: UploadFile) -> Union[str, ErroItemLote]:
+    """Lê e extrai o texto de um arquivo do job (erros viram ErroItemLote)"""
+    try:
+        buffer = await ler_upload_limitado(file)
+        try:
+            texto_extraido = await extrair_texto_de_arquivo_async(file.filename or "unknown", buffer)
+        finally:
+            buffer.close()
+    except HTTPException as he:
+        return ErroItemLote(str(he.detail), he.status_code)
+    except ValueError as e:
+        return ErroItemLote(str(e), 400)
+    except Exception as e:
+        logger.error("❌ Erro ao extrair %s para o job: %s - %s", file.filename, type(e).__name__, e)
+        return ErroItemLote(f"Erro ao processar arquivo: {str(e)}", 500)
+    
+    if not texto_extraido or not texto_extraido.strip():
+        return ErroItemLote(
+            "Não foi possível extrair texto do arquivo. Verifique se o arquivo contém texto válido.", 400
+        )
+    return texto_extraido
+
+
+@router.get("/jobs/{job_id}", response_model=StatusJob)
+def status_job(job_id: str):
+    """Progresso do job: status, total, processados, sucesso e falhas"""
+    status = fila_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return status
+
+
+@router.get("/jobs/{job_id}/resultados", response_model=PaginaResultadosJob)
+def resultados_job(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Índice do primeiro item da página"),
+    limite: int = Query(100, ge=1, le=1000, description="Quantidade de itens da página"),
+):
+    """
+    Resultados do job, página por página (itens ainda não processados aparecem com
+    status "pendente" ou "processando")
+    """
+    status = fila_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    itens = fila_jobs.resultados(job_id, offset, limite)
+    proximo = offset + limite
+    return PaginaResultadosJob(
+        job_id=job_id,
+        status=status.status,
+        total=status.total,
+        offset=offset,
+        limite=limite,
+        itens=itens,
+        proximo_offset=proximo if proximo < status.total else None,
+    )
+
+
+@router.delete("/jobs/{job_id}", status_code=204)
+def remover_job(job_id: str):
+    """Remove o job e seus resultados (itens ainda pendentes não são processados)"""
+    if not fila_jobs.remover(job_id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return Response(status_code=204)
@@ -2,26 +2,95 @@
 API para Classificação Automática de Emails
 Estrutura MVC simples e organizada
 """
+import asyncio
+import importlib
 import logging
 import traceback
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.controllers.email_controller import router as email_router
-from app.config.configuracao import CHAVE_API_GEMINI
-
-# Configura logging detalhado
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
+from app.config.configuracao import (
+    CHAVE_API_GEMINI,
+    CHAVES_API_GEMINI,
+    GEMINI_EXIGIR_CHAVE,
+    JOBS_TAMANHO_MAXIMO_CORPO,
+    JOBS_TAMANHO_MAXIMO_UPLOAD,
+    LOTE_TAMANHO_MAXIMO_CORPO,
+    PRE_CARREGAR_MODULOS,
 )
+from app.config.logs import configurar_logs, encerrar_logs, IdRequisicaoMiddleware
+from app.services.cache_servico import cache_resultados
+from app.services.extrator_servico import encerrar_executor_extracao
+from app.services.upload_servico import LimiteUploadMiddleware, MARGEM_MULTIPART
+from app.services.jobs_servico import fila_jobs
+from app.services.metricas_servico import MetricasMiddleware, exportar_metricas
+
+# Configura logging (nível e formato via LOG_NIVEL / LOG_FORMATO)
+configurar_logs()
 logger = logging.getLogger(__name__)
 
+# Módulos pesados importados em segundo plano depois que a API sobe (PRE_CARREGAR_MODULOS).
+# Sem API key, o SDK do Gemini não será usado e fica de fora.
+MODULOS_PRE_CARREGADOS = ("google.genai", "pdfplumber") if CHAVES_API_GEMINI else ("pdfplumber",)
+
+
+def _validar_chaves_gemini():
+    """
+    Verifica as API keys na inicialização
+    
+    Raises:
+        RuntimeError: Se nenhuma chave estiver configurada e GEMINI_EXIGIR_CHAVE=true
+    """
+    logger.info("API Key Gemini configurada: %s", '✅ SIM' if CHAVE_API_GEMINI else '❌ NÃO')
+    if CHAVES_API_GEMINI:
+        logger.info("API Key (primeiros 10 chars): %s... (%d chave(s) no pool)", CHAVE_API_GEMINI[:10], len(CHAVES_API_GEMINI))
+        return
+    mensagem = "Defina GEMINI_API_KEY (ou GOOGLE_API_KEY, ou GEMINI_API_KEYS) nas variáveis de ambiente."
+    if GEMINI_EXIGIR_CHAVE:
+        raise RuntimeError(mensagem)
+    logger.warning("⚠️ Nenhuma API key do Gemini: só cache, classificador local e similaridade respondem. %s", mensagem)
+
+
+def _pre_carregar_modulos():
+    """Importa os módulos pesados (roda em uma thread, fora do event loop)"""
+    for modulo in MODULOS_PRE_CARREGADOS:
+        try:
+            importlib.import_module(modulo)
+        except ImportError as e:
+            logger.warning("⚠️ Não foi possível pré-carregar %s: %s", modulo, e)
+    logger.info("📦 Módulos pré-carregados: %s", ", ".join(MODULOS_PRE_CARREGADOS))
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    """Inicialização (valida as chaves, inicia a fila de jobs) e finalização da API"""
+    logger.info("=" * 80)
+    logger.info("🚀 INICIANDO API DE CLASSIFICAÇÃO DE EMAILS")
+    logger.info("=" * 80)
+    _validar_chaves_gemini()
+    logger.info("=" * 80)
+    # Workers da fila de jobs (retoma os jobs que ficaram pela metade)
+    await fila_jobs.iniciar()
+    pre_carregamento = asyncio.create_task(asyncio.to_thread(_pre_carregar_modulos)) if PRE_CARREGAR_MODULOS else None
+    try:
+        yield
+    finally:
+        if pre_carregamento is not None:
+            await pre_carregamento
+        await fila_jobs.encerrar()
+        # Grava no cache em disco as escritas que ainda estavam na fila
+        await asyncio.to_thread(cache_resultados.descarregar)
+        encerrar_executor_extracao()
+        encerrar_logs()
+
+
 app = FastAPI(
     title="Email Classifier API",
     description="API para classificação automática de emails usando Inteligência Artificial",
+    lifespan=ciclo_de_vida,
 )
 
 # Handler global para capturar TODAS as exceções não tratadas
@@ -30,10 +99,10 @@ async def global_exception_handler(request: Request, exc: Exception):
     """Captura TODAS as exceções não tratadas e loga detalhadamente"""
     logger.error("=" * 80)
     logger.error("ERRO NÃO TRATADO CAPTURADO!")
-    logger.error(f"URL: {request.url}")
-    logger.error(f"Método: {request.method}")
-    logger.error(f"Tipo de exceção: {type(exc).__name__}")
-    logger.error(f"Mensagem: {str(exc)}")
+    logger.error("URL: %s", request.url)
+    logger.error("Método: %s", request.method)
+    logger.error("Tipo de exceção: %s", type(exc).__name__)
+    logger.error("Mensagem: %s", exc)
     logger.error("Traceback completo:")
     logger.error(traceback.format_exc())
     logger.error("=" * 80)
@@ -44,15 +113,15 @@ async def global_exception_handler(request: Request, exc: Exception):
             "erro": "Erro interno do servidor",
             "tipo": type(exc).__name__,
             "detalhe": str(exc),
-            "traceback": traceback.format_exc() if logger.level == logging.DEBUG else None
+            "traceback": None  # O traceback fica só no log, nunca na resposta ao cliente
         }
     )
 
 # Handler para erros de validação (422)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.warning(f"Erro de validação na requisição: {request.url}")
-    logger.debug(f"Detalhes do erro: {exc.errors()}")
+    logger.warning("Erro de validação na requisição: %s", request.url)
+    logger.debug("Detalhes do erro: %s", exc.errors())
     
     errors = []
     for error in exc.errors():
@@ -69,7 +138,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
                 "erro": error.get("msg", "Erro de validação"),
                 "valor_recebido": error.get("input"),
             })
-
+    
     return JSONResponse(
         status_code=422,
         content={
@@ -88,6 +157,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Limite de tamanho de uploads (rejeita com 413 antes de ler o corpo inteiro)
+app.add_middleware(
+    LimiteUploadMiddleware,
+    limites_por_caminho={"/api/emails/jobs/files": JOBS_TAMANHO_MAXIMO_UPLOAD + MARGEM_MULTIPART},
+    limites_corpo_por_caminho={
+        "/api/emails/classify-batch": LOTE_TAMANHO_MAXIMO_CORPO,
+        "/api/emails/jobs": JOBS_TAMANHO_MAXIMO_CORPO,
+    },
+)
+
+# Métricas por requisição (duração por rota e cabeçalho Server-Timing).
+# Adicionado por último para ficar por fora e medir também as requisições rejeitadas acima.
+app.add_middleware(MetricasMiddleware)
+
+# Id da requisição (X-Request-ID) incluído em todos os logs da requisição
+app.add_middleware(IdRequisicaoMiddleware)
+
 # Rotas principais (API)
 app.include_router(email_router)
 
@@ -113,16 +199,10 @@ def health_get():
 def health_head():
     return None
 
-@app.on_event("startup")
-async def startup_event():
-    """Loga informações na inicialização"""
-    logger.info("=" * 80)
-    logger.info("🚀 INICIANDO API DE CLASSIFICAÇÃO DE EMAILS")
-    logger.info("=" * 80)
-    logger.info(f"API Key Gemini configurada: {'✅ SIM' if CHAVE_API_GEMINI else '❌ NÃO'}")
-    if CHAVE_API_GEMINI:
-        logger.info(f"API Key (primeiros 10 chars): {CHAVE_API_GEMINI[:10]}...")
-    logger.info("=" * 80)
+# Métricas no formato de texto do Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(exportar_metricas(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 def root():
@@ -1,8 +1,9 @@
 """
 Modelos de dados (Schemas) - Define a estrutura dos dados que a API recebe e retorna
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime
+from typing import List, Literal, Optional
 
 
 class RequisicaoEmailTexto(BaseModel):
@@ -22,4 +23,100 @@ class RespostaClassificacao(BaseModel):
     label: str  # "Produtivo" ou "Improdutivo"
     confidence: float  # Confiança da classificação (0.0 a 1.0)
     suggested_reply: str  # Resposta sugerida
+    reason: Optional[str] = None  # Justificativa breve da IA (opcional)
+    tier: Optional[str] = None  # Camada que decidiu a classificação: "local", "similar" ou "gemini"
     all_scores: Optional[dict] = None  # Scores adicionais (opcional)
+
+
+class ClassificacaoIA(BaseModel):
+    """
+    Classificação devolvida pelo Gemini (validada direto do texto JSON da resposta)
+    
+    O label aceita variações de caixa e espaços ("produtivo ", "IMPRODUTIVO"), a
+    confiança é limitada a [0.0, 1.0] e uma justificativa ausente vira "".
+    """
+    label: Literal["Produtivo", "Improdutivo"]
+    confidence: float = Field(0.5, allow_inf_nan=False)
+    reason: str = ""
+    
+    @field_validator("label", mode="before")
+    @classmethod
+    def _normalizar_label(cls, valor):
+        if isinstance(valor, str):
+            return valor.strip().capitalize()
+        return valor
+    
+    @field_validator("confidence")
+    @classmethod
+    def _limitar_confianca(cls, valor: float) -> float:
+        return max(0.0, min(1.0, valor))
+    
+    @field_validator("reason", mode="before")
+    @classmethod
+    def _justificativa_vazia(cls, valor):
+        return "" if valor is None else valor
+
+
+class ClassificacaoRespostaIA(ClassificacaoIA):
+    """Classificação e resposta sugerida devolvidas juntas pelo Gemini (chamada única)"""
+    suggested_reply: str = Field(..., min_length=1)
+    
+    @field_validator("suggested_reply", mode="before")
+    @classmethod
+    def _limpar_espacos(cls, valor):
+        return valor.strip() if isinstance(valor, str) else valor
+
+
+class ItemResultadoLote(BaseModel):
+    """Resultado de um email dentro de um lote (sucesso ou erro individual)"""
+    indice: int  # Posição do email no lote (começa em 0)
+    sucesso: bool
+    resultado: Optional[RespostaClassificacao] = None  # Preenchido em caso de sucesso
+    erro: Optional[str] = None  # Mensagem de erro em caso de falha
+    status_code: Optional[int] = None  # Código HTTP equivalente ao erro (429, 422, 500...)
+
+
+class EstatisticasLote(BaseModel):
+    """Estatísticas de processamento de um lote"""
+    total: int
+    sucesso: int
+    falhas: int
+    duracao_segundos: float
+    emails_por_segundo: float
+
+
+class RespostaLote(BaseModel):
+    """Modelo para retornar o resultado da classificação em lote"""
+    itens: List[ItemResultadoLote]
+    estatisticas: EstatisticasLote
+
+
+class ItemResultadoJob(ItemResultadoLote):
+    """Resultado de um email dentro de um job"""
+    status: str  # "pendente", "processando", "concluido" ou "erro"
+    origem: Optional[str] = None  # Nome do arquivo, quando o job veio de arquivos
+
+
+class StatusJob(BaseModel):
+    """Progresso de um job de classificação"""
+    job_id: str
+    status: str  # "pendente", "processando" ou "concluido"
+    total: int
+    processados: int
+    sucesso: int
+    falhas: int
+    progresso: float  # Fração processada (0.0 a 1.0)
+    criado_em: datetime
+    atualizado_em: datetime
+    concluido_em: Optional[datetime] = None
+
+
+class PaginaResultadosJob(BaseModel):
+    """Uma página dos resultados de um job"""
+    job_id: str
+    status: str
+    total: int
+    offset: int
+    limite: int
+    itens: List[ItemResultadoJob]
+    proximo_offset: Optional[int] = None  # None quando não há mais itens
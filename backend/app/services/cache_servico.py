@@ -0,0 +1,332 @@
+"""
+Serviço de cache de resultados (classificação e resposta sugerida)
+
+O cache é endereçado por conteúdo: a chave é um hash SHA-256 do texto normalizado
+(normalizar_texto), do modelo do Gemini e da versão do prompt. Possui duas camadas:
+- Memória: LRU com TTL e tamanho máximo (evicção do item menos usado)
+- Disco (opcional): SQLite, para sobreviver a reinícios da API. A tabela é podada na
+  abertura e a cada tamanho_maximo / 10 escritas: saem os itens expirados e, acima de
+  tamanho_maximo linhas, os gravados há mais tempo
+
+O SQLite fica fora do event loop: as escritas vão para uma thread gravadora (em lotes,
+um commit por lote) e as leituras assíncronas (buscar_no_cache_async) só vão ao disco,
+em uma thread, quando o item não está na memória.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from app.config.configuracao import (
+    CACHE_HABILITADO,
+    CACHE_TAMANHO_MAXIMO,
+    CACHE_TTL_SEGUNDOS,
+    CACHE_SQLITE_CAMINHO,
+    MODELO_GEMINI,
+    VERSAO_PROMPT,
+)
+from app.services.preprocessador_nlp import normalizar_texto
+from app.services.metricas_servico import incrementar
+
+logger = logging.getLogger(__name__)
+
+# Máximo de escritas gravadas no SQLite por commit da thread gravadora
+ESCRITAS_POR_LOTE = 256
+
+
+def gerar_chave_cache(tipo: str, texto: str, extra: str = "") -> str:
+    """
+    Gera a chave do cache para um texto de email
+    
+    Args:
+        tipo: Tipo do resultado ("classificacao", "resposta", ...)
+        texto: Texto original do email (é normalizado antes do hash)
+        extra: Informação adicional que muda o resultado (ex.: label da resposta)
+    
+    Returns:
+        Hash SHA-256 em hexadecimal
+    """
+    conteudo = "\x1f".join([tipo, MODELO_GEMINI, VERSAO_PROMPT, extra, normalizar_texto(texto or "")])
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class CacheResultados:
+    """Cache LRU em memória com TTL e camada opcional em SQLite"""
+    
+    def __init__(self, tamanho_maximo: int, ttl_segundos: int, caminho_sqlite: str = ""):
+        self.tamanho_maximo = max(1, tamanho_maximo)
+        self.ttl_segundos = ttl_segundos
+        self.caminho_sqlite = caminho_sqlite
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()  # memória e contadores (nunca segurado durante o SQLite)
+        self._lock_sqlite = threading.Lock()  # conexão SQLite
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._escritas_pendentes: "queue.Queue[tuple]" = queue.Queue()  # (geração, chave, valor JSON, expira_em)
+        self._gravador: Optional[threading.Thread] = None
+        self._geracao = 0  # muda em limpar(): escritas pendentes de antes são descartadas
+        self._escritas_por_poda = max(1, self.tamanho_maximo // 10)
+        self._escritas_desde_poda = 0
+        self._contadores = {
+            "hits_memoria": 0,
+            "hits_disco": 0,
+            "misses": 0,
+            "escritas": 0,
+            "evicoes": 0,
+            "expirados": 0,
+            "evicoes_disco": 0,
+        }
+        if caminho_sqlite:
+            self._abrir_sqlite()
+    
+    def _abrir_sqlite(self):
+        """Abre (ou cria) o banco SQLite da camada em disco"""
+        try:
+            self._conexao = sqlite3.connect(self.caminho_sqlite, check_same_thread=False)
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS cache_resultados ("
+                "chave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira_em REAL NOT NULL)"
+            )
+            self._conexao.execute(
+                "CREATE INDEX IF NOT EXISTS cache_resultados_expira_em ON cache_resultados (expira_em)"
+            )
+            self._conexao.commit()
+            with self._lock_sqlite:
+                self._podar_sqlite()
+            logger.info("💾 Cache em disco ativo: %s", self.caminho_sqlite)
+        except sqlite3.Error as e:
+            logger.error("❌ Não foi possível abrir o cache SQLite (%s): %s", self.caminho_sqlite, e)
+            self._conexao = None
+    
+    def obter(self, chave: str) -> Optional[Any]:
+        """
+        Busca um valor no cache (memória e depois disco)
+        
+        A leitura do disco bloqueia a thread atual; no event loop, use obter_async.
+        
+        Returns:
+            Valor salvo ou None se não existir/expirado
+        """
+        valor = self._obter_memoria(chave)
+        if valor is not None:
+            return valor
+        return self._obter_disco(chave)
+    
+    async def obter_async(self, chave: str) -> Optional[Any]:
+        """Versão de obter para o event loop: a leitura do disco (se houver) roda em uma thread"""
+        valor = self._obter_memoria(chave)
+        if valor is not None:
+            return valor
+        if self._conexao is None:
+            return self._obter_disco(chave)
+        return await asyncio.to_thread(self._obter_disco, chave)
+    
+    def _obter_memoria(self, chave: str) -> Optional[Any]:
+        """Busca na camada de memória (None se não estiver lá ou tiver expirado)"""
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em > time.time():
+                self._memoria.move_to_end(chave)
+                self._contadores["hits_memoria"] += 1
+                return valor
+            del self._memoria[chave]
+            self._contadores["expirados"] += 1
+            return None
+    
+    def _obter_disco(self, chave: str) -> Optional[Any]:
+        """Busca na camada em disco (itens expirados ficam para a poda) e conta o miss"""
+        valor = None
+        if self._conexao is not None:
+            try:
+                with self._lock_sqlite:
+                    linha = self._conexao.execute(
+                        "SELECT valor, expira_em FROM cache_resultados WHERE chave = ? AND expira_em > ?",
+                        (chave, time.time()),
+                    ).fetchone()
+                if linha is not None:
+                    valor = json.loads(linha[0])
+            except (sqlite3.Error, ValueError) as e:
+                logger.warning("⚠️ Erro ao ler cache SQLite: %s", e)
+        
+        with self._lock:
+            if valor is None:
+                self._contadores["misses"] += 1
+            else:
+                self._inserir_memoria(chave, valor, linha[1])
+                self._contadores["hits_disco"] += 1
+        return valor
+    
+    def salvar(self, chave: str, valor: Any):
+        """
+        Salva um valor (serializável em JSON) nas duas camadas do cache
+        
+        A memória é atualizada na hora; a gravação no disco entra na fila da thread
+        gravadora (não bloqueia quem chama).
+        """
+        expira_em = time.time() + self.ttl_segundos
+        with self._lock:
+            self._inserir_memoria(chave, valor, expira_em)
+            self._contadores["escritas"] += 1
+        if self._conexao is None:
+            return
+        try:
+            valor_json = json.dumps(valor, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning("⚠️ Erro ao gravar cache SQLite: %s", e)
+            return
+        self._iniciar_gravador()
+        self._escritas_pendentes.put((self._geracao, chave, valor_json, expira_em))
+    
+    def _iniciar_gravador(self):
+        """Cria a thread gravadora na primeira escrita"""
+        if self._gravador is not None:
+            return
+        with self._lock:
+            if self._gravador is None:
+                self._gravador = threading.Thread(
+                    target=self._gravar_pendentes, name="cache-sqlite-gravador", daemon=True
+                )
+                self._gravador.start()
+    
+    def _gravar_pendentes(self):
+        """Thread gravadora: grava as escritas pendentes em lotes (um commit por lote)"""
+        while True:
+            lote = [self._escritas_pendentes.get()]
+            while len(lote) < ESCRITAS_POR_LOTE:
+                try:
+                    lote.append(self._escritas_pendentes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._gravar_lote(lote)
+            except Exception as e:
+                logger.warning("⚠️ Erro ao gravar cache SQLite: %s", e)
+            finally:
+                for _ in lote:
+                    self._escritas_pendentes.task_done()
+    
+    def _gravar_lote(self, lote: list):
+        """Grava um lote de escritas pendentes (ignorando as anteriores ao último limpar)"""
+        with self._lock_sqlite:
+            if self._conexao is None:
+                return
+            linhas = [
+                (chave, valor_json, expira_em)
+                for geracao, chave, valor_json, expira_em in lote
+                if geracao == self._geracao
+            ]
+            if linhas:
+                self._conexao.executemany(
+                    "INSERT OR REPLACE INTO cache_resultados (chave, valor, expira_em) VALUES (?, ?, ?)", linhas
+                )
+                self._conexao.commit()
+            self._escritas_desde_poda += len(linhas)
+            if self._escritas_desde_poda >= self._escritas_por_poda:
+                self._podar_sqlite()
+    
+    def descarregar(self):
+        """Aguarda a thread gravadora gravar as escritas pendentes (ex.: ao encerrar a API)"""
+        if self._gravador is not None:
+            self._escritas_pendentes.join()
+    
+    def _podar_sqlite(self):
+        """
+        Remove da tabela os itens expirados e os mais antigos acima de tamanho_maximo
+        
+        Chamado com _lock_sqlite adquirido. Como expira_em é o momento da escrita + TTL,
+        ordenar por ele ordena pela idade da escrita.
+        """
+        self._escritas_desde_poda = 0
+        try:
+            expirados = self._conexao.execute(
+                "DELETE FROM cache_resultados WHERE expira_em <= ?", (time.time(),)
+            ).rowcount
+            excedentes = self._conexao.execute(
+                "DELETE FROM cache_resultados WHERE chave IN ("
+                "SELECT chave FROM cache_resultados ORDER BY expira_em DESC LIMIT -1 OFFSET ?)",
+                (self.tamanho_maximo,),
+            ).rowcount
+            self._conexao.commit()
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Erro ao podar cache SQLite: %s", e)
+            return
+        with self._lock:
+            self._contadores["expirados"] += expirados
+            self._contadores["evicoes_disco"] += excedentes
+        if expirados or excedentes:
+            logger.debug("Cache SQLite podado: %s expirados, %s acima do limite", expirados, excedentes)
+    
+    def _inserir_memoria(self, chave: str, valor: Any, expira_em: float):
+        """Insere na camada de memória, removendo o item menos usado se passar do limite"""
+        self._memoria[chave] = (expira_em, valor)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.tamanho_maximo:
+            self._memoria.popitem(last=False)
+            self._contadores["evicoes"] += 1
+    
+    def limpar(self):
+        """Remove todos os itens do cache (memória e disco, inclusive escritas pendentes)"""
+        with self._lock:
+            self._memoria.clear()
+        if self._conexao is not None:
+            with self._lock_sqlite:
+                self._geracao += 1
+                self._conexao.execute("DELETE FROM cache_resultados")
+                self._conexao.commit()
+    
+    def estatisticas(self) -> dict:
+        """Retorna contadores de hits/misses e ocupação do cache"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            itens_memoria = len(self._memoria)
+        hits = contadores["hits_memoria"] + contadores["hits_disco"]
+        total = hits + contadores["misses"]
+        return {
+            "habilitado": CACHE_HABILITADO,
+            **contadores,
+            "hits": hits,
+            "taxa_acerto": round(hits / total, 4) if total else 0.0,
+            "itens_memoria": itens_memoria,
+            "escritas_pendentes_disco": self._escritas_pendentes.qsize(),
+            "tamanho_maximo": self.tamanho_maximo,
+            "ttl_segundos": self.ttl_segundos,
+            "disco_ativo": self._conexao is not None,
+            "versao_prompt": VERSAO_PROMPT,
+            "modelo": MODELO_GEMINI,
+        }
+
+
+# Instância global do cache (compartilhada pelos serviços)
+cache_resultados = CacheResultados(CACHE_TAMANHO_MAXIMO, CACHE_TTL_SEGUNDOS, CACHE_SQLITE_CAMINHO)
+
+
+def buscar_no_cache(tipo: str, texto: str, extra: str = "") -> Optional[Any]:
+    """Busca um resultado no cache global (retorna None se o cache estiver desativado)"""
+    if not CACHE_HABILITADO:
+        return None
+    valor = cache_resultados.obter(gerar_chave_cache(tipo, texto, extra))
+    incrementar("cache_consultas_total", tipo=tipo, resultado="miss" if valor is None else "hit")
+    return valor
+
+
+async def buscar_no_cache_async(tipo: str, texto: str, extra: str = "") -> Optional[Any]:
+    """Versão de buscar_no_cache para o event loop (a leitura do disco roda em uma thread)"""
+    if not CACHE_HABILITADO:
+        return None
+    valor = await cache_resultados.obter_async(gerar_chave_cache(tipo, texto, extra))
+    incrementar("cache_consultas_total", tipo=tipo, resultado="miss" if valor is None else "hit")
+    return valor
+
+
+def salvar_no_cache(tipo: str, texto: str, valor: Any, extra: str = ""):
+    """Salva um resultado no cache global (ignora se o cache estiver desativado)"""
+    if not CACHE_HABILITADO:
+        return
+    cache_resultados.salvar(gerar_chave_cache(tipo, texto, extra), valor)
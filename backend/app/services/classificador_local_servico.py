@@ -0,0 +1,285 @@
+"""
+Serviço de classificação local (offline) com NumPy
+
+Classificador linear rápido para decidir emails óbvios sem chamar o Gemini:
+- Características: bag-of-stems com hashing (unigramas e bigramas dos radicais
+  gerados por preprocessar_texto_nlp), sem vocabulário para guardar
+- Modelo: regressão logística (pesos + viés) treinada com SGD em NumPy
+- Decisão: só responde se a confiança for >= CLASSIFICADOR_LOCAL_LIMIAR;
+  caso contrário o email é escalado para o Gemini
+
+Treinamento a partir de um CSV rotulado (colunas: texto,label):
+    python -m app.services.classificador_local_servico treinar dados.csv modelo_local.npz
+"""
+import argparse
+import csv
+import logging
+import math
+import os
+import sys
+import threading
+import zlib
+from typing import List, Optional, Tuple
+import numpy as np
+from app.config.configuracao import CLASSIFICADOR_LOCAL_MODELO, CLASSIFICADOR_LOCAL_LIMIAR
+from app.services.preprocessador_nlp import preprocessar_texto_nlp
+
+logger = logging.getLogger(__name__)
+
+# Número de posições do vetor de características (potência de 2)
+DIMENSAO_PADRAO = 2 ** 16
+
+# Label prevista quando a probabilidade é >= 0.5 (a outra é "Improdutivo")
+LABEL_POSITIVA = "Produtivo"
+LABEL_NEGATIVA = "Improdutivo"
+
+
+def extrair_caracteristicas(texto: str, dimensao: int = DIMENSAO_PADRAO) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte o texto em um vetor esparso de características (hashing trick)
+
+    Usa os radicais de preprocessar_texto_nlp (unigramas e bigramas). Cada termo é
+    mapeado por CRC32 (estável entre processos) para uma posição e um sinal.
+
+    Args:
+        texto: Texto do email
+        dimensao: Tamanho do vetor de características
+
+    Returns:
+        Tupla (indices, valores) do vetor esparso, normalizado (norma L2 = 1)
+    """
+    radicais = (preprocessar_texto_nlp(texto) or "").split()
+    termos = radicais + [f"{a} {b}" for a, b in zip(radicais, radicais[1:])]
+    if not termos:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    # Soma os sinais de cada posição (termos repetidos ou colisões de hash)
+    acumulado: dict = {}
+    for termo in termos:
+        h = zlib.crc32(termo.encode("utf-8"))
+        indice = h % dimensao
+        acumulado[indice] = acumulado.get(indice, 0.0) + (-1.0 if h & 0x80000000 else 1.0)
+
+    indices = np.fromiter(acumulado.keys(), dtype=np.int64, count=len(acumulado))
+    valores = np.fromiter(acumulado.values(), dtype=np.float32, count=len(acumulado))
+    valores = np.sign(valores) * np.log1p(np.abs(valores))
+    norma = np.linalg.norm(valores)
+    if norma > 0:
+        valores /= norma
+    return indices, valores
+
+
+class ModeloLocal:
+    """Regressão logística sobre características com hashing"""
+
+    def __init__(self, pesos: np.ndarray, vies: float = 0.0):
+        self.pesos = pesos.astype(np.float32)
+        self.vies = float(vies)
+
+    @property
+    def dimensao(self) -> int:
+        return len(self.pesos)
+
+    def probabilidade_produtivo(self, texto: str) -> float:
+        """Retorna P(label = "Produtivo") para o texto"""
+        indices, valores = extrair_caracteristicas(texto, self.dimensao)
+        return _sigmoide(float(self.pesos[indices] @ valores) + self.vies)
+
+    def classificar(self, texto: str) -> dict:
+        """
+        Classifica o texto (sem aplicar limiar)
+
+        Returns:
+            Dicionário com label, confidence e reason
+        """
+        probabilidade = self.probabilidade_produtivo(texto)
+        if probabilidade >= 0.5:
+            label, confidence = LABEL_POSITIVA, probabilidade
+        else:
+            label, confidence = LABEL_NEGATIVA, 1.0 - probabilidade
+        return {
+            "label": label,
+            "confidence": round(float(confidence), 4),
+            "reason": "Classificado pelo modelo local (offline)",
+        }
+
+    def salvar(self, caminho: str):
+        """Salva pesos e viés em um arquivo .npz"""
+        np.savez_compressed(caminho, pesos=self.pesos, vies=np.array([self.vies], dtype=np.float32))
+
+    @classmethod
+    def carregar(cls, caminho: str) -> "ModeloLocal":
+        """Carrega um modelo salvo com salvar()"""
+        with np.load(caminho) as dados:
+            return cls(dados["pesos"], float(dados["vies"][0]))
+
+
+def _sigmoide(z: float) -> float:
+    """Função logística, estável para valores grandes"""
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    ez = math.exp(z)
+    return ez / (1.0 + ez)
+
+
+def treinar_modelo(
+    textos: List[str],
+    labels: List[str],
+    dimensao: int = DIMENSAO_PADRAO,
+    epocas: int = 15,
+    taxa_aprendizado: float = 0.5,
+    regularizacao: float = 1e-6,
+    semente: int = 42,
+) -> ModeloLocal:
+    """
+    Treina a regressão logística com SGD (um exemplo por vez, atualização esparsa)
+
+    Args:
+        textos: Textos dos emails
+        labels: "Produtivo" ou "Improdutivo" para cada texto
+        dimensao: Tamanho do vetor de características
+        epocas: Passadas completas pelos dados
+        taxa_aprendizado: Passo inicial do SGD (decai a cada época)
+        regularizacao: Peso da regularização L2
+        semente: Semente para embaralhar os exemplos
+
+    Returns:
+        ModeloLocal treinado
+    """
+    exemplos = [extrair_caracteristicas(texto, dimensao) for texto in textos]
+    alvos = np.array([1.0 if label == LABEL_POSITIVA else 0.0 for label in labels], dtype=np.float32)
+    pesos = np.zeros(dimensao, dtype=np.float32)
+    vies = 0.0
+    gerador = np.random.default_rng(semente)
+
+    for epoca in range(epocas):
+        taxa = taxa_aprendizado / (1.0 + epoca)
+        for i in gerador.permutation(len(exemplos)):
+            indices, valores = exemplos[i]
+            erro = _sigmoide(float(pesos[indices] @ valores) + vies) - alvos[i]
+            pesos[indices] -= taxa * (erro * valores + regularizacao * pesos[indices])
+            vies -= taxa * erro
+
+    return ModeloLocal(pesos, vies)
+
+
+def ler_csv_rotulado(caminho: str) -> Tuple[List[str], List[str]]:
+    """
+    Lê um CSV com as colunas "texto" e "label"
+
+    Linhas com label diferente de Produtivo/Improdutivo são ignoradas.
+    """
+    textos, labels = [], []
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        for linha in csv.DictReader(arquivo):
+            label = (linha.get("label") or "").strip()
+            texto = linha.get("texto") or ""
+            if label in (LABEL_POSITIVA, LABEL_NEGATIVA) and texto.strip():
+                textos.append(texto)
+                labels.append(label)
+    return textos, labels
+
+
+# Modelo carregado (lazy) a partir de CLASSIFICADOR_LOCAL_MODELO
+_modelo_local: Optional[ModeloLocal] = None
+_modelo_carregado = False
+_lock_modelo = threading.Lock()
+
+
+def obter_modelo_local() -> Optional[ModeloLocal]:
+    """Carrega o modelo configurado na primeira chamada (None se não houver modelo)"""
+    global _modelo_local, _modelo_carregado
+    if _modelo_carregado:
+        return _modelo_local
+    with _lock_modelo:
+        if not _modelo_carregado:
+            if CLASSIFICADOR_LOCAL_MODELO:
+                try:
+                    _modelo_local = ModeloLocal.carregar(CLASSIFICADOR_LOCAL_MODELO)
+                    logger.info("🧠 Modelo local carregado: %s", CLASSIFICADOR_LOCAL_MODELO)
+                except (OSError, KeyError, ValueError) as e:
+                    logger.error("❌ Não foi possível carregar o modelo local (%s): %s", CLASSIFICADOR_LOCAL_MODELO, e)
+            _modelo_carregado = True
+    return _modelo_local
+
+
+def classificar_localmente(texto_email: str) -> Optional[dict]:
+    """
+    Tenta classificar o email com o modelo local
+
+    Args:
+        texto_email: Texto do email
+
+    Returns:
+        Dicionário com label, confidence e reason se a confiança atingir o limiar;
+        None se não houver modelo ou se o email for incerto (deve ir para o Gemini)
+    """
+    modelo = obter_modelo_local()
+    if modelo is None or not texto_email or not texto_email.strip():
+        return None
+
+    resultado = modelo.classificar(texto_email)
+    if resultado["confidence"] < CLASSIFICADOR_LOCAL_LIMIAR:
+        logger.debug("Modelo local incerto (%s, %s), escalando para o Gemini", resultado['label'], resultado['confidence'])
+        return None
+
+    logger.info("⚡ Classificado localmente: %s (confiança: %s)", resultado['label'], resultado['confidence'])
+    return resultado
+
+
+def _comando_treinar(args: argparse.Namespace) -> int:
+    """Treina o modelo a partir do CSV e salva no arquivo de saída"""
+    textos, labels = ler_csv_rotulado(args.csv)
+    if len(set(labels)) < 2:
+        print("❌ O CSV precisa ter exemplos de Produtivo e Improdutivo (colunas: texto,label)")
+        return 1
+
+    # Separa uma parte dos dados para validação
+    indices = np.random.default_rng(args.semente).permutation(len(textos))
+    corte = int(len(textos) * (1 - args.validacao)) if args.validacao > 0 else len(textos)
+    treino, validacao = indices[:corte], indices[corte:]
+
+    modelo = treinar_modelo(
+        [textos[i] for i in treino], [labels[i] for i in treino],
+        dimensao=args.dimensao, epocas=args.epocas, semente=args.semente,
+    )
+
+    print(f"✅ Modelo treinado com {len(treino)} exemplos")
+    if len(validacao):
+        acertos, decididos, acertos_decididos = 0, 0, 0
+        for i in validacao:
+            resultado = modelo.classificar(textos[i])
+            acertou = resultado["label"] == labels[i]
+            acertos += acertou
+            if resultado["confidence"] >= CLASSIFICADOR_LOCAL_LIMIAR:
+                decididos += 1
+                acertos_decididos += acertou
+        print(f"📊 Validação ({len(validacao)} exemplos): acurácia {acertos / len(validacao):.2%}")
+        print(
+            f"📊 Acima do limiar {CLASSIFICADOR_LOCAL_LIMIAR}: {decididos / len(validacao):.2%} dos emails "
+            f"decididos localmente, acurácia {acertos_decididos / decididos if decididos else 0:.2%}"
+        )
+
+    modelo.salvar(args.saida)
+    print(f"💾 Modelo salvo em {os.path.abspath(args.saida)}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Classificador local (offline) de emails")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    treinar = subparsers.add_parser("treinar", help="Treina o modelo a partir de um CSV rotulado (texto,label)")
+    treinar.add_argument("csv", help="CSV com as colunas texto,label")
+    treinar.add_argument("saida", help="Arquivo .npz onde o modelo será salvo")
+    treinar.add_argument("--epocas", type=int, default=15)
+    treinar.add_argument("--dimensao", type=int, default=DIMENSAO_PADRAO)
+    treinar.add_argument("--validacao", type=float, default=0.2, help="Fração dos dados usada para validação")
+    treinar.add_argument("--semente", type=int, default=42)
+
+    args = parser.parse_args(argv)
+    return _comando_treinar(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,53 +1,60 @@
 """
 Serviço para classificar emails usando IA (Gemini)
 """
+import asyncio
 import json
 import logging
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Type, Union
 from fastapi import HTTPException
-from google import genai
-from google.genai import errors as genai_errors
-from app.config.configuracao import CHAVE_API_GEMINI, MODELO_GEMINI
+from pydantic import ValidationError
+from app.config.configuracao import (
+    CLASSIFICACAO_NOVAS_TENTATIVAS,
+    LOTE_PROMPT_ORCAMENTO_CARACTERES,
+    LOTE_PROMPT_MAX_TENTATIVAS,
+    METRICAS_HABILITADAS,
+    PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO,
+)
+from app.models.schemas import ClassificacaoIA
+from app.services.gemini_servico import gerar_conteudo, gerar_conteudo_async, eh_erro_quota, erro_quota_excedida
 from app.services.preprocessador_nlp import preprocessar_para_classificacao
+from app.services.prompt_servico import (
+    estimar_tokens,
+    limpar_email,
+    montar_trecho_email,
+    registrar_economia,
+)
+from app.services.cache_servico import buscar_no_cache, buscar_no_cache_async, salvar_no_cache
+from app.services.coalescencia_servico import coalescer
+from app.services.metricas_servico import incrementar, medir_etapa
+from app.services.resiliencia_servico import eh_erro_cliente_gemini
 
 logger = logging.getLogger(__name__)
 
-# Variável global para o cliente Gemini
-cliente_gemini = None
+# Parte fixa do prompt de classificação (vai em system_instruction / cache de contexto)
+INSTRUCAO_CLASSIFICACAO = """
+Você é um classificador de emails de uma empresa do setor financeiro.
+Classifique o email em uma das categorias: "Produtivo" ou "Improdutivo".
 
+Definições:
+- Produtivo: requer ação/resposta específica (status de requisição, suporte, dúvidas do sistema, envio de arquivos para análise, etc.)
+- Improdutivo: não requer ação imediata (felicitações, agradecimentos, mensagens sociais).
 
-def obter_cliente_gemini():
-    """
-    Obtém ou cria o cliente Gemini
-    """
-    global cliente_gemini
-    
-    logger.debug("🔑 Verificando cliente Gemini...")
-    
-    if cliente_gemini is None:
-        logger.info("🔧 Cliente Gemini não existe, criando novo...")
-        if not CHAVE_API_GEMINI:
-            logger.error("❌ API key do Gemini não configurada!")
-            raise HTTPException(
-                status_code=500,
-                detail="API key do Gemini não configurada. Configure GEMINI_API_KEY no arquivo .env"
-            )
-        try:
-            logger.debug(f"🔑 API Key presente (primeiros 10 chars): {CHAVE_API_GEMINI[:10]}...")
-            logger.info("🔧 Inicializando cliente Gemini...")
-            cliente_gemini = genai.Client(api_key=CHAVE_API_GEMINI)
-            logger.info("✅ Cliente Gemini criado com sucesso!")
-        except Exception as e:
-            logger.error(f"❌ Erro ao inicializar cliente Gemini: {type(e).__name__} - {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erro ao inicializar cliente Gemini: {str(e)}"
-            )
-    else:
-        logger.debug("✅ Cliente Gemini já existe, reutilizando...")
+Responda APENAS em JSON válido, no formato:
+{"label":"Produtivo|Improdutivo","confidence":0.0-1.0,"reason":"explicação breve"}
+""".strip()
+
+# Acrescentado ao prompt quando a resposta anterior não pôde ser interpretada
+AVISO_NOVA_TENTATIVA = "\n\nATENÇÃO: a resposta anterior não era um JSON válido. Responda APENAS com o objeto JSON pedido."
+
+
+class RespostaClassificacaoInvalida(Exception):
+    """A resposta do Gemini não virou uma ClassificacaoIA nem depois do reparo"""
     
-    return cliente_gemini
+    def __init__(self, texto_resposta: str, motivo: str):
+        super().__init__(motivo)
+        self.texto_resposta = texto_resposta
 
 
 def classificar_email_com_ia(texto_email: str) -> dict:
@@ -66,167 +73,541 @@ def classificar_email_com_ia(texto_email: str) -> dict:
         HTTPException: Se houver erro na classificação
     """
     logger.info("🤖 Iniciando classificação com IA...")
-    logger.debug(f"Texto original (tamanho: {len(texto_email)} chars)")
+    logger.debug("Texto original (tamanho: %s chars)", len(texto_email))
+    
+    # Verifica se este email (ou um idêntico) já foi classificado
+    resultado_cache = buscar_no_cache("classificacao", texto_email)
+    if resultado_cache is not None:
+        logger.info("⚡ Classificação encontrada no cache: %s", resultado_cache['label'])
+        return dict(resultado_cache)
+    
+    prompt = _montar_prompt_classificacao(texto_email)
+    
+    try:
+        for tentativa in range(CLASSIFICACAO_NOVAS_TENTATIVAS + 1):
+            # Chama a API Gemini
+            logger.info("🌐 Chamando API Gemini para classificação...")
+            with medir_etapa("gemini_classificacao"):
+                resposta = gerar_conteudo(
+                    prompt_da_tentativa(prompt, tentativa), config=config_classificacao(), instrucao=INSTRUCAO_CLASSIFICACAO
+                )
+            resultado = interpretar_tentativa(resposta, tentativa)
+            if resultado is not None:
+                break
+    except Exception as e:
+        raise _converter_erro_classificacao(e) from e
+    
+    salvar_no_cache("classificacao", texto_email, resultado)
+    return resultado
+
+
+async def classificar_email_com_ia_async(texto_email: str, consultar_cache: bool = True) -> dict:
+    """
+    Versão assíncrona de classificar_email_com_ia
+    
+    Usa o cliente assíncrono do Gemini, então não bloqueia o event loop enquanto
+    aguarda a resposta da IA. Classificações do mesmo email que chegarem enquanto esta
+    estiver em andamento aguardam o mesmo resultado (coalescencia_servico).
+    
+    Args:
+        texto_email: Texto do email a ser classificado
+        consultar_cache: False quando quem chama já consultou o cache
+    
+    Returns:
+        Dicionário com label, confidence e reason
+    
+    Raises:
+        HTTPException: Se houver erro na classificação
+    """
+    logger.info("🤖 Iniciando classificação com IA (assíncrona)...")
+    logger.debug("Texto original (tamanho: %s chars)", len(texto_email))
     
-    # Obtém o cliente Gemini (cria se necessário)
-    logger.debug("🔑 Obtendo cliente Gemini...")
-    cliente = obter_cliente_gemini()
-    logger.debug("✅ Cliente Gemini obtido")
+    resultado_cache = await buscar_no_cache_async("classificacao", texto_email) if consultar_cache else None
+    if resultado_cache is not None:
+        logger.info("⚡ Classificação encontrada no cache: %s", resultado_cache['label'])
+        return dict(resultado_cache)
     
-    # Pré-processa o texto usando NLP (remove stop words, aplica stemming)
-    logger.debug("📝 Aplicando pré-processamento NLP...")
-    texto_preprocessado = preprocessar_para_classificacao(texto_email, aplicar_nlp=True)
-    logger.debug(f"Texto pré-processado (tamanho: {len(texto_preprocessado)} chars)")
+    return await coalescer("classificacao", texto_email, lambda: _chamar_gemini_classificacao_async(texto_email))
+
+
+async def _chamar_gemini_classificacao_async(texto_email: str) -> dict:
+    """Chama o Gemini para classificar o email e salva o resultado no cache"""
+    prompt = _montar_prompt_classificacao(texto_email)
+    
+    try:
+        for tentativa in range(CLASSIFICACAO_NOVAS_TENTATIVAS + 1):
+            logger.info("🌐 Chamando API Gemini para classificação (assíncrona)...")
+            with medir_etapa("gemini_classificacao"):
+                resposta = await gerar_conteudo_async(
+                    prompt_da_tentativa(prompt, tentativa), config=config_classificacao(), instrucao=INSTRUCAO_CLASSIFICACAO
+                )
+            resultado = interpretar_tentativa(resposta, tentativa)
+            if resultado is not None:
+                break
+    except Exception as e:
+        raise _converter_erro_classificacao(e) from e
+    
+    salvar_no_cache("classificacao", texto_email, resultado)
+    return resultado
+
+
+def _montar_prompt_classificacao(texto_email: str) -> str:
+    """
+    Monta a parte variável do prompt de classificação (a parte fixa é INSTRUCAO_CLASSIFICACAO)
+    
+    O email vai limpo (sem citações, assinatura e avisos legais) e dentro do orçamento
+    PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO. A versão pré-processada (NLP) só entra quando
+    o email precisou ser cortado e ela, mais compacta, cabe inteira em metade do
+    orçamento: assim cobre também as frases que ficaram de fora. Nos demais casos
+    repetiria o mesmo conteúdo (ou seria só mais um corte).
+    
+    Args:
+        texto_email: Texto original do email
+    
+    Returns:
+        Trecho do email (e, se cortado, o texto pré-processado)
+    """
+    with medir_etapa("preprocessamento"):
+        trecho = montar_trecho_email(texto_email, PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO)
+        bloco_preprocessado = ""
+        if trecho.cortado:
+            logger.debug("📝 Email cortado, aplicando pré-processamento NLP...")
+            texto_preprocessado = preprocessar_para_classificacao(limpar_email(texto_email), aplicar_nlp=True)
+            if estimar_tokens(texto_preprocessado) <= PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO // 2:
+                bloco_preprocessado = f'''
+
+EMAIL COMPLETO (pré-processado com NLP: sem stop words, palavras reduzidas ao radical):
+\"\"\"{texto_preprocessado}\"\"\"'''
+    
+    if METRICAS_HABILITADAS:
+        # O prompt anterior levava o texto original e o pré-processado, cortados em 2000
+        # caracteres. O pré-processado nunca é maior que o original, então conta como outra
+        # cópia dele (estimativa máxima, sem rodar o NLP só para a métrica)
+        tokens_enviados = trecho.tokens + estimar_tokens(bloco_preprocessado)
+        tokens_corte_fixo = 2 * estimar_tokens(texto_email[:2000])
+        registrar_economia("classificacao", tokens_enviados, tokens_corte_fixo - tokens_enviados)
     
-    # Monta o prompt para a IA (usa texto original para contexto, mas menciona pré-processamento)
     logger.debug("📋 Montando prompt para a IA...")
     prompt = f"""
-Você é um classificador de emails de uma empresa do setor financeiro.
-Classifique o email em uma das categorias: "Produtivo" ou "Improdutivo".
+EMAIL:
+\"\"\"{trecho.texto}\"\"\"{bloco_preprocessado}
+""".strip()
+    
+    logger.debug("Prompt montado (tamanho: %s chars)", len(prompt))
+    return prompt
 
-Definições:
-- Produtivo: requer ação/resposta específica (status de requisição, suporte, dúvidas do sistema, envio de arquivos para análise, etc.)
-- Improdutivo: não requer ação imediata (felicitações, agradecimentos, mensagens sociais).
 
-Responda APENAS em JSON válido, no formato:
-{{"label":"Produtivo|Improdutivo","confidence":0.0-1.0,"reason":"explicação breve"}}
+@lru_cache(maxsize=2)
+def config_classificacao(com_resposta: bool = False):
+    """
+    Configuração da classificação: JSON no schema de ClassificacaoIA (criada no primeiro uso)
+    
+    Com com_resposta=True (chamada única), o schema pede também suggested_reply,
+    como ClassificacaoRespostaIA.
+    """
+    from google.genai import types as genai_types
+    campos = ["label", "confidence", "reason"] + (["suggested_reply"] if com_resposta else [])
+    propriedades = {
+        "label": genai_types.Schema(type="STRING", enum=["Produtivo", "Improdutivo"]),
+        "confidence": genai_types.Schema(type="NUMBER", minimum=0.0, maximum=1.0),
+        "reason": genai_types.Schema(type="STRING"),
+    }
+    if com_resposta:
+        propriedades["suggested_reply"] = genai_types.Schema(type="STRING")
+    return genai_types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=genai_types.Schema(
+            type="OBJECT",
+            properties=propriedades,
+            required=campos,
+            property_ordering=campos,
+        ),
+    )
 
-EMAIL (texto pré-processado com NLP):
-\"\"\"{texto_preprocessado[:2000]}\"\"\"
 
-EMAIL ORIGINAL (para contexto):
-\"\"\"{texto_email[:2000]}\"\"\"
-""".strip()
+def prompt_da_tentativa(prompt: str, tentativa: int) -> str:
+    """Na nova tentativa, avisa a IA de que a resposta anterior veio fora do formato"""
+    return prompt + AVISO_NOVA_TENTATIVA if tentativa else prompt
+
+
+def interpretar_tentativa(
+    resposta, tentativa: int, modelo: Type[ClassificacaoIA] = ClassificacaoIA, prompt: str = "classificacao"
+) -> Optional[dict]:
+    """
+    Interpreta a resposta de uma tentativa e registra o caminho em classificacao_parse_total
     
-    logger.debug(f"Prompt montado (tamanho: {len(prompt)} chars)")
-    logger.debug(f"Modelo a ser usado: {MODELO_GEMINI}")
+    Args:
+        resposta: Resposta do generate_content
+        tentativa: 0 na primeira chamada, 1+ nas novas tentativas
+        modelo: ClassificacaoIA, ou ClassificacaoRespostaIA na chamada única
+        prompt: Rótulo "prompt" da métrica ("classificacao" ou "chamada_unica")
     
+    Returns:
+        Dicionário do modelo validado, ou None se ainda houver tentativas
+    
+    Raises:
+        RespostaClassificacaoInvalida: Se a resposta for inválida na última tentativa
+    """
+    with medir_etapa("parse_json"):
+        try:
+            resultado, caminho = _interpretar_resposta_classificacao(resposta, modelo)
+        except RespostaClassificacaoInvalida as e:
+            if tentativa < CLASSIFICACAO_NOVAS_TENTATIVAS:
+                logger.warning("⚠️ Resposta de classificação inválida (%s), perguntando de novo...", e)
+                return None
+            incrementar("classificacao_parse_total", prompt=prompt, caminho="falha")
+            raise
+    incrementar("classificacao_parse_total", prompt=prompt, caminho="nova_tentativa" if tentativa else caminho)
+    return resultado
+
+
+def _interpretar_resposta_classificacao(
+    resposta, modelo: Type[ClassificacaoIA] = ClassificacaoIA
+) -> Tuple[dict, str]:
+    """
+    Converte a resposta do Gemini no dicionário de classificação
+    
+    O texto é validado direto como `modelo` (parse e validação do JSON em uma
+    passada, no pydantic-core). Se falhar, passa por _reparar_classificacao.
+    
+    Args:
+        resposta: Resposta do generate_content
+        modelo: ClassificacaoIA, ou ClassificacaoRespostaIA na chamada única
+    
+    Returns:
+        Tupla (dicionário com label, confidence e reason, "direto" ou "reparado")
+    
+    Raises:
+        RespostaClassificacaoInvalida: Se a resposta vier vazia ou não puder ser reparada
+    """
+    logger.debug("✅ Resposta recebida da API Gemini")
+    texto_resposta = (resposta.text or "").strip()
+    logger.debug("Texto da resposta (tamanho: %s chars)", len(texto_resposta))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Resposta bruta (primeiros 500 chars): %s...", texto_resposta[:500])
+    
+    if not texto_resposta:
+        logger.error("❌ API Gemini retornou resposta VAZIA!")
+        raise RespostaClassificacaoInvalida(texto_resposta, "resposta vazia")
+    
+    caminho = "direto"
     try:
-        # Chama a API Gemini
-        logger.info("🌐 Chamando API Gemini para classificação...")
-        logger.debug(f"Enviando requisição para modelo: {MODELO_GEMINI}")
-        resposta = cliente.models.generate_content(
-            model=MODELO_GEMINI,
-            contents=prompt
-        )
-        logger.debug("✅ Resposta recebida da API Gemini")
-        texto_resposta = (resposta.text or "").strip()
-        logger.debug(f"Texto da resposta (tamanho: {len(texto_resposta)} chars)")
-        logger.debug(f"Resposta bruta (primeiros 500 chars): {texto_resposta[:500]}...")
-        
-        if not texto_resposta:
-            logger.error("❌ API Gemini retornou resposta VAZIA!")
-            raise HTTPException(
+        classificacao = modelo.model_validate_json(texto_resposta)
+    except ValidationError as e:
+        motivo = e.errors()[0]["msg"]
+        logger.debug("Resposta fora do formato, tentando reparar: %s", motivo)
+        classificacao = _reparar_classificacao(texto_resposta, modelo)
+        if classificacao is None:
+            logger.error("❌ Erro ao interpretar o JSON da classificação!")
+            logger.error("Resposta que falhou: %s", texto_resposta)
+            raise RespostaClassificacaoInvalida(texto_resposta, motivo) from e
+        caminho = "reparado"
+    
+    resultado = classificacao.model_dump()
+    logger.info("✅ Classificação concluída: %s (confiança: %s)", resultado["label"], resultado["confidence"])
+    return resultado, caminho
+
+
+# Reparo da resposta: só olha os primeiros caracteres e faz poucas correções, em ordem
+REPARO_MAXIMO_CARACTERES = 4000
+_CORRECOES_JSON = (
+    (re.compile(r",\s*([}\]])"), r"\1"),  # vírgula sobrando antes de } ou ]
+    (re.compile(r"([{,]\s*)(label|confidence|reason|suggested_reply)\s*:"), r'\1"\2":'),  # chave sem aspas
+    (re.compile(r"'([^'\\]*)'(?=\s*[:,}])"), r'"\1"'),  # aspas simples
+)
+
+
+def _reparar_classificacao(
+    texto_resposta: str, modelo: Type[ClassificacaoIA] = ClassificacaoIA
+) -> Optional[ClassificacaoIA]:
+    """
+    Tenta corrigir os defeitos comuns de uma resposta fora do formato
+    
+    Recorta o objeto JSON (da primeira "{" à última "}", descartando texto ou bloco ```
+    em volta) e aplica as _CORRECOES_JSON uma a uma, acumulando, validando o recorte e
+    cada versão corrigida.
+    
+    Args:
+        texto_resposta: Texto bruto retornado pelo Gemini
+        modelo: ClassificacaoIA, ou ClassificacaoRespostaIA na chamada única
+    
+    Returns:
+        `modelo` validado, ou None se nenhuma correção bastar
+    """
+    trecho = texto_resposta[:REPARO_MAXIMO_CARACTERES]
+    inicio, fim = trecho.find("{"), trecho.rfind("}")
+    if inicio == -1 or fim < inicio:
+        return None
+    candidatos = [trecho[inicio:fim + 1]]
+    for padrao, substituto in _CORRECOES_JSON:
+        corrigido = padrao.sub(substituto, candidatos[-1])
+        if corrigido != candidatos[-1]:
+            candidatos.append(corrigido)
+    for candidato in candidatos:
+        try:
+            return modelo.model_validate_json(candidato)
+        except ValidationError:
+            continue
+    return None
+
+
+def _converter_erro_classificacao(e: Exception) -> HTTPException:
+    """
+    Converte qualquer erro da classificação na HTTPException adequada
+    
+    Args:
+        e: Exceção capturada durante a chamada ou o parse da resposta
+    
+    Returns:
+        HTTPException pronta para ser lançada (429 para quota, 500 para o resto)
+    """
+    if isinstance(e, HTTPException):
+        # Re-lança exceções HTTP
+        logger.debug("Re-lançando HTTPException...")
+        return e
+    
+    if isinstance(e, RespostaClassificacaoInvalida):
+        if not e.texto_resposta:
+            return HTTPException(
                 status_code=500,
                 detail="A API Gemini retornou uma resposta vazia. Verifique se a API key está correta."
             )
-        
-        # Extrai o JSON da resposta (pode vir com texto extra)
-        logger.debug("🔍 Extraindo JSON da resposta...")
-        if "{" in texto_resposta and "}" in texto_resposta:
-            inicio = texto_resposta.find("{")
-            fim = texto_resposta.rfind("}") + 1
-            json_str = texto_resposta[inicio:fim]
-            logger.debug(f"JSON extraído (posição {inicio} até {fim})")
-        else:
-            logger.warning("⚠️ Não encontrou chaves {} na resposta, usando texto completo")
-            json_str = texto_resposta
-        
-        logger.debug(f"JSON a ser parseado: {json_str[:200]}...")
-        
-        # Converte JSON para dicionário Python
-        try:
-            dados = json.loads(json_str)
-            logger.debug(f"✅ JSON parseado com sucesso: {dados}")
-        except json.JSONDecodeError as je:
-            logger.error(f"❌ Erro ao fazer parse do JSON!")
-            logger.error(f"JSON que falhou: {json_str}")
-            logger.error(f"Erro: {str(je)}")
-            raise
-        
-        # Valida e normaliza o label
-        logger.debug("✅ Validando e normalizando dados...")
-        label = dados.get("label", "Improdutivo")
-        logger.debug(f"Label recebido: {label}")
-        if label not in ["Produtivo", "Improdutivo"]:
-            logger.warning(f"⚠️ Label inválido '{label}', usando 'Improdutivo' como padrão")
-            label = "Improdutivo"
-        
-        # Valida e normaliza a confiança (entre 0.0 e 1.0)
-        confidence_raw = dados.get("confidence", 0.5)
-        logger.debug(f"Confidence recebido: {confidence_raw} (tipo: {type(confidence_raw)})")
-        confidence = float(confidence_raw)
-        confidence = max(0.0, min(1.0, confidence))
-        logger.debug(f"Confidence normalizado: {confidence}")
-        
-        resultado = {
-            "label": label,
-            "confidence": confidence,
-            "reason": dados.get("reason", "")
-        }
-        logger.info(f"✅ Classificação concluída: {label} (confiança: {confidence})")
-        return resultado
-    except json.JSONDecodeError as e:
         logger.error("=" * 80)
         logger.error("❌ ERRO: JSON inválido na resposta da IA!")
-        logger.error(f"Erro: {str(e)}")
-        logger.error(f"Resposta recebida completa: {texto_resposta if 'texto_resposta' in locals() else 'N/A'}")
+        logger.error("Erro: %s", e)
+        logger.error("Resposta recebida completa: %s", e.texto_resposta)
         logger.error("=" * 80)
-        raise HTTPException(
+        return HTTPException(
             status_code=500, 
-            detail=f"Erro ao processar resposta da IA (JSON inválido): {str(e)}. Resposta recebida: {texto_resposta[:200] if 'texto_resposta' in locals() else 'N/A'}"
+            detail=f"Erro ao processar resposta da IA (JSON inválido): {str(e)}. Resposta recebida: {e.texto_resposta[:200]}"
         )
-    except genai_errors.ClientError as e:
+    
+    if eh_erro_cliente_gemini(e):
         # Trata especificamente erros 429 (quota excedida)
         error_str = str(e)
-        if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower():
+        if eh_erro_quota(error_str):
             logger.error("=" * 80)
             logger.error("⚠️ ERRO 429: QUOTA DA API GEMINI EXCEDIDA!")
             logger.error("=" * 80)
             logger.error("📊 Limite do plano gratuito: 20 requisições/dia")
             logger.error("💡 Soluções:")
             logger.error("   1. Aguardar o reset da cota (próximo dia)")
-            logger.error("   2. Usar outra API key do Gemini")
+            logger.error("   2. Adicionar mais API keys em GEMINI_API_KEYS")
             logger.error("   3. Fazer upgrade do plano na Google Cloud")
-            logger.error(f"⏰ Erro completo: {error_str[:300]}...")
-            logger.error("=" * 80)
-            raise HTTPException(
-                status_code=429,
-                detail={
-                    "erro": "Quota da API Gemini excedida",
-                    "mensagem": "Você atingiu o limite de 20 requisições/dia do plano gratuito.",
-                    "solucoes": [
-                        "Aguardar até o próximo dia para o reset da cota",
-                        "Usar outra API key do Gemini",
-                        "Fazer upgrade do plano na Google Cloud Console"
-                    ],
-                    "link_documentacao": "https://ai.google.dev/gemini-api/docs/rate-limits",
-                    "erro_original": error_str[:500]
-                }
-            )
-        else:
-            # Outro erro do cliente (400, 401, 403, etc)
+            logger.error("⏰ Erro completo: %s...", error_str[:300])
             logger.error("=" * 80)
-            logger.error(f"❌ ERRO DO CLIENTE GEMINI (ClientError)")
-            logger.error(f"Erro: {error_str}")
-            logger.error("=" * 80)
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erro na API Gemini: {error_str[:300]}. Verifique sua API key e conectividade."
-            )
-    except HTTPException:
-        # Re-lança exceções HTTP
-        logger.debug("Re-lançando HTTPException...")
-        raise
-    except Exception as e:
+            return erro_quota_excedida(error_str)
+        # Outro erro do cliente (400, 401, 403, etc)
         logger.error("=" * 80)
-        logger.error(f"❌ ERRO INESPERADO em classificar_email_com_ia!")
-        logger.error(f"Tipo: {type(e).__name__}")
-        logger.error(f"Mensagem: {str(e)}")
-        import traceback
-        logger.error(f"Traceback completo:\n{traceback.format_exc()}")
+        logger.error("❌ ERRO DO CLIENTE GEMINI (ClientError)")
+        logger.error("Erro: %s", error_str)
         logger.error("=" * 80)
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Erro ao classificar email com Gemini: {str(e)}. Verifique se a API key está correta e se há conexão com a internet."
+        return HTTPException(
+            status_code=500,
+            detail=f"Erro na API Gemini: {error_str[:300]}. Verifique sua API key e conectividade."
+        )
+    
+    logger.error("=" * 80)
+    logger.error("❌ ERRO INESPERADO em classificar_email_com_ia!")
+    logger.error("Tipo: %s", type(e).__name__)
+    logger.error("Mensagem: %s", e)
+    import traceback
+    logger.error("Traceback completo:\n%s", traceback.format_exc())
+    logger.error("=" * 80)
+    return HTTPException(
+        status_code=500, 
+        detail=f"Erro ao classificar email com Gemini: {str(e)}. Verifique se a API key está correta e se há conexão com a internet."
+    )
+
+
+# Caracteres reservados por email para a resposta da IA no modo empacotado
+# ({"id":"e12","label":"Improdutivo","confidence":0.95,"reason":"..."})
+CARACTERES_RESPOSTA_POR_EMAIL = 160
+
+
+async def classificar_emails_empacotados_async(textos: List[str]) -> List[Union[dict, HTTPException]]:
+    """
+    Classifica vários emails empacotando-os em poucos prompts (modo lote)
+    
+    Os emails recebem IDs estáveis ("e0", "e1", ...) e são agrupados até o orçamento
+    LOTE_PROMPT_ORCAMENTO_CARACTERES. A IA devolve um array JSON com
+    {id, label, confidence, reason}. Itens ausentes ou malformados são reenviados
+    (até LOTE_PROMPT_MAX_TENTATIVAS rodadas) e, se ainda faltarem, classificados
+    individualmente com classificar_email_com_ia_async.
+    
+    Args:
+        textos: Lista de textos de email
+    
+    Returns:
+        Lista na mesma ordem dos textos, com o dicionário de classificação de cada
+        email ou a HTTPException do erro daquele email
+    """
+    resultados: List[Optional[Union[dict, HTTPException]]] = [None] * len(textos)
+    
+    # Emails já classificados (ou idênticos a outros já classificados) vêm do cache
+    pendentes = {}
+    for indice, texto in enumerate(textos):
+        resultado_cache = await buscar_no_cache_async("classificacao", texto)
+        if resultado_cache is not None:
+            resultados[indice] = dict(resultado_cache)
+        else:
+            pendentes[f"e{indice}"] = indice
+    logger.info("📦 Classificação empacotada: %s emails, %s fora do cache", len(textos), len(pendentes))
+    
+    for tentativa in range(1, LOTE_PROMPT_MAX_TENTATIVAS + 1):
+        if not pendentes:
+            break
+        grupos = _agrupar_por_orcamento(
+            [(id_email, textos[indice]) for id_email, indice in pendentes.items()],
+            LOTE_PROMPT_ORCAMENTO_CARACTERES,
         )
+        logger.info("📦 Rodada %s: %s emails em %s prompt(s)", tentativa, len(pendentes), len(grupos))
+        respostas_grupos = await asyncio.gather(*(_classificar_grupo_async(grupo) for grupo in grupos))
+        
+        for grupo, resposta_grupo in zip(grupos, respostas_grupos):
+            if isinstance(resposta_grupo, HTTPException):
+                # A chamada inteira falhou (ex.: 429): o erro vale para todos os emails do grupo
+                for id_email, _ in grupo:
+                    resultados[pendentes.pop(id_email)] = resposta_grupo
+                continue
+            for id_email, classificacao in resposta_grupo.items():
+                indice = pendentes.pop(id_email)
+                resultados[indice] = classificacao
+                salvar_no_cache("classificacao", textos[indice], classificacao)
+        
+        if pendentes:
+            logger.warning("⚠️ %s email(s) ausentes/malformados na resposta, reenviando...", len(pendentes))
+    
+    # Último recurso: classifica individualmente o que ainda faltar
+    for id_email, indice in pendentes.items():
+        try:
+            resultados[indice] = await classificar_email_com_ia_async(textos[indice])
+        except HTTPException as he:
+            resultados[indice] = he
+    
+    return resultados
+
+
+def _agrupar_por_orcamento(emails: List[Tuple[str, str]], orcamento_caracteres: int) -> List[List[Tuple[str, str]]]:
+    """
+    Agrupa emails em prompts sem ultrapassar o orçamento de caracteres
+    
+    Cada email custa o tamanho do seu bloco no prompt mais a reserva para a resposta.
+    Um email maior que o orçamento sozinho vai em um grupo próprio.
+    
+    Args:
+        emails: Lista de (id, texto)
+        orcamento_caracteres: Máximo de caracteres por prompt
+    
+    Returns:
+        Lista de grupos de (id, texto)
+    """
+    grupos: List[List[Tuple[str, str]]] = []
+    grupo_atual: List[Tuple[str, str]] = []
+    custo_atual = _CUSTO_FIXO_EMPACOTADO
+    for id_email, texto in emails:
+        custo = len(_bloco_email_empacotado(id_email, texto)) + CARACTERES_RESPOSTA_POR_EMAIL
+        if grupo_atual and custo_atual + custo > orcamento_caracteres:
+            grupos.append(grupo_atual)
+            grupo_atual = []
+            custo_atual = _CUSTO_FIXO_EMPACOTADO
+        grupo_atual.append((id_email, texto))
+        custo_atual += custo
+    if grupo_atual:
+        grupos.append(grupo_atual)
+    return grupos
+
+
+# Parte fixa do prompt empacotado (vai em system_instruction / cache de contexto)
+INSTRUCAO_CLASSIFICACAO_EMPACOTADA = """
+Você é um classificador de emails de uma empresa do setor financeiro.
+Classifique CADA email enviado em uma das categorias: "Produtivo" ou "Improdutivo".
+
+Definições:
+- Produtivo: requer ação/resposta específica (status de requisição, suporte, dúvidas do sistema, envio de arquivos para análise, etc.)
+- Improdutivo: não requer ação imediata (felicitações, agradecimentos, mensagens sociais).
+
+Responda APENAS com um array JSON válido, com um objeto para CADA email, usando o id informado:
+[{"id":"e0","label":"Produtivo|Improdutivo","confidence":0.0-1.0,"reason":"explicação breve"}]
+""".strip()
+
+_PROMPT_EMPACOTADO_CABECALHO = "EMAILS:"
+
+# A instrução também ocupa o contexto da chamada, então entra no orçamento do grupo
+_CUSTO_FIXO_EMPACOTADO = len(INSTRUCAO_CLASSIFICACAO_EMPACOTADA) + len(_PROMPT_EMPACOTADO_CABECALHO)
+
+
+def _bloco_email_empacotado(id_email: str, texto: str) -> str:
+    """Monta o bloco de um email dentro do prompt empacotado (limpo e dentro do orçamento)"""
+    trecho = montar_trecho_email(texto, PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO)
+    return f'\n\n<email id="{id_email}">\n{trecho.texto}\n</email>'
+
+
+async def _classificar_grupo_async(grupo: List[Tuple[str, str]]) -> Union[Dict[str, dict], HTTPException]:
+    """
+    Classifica um grupo de emails em uma única chamada ao Gemini
+    
+    Returns:
+        Dicionário id -> classificação apenas com os itens válidos da resposta,
+        ou a HTTPException se a chamada falhar
+    """
+    blocos = [_bloco_email_empacotado(id_email, texto) for id_email, texto in grupo]
+    prompt = _PROMPT_EMPACOTADO_CABECALHO + "".join(blocos)
+    # O prompt anterior levava cada email cortado em 2000 caracteres
+    tokens_enviados = sum(estimar_tokens(bloco) for bloco in blocos)
+    tokens_corte_fixo = sum(
+        estimar_tokens(f'\n\n<email id="{id_email}">\n{texto[:2000]}\n</email>') for id_email, texto in grupo
+    )
+    registrar_economia("lote", tokens_enviados, tokens_corte_fixo - tokens_enviados)
+    logger.debug("Prompt empacotado montado (%s emails, %s chars)", len(grupo), len(prompt))
+    try:
+        with medir_etapa("gemini_classificacao_empacotada"):
+            resposta = await gerar_conteudo_async(prompt, instrucao=INSTRUCAO_CLASSIFICACAO_EMPACOTADA)
+    except Exception as e:
+        return _converter_erro_classificacao(e)
+    with medir_etapa("parse_json"):
+        return _interpretar_resposta_empacotada((resposta.text or "").strip(), {id_email for id_email, _ in grupo})
+
+
+def _interpretar_resposta_empacotada(texto_resposta: str, ids_esperados: set) -> Dict[str, dict]:
+    """
+    Interpreta o array JSON da resposta empacotada, descartando itens malformados
+    
+    Args:
+        texto_resposta: Texto bruto retornado pelo Gemini
+        ids_esperados: IDs enviados no prompt
+    
+    Returns:
+        Dicionário id -> {label, confidence, reason} só com os itens válidos
+    """
+    inicio, fim = texto_resposta.find("["), texto_resposta.rfind("]")
+    if inicio == -1 or fim <= inicio:
+        logger.warning("⚠️ Resposta empacotada sem array JSON")
+        return {}
+    try:
+        itens = json.loads(texto_resposta[inicio:fim + 1])
+    except json.JSONDecodeError as e:
+        logger.warning("⚠️ Array JSON inválido na resposta empacotada: %s", e)
+        return {}
+    if not isinstance(itens, list):
+        return {}
+    
+    validos = {}
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        id_email = str(item.get("id", ""))
+        if id_email not in ids_esperados or id_email in validos:
+            continue
+        if item.get("label") not in ("Produtivo", "Improdutivo"):
+            continue
+        try:
+            confidence = max(0.0, min(1.0, float(item.get("confidence", 0.5))))
+        except (TypeError, ValueError):
+            continue
+        validos[id_email] = {
+            "label": item["label"],
+            "confidence": confidence,
+            "reason": str(item.get("reason") or ""),
+        }
+    return validos
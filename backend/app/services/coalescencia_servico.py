@@ -0,0 +1,123 @@
+"""
+Serviço de coalescência de chamadas idênticas em andamento (single-flight)
+
+Quando várias requisições com o mesmo email chegam juntas (ex.: um email em massa que
+caiu em várias caixas), o cache ainda não tem o resultado e cada uma chamaria o Gemini.
+Aqui, a primeira requisição (líder) dispara a chamada e as outras aguardam o mesmo
+resultado. A chave é a mesma do cache (gerar_chave_cache: hash do texto normalizado,
+modelo e versão do prompt).
+
+- Erros da chamada compartilhada chegam a todas as requisições que a aguardavam
+- A chamada roda em uma tarefa própria: se quem a disparou for cancelado (ex.: cliente
+  desconectou), as outras continuam esperando; a tarefa só é cancelada quando ninguém
+  mais aguarda por ela
+- Cada requisição que aguardou uma chamada de outra conta em chamadas_coalescidas_total
+"""
+import asyncio
+import copy
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+from app.config.configuracao import COALESCER_CHAMADAS
+from app.services.cache_servico import gerar_chave_cache
+from app.services.metricas_servico import incrementar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _ChamadaEmAndamento:
+    """Tarefa compartilhada e quantas requisições estão aguardando por ela"""
+    
+    def __init__(self, tarefa: "asyncio.Task"):
+        self.tarefa = tarefa
+        self.aguardando = 0
+
+
+class GrupoChamadas:
+    """Agrupa chamadas assíncronas idênticas em andamento em uma só"""
+    
+    def __init__(self, habilitado: bool = True):
+        self.habilitado = habilitado
+        self._em_andamento: Dict[str, _ChamadaEmAndamento] = {}
+        self._contadores = {
+            "chamadas": 0,
+            "lideres": 0,
+            "coalescidas": 0,
+            "canceladas": 0,
+        }
+    
+    async def executar(self, tipo: str, texto: str, funcao: Callable[[], Awaitable[T]], extra: str = "") -> T:
+        """
+        Executa funcao() ou aguarda a chamada idêntica que já estiver em andamento
+        
+        Args:
+            tipo: Tipo da chamada ("classificacao", "resposta", ...), como no cache
+            texto: Texto do email (normalizado na chave)
+            funcao: Função assíncrona sem argumentos que faz a chamada
+            extra: Informação adicional que muda o resultado (ex.: label da resposta)
+        
+        Returns:
+            Resultado da chamada (quem aguardou recebe uma cópia rasa, para não
+            compartilhar dicionários mutáveis com o líder)
+        
+        Raises:
+            Exception: O mesmo erro da chamada compartilhada
+        """
+        if not self.habilitado:
+            return await funcao()
+        
+        chave = gerar_chave_cache(tipo, texto, extra)
+        loop = asyncio.get_running_loop()
+        self._contadores["chamadas"] += 1
+        chamada = self._em_andamento.get(chave)
+        if chamada is not None and (chamada.tarefa.done() or chamada.tarefa.get_loop() is not loop):
+            # Sobra de outro event loop (ex.: CLI/benchmarks com asyncio.run): não dá para aguardar
+            chamada = None
+        lider = chamada is None
+        if lider:
+            chamada = _ChamadaEmAndamento(asyncio.ensure_future(funcao()))
+            self._em_andamento[chave] = chamada
+            chamada.tarefa.add_done_callback(lambda _tarefa, chamada=chamada: self._remover(chave, chamada))
+            self._contadores["lideres"] += 1
+        else:
+            self._contadores["coalescidas"] += 1
+            incrementar("chamadas_coalescidas_total", tipo=tipo)
+            logger.info("🔗 Chamada idêntica em andamento (%s), aguardando o mesmo resultado", tipo)
+        
+        chamada.aguardando += 1
+        try:
+            resultado = await asyncio.shield(chamada.tarefa)
+        except asyncio.CancelledError:
+            if chamada.aguardando == 1 and not chamada.tarefa.done():
+                # Ninguém mais espera: cancela a chamada e libera a chave para a próxima
+                self._remover(chave, chamada)
+                chamada.tarefa.cancel()
+                self._contadores["canceladas"] += 1
+            raise
+        finally:
+            chamada.aguardando -= 1
+        return resultado if lider else copy.copy(resultado)
+    
+    def _remover(self, chave: str, chamada: _ChamadaEmAndamento):
+        if self._em_andamento.get(chave) is chamada:
+            del self._em_andamento[chave]
+    
+    def estatisticas(self) -> dict:
+        """Retorna contadores de chamadas, líderes e coalescidas"""
+        contadores = dict(self._contadores)
+        return {
+            "habilitado": self.habilitado,
+            **contadores,
+            "em_andamento": len(self._em_andamento),
+            "taxa_coalescencia": round(contadores["coalescidas"] / contadores["chamadas"], 4) if contadores["chamadas"] else 0.0,
+        }
+
+
+# Instância global (compartilhada pelos serviços)
+grupo_chamadas = GrupoChamadas(COALESCER_CHAMADAS)
+
+
+async def coalescer(tipo: str, texto: str, funcao: Callable[[], Awaitable[T]], extra: str = "") -> T:
+    """Executa funcao() pelo grupo global (ver GrupoChamadas.executar)"""
+    return await grupo_chamadas.executar(tipo, texto, funcao, extra)
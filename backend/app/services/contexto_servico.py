@@ -0,0 +1,266 @@
+"""
+Serviço de cache de contexto do Gemini (instruções fixas registradas como cached content)
+
+Os prompts são divididos em uma instrução fixa (papel, definições, diretrizes e formato da
+resposta) e no trecho variável com o email. CacheContexto.montar_config decide como a
+instrução vai em cada chamada:
+- GEMINI_CACHE_CONTEXTO desligado: em system_instruction (o prefixo igual em todas as
+  chamadas ainda pode ser aproveitado pelo cache implícito dos modelos 2.5)
+- Ligado: a instrução é registrada uma vez por API key (caches.create, o cached content
+  pertence ao projeto da chave) e a chamada leva só o nome do registro em cached_content.
+  Quando faltar menos de GEMINI_CACHE_CONTEXTO_RENOVAR_SEGUNDOS para expirar, o TTL é
+  renovado (caches.update)
+
+Se o registro falhar (ex.: instrução abaixo do mínimo de tokens do modelo), a instrução
+volta para system_instruction e o registro só é tentado de novo depois do TTL. Enquanto
+um registro está sendo criado, as chamadas concorrentes usam system_instruction em vez
+de esperar por ele.
+"""
+import hashlib
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from app.config.configuracao import MODELO_GEMINI
+from app.services.metricas_servico import incrementar
+from app.services.resiliencia_servico import eh_erro_cliente_gemini, eh_erro_transitorio
+
+if TYPE_CHECKING:
+    from google.genai import types as genai_types
+
+logger = logging.getLogger(__name__)
+
+# Ações decididas por CacheContexto._planejar
+_USAR_INSTRUCAO = "instrucao"
+_USAR_REGISTRO = "registro"
+_CRIAR = "criar"
+_RENOVAR = "renovar"
+
+
+@lru_cache(maxsize=64)
+def _hash_instrucao(instrucao: str) -> str:
+    return hashlib.sha256(instrucao.encode("utf-8")).hexdigest()[:16]
+
+
+def _com_campos(config: Optional["genai_types.GenerateContentConfig"], **campos) -> "genai_types.GenerateContentConfig":
+    """Copia a configuração da chamada (ou cria uma nova) com os campos informados"""
+    from google.genai import types as genai_types
+    if config is None:
+        return genai_types.GenerateContentConfig(**campos)
+    return config.model_copy(update=campos)
+
+
+class _RegistroContexto:
+    """Cached content de uma instrução em uma API key"""
+    
+    def __init__(self):
+        self.nome: Optional[str] = None
+        self.expira_em = 0.0
+        self.ocupado = False  # criação ou renovação em andamento
+        self.tentar_depois_de = 0.0  # depois de uma falha no registro
+
+
+class CacheContexto:
+    """Registra as instruções fixas dos prompts como cached content do Gemini"""
+    
+    def __init__(self, habilitado: bool, ttl_segundos: int, renovar_segundos: int, modelo: str = MODELO_GEMINI):
+        self.habilitado = habilitado
+        self.ttl_segundos = max(1, ttl_segundos)
+        self.renovar_segundos = min(max(0, renovar_segundos), self.ttl_segundos / 2)
+        self.modelo = modelo
+        self._registros: Dict[Tuple[str, str], _RegistroContexto] = {}
+        self._lock = threading.Lock()
+        self._contadores = {
+            "criados": 0,
+            "renovados": 0,
+            "reutilizados": 0,
+            "falhas": 0,
+            "sem_registro": 0,
+        }
+    
+    def montar_config(
+        self, cliente, id_chave: str, instrucao: Optional[str],
+        config: Optional["genai_types.GenerateContentConfig"] = None,
+    ) -> Optional["genai_types.GenerateContentConfig"]:
+        """
+        Monta a configuração da chamada com a instrução (registrando-a se preciso)
+        
+        Args:
+            cliente: Cliente Gemini da chave que vai fazer a chamada
+            id_chave: Identificador da chave (o registro é por chave)
+            instrucao: Instrução de sistema (None = chamada sem instrução)
+            config: Configuração da chamada (ex.: response_mime_type)
+        
+        Returns:
+            Configuração com cached_content ou system_instruction
+        """
+        if not instrucao:
+            return config
+        acao, registro = self._planejar(id_chave, instrucao)
+        try:
+            if acao == _CRIAR:
+                try:
+                    registrado = cliente.caches.create(model=self.modelo, config=self._config_criacao(instrucao))
+                except Exception as e:
+                    self._registrar_falha(registro, e)
+                else:
+                    self._registrar_sucesso(registro, registrado.name, criado=True)
+            elif acao == _RENOVAR:
+                try:
+                    cliente.caches.update(name=registro.nome, config=self._config_renovacao())
+                except Exception as e:
+                    self._registrar_falha(registro, e, renovacao=True)
+                else:
+                    self._registrar_sucesso(registro, registro.nome, criado=False)
+        finally:
+            if acao in (_CRIAR, _RENOVAR):
+                # Cancelamento (ou outro BaseException) no meio do registro: libera para a próxima chamada
+                self._liberar(registro)
+        return self._config_final(config, instrucao, registro)
+    
+    async def montar_config_async(
+        self, cliente, id_chave: str, instrucao: Optional[str],
+        config: Optional["genai_types.GenerateContentConfig"] = None,
+    ) -> Optional["genai_types.GenerateContentConfig"]:
+        """Versão assíncrona de montar_config (usa cliente.aio.caches)"""
+        if not instrucao:
+            return config
+        acao, registro = self._planejar(id_chave, instrucao)
+        try:
+            if acao == _CRIAR:
+                try:
+                    registrado = await cliente.aio.caches.create(model=self.modelo, config=self._config_criacao(instrucao))
+                except Exception as e:
+                    self._registrar_falha(registro, e)
+                else:
+                    self._registrar_sucesso(registro, registrado.name, criado=True)
+            elif acao == _RENOVAR:
+                try:
+                    await cliente.aio.caches.update(name=registro.nome, config=self._config_renovacao())
+                except Exception as e:
+                    self._registrar_falha(registro, e, renovacao=True)
+                else:
+                    self._registrar_sucesso(registro, registro.nome, criado=False)
+        finally:
+            if acao in (_CRIAR, _RENOVAR):
+                # Cancelamento (ou outro BaseException) no meio do registro: libera para a próxima chamada
+                self._liberar(registro)
+        return self._config_final(config, instrucao, registro)
+    
+    def invalidar(self, id_chave: str, instrucao: str):
+        """Esquece o registro da instrução na chave (ex.: o Gemini não o encontrou mais)"""
+        with self._lock:
+            registro = self._registros.pop((id_chave, _hash_instrucao(instrucao)), None)
+        if registro is not None and registro.nome:
+            logger.warning("⚠️ Cache de contexto %s rejeitado pelo Gemini, será registrado de novo", registro.nome)
+    
+    def limpar(self):
+        """Esquece todos os registros (não apaga nada no Gemini: eles expiram pelo TTL)"""
+        with self._lock:
+            self._registros.clear()
+    
+    def estatisticas(self) -> dict:
+        """Retorna os contadores e quantos registros estão válidos"""
+        agora = time.monotonic()
+        with self._lock:
+            contadores = dict(self._contadores)
+            ativos = sum(1 for registro in self._registros.values() if registro.nome and registro.expira_em > agora)
+        return {
+            "habilitado": self.habilitado,
+            **contadores,
+            "registros_ativos": ativos,
+            "ttl_segundos": self.ttl_segundos,
+        }
+    
+    def _planejar(self, id_chave: str, instrucao: str) -> Tuple[str, Optional[_RegistroContexto]]:
+        """Decide se a chamada usa a instrução, o registro existente, ou cria/renova o registro"""
+        if not self.habilitado:
+            return _USAR_INSTRUCAO, None
+        agora = time.monotonic()
+        with self._lock:
+            registro = self._registros.setdefault((id_chave, _hash_instrucao(instrucao)), _RegistroContexto())
+            valido = registro.nome is not None and registro.expira_em > agora
+            if registro.ocupado or (valido and registro.expira_em - agora > self.renovar_segundos):
+                return (_USAR_REGISTRO if valido else _USAR_INSTRUCAO), registro
+            if valido:
+                registro.ocupado = True
+                return _RENOVAR, registro
+            if agora < registro.tentar_depois_de:
+                return _USAR_INSTRUCAO, registro
+            registro.nome = None
+            registro.ocupado = True
+            return _CRIAR, registro
+    
+    def _config_final(
+        self, config: Optional["genai_types.GenerateContentConfig"], instrucao: str,
+        registro: Optional[_RegistroContexto],
+    ) -> "genai_types.GenerateContentConfig":
+        nome = None
+        if registro is not None:
+            with self._lock:
+                if registro.nome is not None and registro.expira_em > time.monotonic():
+                    nome = registro.nome
+        if nome is None:
+            if self.habilitado:
+                self._contar("sem_registro")
+            return _com_campos(config, system_instruction=instrucao)
+        self._contar("reutilizados", "reutilizado")
+        return _com_campos(config, cached_content=nome)
+    
+    def _config_criacao(self, instrucao: str) -> "genai_types.CreateCachedContentConfig":
+        from google.genai import types as genai_types
+        return genai_types.CreateCachedContentConfig(
+            system_instruction=instrucao,
+            ttl=f"{self.ttl_segundos}s",
+            display_name=f"email-classifier-{_hash_instrucao(instrucao)}",
+        )
+    
+    def _config_renovacao(self) -> "genai_types.UpdateCachedContentConfig":
+        from google.genai import types as genai_types
+        return genai_types.UpdateCachedContentConfig(ttl=f"{self.ttl_segundos}s")
+    
+    def _liberar(self, registro: _RegistroContexto):
+        with self._lock:
+            registro.ocupado = False
+    
+    def _registrar_sucesso(self, registro: _RegistroContexto, nome: str, criado: bool):
+        with self._lock:
+            registro.nome = nome
+            registro.expira_em = time.monotonic() + self.ttl_segundos
+            registro.ocupado = False
+        if criado:
+            self._contar("criados", "criado")
+            logger.info("🗂️ Instrução registrada no cache de contexto do Gemini: %s", nome)
+        else:
+            self._contar("renovados", "renovado")
+            logger.info("🗂️ Cache de contexto renovado por %ss: %s", self.ttl_segundos, nome)
+    
+    def _registrar_falha(self, registro: _RegistroContexto, erro: Exception, renovacao: bool = False):
+        """
+        Descarta o registro que falhou
+        
+        Se a renovação falhar (ex.: o registro já expirou no Gemini) ou a criação falhar por
+        falta de cota ou instabilidade, a próxima chamada tenta criar outro; outras falhas na
+        criação (ex.: instrução pequena demais) só são tentadas de novo depois do TTL.
+        """
+        temporaria = eh_erro_transitorio(erro) or (eh_erro_cliente_gemini(erro) and erro.code == 429)
+        with self._lock:
+            registro.nome = None
+            registro.expira_em = 0.0
+            registro.ocupado = False
+            if not renovacao and not temporaria:
+                registro.tentar_depois_de = time.monotonic() + self.ttl_segundos
+        self._contar("falhas", "falha")
+        logger.warning(
+            "⚠️ Falha ao %s a instrução no cache de contexto (%s: %.200s); usando system_instruction%s",
+            "renovar" if renovacao else "registrar", type(erro).__name__, erro,
+            "" if renovacao or temporaria else f" pelos próximos {self.ttl_segundos}s",
+        )
+    
+    def _contar(self, contador: str, resultado: Optional[str] = None):
+        with self._lock:
+            self._contadores[contador] += 1
+        if resultado is not None:
+            incrementar("gemini_cache_contexto_total", resultado=resultado)
+
@@ -1,17 +1,80 @@
 """
 Serviço para extrair texto de arquivos
+
+PDFs são lidos página a página (gerador): a leitura para assim que o orçamento de
+caracteres (EXTRACAO_LIMITE_CARACTERES) é atingido, sem processar o resto do arquivo.
+A versão assíncrona roda a extração em um pool de threads ou processos para não
+bloquear o event loop. O pdfplumber (e o pdfminer) só é importado no primeiro PDF.
 """
+import asyncio
 import io
-import pdfplumber
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import BinaryIO, Iterator, Optional, Union
+from app.config.configuracao import EXTRACAO_LIMITE_CARACTERES, EXTRACAO_EXECUTOR, EXTRACAO_MAX_WORKERS
+from app.services.metricas_servico import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+# Pool de extração (criado na primeira chamada assíncrona)
+_executor_extracao: Optional[Executor] = None
 
 
-def extrair_texto_de_arquivo(nome_arquivo: str, conteudo: bytes) -> str:
+def iterar_paginas_pdf(fonte: Union[bytes, BinaryIO], limite_caracteres: int = 0) -> Iterator[str]:
+    """
+    Gera o texto de cada página do PDF, sob demanda
+    
+    As páginas são abertas uma a uma (sem montar a lista de todas as páginas) e
+    liberadas logo após a extração.
+    
+    Args:
+        fonte: Conteúdo do PDF em bytes ou um arquivo binário aberto
+        limite_caracteres: Para depois de gerar esse total de caracteres (0 = sem limite)
+    
+    Yields:
+        Texto de cada página que tiver texto
+    """
+    import pdfplumber
+    from pdfminer.pdfpage import PDFPage
+    from pdfplumber.page import Page
+    
+    if isinstance(fonte, (bytes, bytearray, memoryview)):
+        fonte = io.BytesIO(fonte)
+    
+    total = 0
+    with pdfplumber.open(fonte) as pdf:
+        altura_acumulada = 0
+        for numero, pagina_pdfminer in enumerate(PDFPage.create_pages(pdf.doc), start=1):
+            pagina = Page(pdf, pagina_pdfminer, page_number=numero, initial_doctop=altura_acumulada)
+            altura_acumulada += pagina.height
+            try:
+                texto_pagina = pagina.extract_text()
+            finally:
+                pagina.close()
+            
+            if texto_pagina:
+                yield texto_pagina
+                total += len(texto_pagina) + 1
+            
+            if limite_caracteres and total >= limite_caracteres:
+                logger.debug("✂️ Orçamento de %s caracteres atingido na página %s", limite_caracteres, numero)
+                break
+
+
+def extrair_texto_de_arquivo(
+    nome_arquivo: str,
+    conteudo: Union[bytes, BinaryIO],
+    limite_caracteres: Optional[int] = None,
+) -> str:
     """
     Extrai texto de arquivos .txt ou .pdf
     
     Args:
         nome_arquivo: Nome do arquivo (para identificar extensão)
-        conteudo: Conteúdo do arquivo em bytes
+        conteudo: Conteúdo do arquivo em bytes ou buffer binário (ex.: upload em spool)
+        limite_caracteres: Orçamento de caracteres para PDFs (padrão:
+            EXTRACAO_LIMITE_CARACTERES; 0 = extrai tudo)
     
     Returns:
         Texto extraído do arquivo
@@ -20,24 +83,74 @@ def extrair_texto_de_arquivo(nome_arquivo: str, conteudo: bytes) -> str:
         ValueError: Se o formato não for suportado
     """
     nome_lower = (nome_arquivo or "").lower()
+    if limite_caracteres is None:
+        limite_caracteres = EXTRACAO_LIMITE_CARACTERES
     
     # Processa arquivo .txt
     if nome_lower.endswith(".txt"):
+        if not isinstance(conteudo, (bytes, bytearray)):
+            conteudo = conteudo.read()
         try:
             return conteudo.decode("utf-8").strip()
         except UnicodeDecodeError:
             # Tenta com encoding alternativo se UTF-8 falhar
             return conteudo.decode("latin-1", errors="ignore").strip()
     
-    # Processa arquivo .pdf
+    # Processa arquivo .pdf (página a página, até o orçamento de caracteres)
     elif nome_lower.endswith(".pdf"):
-        texto_partes = []
-        with pdfplumber.open(io.BytesIO(conteudo)) as pdf:
-            for pagina in pdf.pages:
-                texto_pagina = pagina.extract_text()
-                if texto_pagina:
-                    texto_partes.append(texto_pagina)
-        return "\n".join(texto_partes).strip()
+        return "\n".join(iterar_paginas_pdf(conteudo, limite_caracteres)).strip()
     
     else:
         raise ValueError("Formato não suportado. Use arquivos .txt ou .pdf")
+
+
+def _obter_executor() -> Executor:
+    """Cria (uma vez) o pool de extração configurado em EXTRACAO_EXECUTOR"""
+    global _executor_extracao
+    if _executor_extracao is None:
+        workers = max(1, EXTRACAO_MAX_WORKERS)
+        if EXTRACAO_EXECUTOR == "process":
+            _executor_extracao = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor_extracao = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extracao")
+        logger.info("🔧 Pool de extração criado (%s, %s workers)", EXTRACAO_EXECUTOR, workers)
+    return _executor_extracao
+
+
+async def extrair_texto_de_arquivo_async(
+    nome_arquivo: str,
+    conteudo: Union[bytes, BinaryIO],
+    limite_caracteres: Optional[int] = None,
+) -> str:
+    """
+    Versão assíncrona de extrair_texto_de_arquivo (roda no pool de extração)
+    
+    Args:
+        nome_arquivo: Nome do arquivo (para identificar extensão)
+        conteudo: Conteúdo do arquivo em bytes ou buffer binário
+        limite_caracteres: Orçamento de caracteres para PDFs
+    
+    Returns:
+        Texto extraído do arquivo
+    
+    Raises:
+        ValueError: Se o formato não for suportado
+    """
+    if isinstance(_obter_executor(), ProcessPoolExecutor) and not isinstance(conteudo, (bytes, bytearray)):
+        # Arquivos abertos não podem ser enviados para outro processo: lê os bytes antes
+        conteudo = conteudo.read()
+    
+    loop = asyncio.get_running_loop()
+    with medir_etapa("extracao"):
+        return await loop.run_in_executor(
+            _obter_executor(),
+            partial(extrair_texto_de_arquivo, nome_arquivo, conteudo, limite_caracteres),
+        )
+
+
+def encerrar_executor_extracao():
+    """Encerra o pool de extração (chamado no desligamento da API)"""
+    global _executor_extracao
+    if _executor_extracao is not None:
+        _executor_extracao.shutdown(wait=False, cancel_futures=True)
+        _executor_extracao = None
@@ -0,0 +1,621 @@
+"""
+Serviço de acesso ao Gemini - ponto único para chamadas à API
+
+Centraliza a criação dos clientes e as chamadas a generate_content:
+- gerar_conteudo: versão síncrona (client.models.generate_content)
+- gerar_conteudo_async: versão assíncrona nativa (client.aio.models.generate_content),
+  com concorrência limitada por um semáforo (GEMINI_MAX_CONCORRENCIA)
+- gerar_conteudo_stream_async: texto em partes (client.aio.models.generate_content_stream)
+- As chamadas usam o pool de API keys (pool_chaves): se uma chave retorna 429, ela entra
+  em cooldown e a chamada é repetida com a próxima; o 429 só é devolvido quando todas
+  as chaves estão esgotadas
+- Cada chave respeita seu limite de taxa (GEMINI_RPM/GEMINI_RPD)
+- Falhas temporárias (todas as chaves sem cota, 5xx, rede) são repetidas com backoff
+  exponencial e jitter; um circuit breaker (disjuntor) falha na hora com 503 enquanto o
+  Gemini está instável
+- A parte fixa do prompt (instrucao) vai em system_instruction ou, com
+  GEMINI_CACHE_CONTEXTO, como cached content registrado por chave (cache_contexto)
+"""
+import asyncio
+import logging
+import math
+import re
+import time
+import weakref
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+from fastapi import HTTPException
+from app.config.configuracao import (
+    CHAVES_API_GEMINI,
+    GEMINI_CHAVE_ESPERA_SEGUNDOS,
+    MODELO_GEMINI,
+    GEMINI_MAX_CONCORRENCIA,
+    GEMINI_RPM,
+    GEMINI_RPD,
+    GEMINI_ESPERA_MAXIMA_SEGUNDOS,
+    GEMINI_MAX_TENTATIVAS,
+    GEMINI_RETRY_BASE_SEGUNDOS,
+    GEMINI_RETRY_MAXIMO_SEGUNDOS,
+    GEMINI_DISJUNTOR_FALHAS,
+    GEMINI_DISJUNTOR_ABERTO_SEGUNDOS,
+    GEMINI_CACHE_CONTEXTO,
+    GEMINI_CACHE_CONTEXTO_TTL_SEGUNDOS,
+    GEMINI_CACHE_CONTEXTO_RENOVAR_SEGUNDOS,
+    METRICAS_HABILITADAS,
+)
+from app.services.contexto_servico import CacheContexto
+from app.services.metricas_servico import incrementar, observar
+from app.services.pool_chaves_servico import ChaveGemini, PoolChavesGemini
+from app.services.resiliencia_servico import (
+    Disjuntor,
+    calcular_espera_backoff,
+    eh_erro_api_gemini,
+    eh_erro_cliente_gemini,
+    eh_erro_transitorio,
+)
+
+if TYPE_CHECKING:
+    from google.genai import types as genai_types
+
+logger = logging.getLogger(__name__)
+
+# Pool de API keys (uma ou mais chaves, cada uma com seu cliente)
+pool_chaves = PoolChavesGemini(CHAVES_API_GEMINI, GEMINI_CHAVE_ESPERA_SEGUNDOS, rpm=GEMINI_RPM, rpd=GEMINI_RPD)
+
+# Circuit breaker compartilhado por todas as chamadas ao Gemini
+disjuntor = Disjuntor(GEMINI_DISJUNTOR_FALHAS, GEMINI_DISJUNTOR_ABERTO_SEGUNDOS)
+
+# Instruções fixas dos prompts registradas como cached content (por chave)
+cache_contexto = CacheContexto(
+    GEMINI_CACHE_CONTEXTO, GEMINI_CACHE_CONTEXTO_TTL_SEGUNDOS, GEMINI_CACHE_CONTEXTO_RENOVAR_SEGUNDOS
+)
+
+# Contadores das novas tentativas
+_contadores_retry = {"retentativas": 0, "desistencias": 0, "rejeitadas_disjuntor": 0}
+
+# Um semáforo por event loop (asyncio.Semaphore fica preso ao loop em que foi usado)
+_semaforos: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+# Tempo de espera sugerido pela API no erro 429 (RetryInfo), ex.: 'retryDelay': '37s'
+_PADRAO_RETRY_DELAY = re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+def obter_cliente_gemini():
+    """
+    Obtém o cliente Gemini da próxima chave disponível do pool
+    
+    Usado por quem precisa do cliente direto (ex.: /teste-gemini). As chamadas de
+    classificação e resposta devem usar gerar_conteudo/gerar_conteudo_async, que fazem
+    a rotação de chaves.
+    
+    Raises:
+        HTTPException: 429 se todas as chaves estiverem em cooldown, 503 se nenhuma chave
+            estiver configurada, 500 se o cliente não puder ser criado
+    """
+    _verificar_chaves()
+    chave = pool_chaves.escolher()
+    if chave is None:
+        raise erro_quota_excedida("Todas as API keys do Gemini estão em espera por falta de cota")
+    cliente = _obter_cliente(chave)
+    # O uso direto do cliente não passa pela contabilidade do pool
+    pool_chaves.liberar(chave)
+    return cliente
+
+
+def _obter_cliente(chave: ChaveGemini):
+    """Obtém (ou cria) o cliente da chave, convertendo falhas em HTTPException 500"""
+    try:
+        return pool_chaves.obter_cliente(chave)
+    except Exception as e:
+        pool_chaves.registrar_erro(chave)
+        logger.error("❌ Erro ao inicializar cliente Gemini (%s): %s - %s", chave.identificador, type(e).__name__, e)
+        import traceback
+        logger.error("Traceback: %s", traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao inicializar cliente Gemini: {str(e)}"
+        )
+
+
+def obter_semaforo() -> asyncio.Semaphore:
+    """Obtém o semáforo de concorrência do event loop atual (cria se necessário)"""
+    loop = asyncio.get_running_loop()
+    semaforo = _semaforos.get(loop)
+    if semaforo is None:
+        semaforo = asyncio.Semaphore(max(1, GEMINI_MAX_CONCORRENCIA))
+        _semaforos[loop] = semaforo
+    return semaforo
+
+
+def gerar_conteudo(
+    prompt: str,
+    config: Optional["genai_types.GenerateContentConfig"] = None,
+    instrucao: Optional[str] = None,
+):
+    """
+    Chama generate_content de forma síncrona (bloqueia a thread atual)
+    
+    Args:
+        prompt: Parte variável do prompt (o email)
+        config: Configuração opcional (ex.: response_mime_type)
+        instrucao: Parte fixa do prompt (system_instruction ou cached content)
+    
+    Returns:
+        Resposta do Gemini (GenerateContentResponse)
+    
+    Raises:
+        HTTPException: 429 se todas as chaves do pool estiverem sem cota, 503 se o disjuntor
+            estiver aberto ou se nenhuma chave estiver configurada
+    """
+    _verificar_chaves()
+    tentativa = 0
+    while True:
+        tentativa += 1
+        _verificar_disjuntor()
+        try:
+            resposta = _chamar_com_rotacao(prompt, config, instrucao)
+        except Exception as e:
+            time.sleep(_espera_para_nova_tentativa(e, tentativa))
+            continue
+        except BaseException:
+            # Interrompida sem resultado: não diz nada sobre o Gemini, mas devolve a vaga de teste
+            disjuntor.liberar_teste()
+            raise
+        disjuntor.registrar_sucesso()
+        return resposta
+
+
+async def gerar_conteudo_async(
+    prompt: str,
+    config: Optional["genai_types.GenerateContentConfig"] = None,
+    instrucao: Optional[str] = None,
+):
+    """
+    Chama generate_content usando o cliente assíncrono (não bloqueia o event loop)
+    
+    A quantidade de chamadas simultâneas é limitada por GEMINI_MAX_CONCORRENCIA
+    (a espera entre tentativas não ocupa vaga do semáforo).
+    
+    Args:
+        prompt: Parte variável do prompt (o email)
+        config: Configuração opcional (ex.: response_mime_type)
+        instrucao: Parte fixa do prompt (system_instruction ou cached content)
+    
+    Returns:
+        Resposta do Gemini (GenerateContentResponse)
+    
+    Raises:
+        HTTPException: 429 se todas as chaves do pool estiverem sem cota, 503 se o disjuntor
+            estiver aberto ou se nenhuma chave estiver configurada
+    """
+    _verificar_chaves()
+    tentativa = 0
+    while True:
+        tentativa += 1
+        async with obter_semaforo():
+            # Verificado depois de conseguir a vaga: quem estava na fila também falha rápido
+            _verificar_disjuntor()
+            try:
+                resposta = await _chamar_com_rotacao_async(prompt, config, instrucao)
+            except Exception as e:
+                espera = _espera_para_nova_tentativa(e, tentativa)
+            except BaseException:
+                # Cancelada (cliente desconectou, resposta especulativa descartada): devolve a vaga de teste
+                disjuntor.liberar_teste()
+                raise
+            else:
+                disjuntor.registrar_sucesso()
+                return resposta
+        await asyncio.sleep(espera)
+
+
+async def gerar_conteudo_stream_async(
+    prompt: str,
+    config: Optional["genai_types.GenerateContentConfig"] = None,
+    instrucao: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Chama generate_content_stream e devolve o texto gerado em partes, conforme chega
+    
+    Rotação de chaves, novas tentativas e disjuntor funcionam como em gerar_conteudo_async,
+    mas só até o primeiro pedaço chegar: um erro depois disso é repassado a quem chamou
+    (parte do texto já foi entregue). A vaga do semáforo fica ocupada até o fim do stream.
+    
+    Args:
+        prompt: Parte variável do prompt (o email)
+        config: Configuração opcional
+        instrucao: Parte fixa do prompt (system_instruction ou cached content)
+    
+    Yields:
+        Trechos de texto da resposta (na ordem em que chegam)
+    
+    Raises:
+        HTTPException: 429 se todas as chaves do pool estiverem sem cota, 503 se o disjuntor
+            estiver aberto ou se nenhuma chave estiver configurada
+    """
+    _verificar_chaves()
+    tentativa = 0
+    while True:
+        tentativa += 1
+        async with obter_semaforo():
+            _verificar_disjuntor()
+            try:
+                chave, fluxo, pedaco, inicio, enviados = await _abrir_stream_com_rotacao_async(prompt, config, instrucao)
+            except Exception as e:
+                espera = _espera_para_nova_tentativa(e, tentativa)
+            except BaseException:
+                disjuntor.liberar_teste()
+                raise
+            else:
+                disjuntor.registrar_sucesso()
+                ultimo = pedaco
+                try:
+                    while pedaco is not None:
+                        if pedaco.text:
+                            yield pedaco.text
+                        ultimo = pedaco
+                        pedaco = await anext(fluxo, None)
+                except Exception as e:
+                    _registrar_metricas_chamada(inicio, enviados, erro=e)
+                    pool_chaves.registrar_erro(chave)
+                    if eh_erro_transitorio(e):
+                        disjuntor.registrar_falha()
+                    logger.error("❌ Stream do Gemini interrompido: %s - %s", type(e).__name__, e)
+                    raise
+                except BaseException:
+                    # Quem consumia o stream desistiu (cliente desconectou, tarefa cancelada)
+                    pool_chaves.liberar(chave)
+                    await fluxo.aclose()
+                    raise
+                _registrar_metricas_chamada(inicio, enviados, resposta=ultimo)
+                pool_chaves.registrar_sucesso(chave)
+                return
+        await asyncio.sleep(espera)
+
+
+def _chamar_com_rotacao(
+    prompt: str, config: Optional["genai_types.GenerateContentConfig"], instrucao: Optional[str] = None
+):
+    """Uma tentativa de chamada, passando pelas chaves do pool até uma ter cota"""
+    tentadas: List[ChaveGemini] = []
+    contexto_descartado = False
+    while True:
+        chave = _proxima_chave(tentadas)
+        espera = _reservar_limite(chave, tentadas)
+        if espera is None:
+            continue
+        cliente = _obter_cliente(chave)
+        try:
+            if espera:
+                time.sleep(espera)
+            config_chamada = cache_contexto.montar_config(cliente, chave.identificador, instrucao, config)
+        except BaseException:
+            pool_chaves.liberar(chave)
+            raise
+        enviados = _caracteres_enviados(prompt, config_chamada)
+        inicio = time.perf_counter()
+        try:
+            logger.debug("Enviando requisição para modelo: %s (chave %s)", MODELO_GEMINI, chave.identificador)
+            resposta = cliente.models.generate_content(model=MODELO_GEMINI, contents=prompt, config=config_chamada)
+        except Exception as e:
+            _registrar_metricas_chamada(inicio, enviados, erro=e)
+            if not contexto_descartado and _descartar_contexto_rejeitado(chave, instrucao, config_chamada, e):
+                contexto_descartado = True
+                continue
+            _registrar_falha(chave, e, tentadas)
+            continue
+        except BaseException:
+            # Cancelada durante a chamada (cliente desconectou, tarefa descartada)
+            pool_chaves.liberar(chave)
+            raise
+        _registrar_metricas_chamada(inicio, enviados, resposta=resposta)
+        pool_chaves.registrar_sucesso(chave)
+        return resposta
+
+
+async def _chamar_com_rotacao_async(
+    prompt: str, config: Optional["genai_types.GenerateContentConfig"], instrucao: Optional[str] = None
+):
+    """Versão assíncrona de _chamar_com_rotacao"""
+    tentadas: List[ChaveGemini] = []
+    contexto_descartado = False
+    while True:
+        chave = _proxima_chave(tentadas)
+        espera = _reservar_limite(chave, tentadas)
+        if espera is None:
+            continue
+        cliente = _obter_cliente(chave)
+        try:
+            if espera:
+                await asyncio.sleep(espera)
+            config_chamada = await cache_contexto.montar_config_async(cliente, chave.identificador, instrucao, config)
+        except BaseException:
+            # Cancelada antes de chamar o Gemini: a chave não chegou a ser usada
+            pool_chaves.liberar(chave)
+            raise
+        enviados = _caracteres_enviados(prompt, config_chamada)
+        inicio = time.perf_counter()
+        try:
+            logger.debug("Enviando requisição assíncrona para modelo: %s (chave %s)", MODELO_GEMINI, chave.identificador)
+            resposta = await cliente.aio.models.generate_content(model=MODELO_GEMINI, contents=prompt, config=config_chamada)
+        except Exception as e:
+            _registrar_metricas_chamada(inicio, enviados, erro=e)
+            if not contexto_descartado and _descartar_contexto_rejeitado(chave, instrucao, config_chamada, e):
+                contexto_descartado = True
+                continue
+            _registrar_falha(chave, e, tentadas)
+            continue
+        except BaseException:
+            # Cancelada durante a chamada (cliente desconectou, tarefa descartada)
+            pool_chaves.liberar(chave)
+            raise
+        _registrar_metricas_chamada(inicio, enviados, resposta=resposta)
+        pool_chaves.registrar_sucesso(chave)
+        return resposta
+
+
+async def _abrir_stream_com_rotacao_async(
+    prompt: str, config: Optional["genai_types.GenerateContentConfig"], instrucao: Optional[str] = None
+):
+    """
+    Abre o stream passando pelas chaves do pool até uma ter cota
+    
+    O SDK só faz a requisição ao ler o primeiro pedaço, então ele é lido aqui (um 429
+    nesse ponto ainda pode ser resolvido com outra chave).
+    
+    Returns:
+        Tupla (chave, stream, primeiro pedaço ou None, instante do início, caracteres enviados)
+    """
+    tentadas: List[ChaveGemini] = []
+    contexto_descartado = False
+    while True:
+        chave = _proxima_chave(tentadas)
+        espera = _reservar_limite(chave, tentadas)
+        if espera is None:
+            continue
+        cliente = _obter_cliente(chave)
+        try:
+            if espera:
+                await asyncio.sleep(espera)
+            config_chamada = await cache_contexto.montar_config_async(cliente, chave.identificador, instrucao, config)
+        except BaseException:
+            # Cancelada antes de chamar o Gemini: a chave não chegou a ser usada
+            pool_chaves.liberar(chave)
+            raise
+        enviados = _caracteres_enviados(prompt, config_chamada)
+        inicio = time.perf_counter()
+        try:
+            logger.debug("Abrindo stream para modelo: %s (chave %s)", MODELO_GEMINI, chave.identificador)
+            fluxo = await cliente.aio.models.generate_content_stream(model=MODELO_GEMINI, contents=prompt, config=config_chamada)
+            primeiro = await anext(fluxo, None)
+        except Exception as e:
+            _registrar_metricas_chamada(inicio, enviados, erro=e)
+            if not contexto_descartado and _descartar_contexto_rejeitado(chave, instrucao, config_chamada, e):
+                contexto_descartado = True
+                continue
+            _registrar_falha(chave, e, tentadas)
+            continue
+        except BaseException:
+            # Cancelada durante a chamada (cliente desconectou, tarefa descartada)
+            pool_chaves.liberar(chave)
+            raise
+        return chave, fluxo, primeiro, inicio, enviados
+
+
+def _caracteres_enviados(prompt: str, config) -> int:
+    """Caracteres enviados na chamada: o prompt e a instrução, se não estiver em cached content"""
+    instrucao = getattr(config, "system_instruction", None)
+    return len(prompt) + (len(instrucao) if isinstance(instrucao, str) else 0)
+
+
+def _descartar_contexto_rejeitado(chave: ChaveGemini, instrucao: Optional[str], config, erro: Exception) -> bool:
+    """
+    Trata a falha de uma chamada feita com cached content (ex.: o registro expirou ou foi
+    apagado no Gemini)
+    
+    Returns:
+        True se o registro foi descartado e a chamada deve ser repetida (uma vez por
+        chamada: o próximo envio registra a instrução de novo ou usa system_instruction)
+    """
+    if not (
+        instrucao
+        and getattr(config, "cached_content", None)
+        and eh_erro_cliente_gemini(erro)
+        and erro.code in (400, 403, 404)
+    ):
+        return False
+    cache_contexto.invalidar(chave.identificador, instrucao)
+    pool_chaves.liberar(chave)
+    return True
+
+
+def _registrar_metricas_chamada(inicio: float, caracteres_enviados: int, resposta=None, erro: Optional[Exception] = None):
+    """Registra duração, resultado, caracteres enviados e tokens (usage_metadata) de uma chamada"""
+    if not METRICAS_HABILITADAS:
+        return
+    observar("gemini_duracao_segundos", time.perf_counter() - inicio, modelo=MODELO_GEMINI)
+    incrementar("gemini_caracteres_enviados_total", caracteres_enviados, modelo=MODELO_GEMINI)
+    if erro is not None:
+        resultado = "quota" if getattr(erro, "code", None) == 429 else "erro"
+        incrementar("gemini_chamadas_total", modelo=MODELO_GEMINI, resultado=resultado)
+        return
+    incrementar("gemini_chamadas_total", modelo=MODELO_GEMINI, resultado="sucesso")
+    uso = getattr(resposta, "usage_metadata", None)
+    if uso is not None:
+        # prompt_token_count inclui os tokens vindos do cache de contexto (cached_content_token_count)
+        for tipo, campo in (
+            ("prompt", "prompt_token_count"),
+            ("cache", "cached_content_token_count"),
+            ("resposta", "candidates_token_count"),
+        ):
+            tokens = getattr(uso, campo, None)
+            if tokens:
+                incrementar("gemini_tokens_total", tokens, modelo=MODELO_GEMINI, tipo=tipo)
+
+
+def _proxima_chave(tentadas: List[ChaveGemini]) -> ChaveGemini:
+    """Escolhe a próxima chave ainda não tentada; 429 se não houver nenhuma disponível"""
+    chave = pool_chaves.escolher(excluir=tentadas)
+    if chave is None:
+        espera = pool_chaves.segundos_ate_liberar()
+        logger.error("⚠️ Todas as %s API keys do Gemini estão sem cota (próxima libera em %.0fs)", len(pool_chaves), espera)
+        raise erro_quota_excedida(
+            f"Todas as {len(pool_chaves)} API keys configuradas estão sem cota",
+            tentar_novamente_em=espera,
+        )
+    return chave
+
+
+def _reservar_limite(chave: ChaveGemini, tentadas: List[ChaveGemini]) -> Optional[float]:
+    """
+    Reserva um token no limitador da chave
+    
+    Returns:
+        Segundos a aguardar antes da chamada, ou None se a espera passaria de
+        GEMINI_ESPERA_MAXIMA_SEGUNDOS (a chave é adiada e outra deve ser escolhida)
+    """
+    espera = chave.limitador.reservar(GEMINI_ESPERA_MAXIMA_SEGUNDOS)
+    if espera is None:
+        pool_chaves.adiar(chave, chave.limitador.espera_estimada())
+        tentadas.append(chave)
+    elif espera:
+        logger.debug("⏳ Aguardando %.2fs pelo limite de taxa da chave %s", espera, chave.identificador)
+    return espera
+
+
+def _registrar_falha(chave: ChaveGemini, erro: Exception, tentadas: List[ChaveGemini]):
+    """
+    Registra a falha da chamada no pool
+    
+    Se for erro de cota, a chave entra em cooldown e a função retorna para a chamada ser
+    repetida com outra chave. Qualquer outro erro é relançado para quem chamou.
+    """
+    if eh_erro_cliente_gemini(erro) and (erro.code == 429 or eh_erro_quota(str(erro))):
+        pool_chaves.registrar_quota(chave, extrair_espera_sugerida(erro))
+        tentadas.append(chave)
+        return
+    pool_chaves.registrar_erro(chave)
+    raise erro
+
+
+def _verificar_chaves():
+    """Falha com 503 se nenhuma API key foi configurada (só os tiers locais funcionam)"""
+    if not len(pool_chaves):
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "erro": "API Gemini não configurada",
+                "mensagem": "Defina GEMINI_API_KEY (ou GOOGLE_API_KEY, ou GEMINI_API_KEYS) para usar o Gemini.",
+            },
+        )
+
+
+def _verificar_disjuntor():
+    """Falha na hora (503) se o disjuntor estiver aberto"""
+    espera = disjuntor.permitir()
+    if espera:
+        _contadores_retry["rejeitadas_disjuntor"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "erro": "API Gemini temporariamente indisponível",
+                "mensagem": "Muitas falhas seguidas ao chamar o Gemini. Tente novamente em instantes.",
+                "tentar_novamente_em_segundos": math.ceil(espera),
+            },
+            headers={"Retry-After": str(math.ceil(espera))},
+        )
+
+
+def _espera_para_nova_tentativa(erro: Exception, tentativa: int) -> float:
+    """
+    Decide se a chamada que falhou deve ser repetida
+    
+    Args:
+        erro: Exceção da tentativa
+        tentativa: Número da tentativa que falhou (1 = primeira)
+    
+    Returns:
+        Segundos de espera antes da próxima tentativa
+    
+    Raises:
+        Exception: O próprio erro, se não for temporário ou se as tentativas acabaram
+    """
+    if isinstance(erro, HTTPException) and erro.status_code == 429:
+        # Todas as chaves sem cota: o Gemini respondeu, só não há cota agora
+        disjuntor.liberar_teste()
+        espera_sugerida = pool_chaves.segundos_ate_liberar()
+    elif eh_erro_transitorio(erro):
+        disjuntor.registrar_falha()
+        espera_sugerida = extrair_espera_sugerida(erro)
+    else:
+        if eh_erro_api_gemini(erro):
+            disjuntor.registrar_sucesso()
+        else:
+            disjuntor.liberar_teste()
+        raise erro
+    
+    if tentativa >= GEMINI_MAX_TENTATIVAS or (
+        espera_sugerida is not None and espera_sugerida > GEMINI_RETRY_MAXIMO_SEGUNDOS
+    ):
+        _contadores_retry["desistencias"] += 1
+        logger.error("❌ Chamada ao Gemini falhou após %s tentativa(s): %s", tentativa, type(erro).__name__)
+        raise erro
+    
+    espera = calcular_espera_backoff(
+        tentativa, GEMINI_RETRY_BASE_SEGUNDOS, GEMINI_RETRY_MAXIMO_SEGUNDOS, espera_sugerida
+    )
+    _contadores_retry["retentativas"] += 1
+    logger.warning(
+        "🔁 Tentativa %d/%d ao Gemini falhou (%s), tentando de novo em %.1fs",
+        tentativa, GEMINI_MAX_TENTATIVAS, type(erro).__name__, espera,
+    )
+    return espera
+
+
+def estatisticas_gemini() -> dict:
+    """Estado do pool de chaves, do disjuntor, do cache de contexto e das novas tentativas"""
+    return {
+        **pool_chaves.estatisticas(),
+        "disjuntor": disjuntor.estatisticas(),
+        "cache_contexto": cache_contexto.estatisticas(),
+        **_contadores_retry,
+    }
+
+
+def extrair_espera_sugerida(erro: Exception) -> Optional[float]:
+    """Extrai o retryDelay (em segundos) que a API envia junto com o 429, se houver"""
+    encontrado = _PADRAO_RETRY_DELAY.search(str(erro))
+    return float(encontrado.group(1)) if encontrado else None
+
+
+def eh_erro_quota(error_str: str) -> bool:
+    """Verifica se a mensagem de erro do Gemini indica quota excedida (429)"""
+    return "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower()
+
+
+def erro_quota_excedida(error_str: str, tentar_novamente_em: Optional[float] = None) -> HTTPException:
+    """
+    Monta a HTTPException 429 padrão para quota do Gemini excedida
+    
+    Args:
+        error_str: Mensagem de erro original do Gemini
+        tentar_novamente_em: Segundos até alguma chave sair do cooldown (vira Retry-After)
+    
+    Returns:
+        HTTPException com status 429 e instruções para o usuário
+    """
+    detalhe = {
+        "erro": "Quota da API Gemini excedida",
+        "mensagem": "Todas as API keys configuradas atingiram o limite (20 requisições/dia por chave no plano gratuito).",
+        "solucoes": [
+            "Aguardar até o próximo dia para o reset da cota",
+            "Adicionar mais API keys do Gemini em GEMINI_API_KEYS",
+            "Fazer upgrade do plano na Google Cloud Console"
+        ],
+        "link_documentacao": "https://ai.google.dev/gemini-api/docs/rate-limits",
+        "erro_original": error_str[:500]
+    }
+    headers = None
+    if tentar_novamente_em:
+        detalhe["tentar_novamente_em_segundos"] = math.ceil(tentar_novamente_em)
+        headers = {"Retry-After": str(math.ceil(tentar_novamente_em))}
+    return HTTPException(status_code=429, detail=detalhe, headers=headers)
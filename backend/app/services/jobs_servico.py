@@ -0,0 +1,452 @@
+"""
+Serviço de jobs de classificação em lote (envia agora, busca os resultados depois)
+
+- Um job é uma lista de emails (textos ou arquivos já extraídos) gravada em SQLite
+- Workers assíncronos (JOBS_WORKERS) rodam no event loop da API e pegam os itens
+  pendentes na ordem de chegada; como usam processar_email_async, dividem o pool de
+  chaves, o limite de taxa e o disjuntor com o resto da API
+- Itens que recebem 429/503 voltam para a fila depois do Retry-After (até
+  JOBS_MAX_TENTATIVAS vezes); os demais erros ficam registrados no item
+- Itens que estavam em processamento quando a API parou voltam a ficar pendentes na
+  inicialização, então os jobs continuam de onde pararam
+- O acesso ao SQLite a partir do event loop (envio de jobs e workers) roda em threads
+  (asyncio.to_thread), para um job grande não travar as outras requisições
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple, Union
+from fastapi import HTTPException
+from app.config.configuracao import JOBS_SQLITE_CAMINHO, JOBS_WORKERS, JOBS_MAX_TENTATIVAS
+from app.models.schemas import ItemResultadoJob, RespostaClassificacao, StatusJob
+from app.services.lote_servico import ErroItemLote
+from app.services.processamento_servico import processar_email_async
+
+logger = logging.getLogger(__name__)
+
+# Status de um job
+JOB_PENDENTE = "pendente"
+JOB_PROCESSANDO = "processando"
+JOB_CONCLUIDO = "concluido"
+
+# Status de um item
+ITEM_PENDENTE = "pendente"
+ITEM_PROCESSANDO = "processando"
+ITEM_CONCLUIDO = "concluido"
+ITEM_ERRO = "erro"
+
+# Espera máxima antes de devolver à fila um item que recebeu 429/503
+ESPERA_MAXIMA_REENVIO_SEGUNDOS = 300.0
+
+# Espera máxima de um worker depois de erros seguidos na fila (ex.: banco travado)
+ESPERA_MAXIMA_WORKER_SEGUNDOS = 30
+
+# Item enviado para um job: texto do email ou erro já conhecido (ex.: arquivo inválido),
+# com o nome do arquivo de origem quando houver
+ItemEnvio = Tuple[Union[str, ErroItemLote], Optional[str]]
+
+
+class RepositorioJobs:
+    """Jobs e itens gravados em SQLite (uma conexão protegida por lock)"""
+    
+    def __init__(self, caminho_sqlite: str):
+        self.caminho_sqlite = caminho_sqlite
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho_sqlite, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                processados INTEGER NOT NULL DEFAULT 0,
+                sucesso INTEGER NOT NULL DEFAULT 0,
+                falhas INTEGER NOT NULL DEFAULT 0,
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL,
+                concluido_em REAL
+            );
+            CREATE TABLE IF NOT EXISTS itens_job (
+                job_id TEXT NOT NULL,
+                indice INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                origem TEXT,
+                texto TEXT,
+                resultado TEXT,
+                erro TEXT,
+                status_code INTEGER,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                disponivel_em REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (job_id, indice)
+            );
+            CREATE INDEX IF NOT EXISTS itens_job_status ON itens_job (status, disponivel_em);
+            """
+        )
+        self._conexao.commit()
+    
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+    
+    def criar_job(self, itens: Sequence[ItemEnvio]) -> str:
+        """Grava o job e seus itens; itens com erro já entram como processados"""
+        job_id = uuid.uuid4().hex
+        agora = time.time()
+        linhas = []
+        falhas = 0
+        for indice, (conteudo, origem) in enumerate(itens):
+            if isinstance(conteudo, ErroItemLote):
+                falhas += 1
+                linhas.append((job_id, indice, ITEM_ERRO, origem, None, str(conteudo), conteudo.status_code))
+            else:
+                linhas.append((job_id, indice, ITEM_PENDENTE, origem, conteudo, None, None))
+        status = JOB_CONCLUIDO if falhas == len(linhas) else JOB_PENDENTE
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "INSERT INTO jobs (id, status, total, processados, falhas, criado_em, atualizado_em, concluido_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, len(linhas), falhas, falhas, agora, agora, agora if status == JOB_CONCLUIDO else None),
+            )
+            self._conexao.executemany(
+                "INSERT INTO itens_job (job_id, indice, status, origem, texto, erro, status_code) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+        return job_id
+    
+    def reservar_proximo(self) -> Optional[Tuple[str, int, str, int]]:
+        """
+        Marca o próximo item pendente (mais antigo primeiro) como em processamento
+        
+        A consulta e a marcação rodam em uma transação BEGIN IMMEDIATE (trava de escrita
+        desde o início), então dois processos usando o mesmo banco não pegam o mesmo item.
+        
+        Returns:
+            (job_id, indice, texto, tentativas) ou None se não houver item disponível agora
+        """
+        agora = time.time()
+        with self._lock, self._conexao:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            linha = self._conexao.execute(
+                "SELECT job_id, indice, texto, tentativas FROM itens_job "
+                "WHERE status = ? AND disponivel_em <= ? ORDER BY rowid LIMIT 1",
+                (ITEM_PENDENTE, agora),
+            ).fetchone()
+            if linha is None:
+                return None
+            job_id, indice = linha[0], linha[1]
+            self._conexao.execute(
+                "UPDATE itens_job SET status = ? WHERE job_id = ? AND indice = ?",
+                (ITEM_PROCESSANDO, job_id, indice),
+            )
+            self._conexao.execute(
+                "UPDATE jobs SET status = ?, atualizado_em = ? WHERE id = ? AND status = ?",
+                (JOB_PROCESSANDO, agora, job_id, JOB_PENDENTE),
+            )
+            return linha
+    
+    def segundos_ate_proximo(self) -> Optional[float]:
+        """Tempo até algum item pendente ficar disponível (None se não houver pendentes)"""
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT MIN(disponivel_em) FROM itens_job WHERE status = ?", (ITEM_PENDENTE,)
+            ).fetchone()
+        if linha is None or linha[0] is None:
+            return None
+        return max(0.0, linha[0] - time.time())
+    
+    def concluir_item(
+        self,
+        job_id: str,
+        indice: int,
+        resultado: Optional[dict] = None,
+        erro: Optional[str] = None,
+        status_code: Optional[int] = None,
+    ):
+        """Grava o resultado (ou erro) do item e atualiza o progresso do job"""
+        agora = time.time()
+        sucesso = erro is None
+        with self._lock, self._conexao:
+            atualizados = self._conexao.execute(
+                "UPDATE itens_job SET status = ?, resultado = ?, erro = ?, status_code = ? "
+                "WHERE job_id = ? AND indice = ? AND status = ?",
+                (
+                    ITEM_CONCLUIDO if sucesso else ITEM_ERRO,
+                    json.dumps(resultado, ensure_ascii=False) if resultado is not None else None,
+                    erro,
+                    status_code,
+                    job_id,
+                    indice,
+                    ITEM_PROCESSANDO,
+                ),
+            ).rowcount
+            if not atualizados:
+                # Job removido enquanto o item era processado
+                return
+            self._conexao.execute(
+                "UPDATE jobs SET processados = processados + 1, sucesso = sucesso + ?, falhas = falhas + ?, "
+                "atualizado_em = ?, "
+                "status = CASE WHEN processados + 1 >= total THEN ? ELSE status END, "
+                "concluido_em = CASE WHEN processados + 1 >= total THEN ? ELSE concluido_em END "
+                "WHERE id = ?",
+                (int(sucesso), int(not sucesso), agora, JOB_CONCLUIDO, agora, job_id),
+            )
+    
+    def devolver_item(self, job_id: str, indice: int, espera_segundos: float = 0.0, contar_tentativa: bool = True):
+        """Devolve o item para a fila (disponível de novo após espera_segundos)"""
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "UPDATE itens_job SET status = ?, tentativas = tentativas + ?, disponivel_em = ? "
+                "WHERE job_id = ? AND indice = ? AND status = ?",
+                (ITEM_PENDENTE, int(contar_tentativa), time.time() + espera_segundos, job_id, indice, ITEM_PROCESSANDO),
+            )
+    
+    def recuperar_interrompidos(self) -> int:
+        """Itens que estavam em processamento quando a API parou voltam a ficar pendentes"""
+        with self._lock, self._conexao:
+            return self._conexao.execute(
+                "UPDATE itens_job SET status = ? WHERE status = ?", (ITEM_PENDENTE, ITEM_PROCESSANDO)
+            ).rowcount
+    
+    def obter_job(self, job_id: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT id, status, total, processados, sucesso, falhas, criado_em, atualizado_em, concluido_em "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+    
+    def listar_itens(self, job_id: str, offset: int, limite: int) -> List[tuple]:
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT indice, status, origem, resultado, erro, status_code FROM itens_job "
+                "WHERE job_id = ? AND indice >= ? ORDER BY indice LIMIT ?",
+                (job_id, offset, limite),
+            ).fetchall()
+    
+    def remover_job(self, job_id: str) -> bool:
+        with self._lock, self._conexao:
+            self._conexao.execute("DELETE FROM itens_job WHERE job_id = ?", (job_id,))
+            return self._conexao.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+    
+    def contar_pendentes(self) -> int:
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT COUNT(*) FROM itens_job WHERE status IN (?, ?)", (ITEM_PENDENTE, ITEM_PROCESSANDO)
+            ).fetchone()[0]
+
+
+class FilaJobs:
+    """
+    Fila de jobs com workers assíncronos
+    
+    Args:
+        caminho_sqlite: Banco SQLite dos jobs (vazio desativa a fila)
+        workers: Quantidade de workers
+        max_tentativas: Vezes que um item volta para a fila após 429/503
+        processar: Função que processa um email (padrão: processar_email_async)
+    """
+    
+    def __init__(
+        self,
+        caminho_sqlite: str,
+        workers: int = 4,
+        max_tentativas: int = 3,
+        processar: Callable[[str], Awaitable[RespostaClassificacao]] = processar_email_async,
+    ):
+        self.caminho_sqlite = caminho_sqlite
+        self.workers = max(1, workers)
+        self.max_tentativas = max(1, max_tentativas)
+        self.processar = processar
+        self.repositorio: Optional[RepositorioJobs] = None
+        self._tarefas: List[asyncio.Task] = []
+        self._novos_itens: Optional[asyncio.Event] = None
+    
+    @property
+    def habilitada(self) -> bool:
+        return bool(self.caminho_sqlite)
+    
+    async def iniciar(self):
+        """Abre o banco, recupera itens interrompidos e inicia os workers"""
+        if not self.habilitada or self._tarefas:
+            return
+        self.repositorio = await asyncio.to_thread(RepositorioJobs, self.caminho_sqlite)
+        recuperados = await asyncio.to_thread(self.repositorio.recuperar_interrompidos)
+        self._novos_itens = asyncio.Event()
+        self._tarefas = [asyncio.create_task(self._worker(numero)) for numero in range(1, self.workers + 1)]
+        logger.info(
+            "📮 Fila de jobs iniciada: %s (%d workers, %d itens pendentes, %d retomados)",
+            self.caminho_sqlite, self.workers, await asyncio.to_thread(self.repositorio.contar_pendentes), recuperados,
+        )
+    
+    async def encerrar(self):
+        """Para os workers; itens em processamento voltam para a fila"""
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        if self.repositorio is not None:
+            self.repositorio.fechar()
+            self.repositorio = None
+    
+    def _obter_repositorio(self) -> RepositorioJobs:
+        if self.repositorio is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Fila de jobs desativada (configure JOBS_SQLITE_CAMINHO)"
+                if not self.habilitada else "Fila de jobs ainda não foi iniciada",
+            )
+        return self.repositorio
+    
+    async def submeter(self, itens: Sequence[ItemEnvio]) -> StatusJob:
+        """
+        Cria um job (gravado em uma thread) e acorda os workers
+        
+        Args:
+            itens: Lista de (texto ou ErroItemLote, nome do arquivo de origem ou None)
+        
+        Returns:
+            StatusJob do job criado
+        """
+        repositorio = self._obter_repositorio()
+        job_id = await asyncio.to_thread(repositorio.criar_job, itens)
+        self._novos_itens.set()
+        logger.info("📮 Job %s criado com %d emails", job_id, len(itens))
+        return await asyncio.to_thread(self.status, job_id)
+    
+    def status(self, job_id: str) -> Optional[StatusJob]:
+        """Progresso do job (None se não existir); bloqueante, como resultados e remover"""
+        linha = self._obter_repositorio().obter_job(job_id)
+        if linha is None:
+            return None
+        job_id, status, total, processados, sucesso, falhas, criado_em, atualizado_em, concluido_em = linha
+        return StatusJob(
+            job_id=job_id,
+            status=status,
+            total=total,
+            processados=processados,
+            sucesso=sucesso,
+            falhas=falhas,
+            progresso=round(processados / total, 4) if total else 1.0,
+            criado_em=_data(criado_em),
+            atualizado_em=_data(atualizado_em),
+            concluido_em=_data(concluido_em) if concluido_em else None,
+        )
+    
+    def resultados(self, job_id: str, offset: int, limite: int) -> List[ItemResultadoJob]:
+        """Itens do job a partir da posição `offset` (no máximo `limite` itens)"""
+        itens = []
+        for indice, status, origem, resultado, erro, status_code in self._obter_repositorio().listar_itens(
+            job_id, offset, limite
+        ):
+            itens.append(ItemResultadoJob(
+                indice=indice,
+                status=status,
+                origem=origem,
+                sucesso=status == ITEM_CONCLUIDO,
+                resultado=RespostaClassificacao.model_validate_json(resultado) if resultado else None,
+                erro=erro,
+                status_code=status_code,
+            ))
+        return itens
+    
+    def remover(self, job_id: str) -> bool:
+        """Remove o job e seus itens (itens pendentes não são mais processados)"""
+        removido = self._obter_repositorio().remover_job(job_id)
+        if removido:
+            logger.info("🗑️ Job %s removido", job_id)
+        return removido
+    
+    async def _worker(self, numero: int):
+        """Pega itens pendentes e processa um por vez até ser cancelado"""
+        falhas_seguidas = 0
+        while True:
+            try:
+                await self._executar_rodada(numero)
+                falhas_seguidas = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Ex.: sqlite3.OperationalError (banco travado): o worker espera e continua
+                falhas_seguidas += 1
+                espera = min(ESPERA_MAXIMA_WORKER_SEGUNDOS, 2 ** (falhas_seguidas - 1))
+                logger.error(
+                    "❌ Worker %d: erro na fila de jobs (%s: %s), tentando de novo em %ss",
+                    numero, type(e).__name__, e, espera,
+                )
+                await asyncio.sleep(espera)
+    
+    async def _executar_rodada(self, numero: int):
+        """Processa o próximo item disponível ou espera até haver um"""
+        # Limpa antes de consultar: um job criado depois da consulta acorda o worker
+        self._novos_itens.clear()
+        item = await asyncio.to_thread(self.repositorio.reservar_proximo)
+        if item is None:
+            espera = await asyncio.to_thread(self.repositorio.segundos_ate_proximo)
+            try:
+                await asyncio.wait_for(self._novos_itens.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+            return
+        try:
+            await self._processar_item(numero, *item)
+        except Exception:
+            # O resultado não foi gravado: devolve o item para não ficar preso em processamento
+            try:
+                await asyncio.to_thread(self.repositorio.devolver_item, item[0], item[1], contar_tentativa=False)
+            except Exception as e:
+                logger.error("❌ Worker %d: não foi possível devolver o item %s/%d: %s", numero, item[0], item[1], e)
+            raise
+    
+    async def _processar_item(self, numero: int, job_id: str, indice: int, texto: str, tentativas: int):
+        try:
+            resultado = await self.processar(texto)
+        except asyncio.CancelledError:
+            # Síncrono: no encerramento o item precisa voltar antes de o banco ser fechado
+            self.repositorio.devolver_item(job_id, indice, contar_tentativa=False)
+            raise
+        except HTTPException as he:
+            if he.status_code in (429, 503) and tentativas + 1 < self.max_tentativas:
+                espera = segundos_retry_after(he)
+                logger.warning(
+                    "⏳ Worker %d: item %s/%d recebeu %s, volta para a fila em %.0fs",
+                    numero, job_id, indice, he.status_code, espera,
+                )
+                await asyncio.to_thread(self.repositorio.devolver_item, job_id, indice, espera)
+                return
+            detalhe = he.detail if isinstance(he.detail, str) else json.dumps(he.detail, ensure_ascii=False)
+            await asyncio.to_thread(
+                self.repositorio.concluir_item, job_id, indice, erro=detalhe, status_code=he.status_code
+            )
+            return
+        except Exception as e:
+            logger.error("❌ Worker %d: erro no item %s/%d: %s - %s", numero, job_id, indice, type(e).__name__, e)
+            await asyncio.to_thread(
+                self.repositorio.concluir_item, job_id, indice, erro=f"Erro ao processar email: {str(e)}", status_code=500
+            )
+            return
+        await asyncio.to_thread(self.repositorio.concluir_item, job_id, indice, resultado=resultado.model_dump())
+
+
+def segundos_retry_after(erro: HTTPException) -> float:
+    """Segundos indicados no Retry-After da HTTPException (limitado a ESPERA_MAXIMA_REENVIO_SEGUNDOS)"""
+    try:
+        espera = float((erro.headers or {}).get("Retry-After", 1))
+    except ValueError:
+        espera = 1.0
+    return min(max(espera, 1.0), ESPERA_MAXIMA_REENVIO_SEGUNDOS)
+
+
+def _data(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+# Fila global (iniciada no startup da API)
+fila_jobs = FilaJobs(JOBS_SQLITE_CAMINHO, JOBS_WORKERS, JOBS_MAX_TENTATIVAS)
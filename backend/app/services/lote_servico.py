@@ -0,0 +1,204 @@
+"""
+Serviço para classificação de emails em lote
+
+Recebe uma lista de emails (array JSON ou NDJSON), processa todos com concorrência
+limitada e devolve o resultado de cada item. Um erro em um item (429, JSON inválido,
+texto vazio...) não derruba o lote inteiro.
+
+Com LOTE_EMPACOTAR_PROMPTS ativo, a classificação é feita com vários emails por
+prompt (classificar_emails_empacotados_async) e só a resposta sugerida é gerada
+individualmente.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import List, Union
+from fastapi import HTTPException
+from pydantic import ValidationError
+from app.config.configuracao import LOTE_MAX_ITENS, LOTE_MAX_CONCORRENCIA, LOTE_EMPACOTAR_PROMPTS
+from app.models.schemas import (
+    RequisicaoEmailTexto,
+    ItemResultadoLote,
+    EstatisticasLote,
+    RespostaLote,
+)
+from app.services.classificador_servico import classificar_emails_empacotados_async
+from app.services.processamento_servico import (
+    classificar_sem_gemini,
+    processar_email_async,
+    responder_email_classificado_async,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tipos de conteúdo tratados como NDJSON (um JSON por linha)
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+class ErroItemLote(Exception):
+    """Erro de um item específico do lote (ex.: JSON inválido em uma linha do NDJSON)"""
+    
+    def __init__(self, mensagem: str, status_code: int = 422):
+        super().__init__(mensagem)
+        self.status_code = status_code
+
+
+def interpretar_corpo_lote(
+    corpo: bytes, content_type: str = "", max_itens: int = LOTE_MAX_ITENS
+) -> List[Union[RequisicaoEmailTexto, ErroItemLote]]:
+    """
+    Converte o corpo da requisição em uma lista de emails
+    
+    Aceita:
+    - Array JSON: [{"texto": "..."}, {"texto": "..."}]
+    - NDJSON: um objeto {"texto": "..."} por linha
+    
+    Itens inválidos viram ErroItemLote (em vez de falhar o lote inteiro).
+    
+    Args:
+        corpo: Corpo bruto da requisição
+        content_type: Header Content-Type da requisição
+        max_itens: Máximo de emails aceitos
+    
+    Returns:
+        Lista com RequisicaoEmailTexto (itens válidos) ou ErroItemLote (itens inválidos)
+    
+    Raises:
+        HTTPException: Se o corpo estiver vazio, não for um array/NDJSON ou tiver itens demais
+    """
+    try:
+        texto = corpo.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="O corpo da requisição deve estar em UTF-8")
+    
+    if not texto.strip():
+        raise HTTPException(status_code=400, detail="Lote vazio. Envie um array JSON ou NDJSON com os emails.")
+    
+    eh_ndjson = content_type.split(";")[0].strip().lower() in TIPOS_NDJSON
+    brutos: list = []
+    if not eh_ndjson:
+        try:
+            dados = json.loads(texto)
+        except json.JSONDecodeError:
+            # Não é um JSON único: tenta interpretar como NDJSON
+            eh_ndjson = True
+        else:
+            if not isinstance(dados, list):
+                raise HTTPException(
+                    status_code=400,
+                    detail='O lote deve ser um array JSON: [{"texto": "..."}, ...] ou NDJSON (um objeto por linha)'
+                )
+            brutos = dados
+    
+    if eh_ndjson:
+        for numero_linha, linha in enumerate(texto.splitlines(), start=1):
+            if not linha.strip():
+                continue
+            try:
+                brutos.append(json.loads(linha))
+            except json.JSONDecodeError as e:
+                brutos.append(ErroItemLote(f"JSON inválido na linha {numero_linha}: {e.msg}"))
+    
+    if not brutos:
+        raise HTTPException(status_code=400, detail="Lote vazio. Envie ao menos um email.")
+    if len(brutos) > max_itens:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote muito grande: {len(brutos)} emails (máximo: {max_itens})"
+        )
+    
+    return [_validar_item(bruto) for bruto in brutos]
+
+
+def _validar_item(bruto) -> Union[RequisicaoEmailTexto, ErroItemLote]:
+    """Valida um item do lote contra RequisicaoEmailTexto (aceita também string pura)"""
+    if isinstance(bruto, ErroItemLote):
+        return bruto
+    if isinstance(bruto, str):
+        bruto = {"texto": bruto}
+    try:
+        return RequisicaoEmailTexto.model_validate(bruto)
+    except ValidationError as e:
+        erros = "; ".join(
+            f"{'.'.join(str(x) for x in erro.get('loc', [])) or 'item'}: {erro.get('msg')}"
+            for erro in e.errors()
+        )
+        return ErroItemLote(f"Item inválido: {erros}")
+
+
+async def processar_lote_async(itens: List[Union[RequisicaoEmailTexto, ErroItemLote]]) -> RespostaLote:
+    """
+    Processa todos os emails do lote com concorrência limitada
+    
+    Args:
+        itens: Saída de interpretar_corpo_lote
+    
+    Returns:
+        RespostaLote com o resultado de cada item e estatísticas de throughput
+    """
+    logger.info("📦 Processando lote com %s emails (concorrência: %s)...", len(itens), LOTE_MAX_CONCORRENCIA)
+    semaforo = asyncio.Semaphore(max(1, LOTE_MAX_CONCORRENCIA))
+    inicio = time.perf_counter()
+    
+    # Modo empacotado: classifica todos os emails válidos com poucos prompts
+    # (emails decididos sem o Gemini, pelo classificador local ou por um email
+    # parecido já classificado, ficam de fora do prompt)
+    classificacoes = {}
+    classificacoes_locais = {}
+    if LOTE_EMPACOTAR_PROMPTS:
+        indices_validos = []
+        for i, item in enumerate(itens):
+            if isinstance(item, ErroItemLote):
+                continue
+            decidido = classificar_sem_gemini(item.texto)
+            if decidido is not None:
+                classificacoes_locais[i] = decidido
+            else:
+                indices_validos.append(i)
+        if indices_validos:
+            resultados_empacotados = await classificar_emails_empacotados_async(
+                [itens[i].texto for i in indices_validos]
+            )
+            classificacoes = dict(zip(indices_validos, resultados_empacotados))
+    
+    async def processar_item(indice: int, item) -> ItemResultadoLote:
+        if isinstance(item, ErroItemLote):
+            return ItemResultadoLote(indice=indice, sucesso=False, erro=str(item), status_code=item.status_code)
+        async with semaforo:
+            try:
+                classificacao = classificacoes.get(indice)
+                if isinstance(classificacao, HTTPException):
+                    raise classificacao
+                if indice in classificacoes_locais:
+                    resultado = await responder_email_classificado_async(item.texto, *classificacoes_locais[indice])
+                elif classificacao is not None:
+                    resultado = await responder_email_classificado_async(item.texto, classificacao)
+                else:
+                    resultado = await processar_email_async(item.texto)
+                return ItemResultadoLote(indice=indice, sucesso=True, resultado=resultado)
+            except HTTPException as he:
+                detalhe = he.detail if isinstance(he.detail, str) else json.dumps(he.detail, ensure_ascii=False)
+                return ItemResultadoLote(indice=indice, sucesso=False, erro=detalhe, status_code=he.status_code)
+            except Exception as e:
+                logger.error("❌ Erro no item %s do lote: %s - %s", indice, type(e).__name__, e)
+                return ItemResultadoLote(
+                    indice=indice, sucesso=False, erro=f"Erro ao processar email: {str(e)}", status_code=500
+                )
+    
+    resultados = await asyncio.gather(*(processar_item(i, item) for i, item in enumerate(itens)))
+    
+    duracao = time.perf_counter() - inicio
+    sucesso = sum(1 for r in resultados if r.sucesso)
+    estatisticas = EstatisticasLote(
+        total=len(resultados),
+        sucesso=sucesso,
+        falhas=len(resultados) - sucesso,
+        duracao_segundos=round(duracao, 4),
+        emails_por_segundo=round(len(resultados) / duracao, 2) if duracao > 0 else 0.0,
+    )
+    logger.info(
+        "✅ Lote concluído: %d/%d com sucesso em %ss (%s emails/s)",
+        estatisticas.sucesso, estatisticas.total, estatisticas.duracao_segundos, estatisticas.emails_por_segundo,
+    )
+    return RespostaLote(itens=list(resultados), estatisticas=estatisticas)
@@ -0,0 +1,282 @@
+"""
+Serviço de métricas (contadores, histogramas e spans por etapa)
+
+Registro leve em memória, exportado no formato de texto do Prometheus em /metrics:
+- Contadores: incrementar("gemini_tokens_total", 120, modelo=..., tipo="prompt")
+- Histogramas: observar("gemini_duracao_segundos", 0.8, modelo=...)
+- Spans: `with medir_etapa("extracao"):` mede a etapa do pipeline (histograma por etapa)
+  e, dentro de uma requisição, acrescenta a etapa ao cabeçalho Server-Timing da resposta
+- MetricasMiddleware: duração e contagem de requisições por rota
+
+Com METRICAS_HABILITADAS=false, as funções retornam na hora (sem lock nem relógio).
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from app.config.configuracao import METRICAS_HABILITADAS
+
+logger = logging.getLogger(__name__)
+
+# Prefixo de todas as métricas exportadas
+PREFIXO = "email_classifier"
+
+# Limites (em segundos) dos buckets dos histogramas de duração
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Descrição (HELP) e tipo de cada métrica
+DEFINICOES = {
+    "requisicoes_total": ("counter", "Requisições HTTP por rota, método e status"),
+    "requisicao_duracao_segundos": ("histogram", "Duração das requisições HTTP por rota"),
+    "etapa_duracao_segundos": ("histogram", "Duração de cada etapa do pipeline de classificação"),
+    "gemini_chamadas_total": ("counter", "Chamadas ao Gemini por modelo e resultado"),
+    "gemini_duracao_segundos": ("histogram", "Duração das chamadas ao Gemini por modelo"),
+    "gemini_tokens_total": ("counter", "Tokens informados pelo Gemini (usage_metadata) por tipo (prompt inclui cache)"),
+    "gemini_cache_contexto_total": ("counter", "Uso do cache de contexto do Gemini (criado, renovado, reutilizado, falha)"),
+    "gemini_caracteres_enviados_total": ("counter", "Caracteres enviados ao Gemini nos prompts"),
+    "prompt_tokens_email_total": ("counter", "Tokens estimados do email nos prompts: enviados e economizados (vs corte fixo)"),
+    "cache_consultas_total": ("counter", "Consultas ao cache de resultados por tipo e resultado"),
+    "chamadas_coalescidas_total": ("counter", "Chamadas que aguardaram uma chamada idêntica em andamento (single-flight) por tipo"),
+    "respostas_modelo_total": ("counter", "Respostas sugeridas montadas por modelo (sem chamar o Gemini) por intenção"),
+    "resposta_especulativa_total": ("counter", "Respostas geradas junto com a classificação para o label previsto (acerto ou descartada)"),
+    "resposta_especulativa_ganho_segundos": ("histogram", "Tempo economizado pela resposta especulativa (0 quando descartada)"),
+    "classificacao_parse_total": ("counter", "Respostas de classificação por prompt e caminho (direto, reparado, nova_tentativa, falha)"),
+    "similaridade_consultas_total": ("counter", "Consultas ao índice de emails quase duplicados por resultado"),
+    "fallbacks_total": ("counter", "Fallbacks do pipeline (resposta padrão, chamada única inválida)"),
+}
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+# Etapas medidas na requisição atual (para o cabeçalho Server-Timing): nome -> [vezes, duração total]
+_etapas_requisicao: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("etapas_requisicao", default=None)
+
+# Acima deste tamanho o cabeçalho Server-Timing é omitido (proxies costumam limitar
+# os cabeçalhos a 8-16KB no total)
+SERVER_TIMING_MAXIMO_BYTES = 2048
+
+
+class RegistroMetricas:
+    """Contadores e histogramas com rótulos, exportáveis no formato do Prometheus"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_DURACAO):
+        self.buckets = buckets
+        self._contadores: Dict[str, Dict[Rotulos, float]] = {}
+        # nome -> rótulos -> [contagem por bucket..., contagem +Inf, soma]
+        self._histogramas: Dict[str, Dict[Rotulos, List[float]]] = {}
+        self._lock = threading.Lock()
+    
+    def incrementar(self, nome: str, valor: float = 1.0, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            serie = self._contadores.setdefault(nome, {})
+            serie[chave] = serie.get(chave, 0.0) + valor
+    
+    def observar(self, nome: str, valor: float, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            serie = self._histogramas.setdefault(nome, {})
+            dados = serie.get(chave)
+            if dados is None:
+                dados = serie[chave] = [0.0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    dados[i] += 1
+                    break
+            else:
+                dados[len(self.buckets)] += 1
+            dados[-1] += valor
+    
+    def somar(self, nome: str, **rotulos) -> float:
+        """Soma as séries do contador `nome` que têm os rótulos informados"""
+        filtro = set(rotulos.items())
+        with self._lock:
+            return sum(valor for chave, valor in self._contadores.get(nome, {}).items() if filtro <= set(chave))
+    
+    def resumir_histograma(self, nome: str, **rotulos) -> Tuple[int, float]:
+        """(quantidade de observações, soma) das séries do histograma `nome` com os rótulos informados"""
+        filtro = set(rotulos.items())
+        with self._lock:
+            series = [dados for chave, dados in self._histogramas.get(nome, {}).items() if filtro <= set(chave)]
+            return int(sum(sum(dados[:-1]) for dados in series)), sum(dados[-1] for dados in series)
+    
+    def limpar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+    
+    def exportar_prometheus(self) -> str:
+        """Gera o texto no formato de exposição do Prometheus (version=0.0.4)"""
+        linhas: List[str] = []
+        with self._lock:
+            for nome in sorted(set(self._contadores) | set(self._histogramas)):
+                tipo, ajuda = DEFINICOES.get(nome, ("counter" if nome in self._contadores else "histogram", ""))
+                nome_completo = f"{PREFIXO}_{nome}"
+                linhas.append(f"# HELP {nome_completo} {ajuda}")
+                linhas.append(f"# TYPE {nome_completo} {tipo}")
+                for rotulos, valor in sorted(self._contadores.get(nome, {}).items()):
+                    linhas.append(f"{nome_completo}{_formatar_rotulos(rotulos)} {_formatar_valor(valor)}")
+                for rotulos, dados in sorted(self._histogramas.get(nome, {}).items()):
+                    acumulado = 0.0
+                    for limite, contagem in zip(self.buckets, dados):
+                        acumulado += contagem
+                        rotulos_bucket = rotulos + (("le", _formatar_valor(limite)),)
+                        linhas.append(f"{nome_completo}_bucket{_formatar_rotulos(rotulos_bucket)} {_formatar_valor(acumulado)}")
+                    acumulado += dados[len(self.buckets)]
+                    linhas.append(f"{nome_completo}_bucket{_formatar_rotulos(rotulos + (('le', '+Inf'),))} {_formatar_valor(acumulado)}")
+                    linhas.append(f"{nome_completo}_sum{_formatar_rotulos(rotulos)} {_formatar_valor(dados[-1])}")
+                    linhas.append(f"{nome_completo}_count{_formatar_rotulos(rotulos)} {_formatar_valor(acumulado)}")
+        return "\n".join(linhas) + "\n"
+
+
+def _formatar_rotulos(rotulos: Rotulos) -> str:
+    if not rotulos:
+        return ""
+    partes = []
+    for nome, valor in rotulos:
+        valor = str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        partes.append(f'{nome}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _formatar_valor(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+# Registro global
+metricas = RegistroMetricas()
+
+
+def incrementar(nome: str, valor: float = 1.0, **rotulos):
+    """Soma `valor` ao contador `nome` (nada acontece com as métricas desativadas)"""
+    if METRICAS_HABILITADAS:
+        metricas.incrementar(nome, valor, **rotulos)
+
+
+def observar(nome: str, valor: float, **rotulos):
+    """Registra `valor` no histograma `nome` (nada acontece com as métricas desativadas)"""
+    if METRICAS_HABILITADAS:
+        metricas.observar(nome, valor, **rotulos)
+
+
+class _Etapa:
+    """Span de uma etapa do pipeline (use via medir_etapa)"""
+    
+    __slots__ = ("nome", "inicio")
+    
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.inicio = 0.0
+    
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+    
+    def __exit__(self, tipo_excecao, excecao, traceback):
+        duracao = time.perf_counter() - self.inicio
+        metricas.observar("etapa_duracao_segundos", duracao, etapa=self.nome)
+        etapas = _etapas_requisicao.get()
+        if etapas is not None:
+            acumulado = etapas.get(self.nome)
+            if acumulado is None:
+                etapas[self.nome] = [1, duracao]
+            else:
+                acumulado[0] += 1
+                acumulado[1] += duracao
+        return False
+
+
+class _EtapaNula:
+    """Span vazio usado quando as métricas estão desativadas"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, tipo_excecao, excecao, traceback):
+        return False
+
+
+_ETAPA_NULA = _EtapaNula()
+
+
+def medir_etapa(nome: str):
+    """
+    Mede a duração de uma etapa do pipeline
+    
+    Uso:
+        with medir_etapa("extracao"):
+            texto = ...
+    
+    Args:
+        nome: Nome da etapa (vira o rótulo `etapa` do histograma)
+    """
+    if not METRICAS_HABILITADAS:
+        return _ETAPA_NULA
+    return _Etapa(nome)
+
+
+def exportar_metricas() -> str:
+    """Texto das métricas no formato do Prometheus (vazio se desativadas)"""
+    if not METRICAS_HABILITADAS:
+        return ""
+    return metricas.exportar_prometheus()
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP
+    
+    Registra duração e contagem por rota (o template da rota, ex.: /api/emails/classify-file,
+    para não criar uma série por URL) e adiciona o cabeçalho Server-Timing com as etapas
+    medidas durante a requisição (uma entrada por etapa, com a duração somada).
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICAS_HABILITADAS:
+            return await self.app(scope, receive, send)
+        
+        etapas: Dict[str, List[float]] = {}
+        token = _etapas_requisicao.set(etapas)
+        inicio = time.perf_counter()
+        status = 500
+        
+        async def send_com_metricas(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                server_timing = _formatar_server_timing(etapas)
+                if server_timing:
+                    mensagem = {**mensagem, "headers": [*mensagem.get("headers", []), (b"server-timing", server_timing)]}
+            await send(mensagem)
+        
+        try:
+            await self.app(scope, receive, send_com_metricas)
+        finally:
+            _etapas_requisicao.reset(token)
+            rota = getattr(scope.get("route"), "path", None) or "desconhecida"
+            metodo = scope.get("method", "")
+            metricas.observar("requisicao_duracao_segundos", time.perf_counter() - inicio, metodo=metodo, rota=rota)
+            metricas.incrementar("requisicoes_total", metodo=metodo, rota=rota, status=str(status))
+
+
+def _formatar_server_timing(etapas: Dict[str, List[float]]) -> bytes:
+    """
+    Valor do cabeçalho Server-Timing: `etapa;dur=ms`, com `desc="Nx"` se a etapa se repetiu
+    
+    Returns:
+        Cabeçalho codificado, ou b"" se não houver etapas ou se passar de SERVER_TIMING_MAXIMO_BYTES
+    """
+    partes = []
+    for nome, (vezes, duracao) in etapas.items():
+        parte = f"{nome};dur={duracao * 1000:.1f}"
+        partes.append(parte if vezes == 1 else f'{parte};desc="{int(vezes)}x"')
+    valor = ", ".join(partes).encode("latin-1")
+    if len(valor) > SERVER_TIMING_MAXIMO_BYTES:
+        logger.debug("Server-Timing omitido (%s bytes)", len(valor))
+        return b""
+    return valor
@@ -0,0 +1,266 @@
+"""
+Serviço de respostas por modelo (resposta sugerida sem chamar o Gemini)
+
+Emails improdutivos costumam pedir uma resposta de fórmula. Para os labels em
+RESPOSTA_MODELOS_LABELS, detectar_intencao reconhece no texto novo do email (sem a
+mensagem citada, limpo por prompt_servico.limpar_email) uma destas intenções:
+- "festas": votos de Natal, Ano Novo, Páscoa, boas festas
+- "felicitacao": parabéns, felicitações
+- "confirmacao": confirmação de recebimento ("recebido", "ciente", "de acordo")
+- "agradecimento": obrigado, agradeço
+
+responder_por_modelo monta a resposta a partir de um dos modelos da intenção, com o
+nome do remetente (da assinatura ou de "meu nome é ...") e os números de
+chamado/protocolo citados no email. Emails com pedido ou pergunta, sem nenhuma dessas
+intenções ou com mais de RESPOSTA_MODELOS_MAXIMO_PALAVRAS palavras continuam com a
+resposta do Gemini (retorno None).
+"""
+import logging
+import re
+import zlib
+from typing import List, Optional, Tuple
+from app.config.configuracao import RESPOSTA_MODELOS_LABELS, RESPOSTA_MODELOS_MAXIMO_PALAVRAS
+from app.services.metricas_servico import incrementar
+from app.services.prompt_servico import MAXIMO_LINHAS_ASSINATURA, inicio_citacao, limpar_email
+
+logger = logging.getLogger(__name__)
+
+INTENCAO_FESTAS = "festas"
+INTENCAO_FELICITACAO = "felicitacao"
+INTENCAO_CONFIRMACAO = "confirmacao"
+INTENCAO_AGRADECIMENTO = "agradecimento"
+
+# Na ordem de prioridade: "Obrigado e Feliz Natal!" é respondido com os votos de festas
+# (aplicados ao texto em minúsculas)
+_PADROES_INTENCAO = (
+    (INTENCAO_FESTAS, re.compile(
+        r"feliz(?:es)? (?:natal|ano novo|páscoa|pascoa|20\d\d)|boas festas|próspero ano|prospero ano|"
+        r"festas de fim de ano|merry christmas|happy (?:new year|holidays)"
+    )),
+    (INTENCAO_FELICITACAO, re.compile(r"parab[eé]ns|felicita[cç]|congratula|feliz anivers[aá]rio")),
+    (INTENCAO_CONFIRMACAO, re.compile(
+        r"\b(?:recebid[oa]s?|recebi|ciente|anotad[oa]|confirmo|confirmad[oa]|de acordo|combinado|entendido|ok)\b"
+    )),
+    (INTENCAO_AGRADECIMENTO, re.compile(r"obrigad[oa]|agrade[cç]|\bgrat[oa]\b|gratid[aã]o|valeu|thanks|thank you")),
+)
+
+# Pedidos, perguntas e problemas: o email precisa de uma resposta de verdade (Gemini)
+_PADRAO_PEDIDO = re.compile(
+    r"\?|poderi|precis|gostaria|solicit(?:o|ar|amos|ando)\b|favor|aguard|urgent|problema(?! (?:foi )?resolvido)|\berro|falha|d[uú]vida|reclama|"
+    r"cancel|reembols|prazo|anexo|\bsegue|status|quando|como fa[cç]o|"
+    r"pode(?:m|ria)? (?:me )?(?:enviar|mandar|verificar|informar|confirmar|ajudar|explicar)|"
+    r"n[aã]o (?:consigo|recebi|chegou|funciona|foi|est[aá])"
+)
+
+# Votos retribuídos na resposta de festas
+_VOTOS = (
+    (re.compile(r"natal|christmas"), "um Feliz Natal"),
+    (re.compile(r"ano novo|pr[oó]spero|new year|feliz 20\d\d"), "um próspero Ano Novo"),
+    (re.compile(r"p[aá]scoa"), "uma Feliz Páscoa"),
+)
+VOTOS_PADRAO = "Boas Festas"
+
+# Despedida antes do nome na assinatura (sozinha na linha ou seguida do nome: "Abraços, Ana")
+_DESPEDIDAS = (
+    r"atenciosamente|att|atte|abs|abraços?|um abraço|cordialmente|saudações|sds|grat[oa]|"
+    r"(?:muito )?obrigad[oa]|beijos|bjs|best regards|kind regards|regards|thanks"
+)
+_PADRAO_DESPEDIDA = re.compile(rf"^\s*(?:{_DESPEDIDAS})\s*[.,!]*\s*$", re.IGNORECASE)
+_PADRAO_DESPEDIDA_COM_NOME = re.compile(rf"^\s*(?:{_DESPEDIDAS})\s*[,!]\s*(.+?)\s*[.!]?\s*$", re.IGNORECASE)
+_PADRAO_DELIMITADOR_ASSINATURA = re.compile(r"^\s*--\s*$")
+_PADRAO_APRESENTACAO = re.compile(r"(?:[Mm]eu nome é|[Mm]e chamo|[Aa]qui é (?:[oa] )?)\s*([A-ZÀ-Ý][a-zà-ÿ]+)")
+# Nome próprio: até 4 palavras com inicial maiúscula (e "da", "de", "dos"... entre elas)
+_PADRAO_NOME = re.compile(r"^[A-ZÀ-Ý][a-zà-ÿ'’-]+(?:\s+(?:d[aeo]s?\s+)?[A-ZÀ-Ý][a-zà-ÿ'’-]+){0,3}$")
+# Linhas de assinatura com cara de nome que não são o nome de alguém
+_NAO_NOMES = {"equipe", "time", "departamento", "setor", "empresa", "diretoria", "gerência", "pessoal", "todos", "prezados"}
+
+# Números de chamado citados: "chamado 12345", "protocolo nº 2024/001", "#98765"
+_PADRAO_CHAMADO = re.compile(
+    r"\b(chamado|protocolo|ticket|requisi[cç][aã]o|solicita[cç][aã]o|ocorr[eê]ncia|pedido)s?\s*"
+    r"(?:n[º°o]\.?|n[uú]mero|#)?\s*:?\s*#?\s*(\d(?:[\d./-]*\d){2,})"
+    r"|#(\d{3,})",
+    re.IGNORECASE,
+)
+MAXIMO_CHAMADOS = 3
+# Tipo citado -> (artigo, nome na resposta)
+_TIPOS_CHAMADO = {
+    "chamado": ("o", "chamado"),
+    "protocolo": ("o", "protocolo"),
+    "ticket": ("o", "ticket"),
+    "requisicao": ("a", "requisição"),
+    "solicitacao": ("a", "solicitação"),
+    "ocorrencia": ("a", "ocorrência"),
+    "pedido": ("o", "pedido"),
+}
+
+# Modelos por intenção: {saudacao} ("Olá, Ana!"), {referencia} (" sobre o chamado 123",
+# ou vazio) e {votos} (festas). O modelo é escolhido pelo hash do email: o mesmo email
+# recebe sempre a mesma resposta.
+MODELOS = {
+    INTENCAO_AGRADECIMENTO: (
+        "{saudacao}\n\n"
+        "Nós é que agradecemos pela mensagem{referencia}! Ficamos felizes em poder ajudar.\n\n"
+        "Seguimos à disposição sempre que precisar.\n\n"
+        "Atenciosamente.",
+        "{saudacao}\n\n"
+        "Obrigado pelo retorno{referencia}! É muito bom saber que deu tudo certo.\n\n"
+        "Conte com a gente sempre que precisar.\n\n"
+        "Atenciosamente.",
+    ),
+    INTENCAO_FELICITACAO: (
+        "{saudacao}\n\n"
+        "Muito obrigado pelas felicitações e pelo carinho! Mensagens como a sua nos motivam "
+        "a seguir fazendo um bom trabalho.\n\n"
+        "Um abraço e até breve.\n\n"
+        "Atenciosamente.",
+        "{saudacao}\n\n"
+        "Agradecemos de coração pelos parabéns! Ficamos muito felizes com o reconhecimento.\n\n"
+        "Seguimos à disposição.\n\n"
+        "Atenciosamente.",
+    ),
+    INTENCAO_FESTAS: (
+        "{saudacao}\n\n"
+        "Muito obrigado pelos votos! Desejamos a você e aos seus {votos}, com muita saúde "
+        "e realizações.\n\n"
+        "Seguimos à disposição.\n\n"
+        "Atenciosamente.",
+        "{saudacao}\n\n"
+        "Agradecemos a lembrança e retribuímos com carinho: {votos} para você e sua família!\n\n"
+        "Conte sempre com a gente.\n\n"
+        "Atenciosamente.",
+    ),
+    INTENCAO_CONFIRMACAO: (
+        "{saudacao}\n\n"
+        "Obrigado pela confirmação{referencia}. Registramos o seu retorno.\n\n"
+        "Caso precise de algo mais, é só nos chamar por aqui.\n\n"
+        "Atenciosamente.",
+    ),
+}
+
+
+def _linhas_sem_citacao(texto_email: str) -> List[str]:
+    """Linhas do email antes da mensagem citada (respostas anteriores, encaminhamentos)"""
+    linhas = (texto_email or "").replace("\r\n", "\n").split("\n")
+    return linhas[:inicio_citacao(linhas)]
+
+
+def detectar_intencao(texto_email: str) -> Optional[str]:
+    """
+    Detecta a intenção de um email que pode ser respondido por modelo
+    
+    Args:
+        texto_email: Texto original do email (a mensagem citada e a assinatura são ignoradas)
+    
+    Returns:
+        Uma das intenções (INTENCAO_*) ou None se o email tiver pedido/pergunta, for
+        longo demais ou não tiver nenhuma delas
+    """
+    texto = limpar_email("\n".join(_linhas_sem_citacao(texto_email)).strip()).lower()
+    if not texto or len(texto.split()) > RESPOSTA_MODELOS_MAXIMO_PALAVRAS or _PADRAO_PEDIDO.search(texto):
+        return None
+    for intencao, padrao in _PADROES_INTENCAO:
+        if padrao.search(texto):
+            return intencao
+    return None
+
+
+def extrair_nome_remetente(texto_email: str) -> Optional[str]:
+    """
+    Primeiro nome do remetente, da assinatura ou de "meu nome é ..."
+    
+    Args:
+        texto_email: Texto original do email
+    
+    Returns:
+        Primeiro nome ou None se não for encontrado
+    """
+    linhas = _linhas_sem_citacao(texto_email)
+    inicio_busca = max(0, len(linhas) - MAXIMO_LINHAS_ASSINATURA - 1)
+    for i in range(len(linhas) - 1, inicio_busca - 1, -1):
+        com_nome = _PADRAO_DESPEDIDA_COM_NOME.match(linhas[i])
+        if com_nome and _eh_nome(com_nome.group(1)):
+            return com_nome.group(1).split()[0]
+        if _PADRAO_DESPEDIDA.match(linhas[i]) or _PADRAO_DELIMITADOR_ASSINATURA.match(linhas[i]):
+            seguinte = next((linha.strip() for linha in linhas[i + 1:] if linha.strip()), "")
+            if _eh_nome(seguinte):
+                return seguinte.split()[0]
+    apresentacao = _PADRAO_APRESENTACAO.search("\n".join(linhas))
+    return apresentacao.group(1) if apresentacao else None
+
+
+def _eh_nome(linha: str) -> bool:
+    return bool(
+        _PADRAO_NOME.match(linha)
+        and not _PADRAO_DESPEDIDA.match(linha)
+        and linha.split()[0].lower() not in _NAO_NOMES
+    )
+
+
+def extrair_numeros_chamado(texto_email: str) -> List[Tuple[str, str]]:
+    """
+    Números de chamado/protocolo citados no email (inclusive na mensagem citada)
+    
+    Args:
+        texto_email: Texto original do email
+    
+    Returns:
+        Lista de (tipo, número) sem repetições, na ordem em que aparecem (no máximo
+        MAXIMO_CHAMADOS). O tipo é uma das chaves de _TIPOS_CHAMADO.
+    """
+    encontrados = {}
+    for encontrado in _PADRAO_CHAMADO.finditer(texto_email or ""):
+        tipo, numero, numero_hash = encontrado.groups()
+        numero = numero or numero_hash
+        if numero in encontrados:
+            continue
+        tipo = (tipo or "chamado").lower().replace("ç", "c").replace("ã", "a").replace("ê", "e")
+        encontrados[numero] = tipo
+        if len(encontrados) == MAXIMO_CHAMADOS:
+            break
+    return [(tipo, numero) for numero, tipo in encontrados.items()]
+
+
+def _montar_referencia(chamados: List[Tuple[str, str]]) -> str:
+    """" sobre o chamado 123 e a solicitação 456" (vazio sem chamados)"""
+    if not chamados:
+        return ""
+    partes = [f"{_TIPOS_CHAMADO[tipo][0]} {_TIPOS_CHAMADO[tipo][1]} {numero}" for tipo, numero in chamados]
+    if len(partes) > 1:
+        partes = [", ".join(partes[:-1]), partes[-1]]
+    return " sobre " + " e ".join(partes)
+
+
+def _montar_votos(texto_email: str) -> str:
+    texto = texto_email.lower()
+    votos = [voto for padrao, voto in _VOTOS if padrao.search(texto)]
+    return " e ".join(votos) if votos else VOTOS_PADRAO
+
+
+def responder_por_modelo(label: str, texto_email: str) -> Optional[str]:
+    """
+    Monta a resposta sugerida a partir de um modelo, se o label e o email permitirem
+    
+    Args:
+        label: Label da classificação (precisa estar em RESPOSTA_MODELOS_LABELS)
+        texto_email: Texto original do email
+    
+    Returns:
+        Resposta pronta ou None se o email precisar da resposta do Gemini
+    """
+    if label not in RESPOSTA_MODELOS_LABELS:
+        return None
+    intencao = detectar_intencao(texto_email)
+    if intencao is None:
+        return None
+    
+    nome = extrair_nome_remetente(texto_email)
+    modelos = MODELOS[intencao]
+    modelo = modelos[zlib.crc32(texto_email.encode("utf-8")) % len(modelos)]
+    resposta = modelo.format(
+        saudacao=f"Olá, {nome}!" if nome else "Olá!",
+        referencia=_montar_referencia(extrair_numeros_chamado(texto_email)),
+        votos=_montar_votos("\n".join(_linhas_sem_citacao(texto_email))),
+    )
+    incrementar("respostas_modelo_total", intencao=intencao)
+    logger.info("📝 Resposta sugerida por modelo (%s), sem chamar o Gemini", intencao)
+    return resposta
@@ -0,0 +1,189 @@
+"""
+Serviço de pool de API keys do Gemini
+
+Distribui as chamadas entre várias chaves (GEMINI_API_KEYS) para somar a cota de cada uma:
+- Cada chave tem seu próprio genai.Client (criado na primeira vez que a chave é usada;
+  o google.genai também só é importado nesse momento)
+- A escolha prioriza a chave com menos chamadas em andamento e usada há mais tempo
+- Uma chave que retorna 429 (RESOURCE_EXHAUSTED) fica em espera até o fim do cooldown
+- Cada chave tem seu limitador de taxa (GEMINI_RPM/GEMINI_RPD); chaves com token livre têm prioridade
+- Uso, erros e cooldown de cada chave ficam disponíveis em estatisticas()
+"""
+import logging
+import threading
+import time
+from typing import Callable, Iterable, List, Optional
+from app.services.resiliencia_servico import LimitadorTaxa
+
+logger = logging.getLogger(__name__)
+
+
+def criar_cliente_gemini(chave: str):
+    """Cria o genai.Client da chave (o SDK só é importado aqui, no primeiro uso)"""
+    from google import genai
+    return genai.Client(api_key=chave)
+
+
+def mascarar_chave(chave: str) -> str:
+    """Mostra só o início e o fim da chave (para logs e estatísticas)"""
+    if len(chave) <= 10:
+        return "***"
+    return f"{chave[:6]}...{chave[-4:]}"
+
+
+class ChaveGemini:
+    """Uma API key do pool, com seu cliente e contadores de uso"""
+    
+    def __init__(self, chave: str, indice: int, limitador: Optional[LimitadorTaxa] = None):
+        self.chave = chave
+        self.indice = indice
+        self.limitador = limitador or LimitadorTaxa()
+        self.cliente = None
+        self.em_andamento = 0
+        self.ultimo_uso = 0.0
+        self.cooldown_ate = 0.0
+        self.contadores = {
+            "requisicoes": 0,
+            "sucessos": 0,
+            "erros_quota": 0,
+            "erros": 0,
+            "adiadas_limite": 0,
+        }
+    
+    @property
+    def identificador(self) -> str:
+        return f"#{self.indice} ({mascarar_chave(self.chave)})"
+    
+    def disponivel(self, agora: float) -> bool:
+        return self.cooldown_ate <= agora
+
+
+class PoolChavesGemini:
+    """Pool de API keys do Gemini com rotação baseada em cota"""
+    
+    def __init__(
+        self,
+        chaves: Iterable[str],
+        espera_padrao_segundos: float = 60.0,
+        fabrica_cliente: Optional[Callable[[str], object]] = None,
+        rpm: int = 0,
+        rpd: int = 0,
+    ):
+        self.chaves: List[ChaveGemini] = [
+            ChaveGemini(chave, i, LimitadorTaxa(rpm, rpd)) for i, chave in enumerate(chaves, start=1)
+        ]
+        self.espera_padrao_segundos = espera_padrao_segundos
+        self.fabrica_cliente = fabrica_cliente or criar_cliente_gemini
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.chaves)
+    
+    def escolher(self, excluir: Iterable[ChaveGemini] = ()) -> Optional[ChaveGemini]:
+        """
+        Escolhe a próxima chave disponível e a marca como em uso
+        
+        Args:
+            excluir: Chaves que não devem ser escolhidas (ex.: já tentadas nesta chamada)
+        
+        Returns:
+            ChaveGemini escolhida ou None se todas estiverem em cooldown (ou excluídas)
+        """
+        excluidas = set(id(chave) for chave in excluir)
+        agora = time.monotonic()
+        with self._lock:
+            candidatas = [
+                chave for chave in self.chaves
+                if id(chave) not in excluidas and chave.disponivel(agora)
+            ]
+            if not candidatas:
+                return None
+            escolhida = min(candidatas, key=lambda chave: (
+                chave.limitador.espera_estimada() > 0, chave.em_andamento, chave.ultimo_uso
+            ))
+            escolhida.em_andamento += 1
+            escolhida.ultimo_uso = agora
+            escolhida.contadores["requisicoes"] += 1
+            return escolhida
+    
+    def obter_cliente(self, chave: ChaveGemini):
+        """Retorna o cliente da chave (cria na primeira vez)"""
+        if chave.cliente is None:
+            with self._lock:
+                if chave.cliente is None:
+                    logger.info("🔧 Criando cliente Gemini para a chave %s", chave.identificador)
+                    chave.cliente = self.fabrica_cliente(chave.chave)
+        return chave.cliente
+    
+    def liberar(self, chave: ChaveGemini):
+        """Devolve a chave sem contabilizar resultado (ex.: cliente obtido para uso direto)"""
+        with self._lock:
+            chave.em_andamento -= 1
+    
+    def registrar_sucesso(self, chave: ChaveGemini):
+        with self._lock:
+            chave.em_andamento -= 1
+            chave.contadores["sucessos"] += 1
+    
+    def registrar_erro(self, chave: ChaveGemini):
+        """Erro que não é de cota: a chave continua disponível"""
+        with self._lock:
+            chave.em_andamento -= 1
+            chave.contadores["erros"] += 1
+    
+    def registrar_quota(self, chave: ChaveGemini, espera_segundos: Optional[float] = None):
+        """
+        Coloca a chave em cooldown após um 429 (RESOURCE_EXHAUSTED)
+        
+        Args:
+            chave: Chave que recebeu o 429
+            espera_segundos: Tempo sugerido pela API (usa espera_padrao_segundos se None)
+        """
+        espera = espera_segundos if espera_segundos is not None else self.espera_padrao_segundos
+        with self._lock:
+            chave.em_andamento -= 1
+            chave.contadores["erros_quota"] += 1
+            chave.cooldown_ate = max(chave.cooldown_ate, time.monotonic() + espera)
+        logger.warning("⚠️ Chave %s sem cota, em espera por %.0fs", chave.identificador, espera)
+    
+    def adiar(self, chave: ChaveGemini, espera_segundos: float):
+        """
+        Tira a chave de uso porque o limitador local não libera um token a tempo
+        
+        Diferente de registrar_quota, não conta como erro de cota do Gemini.
+        """
+        with self._lock:
+            chave.em_andamento -= 1
+            chave.contadores["adiadas_limite"] += 1
+            chave.cooldown_ate = max(chave.cooldown_ate, time.monotonic() + espera_segundos)
+        logger.info("⏳ Chave %s no limite de taxa local, em espera por %.0fs", chave.identificador, espera_segundos)
+    
+    def segundos_ate_liberar(self) -> float:
+        """Tempo até a próxima chave sair do cooldown (0 se alguma já está disponível)"""
+        agora = time.monotonic()
+        with self._lock:
+            if not self.chaves:
+                return 0.0
+            return max(0.0, min(chave.cooldown_ate for chave in self.chaves) - agora)
+    
+    def estatisticas(self) -> dict:
+        """Retorna uso, erros e cooldown de cada chave do pool"""
+        agora = time.monotonic()
+        with self._lock:
+            chaves = [
+                {
+                    "chave": chave.identificador,
+                    "disponivel": chave.disponivel(agora),
+                    "cooldown_restante_segundos": round(max(0.0, chave.cooldown_ate - agora), 1),
+                    "em_andamento": chave.em_andamento,
+                    **chave.contadores,
+                    **({"limitador": chave.limitador.estatisticas()} if chave.limitador.ativo else {}),
+                }
+                for chave in self.chaves
+            ]
+        return {
+            "total_chaves": len(chaves),
+            "chaves_disponiveis": sum(1 for chave in chaves if chave["disponivel"]),
+            "espera_padrao_segundos": self.espera_padrao_segundos,
+            "chaves": chaves,
+        }
@@ -1,9 +1,13 @@
 """
 Serviço para pré-processamento de texto usando NLP
 Remove stop words, aplica stemming/lemmatization
+
+O pipeline é feito em uma única passada: um regex compilado extrai as palavras
+(sequências de letras, números e _), e cada palavra é convertida para minúsculas,
+filtrada (stop words) e reduzida ao radical, sem reconstruir o texto entre as etapas.
 """
 import re
-from typing import List
+from functools import lru_cache
 
 
 # Lista de stop words em português (palavras comuns que não agregam significado)
@@ -27,6 +31,28 @@ STOP_WORDS_PT = {
 }
 
 
+# Sufixos comuns em português usados no stemming simples
+SUFIXOS_STEMMING = (
+    'ção', 'ções', 'mente', 'ando', 'endo', 'indo',
+    'ado', 'ido', 'ada', 'ida', 'ados', 'idos', 'adas', 'idas',
+    'ar', 'er', 'ir', 'ou', 'am', 'em', 'im',
+)
+
+# Tabela de maior correspondência: (tamanho, sufixos com esse tamanho), do maior para o menor.
+# Nenhum sufixo da lista termina com outro sufixo da lista, então testar do maior para o
+# menor dá o mesmo resultado que percorrer a lista na ordem original.
+_TABELA_SUFIXOS = tuple(
+    (tamanho, frozenset(s for s in SUFIXOS_STEMMING if len(s) == tamanho))
+    for tamanho in sorted({len(s) for s in SUFIXOS_STEMMING}, reverse=True)
+)
+
+# Máximo de palavras distintas guardadas no cache de radicais (LRU)
+TAMANHO_CACHE_STEMMING = 50_000
+
+# Uma "palavra" é uma sequência de caracteres \w (letras, números e _)
+_PADRAO_PALAVRA = re.compile(r'\w+')
+
+
 def remover_stop_words(texto: str) -> str:
     """
     Remove stop words (palavras comuns) do texto
@@ -50,14 +76,20 @@ def normalizar_texto(texto: str) -> str:
         texto: Texto original
     
     Returns:
-        Texto normalizado
+        Texto normalizado (palavras separadas por um único espaço)
     """
-    # Remove caracteres especiais, mantendo apenas letras, números e espaços
-    texto = re.sub(r'[^\w\s]', ' ', texto)
-    # Remove espaços múltiplos
-    texto = re.sub(r'\s+', ' ', texto)
-    # Remove espaços no início e fim
-    return texto.strip()
+    # Mantém apenas as sequências de letras/números, separadas por um espaço
+    return ' '.join(_PADRAO_PALAVRA.findall(texto))
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_STEMMING)
+def _radical(palavra: str) -> str:
+    """Remove o maior sufixo da tabela (palavra já em minúsculas); resultado memoizado"""
+    tamanho_palavra = len(palavra)
+    for tamanho, sufixos in _TABELA_SUFIXOS:
+        if tamanho_palavra > tamanho + 2 and palavra[-tamanho:] in sufixos:
+            return palavra[:-tamanho]
+    return palavra
 
 
 def aplicar_stemming_simples(palavra: str) -> str:
@@ -71,27 +103,14 @@ def aplicar_stemming_simples(palavra: str) -> str:
     Returns:
         Palavra com stemming aplicado
     """
-    palavra = palavra.lower()
-    
-    # Sufixos comuns em português
-    sufixos = ['ção', 'ções', 'mente', 'mente', 'ando', 'endo', 'indo', 
-               'ado', 'ido', 'ada', 'ida', 'ados', 'idos', 'adas', 'idas',
-               'ar', 'er', 'ir', 'ou', 'am', 'em', 'im']
-    
-    # Remove sufixos comuns
-    for sufixo in sufixos:
-        if palavra.endswith(sufixo) and len(palavra) > len(sufixo) + 2:
-            palavra = palavra[:-len(sufixo)]
-            break
-    
-    return palavra
+    return _radical(palavra.lower())
 
 
 def preprocessar_texto_nlp(texto: str) -> str:
     """
     Aplica pré-processamento completo de NLP no texto
     
-    Processos aplicados:
+    Processos aplicados (em uma única passada por palavra):
     1. Normalização (remove caracteres especiais)
     2. Remoção de stop words
     3. Stemming simples
@@ -105,20 +124,13 @@ def preprocessar_texto_nlp(texto: str) -> str:
     if not texto or not texto.strip():
         return texto
     
-    # 1. Normaliza o texto
-    texto_normalizado = normalizar_texto(texto)
-    
-    # 2. Remove stop words
-    texto_sem_stop_words = remover_stop_words(texto_normalizado)
-    
-    # 3. Aplica stemming em cada palavra
-    palavras = texto_sem_stop_words.split()
-    palavras_stemmed = [aplicar_stemming_simples(palavra) for palavra in palavras]
-    
-    # Retorna texto pré-processado
-    texto_preprocessado = ' '.join(palavras_stemmed)
-    
-    return texto_preprocessado
+    stop_words = STOP_WORDS_PT
+    radical = _radical
+    return ' '.join([
+        radical(palavra)
+        for palavra in map(str.lower, _PADRAO_PALAVRA.findall(texto))
+        if palavra not in stop_words
+    ])
 
 
 def preprocessar_para_classificacao(texto: str, aplicar_nlp: bool = True) -> str:
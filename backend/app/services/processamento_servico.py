@@ -0,0 +1,590 @@
+"""
+Serviço que orquestra o processamento completo de um email:
+classificação + resposta sugerida
+
+Suporta dois modos (configurável em MODO_CHAMADA_UNICA):
+- Chamada única: classificação e resposta em UMA chamada ao Gemini (JSON estruturado)
+- Duas chamadas: classificar_email_com_ia + gerar_resposta_sugerida (fluxo tradicional)
+
+Antes de chamar o Gemini, o classificador local (classificador_local_servico) tenta
+decidir o email e, depois dele, o índice de quase duplicados (similaridade_servico)
+procura um email parecido já classificado; só os que sobram são escalados. O campo
+"tier" do resultado indica qual camada decidiu a classificação. Os dois usam NumPy e
+só são importados quando estão ligados (CLASSIFICADOR_LOCAL_MODELO / SIMILARIDADE_HABILITADA).
+
+Com RESPOSTA_ESPECULATIVA, o fluxo assíncrono de duas chamadas começa a resposta junto
+com a classificação, para um label previsto sem IA (prever_label); se o Gemini discordar,
+a resposta é cancelada e gerada de novo para o label certo.
+
+Cada função tem uma versão assíncrona (sufixo _async) usada pelos endpoints.
+processar_email_stream entrega a classificação assim que sai e a resposta em partes.
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Optional, Tuple, TypeVar
+from fastapi import HTTPException
+from app.config.configuracao import (
+    CLASSIFICACAO_NOVAS_TENTATIVAS,
+    CLASSIFICADOR_LOCAL_MODELO,
+    MODO_CHAMADA_UNICA,
+    PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO,
+    RESPOSTA_ESPECULATIVA,
+    SIMILARIDADE_HABILITADA,
+)
+from app.models.schemas import ClassificacaoRespostaIA, RespostaClassificacao
+from app.services.gemini_servico import gerar_conteudo, gerar_conteudo_async
+from app.services.classificador_servico import (
+    classificar_email_com_ia,
+    classificar_email_com_ia_async,
+    config_classificacao,
+    eh_erro_quota,
+    erro_quota_excedida,
+    interpretar_tentativa,
+    prompt_da_tentativa,
+    RespostaClassificacaoInvalida,
+)
+from app.services.resposta_servico import (
+    eh_resposta_padrao,
+    gerar_resposta_sugerida,
+    gerar_resposta_sugerida_async,
+    gerar_resposta_sugerida_stream,
+    limpar_resposta_gerada,
+)
+from app.services.cache_servico import buscar_no_cache, buscar_no_cache_async, salvar_no_cache
+from app.services.coalescencia_servico import coalescer
+from app.services.prompt_servico import estimar_tokens, montar_trecho_email, registrar_economia
+from app.services.metricas_servico import incrementar, medir_etapa, observar
+from app.services.modelos_resposta_servico import detectar_intencao
+from app.services.resiliencia_servico import eh_erro_cliente_gemini
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# Camadas que podem decidir a classificação (campo "tier" da resposta)
+TIER_LOCAL = "local"
+TIER_SIMILAR = "similar"
+TIER_GEMINI = "gemini"
+
+
+# Parte fixa do prompt da chamada única (vai em system_instruction / cache de contexto)
+INSTRUCAO_CHAMADA_UNICA = """
+Você é um assistente de uma empresa do setor financeiro.
+Faça DUAS tarefas com o email recebido:
+
+1. Classifique o email em uma das categorias: "Produtivo" ou "Improdutivo".
+   - Produtivo: requer ação/resposta específica (status de requisição, suporte, dúvidas do sistema, envio de arquivos para análise, etc.)
+   - Improdutivo: não requer ação imediata (felicitações, agradecimentos, mensagens sociais).
+
+2. Gere uma resposta profissional e personalizada para o email, de acordo com a categoria:
+   - Se Produtivo: reconheça a solicitação, faça referência a números de chamado/requisição se houver,
+     ofereça ajuda para verificar status ou suporte técnico, no máximo 4 parágrafos.
+   - Se Improdutivo: seja cordial e agradeça, retribua felicitações de forma breve, 2-3 parágrafos.
+   - Mantenha tom profissional mas acessível e assine com "Atenciosamente".
+
+Responda APENAS em JSON válido, no formato:
+{"label":"Produtivo|Improdutivo","confidence":0.0-1.0,"reason":"explicação breve","suggested_reply":"texto da resposta"}
+""".strip()
+
+
+class RespostaChamadaUnicaInvalida(Exception):
+    """A resposta da chamada única não pôde ser interpretada (usa o fluxo de duas chamadas)"""
+
+
+def _montar_prompt_chamada_unica(texto_email: str) -> str:
+    """Monta a parte variável do prompt da chamada única (a parte fixa é INSTRUCAO_CHAMADA_UNICA)"""
+    trecho = montar_trecho_email(texto_email, PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO)
+    # O prompt anterior levava o email cortado em 2000 caracteres
+    registrar_economia("chamada_unica", trecho.tokens, estimar_tokens((texto_email or "")[:2000]) - trecho.tokens)
+    return f"""
+EMAIL RECEBIDO:
+\"\"\"{trecho.texto}\"\"\"
+""".strip()
+
+
+def _interpretar_chamada_unica(resposta, tentativa: int) -> Optional[RespostaClassificacao]:
+    """
+    Converte a resposta da IA em RespostaClassificacao validada
+    
+    Passa pela mesma validação, reparo e nova tentativa da classificação
+    (interpretar_tentativa), com o modelo ClassificacaoRespostaIA.
+    
+    Args:
+        resposta: Resposta do generate_content
+        tentativa: 0 na primeira chamada, 1+ nas novas tentativas
+    
+    Returns:
+        RespostaClassificacao, ou None se ainda houver tentativas
+    
+    Raises:
+        RespostaChamadaUnicaInvalida: Se a resposta for inválida na última tentativa
+    """
+    try:
+        dados = interpretar_tentativa(resposta, tentativa, ClassificacaoRespostaIA, prompt="chamada_unica")
+    except RespostaClassificacaoInvalida as e:
+        raise RespostaChamadaUnicaInvalida(str(e)) from e
+    if dados is None:
+        return None
+    
+    resposta_sugerida = limpar_resposta_gerada(dados["suggested_reply"])
+    if not resposta_sugerida:
+        raise RespostaChamadaUnicaInvalida("suggested_reply vazio")
+    return RespostaClassificacao(
+        label=dados["label"],
+        confidence=dados["confidence"],
+        suggested_reply=resposta_sugerida,
+        reason=dados["reason"] or None,
+        tier=TIER_GEMINI,
+        all_scores=None,
+    )
+
+
+def classificar_e_responder_com_ia(texto_email: str) -> RespostaClassificacao:
+    """
+    Classifica o email E gera a resposta sugerida em UMA única chamada ao Gemini
+    
+    Args:
+        texto_email: Texto do email
+    
+    Returns:
+        RespostaClassificacao validada
+    
+    Raises:
+        RespostaChamadaUnicaInvalida: Se a resposta da IA não for utilizável
+        HTTPException: Se a quota do Gemini for excedida (429)
+    """
+    logger.info("🤖 Classificando e gerando resposta em chamada única...")
+    
+    # Se classificação e resposta já estiverem no cache, nem chama a IA
+    resultado_cache = _buscar_resultado_no_cache(texto_email)
+    if resultado_cache is not None:
+        return resultado_cache
+    
+    prompt = _montar_prompt_chamada_unica(texto_email)
+    logger.debug("Prompt (chamada única) montado (tamanho: %s chars)", len(prompt))
+    
+    for tentativa in range(CLASSIFICACAO_NOVAS_TENTATIVAS + 1):
+        try:
+            with medir_etapa("gemini_chamada_unica"):
+                resposta = gerar_conteudo(
+                    prompt_da_tentativa(prompt, tentativa),
+                    config=config_classificacao(com_resposta=True),
+                    instrucao=INSTRUCAO_CHAMADA_UNICA,
+                )
+        except Exception as e:
+            erro_quota = _converter_erro_chamada_unica(e)
+            if erro_quota is not None:
+                raise erro_quota from e
+            raise
+        resultado = _interpretar_chamada_unica(resposta, tentativa)
+        if resultado is not None:
+            break
+    
+    return _finalizar_chamada_unica(texto_email, resultado)
+
+
+async def classificar_e_responder_com_ia_async(texto_email: str) -> RespostaClassificacao:
+    """
+    Versão assíncrona de classificar_e_responder_com_ia
+    
+    Chamadas do mesmo email que chegarem enquanto esta estiver em andamento aguardam o
+    mesmo resultado (coalescencia_servico).
+    
+    Args:
+        texto_email: Texto do email
+    
+    Returns:
+        RespostaClassificacao validada
+    
+    Raises:
+        RespostaChamadaUnicaInvalida: Se a resposta da IA não for utilizável
+        HTTPException: Se a quota do Gemini for excedida (429)
+    """
+    logger.info("🤖 Classificando e gerando resposta em chamada única (assíncrona)...")
+    
+    resultado_cache = await _buscar_resultado_no_cache_async(texto_email)
+    if resultado_cache is not None:
+        return resultado_cache
+    
+    return await coalescer("chamada_unica", texto_email, lambda: _chamar_gemini_chamada_unica_async(texto_email))
+
+
+async def _chamar_gemini_chamada_unica_async(texto_email: str) -> RespostaClassificacao:
+    """Faz a chamada única ao Gemini e interpreta a resposta (salvando no cache)"""
+    prompt = _montar_prompt_chamada_unica(texto_email)
+    logger.debug("Prompt (chamada única) montado (tamanho: %s chars)", len(prompt))
+    
+    for tentativa in range(CLASSIFICACAO_NOVAS_TENTATIVAS + 1):
+        try:
+            with medir_etapa("gemini_chamada_unica"):
+                resposta = await gerar_conteudo_async(
+                    prompt_da_tentativa(prompt, tentativa),
+                    config=config_classificacao(com_resposta=True),
+                    instrucao=INSTRUCAO_CHAMADA_UNICA,
+                )
+        except Exception as e:
+            erro_quota = _converter_erro_chamada_unica(e)
+            if erro_quota is not None:
+                raise erro_quota from e
+            raise
+        resultado = _interpretar_chamada_unica(resposta, tentativa)
+        if resultado is not None:
+            break
+    
+    return _finalizar_chamada_unica(texto_email, resultado)
+
+
+def _converter_erro_chamada_unica(e: Exception) -> Optional[HTTPException]:
+    """Converte erro de quota do cliente Gemini em HTTPException 429; None para os outros (seguem para o fallback)"""
+    if not eh_erro_cliente_gemini(e):
+        return None
+    error_str = str(e)
+    if eh_erro_quota(error_str):
+        logger.error("⚠️ ERRO 429: QUOTA DA API GEMINI EXCEDIDA (chamada única)!")
+        return erro_quota_excedida(error_str)
+    return None
+
+
+def _finalizar_chamada_unica(texto_email: str, resultado: RespostaClassificacao) -> RespostaClassificacao:
+    """Salva classificação e resposta da chamada única no cache"""
+    salvar_no_cache("classificacao", texto_email, {
+        "label": resultado.label,
+        "confidence": resultado.confidence,
+        "reason": resultado.reason or "",
+    })
+    salvar_no_cache("resposta", texto_email, resultado.suggested_reply, extra=resultado.label)
+    registrar_similar(texto_email, resultado.model_dump(), resultado.suggested_reply)
+    logger.info("✅ Chamada única concluída: %s (confiança: %s)", resultado.label, resultado.confidence)
+    return resultado
+
+
+def _buscar_resultado_no_cache(texto_email: str):
+    """Retorna RespostaClassificacao se classificação e resposta estiverem no cache (senão None)"""
+    classificacao_cache = buscar_no_cache("classificacao", texto_email)
+    if classificacao_cache is None:
+        return None
+    resposta_cache = buscar_no_cache("resposta", texto_email, extra=classificacao_cache["label"])
+    if resposta_cache is None:
+        return None
+    logger.info("⚡ Resultado encontrado no cache: %s", classificacao_cache['label'])
+    return _montar_resultado(classificacao_cache, resposta_cache)
+
+
+async def _buscar_resultado_no_cache_async(texto_email: str):
+    """Versão de _buscar_resultado_no_cache para o event loop (leituras do disco em thread)"""
+    classificacao_cache = await buscar_no_cache_async("classificacao", texto_email)
+    if classificacao_cache is None:
+        return None
+    resposta_cache = await buscar_no_cache_async("resposta", texto_email, extra=classificacao_cache["label"])
+    if resposta_cache is None:
+        return None
+    logger.info("⚡ Resultado encontrado no cache: %s", classificacao_cache['label'])
+    return _montar_resultado(classificacao_cache, resposta_cache)
+
+
+def _montar_resultado(resultado_classificacao: dict, resposta_sugerida: str, tier: str = TIER_GEMINI) -> RespostaClassificacao:
+    """Junta classificação e resposta sugerida no modelo de retorno da API"""
+    return RespostaClassificacao(
+        label=resultado_classificacao["label"],
+        confidence=resultado_classificacao["confidence"],
+        suggested_reply=resposta_sugerida,
+        reason=resultado_classificacao.get("reason") or None,
+        tier=tier,
+        all_scores=None
+    )
+
+
+def _processar_em_duas_chamadas(texto_email: str) -> RespostaClassificacao:
+    """Fluxo tradicional: classifica e depois gera a resposta (duas chamadas ao Gemini)"""
+    resultado_classificacao = classificar_email_com_ia(texto_email)
+    resposta_sugerida = gerar_resposta_sugerida(resultado_classificacao["label"], texto_email)
+    registrar_similar(texto_email, resultado_classificacao, resposta_sugerida)
+    return _montar_resultado(resultado_classificacao, resposta_sugerida)
+
+
+async def _processar_em_duas_chamadas_async(texto_email: str) -> RespostaClassificacao:
+    """Versão assíncrona do fluxo tradicional de duas chamadas"""
+    if RESPOSTA_ESPECULATIVA:
+        resultado_classificacao, resposta_sugerida = await _classificar_com_resposta_especulativa(texto_email)
+    else:
+        resultado_classificacao = await classificar_email_com_ia_async(texto_email)
+        resposta_sugerida = await gerar_resposta_sugerida_async(resultado_classificacao["label"], texto_email)
+    registrar_similar(texto_email, resultado_classificacao, resposta_sugerida)
+    return _montar_resultado(resultado_classificacao, resposta_sugerida)
+
+
+def prever_label(texto_email: str) -> str:
+    """
+    Palpite do label sem chamar o Gemini (para a resposta especulativa)
+    
+    Usa a probabilidade do modelo local, se houver um configurado (mesmo abaixo do
+    limiar de confiança); senão, emails de cortesia sem pedido (detectar_intencao) são
+    Improdutivo e o resto, Produtivo.
+    """
+    if CLASSIFICADOR_LOCAL_MODELO:
+        from app.services.classificador_local_servico import obter_modelo_local
+        modelo = obter_modelo_local()
+        if modelo is not None:
+            return "Produtivo" if modelo.probabilidade_produtivo(texto_email) >= 0.5 else "Improdutivo"
+    return "Improdutivo" if detectar_intencao(texto_email) else "Produtivo"
+
+
+async def _classificar_com_resposta_especulativa(texto_email: str) -> Tuple[dict, str]:
+    """
+    Classifica o email e gera a resposta ao mesmo tempo, para o label previsto
+    
+    Se a classificação confirmar o label, a resposta já está pronta (ou a caminho);
+    senão, a resposta especulativa é cancelada e gerada de novo. Registra o resultado em
+    resposta_especulativa_total e o tempo economizado em resposta_especulativa_ganho_segundos
+    (o tempo em que classificação e resposta correram juntas; 0 quando o palpite erra).
+    
+    Args:
+        texto_email: Texto do email
+    
+    Returns:
+        Tupla (classificação, resposta sugerida)
+    
+    Raises:
+        HTTPException: Se houver erro na classificação (a resposta especulativa é cancelada)
+    """
+    classificacao_cache = await buscar_no_cache_async("classificacao", texto_email)
+    if classificacao_cache is not None:
+        # Classificação pronta: não há o que especular
+        logger.info("⚡ Classificação encontrada no cache: %s", classificacao_cache["label"])
+        resultado_classificacao = dict(classificacao_cache)
+        return resultado_classificacao, await gerar_resposta_sugerida_async(resultado_classificacao["label"], texto_email)
+    
+    label_previsto = prever_label(texto_email)
+    inicio = time.perf_counter()
+    resposta_especulativa = asyncio.ensure_future(
+        _cronometrar(gerar_resposta_sugerida_async(label_previsto, texto_email))
+    )
+    try:
+        resultado_classificacao = await classificar_email_com_ia_async(texto_email, consultar_cache=False)
+    except BaseException:
+        resposta_especulativa.cancel()
+        raise
+    fim_classificacao = time.perf_counter()
+    
+    if resultado_classificacao["label"] == label_previsto:
+        resposta_sugerida, fim_resposta = await resposta_especulativa
+        incrementar("resposta_especulativa_total", resultado="acerto")
+        observar("resposta_especulativa_ganho_segundos", min(fim_classificacao, fim_resposta) - inicio)
+        return resultado_classificacao, resposta_sugerida
+    
+    resposta_especulativa.cancel()
+    incrementar("resposta_especulativa_total", resultado="descartada")
+    observar("resposta_especulativa_ganho_segundos", 0.0)
+    logger.info(
+        "🔀 Resposta especulativa descartada (previsto: %s, classificado: %s)",
+        label_previsto, resultado_classificacao["label"],
+    )
+    resposta_sugerida = await gerar_resposta_sugerida_async(resultado_classificacao["label"], texto_email)
+    return resultado_classificacao, resposta_sugerida
+
+
+async def _cronometrar(chamada: Awaitable[T]) -> Tuple[T, float]:
+    """Aguarda a chamada e retorna (resultado, instante em que terminou)"""
+    resultado = await chamada
+    return resultado, time.perf_counter()
+
+
+def classificar_localmente(texto_email: str) -> Optional[dict]:
+    """classificador_local_servico.classificar_localmente (None sem modelo configurado)"""
+    if not CLASSIFICADOR_LOCAL_MODELO:
+        return None
+    from app.services.classificador_local_servico import classificar_localmente as classificar
+    return classificar(texto_email)
+
+
+def buscar_similar(texto_email: str) -> Optional[dict]:
+    """similaridade_servico.buscar_similar (None com o índice desligado)"""
+    if not SIMILARIDADE_HABILITADA:
+        return None
+    from app.services.similaridade_servico import buscar_similar as buscar
+    return buscar(texto_email)
+
+
+def registrar_similar(texto_email: str, classificacao: dict, resposta_sugerida: Optional[str] = None):
+    """similaridade_servico.registrar_similar (nada a fazer com o índice desligado)"""
+    if not SIMILARIDADE_HABILITADA:
+        return
+    # A resposta padrão (fallback quando o Gemini falha) não é guardada
+    if resposta_sugerida and eh_resposta_padrao(classificacao["label"], resposta_sugerida):
+        resposta_sugerida = None
+    from app.services.similaridade_servico import registrar_similar as registrar
+    registrar(texto_email, classificacao, resposta_sugerida)
+
+
+def classificar_sem_gemini(texto_email: str) -> Optional[Tuple[dict, str]]:
+    """
+    Tenta decidir o email sem chamar o Gemini para classificar
+    
+    Consulta o classificador local e, se ele não estiver confiante, o índice de
+    emails quase duplicados.
+    
+    Args:
+        texto_email: Texto do email
+    
+    Returns:
+        Tupla (classificação, tier) ou None se o email precisar do Gemini. A
+        classificação de um email parecido pode trazer "suggested_reply" (ver
+        buscar_similar).
+    """
+    with medir_etapa("classificacao_local"):
+        classificacao_local = classificar_localmente(texto_email)
+    if classificacao_local is not None:
+        return classificacao_local, TIER_LOCAL
+    with medir_etapa("busca_similar"):
+        classificacao_similar = buscar_similar(texto_email)
+    if classificacao_similar is not None:
+        return classificacao_similar, TIER_SIMILAR
+    return None
+
+
+async def responder_email_classificado_async(
+    texto_email: str, resultado_classificacao: dict, tier: str = TIER_GEMINI
+) -> RespostaClassificacao:
+    """
+    Gera a resposta sugerida para um email já classificado (ex.: pelo modo empacotado)
+    
+    Args:
+        texto_email: Texto do email
+        resultado_classificacao: Dicionário com label, confidence e reason
+        tier: Camada que decidiu a classificação
+    
+    Returns:
+        RespostaClassificacao completa (reaproveita "suggested_reply" da classificação,
+        se houver)
+    """
+    resposta_sugerida = resultado_classificacao.get("suggested_reply")
+    if not resposta_sugerida:
+        resposta_sugerida = await gerar_resposta_sugerida_async(resultado_classificacao["label"], texto_email)
+    if tier == TIER_GEMINI:
+        registrar_similar(texto_email, resultado_classificacao, resposta_sugerida)
+    return _montar_resultado(resultado_classificacao, resposta_sugerida, tier)
+
+
+def _avisar_fallback_chamada_unica(e: Exception):
+    """Loga que a chamada única falhou e que o fluxo de duas chamadas será usado"""
+    incrementar("fallbacks_total", tipo="chamada_unica", motivo=type(e).__name__)
+    logger.warning(
+        "⚠️ Chamada única falhou (%s: %.200s), usando fluxo de duas chamadas...",
+        type(e).__name__, e,
+    )
+
+
+def processar_email(texto_email: str) -> RespostaClassificacao:
+    """
+    Processa um email completo: classificação + resposta sugerida
+    
+    Primeiro tenta decidir sem o Gemini (classificador local e emails quase
+    duplicados, ver classificar_sem_gemini). Senão, usa o modo de chamada única se MODO_CHAMADA_UNICA estiver ativo; se a
+    resposta da chamada única for inválida (ou der erro não relacionado a quota),
+    volta para o fluxo de duas chamadas.
+    
+    Args:
+        texto_email: Texto do email
+    
+    Returns:
+        RespostaClassificacao com label, confidence, reason e suggested_reply
+    
+    Raises:
+        HTTPException: Se houver erro na classificação
+    """
+    # Camadas locais: emails óbvios ou parecidos com um já classificado dispensam o Gemini
+    decidido = classificar_sem_gemini(texto_email)
+    if decidido is not None:
+        classificacao, tier = decidido
+        resposta_sugerida = classificacao.get("suggested_reply") or gerar_resposta_sugerida(
+            classificacao["label"], texto_email
+        )
+        return _montar_resultado(classificacao, resposta_sugerida, tier)
+    
+    if MODO_CHAMADA_UNICA:
+        try:
+            return classificar_e_responder_com_ia(texto_email)
+        except HTTPException:
+            raise
+        except Exception as e:
+            _avisar_fallback_chamada_unica(e)
+    
+    return _processar_em_duas_chamadas(texto_email)
+
+
+async def processar_email_async(texto_email: str) -> RespostaClassificacao:
+    """
+    Versão assíncrona de processar_email (não bloqueia o event loop)
+    
+    Args:
+        texto_email: Texto do email
+    
+    Returns:
+        RespostaClassificacao com label, confidence, reason e suggested_reply
+    
+    Raises:
+        HTTPException: Se houver erro na classificação
+    """
+    decidido = classificar_sem_gemini(texto_email)
+    if decidido is not None:
+        return await responder_email_classificado_async(texto_email, *decidido)
+    
+    if MODO_CHAMADA_UNICA:
+        try:
+            return await classificar_e_responder_com_ia_async(texto_email)
+        except HTTPException:
+            raise
+        except Exception as e:
+            _avisar_fallback_chamada_unica(e)
+    
+    return await _processar_em_duas_chamadas_async(texto_email)
+
+
+async def processar_email_stream(texto_email: str) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Processa um email entregando o resultado em partes (para Server-Sent Events)
+    
+    Usa sempre o fluxo de duas chamadas (a classificação precisa sair antes da resposta),
+    mesmo com MODO_CHAMADA_UNICA ativo; as camadas sem Gemini (classificar_sem_gemini)
+    continuam sendo consultadas primeiro.
+    
+    Args:
+        texto_email: Texto do email
+    
+    Yields:
+        Tuplas (evento, dados):
+        - ("classificacao", {label, confidence, reason, tier}) assim que a classificação sai
+        - ("resposta", {texto, substituir}) trechos da resposta sugerida (ver
+          gerar_resposta_sugerida_stream)
+        - ("fim", RespostaClassificacao completa como dicionário)
+    
+    Raises:
+        HTTPException: Se houver erro na classificação (antes do primeiro evento)
+    """
+    decidido = classificar_sem_gemini(texto_email)
+    if decidido is not None:
+        resultado_classificacao, tier = decidido
+    else:
+        resultado_classificacao = await classificar_email_com_ia_async(texto_email)
+        tier = TIER_GEMINI
+    
+    yield "classificacao", {
+        "label": resultado_classificacao["label"],
+        "confidence": resultado_classificacao["confidence"],
+        "reason": resultado_classificacao.get("reason") or None,
+        "tier": tier,
+    }
+    
+    resposta_sugerida = resultado_classificacao.get("suggested_reply") or ""
+    if resposta_sugerida:
+        yield "resposta", {"texto": resposta_sugerida, "substituir": True}
+    else:
+        async for trecho in gerar_resposta_sugerida_stream(resultado_classificacao["label"], texto_email):
+            resposta_sugerida = trecho["texto"] if trecho["substituir"] else resposta_sugerida + trecho["texto"]
+            yield "resposta", trecho
+        if tier == TIER_GEMINI:
+            registrar_similar(texto_email, resultado_classificacao, resposta_sugerida)
+    
+    yield "fim", _montar_resultado(resultado_classificacao, resposta_sugerida, tier).model_dump()
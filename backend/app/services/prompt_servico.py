@@ -0,0 +1,251 @@
+"""
+Serviço de montagem do texto do email dentro dos prompts (orçamento de tokens)
+
+Em vez de cortar o email em um número fixo de caracteres:
+- estimar_tokens: estimativa local de tokens (sem chamar a API de contagem do Gemini)
+- limpar_email: remove citações de respostas anteriores ("Em ... escreveu:", linhas com
+  ">", cabeçalhos De:/Enviado:), assinaturas e avisos legais/de confidencialidade
+- montar_trecho_email: se o email limpo não couber no orçamento, mantém as frases mais
+  informativas (pedidos, perguntas, números de chamado), na ordem original
+- registrar_economia: tokens enviados e economizados por prompt, nas métricas e no log
+"""
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from app.config.configuracao import PROMPT_LIMPAR_EMAIL
+from app.services.metricas_servico import incrementar
+
+logger = logging.getLogger(__name__)
+
+# Caracteres por token na estimativa (média do tokenizador do Gemini em texto em português)
+CARACTERES_POR_TOKEN = 4
+
+# Marca colocada no lugar das frases que ficaram de fora do trecho
+MARCA_CORTE = "[...]"
+
+# Linhas que iniciam a citação de uma mensagem anterior (o resto do email é descartado)
+_PADRAO_CITACAO = re.compile(
+    r"^\s*(?:"
+    r"(?:em|on)\s.{4,200}\s(?:escreveu|wrote)\s*:"
+    r"|-{2,}\s*(?:mensagem original|original message|mensagem encaminhada|forwarded message)\s*-{2,}"
+    r"|_{10,}"
+    r")\s*$",
+    re.IGNORECASE,
+)
+
+# Linhas citadas começam com ">" (um ou mais níveis)
+_PADRAO_PREFIXO_CITACAO = re.compile(r"^\s*(?:>\s?)+")
+
+# Abaixo disso, o texto antes da citação não basta para entender o email
+MINIMO_PALAVRAS_ANTES_DA_CITACAO = 5
+
+# Cabeçalho de mensagem citada no estilo do Outlook: "De:" seguido de "Enviado:"/"Data:"
+_PADRAO_CABECALHO_DE = re.compile(r"^\s*\*?(?:de|from)\s*:\*?\s", re.IGNORECASE)
+_PADRAO_CABECALHO_DATA = re.compile(r"^\s*\*?(?:enviad[oa]|sent|data|date)\s*:\*?\s", re.IGNORECASE)
+
+# Início de assinatura: delimitador "--" ou despedida sozinha na linha
+_PADRAO_DELIMITADOR_ASSINATURA = re.compile(r"^\s*--\s*$")
+_PADRAO_DESPEDIDA = re.compile(
+    r"^\s*(?:atenciosamente|att|atte|abs|abraços?|cordialmente|saudações|sds|grat[oa]|"
+    r"best regards|kind regards|regards)\s*[.,!]?\s*$",
+    re.IGNORECASE,
+)
+_PADRAO_ENVIADO_DO_CELULAR = re.compile(r"^\s*(?:enviado d[oe] meu|sent from my)\s", re.IGNORECASE)
+
+# Linhas que podem seguir a despedida (nome, cargo, telefone, empresa)
+MAXIMO_LINHAS_ASSINATURA = 8
+
+# Termos de avisos legais; um parágrafo com 2 ou mais deles é descartado
+# (aplicado ao texto em minúsculas: sem IGNORECASE, o regex é bem mais rápido)
+_PADRAO_AVISO_LEGAL = re.compile(
+    r"confidencia|sigilos|destinatári|aviso legal|disclaimer|privileged|intended recipient|"
+    r"esta mensagem|this (?:e-?mail|message)|proibid|prohibited|notifique|apague|delete"
+)
+
+# Frases que costumam carregar o pedido do email (pontuadas na seleção; texto em minúsculas)
+_PADRAO_PEDIDO = re.compile(
+    r"\?|solicit|gostaria|precis|poderi|favor|status|erro|problema|urgent|prazo|anexo|segue|"
+    r"aguardo|dúvida|não consigo|acesso|pagamento|boleto|contrato|requisição|chamado|protocolo|"
+    r"reembolso|cancel|atualiz|verific|parabéns|obrigad|agradeç"
+)
+_PADRAO_NUMERO = re.compile(r"\d")
+_PADRAO_FRASES = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa de tokens de um texto (CARACTERES_POR_TOKEN caracteres por token)"""
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def inicio_citacao(linhas: List[str]) -> Optional[int]:
+    """Índice da linha que inicia a primeira citação de mensagem anterior (None se não houver)"""
+    for i, linha in enumerate(linhas):
+        if (
+            _PADRAO_CITACAO.match(linha)
+            or linha.lstrip().startswith(">")
+            or (_PADRAO_CABECALHO_DE.match(linha) and any(
+                _PADRAO_CABECALHO_DATA.match(seguinte) for seguinte in linhas[i + 1:i + 4]
+            ))
+        ):
+            return i
+    return None
+
+
+def _cortar_citacao(linhas: List[str]) -> List[str]:
+    """
+    Mantém só as linhas antes da primeira citação de mensagem anterior
+    
+    Com menos de MINIMO_PALAVRAS_ANTES_DA_CITACAO palavras antes dela (ex.: um
+    encaminhamento com "Segue abaixo"), a mensagem citada é o conteúdo do email: é
+    mantida, sem os ">" do início das linhas.
+    """
+    i = inicio_citacao(linhas)
+    if i is None:
+        return linhas
+    if len(" ".join(linhas[:i]).split()) >= MINIMO_PALAVRAS_ANTES_DA_CITACAO:
+        return linhas[:i]
+    return [_PADRAO_PREFIXO_CITACAO.sub("", linha) for linha in linhas]
+
+
+def _remover_assinatura(linhas: List[str]) -> List[str]:
+    """Remove o delimitador "--" (e o que vem depois), "Enviado do meu..." e a despedida final"""
+    linhas = [linha for linha in linhas if not _PADRAO_ENVIADO_DO_CELULAR.match(linha)]
+    for i, linha in enumerate(linhas):
+        if _PADRAO_DELIMITADOR_ASSINATURA.match(linha):
+            linhas = linhas[:i]
+            break
+    # Despedida seguida só de poucas linhas (nome, cargo, telefone): é a assinatura
+    inicio_busca = max(0, len(linhas) - MAXIMO_LINHAS_ASSINATURA - 1)
+    for i in range(inicio_busca, len(linhas)):
+        if _PADRAO_DESPEDIDA.match(linhas[i]):
+            return linhas[:i]
+    return linhas
+
+
+def _eh_aviso_legal(paragrafo: str) -> bool:
+    return len(set(_PADRAO_AVISO_LEGAL.findall(paragrafo.lower()))) >= 2
+
+
+@lru_cache(maxsize=256)
+def limpar_email(texto: str) -> str:
+    """
+    Remove citações, assinatura e avisos legais do email
+    
+    Se a limpeza não deixar nenhum texto (ex.: email que é só um encaminhamento),
+    o texto original é mantido.
+    
+    Args:
+        texto: Texto original do email
+    
+    Returns:
+        Texto limpo, com no máximo uma linha em branco entre parágrafos
+    """
+    if not texto or not PROMPT_LIMPAR_EMAIL:
+        return texto
+    linhas = _remover_assinatura(_cortar_citacao(texto.replace("\r\n", "\n").split("\n")))
+    paragrafos = [
+        paragrafo.strip()
+        for paragrafo in re.split(r"\n\s*\n", "\n".join(linhas))
+        if paragrafo.strip() and not _eh_aviso_legal(paragrafo)
+    ]
+    limpo = "\n\n".join(paragrafos)
+    return limpo if re.search(r"\w", limpo) else texto.strip()
+
+
+def _pontuar_frase(frase: str, posicao: int) -> float:
+    """Quanto a frase ajuda a entender o pedido do email (maior = mais informativa)"""
+    pontos = 2.0 * min(3, len(_PADRAO_PEDIDO.findall(frase.lower())))
+    if _PADRAO_NUMERO.search(frase):
+        pontos += 1.0
+    if posicao == 0:
+        pontos += 1.5
+    if len(frase.split()) < 3:
+        pontos -= 1.0
+    return pontos
+
+
+def selecionar_frases(texto: str, orcamento_tokens: int) -> Tuple[str, bool]:
+    """
+    Reduz o texto ao orçamento mantendo as frases mais informativas
+    
+    Args:
+        texto: Texto (já limpo) do email
+        orcamento_tokens: Máximo de tokens estimados do trecho
+    
+    Returns:
+        Tupla (trecho, cortado). As frases escolhidas ficam na ordem original, com
+        MARCA_CORTE onde frases foram omitidas.
+    """
+    if estimar_tokens(texto) <= orcamento_tokens:
+        return texto, False
+    
+    frases = [frase.strip() for frase in _PADRAO_FRASES.split(texto) if frase.strip()]
+    ordem = sorted(range(len(frases)), key=lambda i: (-_pontuar_frase(frases[i], i), i))
+    limite = orcamento_tokens * CARACTERES_POR_TOKEN
+    escolhidas, usado = set(), 0
+    for i in ordem:
+        custo = len(frases[i]) + len(MARCA_CORTE) + 2
+        if usado + custo <= limite:
+            escolhidas.add(i)
+            usado += custo
+    if not escolhidas:
+        # Nem a frase mais informativa cabe: usa o começo dela
+        return frases[ordem[0]][:limite - len(MARCA_CORTE) - 1] + " " + MARCA_CORTE, True
+    
+    partes, anterior = [], -1
+    for i in sorted(escolhidas):
+        if i != anterior + 1:
+            partes.append(MARCA_CORTE)
+        partes.append(frases[i])
+        anterior = i
+    if anterior != len(frases) - 1:
+        partes.append(MARCA_CORTE)
+    return "\n".join(partes), True
+
+
+class TrechoEmail:
+    """Texto do email preparado para o prompt, com a contagem de tokens estimada"""
+    
+    def __init__(self, texto: str, tokens_originais: int, cortado: bool):
+        self.texto = texto
+        self.tokens_originais = tokens_originais
+        self.cortado = cortado
+    
+    @property
+    def tokens(self) -> int:
+        return estimar_tokens(self.texto)
+
+
+def montar_trecho_email(texto_email: str, orcamento_tokens: int) -> TrechoEmail:
+    """
+    Limpa o email e o reduz ao orçamento de tokens
+    
+    Args:
+        texto_email: Texto original do email
+        orcamento_tokens: Máximo de tokens estimados do trecho
+    
+    Returns:
+        TrechoEmail com o texto a colocar no prompt
+    """
+    texto_email = texto_email or ""
+    trecho, cortado = selecionar_frases(limpar_email(texto_email), orcamento_tokens)
+    return TrechoEmail(trecho, estimar_tokens(texto_email), cortado)
+
+
+def registrar_economia(prompt: str, tokens_enviados: int, tokens_economizados: int):
+    """
+    Registra os tokens do email enviados e economizados em um prompt
+    
+    Args:
+        prompt: Tipo do prompt ("classificacao", "resposta", "chamada_unica", "lote")
+        tokens_enviados: Tokens estimados do conteúdo do email no prompt
+        tokens_economizados: Tokens estimados que o corte por caracteres teria enviado a mais
+    """
+    tokens_economizados = max(0, tokens_economizados)
+    incrementar("prompt_tokens_email_total", tokens_enviados, prompt=prompt, tipo="enviados")
+    incrementar("prompt_tokens_email_total", tokens_economizados, prompt=prompt, tipo="economizados")
+    logger.debug(
+        "📉 Prompt de %s: %d tokens do email (%d economizados)", prompt, tokens_enviados, tokens_economizados
+    )
@@ -0,0 +1,255 @@
+"""
+Serviço de resiliência para as chamadas ao Gemini
+
+Peças usadas por gemini_servico em volta de generate_content:
+- LimitadorTaxa: token bucket com orçamento por minuto (RPM) e por dia (RPD)
+- calcular_espera_backoff: espera exponencial com jitter, respeitando o tempo sugerido pela API
+- eh_erro_transitorio: decide se vale tentar de novo (5xx, falhas de rede)
+- eh_erro_cliente_gemini / eh_erro_api_gemini: tipo do erro do SDK, sem importar o
+  google.genai (ele só é carregado quando o primeiro cliente é criado)
+- Disjuntor: circuit breaker que falha na hora enquanto o Gemini está instável
+"""
+import logging
+import random
+import sys
+import threading
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BaldeTokens:
+    """Balde com `capacidade` tokens, reabastecido continuamente ao longo de `periodo_segundos`"""
+    
+    def __init__(self, capacidade: int, periodo_segundos: float):
+        self.capacidade = float(capacidade)
+        self.taxa = capacidade / periodo_segundos  # tokens por segundo
+        self.tokens = float(capacidade)
+        self.atualizado_em = time.monotonic()
+    
+    def reabastecer(self, agora: float):
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+    
+    def espera(self) -> float:
+        """Segundos até existir um token inteiro (tokens podem estar negativos por reservas)"""
+        return max(0.0, (1.0 - self.tokens) / self.taxa)
+
+
+class LimitadorTaxa:
+    """
+    Limitador de taxa (token bucket) com orçamento por minuto e por dia
+    
+    O orçamento diário é reabastecido aos poucos (RPD tokens a cada 24h), uma aproximação
+    do reset diário da cota que evita gastar tudo de uma vez.
+    """
+    
+    def __init__(self, rpm: int = 0, rpd: int = 0):
+        self._baldes: List[BaldeTokens] = []
+        if rpm > 0:
+            self._baldes.append(BaldeTokens(rpm, 60.0))
+        if rpd > 0:
+            self._baldes.append(BaldeTokens(rpd, 24 * 60 * 60.0))
+        self._lock = threading.Lock()
+    
+    @property
+    def ativo(self) -> bool:
+        return bool(self._baldes)
+    
+    def espera_estimada(self) -> float:
+        """Segundos até a próxima requisição poder sair (0 se já pode)"""
+        if not self._baldes:
+            return 0.0
+        agora = time.monotonic()
+        with self._lock:
+            for balde in self._baldes:
+                balde.reabastecer(agora)
+            return max(balde.espera() for balde in self._baldes)
+    
+    def reservar(self, espera_maxima: Optional[float] = None) -> Optional[float]:
+        """
+        Reserva um token para uma requisição
+        
+        Args:
+            espera_maxima: Se a espera necessária passar disso, nada é reservado
+        
+        Returns:
+            Segundos que a requisição deve aguardar antes de sair (0 se pode sair já),
+            ou None se a espera passaria de espera_maxima
+        """
+        if not self._baldes:
+            return 0.0
+        agora = time.monotonic()
+        with self._lock:
+            for balde in self._baldes:
+                balde.reabastecer(agora)
+            espera = max(balde.espera() for balde in self._baldes)
+            if espera_maxima is not None and espera > espera_maxima:
+                return None
+            for balde in self._baldes:
+                balde.tokens -= 1.0
+            return espera
+    
+    def estatisticas(self) -> dict:
+        agora = time.monotonic()
+        with self._lock:
+            for balde in self._baldes:
+                balde.reabastecer(agora)
+            return {
+                "tokens_disponiveis": [round(balde.tokens, 2) for balde in self._baldes],
+                "espera_segundos": round(max((balde.espera() for balde in self._baldes), default=0.0), 2),
+            }
+
+
+def calcular_espera_backoff(
+    tentativa: int,
+    base_segundos: float,
+    maximo_segundos: float,
+    espera_sugerida: Optional[float] = None,
+) -> float:
+    """
+    Calcula a espera antes da próxima tentativa
+    
+    Args:
+        tentativa: Número da tentativa que falhou (1 = primeira)
+        base_segundos: Espera base (dobra a cada tentativa)
+        maximo_segundos: Teto da espera exponencial
+        espera_sugerida: Tempo sugerido pela API (retryDelay / Retry-After), se houver
+    
+    Returns:
+        Segundos de espera. Com sugestão da API, espera pelo menos o tempo sugerido e
+        espalha as chamadas até o dobro dele (evita que todas voltem no mesmo instante);
+        sem sugestão, metade fixa + metade aleatória da espera exponencial.
+    """
+    if espera_sugerida is not None:
+        return espera_sugerida + random.uniform(0, espera_sugerida + base_segundos)
+    exponencial = min(maximo_segundos, base_segundos * (2 ** (tentativa - 1)))
+    return exponencial / 2 + random.uniform(0, exponencial / 2)
+
+
+def _classe_de_erro(modulo: str, nome: str) -> Optional[type]:
+    """
+    Classe de exceção de um módulo já importado (None se ele ainda não foi carregado)
+    
+    Se o google.genai (ou o requests) ainda não foi importado, nenhuma exceção dele pode
+    ter sido lançada: a verificação não precisa carregar o módulo.
+    """
+    carregado = sys.modules.get(modulo)
+    return getattr(carregado, nome, None) if carregado is not None else None
+
+
+def _eh_instancia(erro: Exception, modulo: str, *nomes: str) -> bool:
+    return any(
+        classe is not None and isinstance(erro, classe)
+        for classe in (_classe_de_erro(modulo, nome) for nome in nomes)
+    )
+
+
+def eh_erro_cliente_gemini(erro: Exception) -> bool:
+    """Erro 4xx do SDK do Gemini (google.genai.errors.ClientError)"""
+    return _eh_instancia(erro, "google.genai.errors", "ClientError")
+
+
+def eh_erro_api_gemini(erro: Exception) -> bool:
+    """Qualquer erro de resposta da API do Gemini (google.genai.errors.APIError)"""
+    return _eh_instancia(erro, "google.genai.errors", "APIError")
+
+
+def eh_erro_transitorio(erro: Exception) -> bool:
+    """Erros que indicam instabilidade do Gemini ou da rede (vale tentar de novo)"""
+    return (
+        isinstance(erro, (ConnectionError, TimeoutError))
+        or _eh_instancia(erro, "google.genai.errors", "ServerError")
+        or _eh_instancia(erro, "requests.exceptions", "ConnectionError", "Timeout")
+    )
+
+
+class Disjuntor:
+    """
+    Circuit breaker para o Gemini
+    
+    - Fechado: chamadas passam normalmente; falhas seguidas são contadas
+    - Aberto: após `limite_falhas` falhas seguidas, as chamadas são rejeitadas na hora
+      durante `tempo_aberto_segundos`
+    - Meio aberto: passado esse tempo, uma única chamada de teste é liberada; sucesso fecha
+      o circuito e falha o abre de novo
+    """
+    
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+    
+    def __init__(self, limite_falhas: int, tempo_aberto_segundos: float):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto_segundos = tempo_aberto_segundos
+        self.estado = self.FECHADO
+        self._falhas_seguidas = 0
+        self._aberto_ate = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+        self._contadores = {"aberturas": 0, "rejeitadas": 0}
+    
+    def permitir(self) -> float:
+        """
+        Verifica se uma chamada pode sair
+        
+        Returns:
+            0 se pode; caso contrário, segundos até o circuito aceitar uma chamada de teste
+        """
+        if self.limite_falhas <= 0:
+            return 0.0
+        agora = time.monotonic()
+        with self._lock:
+            if self.estado == self.FECHADO:
+                return 0.0
+            if self.estado == self.ABERTO and agora >= self._aberto_ate:
+                self.estado = self.MEIO_ABERTO
+                self._teste_em_andamento = False
+                logger.info("🔌 Disjuntor do Gemini meio aberto: liberando uma chamada de teste")
+            if self.estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return 0.0
+            self._contadores["rejeitadas"] += 1
+            return max(self._aberto_ate - agora, 1.0)
+    
+    def registrar_sucesso(self):
+        """O Gemini respondeu (mesmo que com erro 4xx): o upstream está saudável"""
+        with self._lock:
+            if self.estado != self.FECHADO:
+                logger.info("✅ Disjuntor do Gemini fechado novamente")
+            self.estado = self.FECHADO
+            self._falhas_seguidas = 0
+            self._teste_em_andamento = False
+    
+    def liberar_teste(self):
+        """Libera a chamada de teste sem concluir nada sobre a saúde do Gemini"""
+        with self._lock:
+            self._teste_em_andamento = False
+    
+    def registrar_falha(self):
+        """Falha transitória (5xx/rede): conta para abrir o circuito"""
+        if self.limite_falhas <= 0:
+            return
+        with self._lock:
+            self._falhas_seguidas += 1
+            if self.estado == self.MEIO_ABERTO or self._falhas_seguidas >= self.limite_falhas:
+                if self.estado != self.ABERTO:
+                    self._contadores["aberturas"] += 1
+                    logger.error(
+                        "🔌 Disjuntor do Gemini aberto após %d falhas seguidas (por %.0fs)",
+                        self._falhas_seguidas, self.tempo_aberto_segundos,
+                    )
+                self.estado = self.ABERTO
+                self._aberto_ate = time.monotonic() + self.tempo_aberto_segundos
+                self._teste_em_andamento = False
+    
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "estado": self.estado,
+                "falhas_seguidas": self._falhas_seguidas,
+                "aberto_restante_segundos": round(max(0.0, self._aberto_ate - time.monotonic()), 1)
+                if self.estado == self.ABERTO else 0.0,
+                **self._contadores,
+            }
@@ -1,39 +1,30 @@
 """
 Serviço para gerar respostas automáticas usando IA
+
+Agradecimentos, felicitações, votos de festas e confirmações dos labels em
+RESPOSTA_MODELOS_LABELS são respondidos por modelo, sem chamar o Gemini
+(modelos_resposta_servico).
 """
 import logging
-from app.services.classificador_servico import obter_cliente_gemini
-from app.config.configuracao import MODELO_GEMINI
+from typing import AsyncIterator
+from app.services.gemini_servico import gerar_conteudo, gerar_conteudo_async, gerar_conteudo_stream_async
+from app.services.cache_servico import buscar_no_cache, buscar_no_cache_async, salvar_no_cache
+from app.services.coalescencia_servico import coalescer
+from app.services.metricas_servico import incrementar, medir_etapa
+from app.services.modelos_resposta_servico import responder_por_modelo
+from app.services.prompt_servico import estimar_tokens, montar_trecho_email, registrar_economia
+from app.services.resiliencia_servico import eh_erro_cliente_gemini
+from app.config.configuracao import PROMPT_ORCAMENTO_TOKENS_RESPOSTA
 from fastapi import HTTPException
-from google.genai import errors as genai_errors
 
 logger = logging.getLogger(__name__)
 
+# Prefixos que a IA às vezes coloca antes da resposta e que devem ser removidos
+PREFIXOS_RESPOSTA = ('resposta:', 'aqui está:', 'segue:')
 
-def gerar_resposta_sugerida(label: str, texto_email: str) -> str:
-    """
-    Gera uma resposta automática personalizada usando IA baseada no conteúdo do email
-    
-    Args:
-        label: "Produtivo" ou "Improdutivo"
-        texto_email: Texto original do email para personalizar a resposta
-    
-    Returns:
-        Texto da resposta sugerida personalizada
-    """
-    logger.info(f"💬 Gerando resposta sugerida (label: {label})...")
-    logger.debug(f"Texto do email (tamanho: {len(texto_email)} chars)")
-    
-    try:
-        logger.debug("🔑 Obtendo cliente Gemini...")
-        cliente = obter_cliente_gemini()
-        logger.debug("✅ Cliente Gemini obtido")
-        
-        # Monta prompt para gerar resposta personalizada
-        logger.debug(f"📋 Montando prompt para gerar resposta ({label})...")
-        if label == "Produtivo":
-            prompt = f"""
-Você é um assistente de uma empresa do setor financeiro. Gere uma resposta profissional e personalizada para este email.
+# Partes fixas dos prompts de resposta, por label (vão em system_instruction / cache de contexto)
+INSTRUCAO_RESPOSTA_PRODUTIVO = """
+Você é um assistente de uma empresa do setor financeiro. Gere uma resposta profissional e personalizada para o email recebido.
 
 O email foi classificado como PRODUTIVO (requer ação/resposta específica).
 
@@ -47,14 +38,11 @@ Diretrizes:
 - Use no máximo 4 parágrafos
 - Assine com "Atenciosamente"
 
-EMAIL RECEBIDO:
-\"\"\"{texto_email[:1500]}\"\"\"
-
-Gere APENAS a resposta, sem explicações adicionais:
+Gere APENAS a resposta, sem explicações adicionais.
 """.strip()
-        else:
-            prompt = f"""
-Você é um assistente de uma empresa do setor financeiro. Gere uma resposta profissional e personalizada para este email.
+
+INSTRUCAO_RESPOSTA_IMPRODUTIVO = """
+Você é um assistente de uma empresa do setor financeiro. Gere uma resposta profissional e personalizada para o email recebido.
 
 O email foi classificado como IMPRODUTIVO (não requer ação imediata - felicitações, agradecimentos, etc).
 
@@ -65,64 +53,374 @@ Diretrizes:
 - Mantenha resposta breve (2-3 parágrafos)
 - Assine com "Atenciosamente"
 
-EMAIL RECEBIDO:
-\"\"\"{texto_email[:1500]}\"\"\"
-
-Gere APENAS a resposta, sem explicações adicionais:
+Gere APENAS a resposta, sem explicações adicionais.
 """.strip()
-        
-        logger.debug(f"Prompt montado (tamanho: {len(prompt)} chars)")
-        logger.debug(f"Modelo: {MODELO_GEMINI}")
+
+
+def gerar_resposta_sugerida(label: str, texto_email: str) -> str:
+    """
+    Gera uma resposta automática personalizada usando IA baseada no conteúdo do email
+    
+    Emails que podem ser respondidos por modelo (responder_por_modelo) não chamam a IA.
+    
+    Args:
+        label: "Produtivo" ou "Improdutivo"
+        texto_email: Texto original do email para personalizar a resposta
+    
+    Returns:
+        Texto da resposta sugerida personalizada
+    """
+    logger.info("💬 Gerando resposta sugerida (label: %s)...", label)
+    logger.debug("Texto do email (tamanho: %s chars)", len(texto_email))
+    
+    # Emails de fórmula (agradecimento, felicitação...) não precisam do Gemini
+    resposta_modelo = responder_por_modelo(label, texto_email)
+    if resposta_modelo is not None:
+        return resposta_modelo
+    
+    # Verifica se já existe resposta gerada para este email (e label) no cache
+    resposta_cache = buscar_no_cache("resposta", texto_email, extra=label)
+    if resposta_cache is not None:
+        logger.info("⚡ Resposta sugerida encontrada no cache")
+        return resposta_cache
+    
+    try:
+        prompt = _montar_prompt_resposta(label, texto_email)
         
         # Chama a IA para gerar resposta
         logger.info("🌐 Chamando API Gemini para gerar resposta...")
-        resposta = cliente.models.generate_content(
-            model=MODELO_GEMINI,
-            contents=prompt
-        )
-        logger.debug("✅ Resposta recebida da API Gemini")
-        
-        texto_resposta = (resposta.text or "").strip()
-        logger.debug(f"Texto da resposta (tamanho: {len(texto_resposta)} chars)")
-        logger.debug(f"Resposta bruta (primeiros 300 chars): {texto_resposta[:300]}...")
-        
-        # Se a resposta vier vazia ou com texto extra, limpa
-        if not texto_resposta:
-            logger.warning("⚠️ Resposta vazia da IA, usando resposta padrão")
-            return _resposta_padrao(label)
-        
-        # Remove possíveis prefixos como "Resposta:" ou "Aqui está:"
-        logger.debug("🧹 Limpando resposta (removendo prefixos)...")
-        linhas = texto_resposta.split('\n')
-        linhas_limpas = [linha for linha in linhas if not linha.strip().lower().startswith(('resposta:', 'aqui está:', 'segue:'))]
-        texto_resposta = '\n'.join(linhas_limpas).strip()
-        
-        if not texto_resposta:
-            logger.warning("⚠️ Resposta ficou vazia após limpeza, usando resposta padrão")
-            return _resposta_padrao(label)
+        with medir_etapa("gemini_resposta"):
+            resposta = gerar_conteudo(prompt, instrucao=_instrucao_resposta(label))
+    except Exception as e:
+        return _resposta_fallback(label, e)
+    
+    return _finalizar_resposta(label, texto_email, resposta)
+
+
+async def gerar_resposta_sugerida_async(label: str, texto_email: str) -> str:
+    """
+    Versão assíncrona de gerar_resposta_sugerida (usa o cliente assíncrono do Gemini)
+    
+    Pedidos da mesma resposta (mesmo email e label) que chegarem enquanto este estiver
+    em andamento aguardam o mesmo resultado (coalescencia_servico).
+    
+    Args:
+        label: "Produtivo" ou "Improdutivo"
+        texto_email: Texto original do email para personalizar a resposta
+    
+    Returns:
+        Texto da resposta sugerida personalizada
+    """
+    logger.info("💬 Gerando resposta sugerida (label: %s, assíncrona)...", label)
+    logger.debug("Texto do email (tamanho: %s chars)", len(texto_email))
+    
+    resposta_modelo = responder_por_modelo(label, texto_email)
+    if resposta_modelo is not None:
+        return resposta_modelo
+    
+    resposta_cache = await buscar_no_cache_async("resposta", texto_email, extra=label)
+    if resposta_cache is not None:
+        logger.info("⚡ Resposta sugerida encontrada no cache")
+        return resposta_cache
+    
+    return await coalescer(
+        "resposta", texto_email, lambda: _chamar_gemini_resposta_async(label, texto_email), extra=label
+    )
+
+
+async def _chamar_gemini_resposta_async(label: str, texto_email: str) -> str:
+    """Chama o Gemini para gerar a resposta sugerida (com fallback) e salva no cache"""
+    try:
+        prompt = _montar_prompt_resposta(label, texto_email)
         
-        logger.info(f"✅ Resposta gerada com sucesso (tamanho final: {len(texto_resposta)} chars)")
-        return texto_resposta
+        logger.info("🌐 Chamando API Gemini para gerar resposta (assíncrona)...")
+        with medir_etapa("gemini_resposta"):
+            resposta = await gerar_conteudo_async(prompt, instrucao=_instrucao_resposta(label))
+    except Exception as e:
+        return _resposta_fallback(label, e)
+    
+    return _finalizar_resposta(label, texto_email, resposta)
+
+
+async def gerar_resposta_sugerida_stream(label: str, texto_email: str) -> AsyncIterator[dict]:
+    """
+    Gera a resposta sugerida em partes, conforme o Gemini produz o texto
+    
+    Os prefixos ("Resposta:", "Aqui está:"...) são removidos durante o stream, com o mesmo
+    resultado de limpar_resposta_gerada. Se a IA falhar ou a resposta vier vazia, a
+    resposta padrão é enviada substituindo o que já tiver sido enviado.
+    
+    Args:
+        label: "Produtivo" ou "Improdutivo"
+        texto_email: Texto original do email para personalizar a resposta
+    
+    Yields:
+        Dicionários {"texto": trecho, "substituir": False} com a continuação da resposta,
+        ou {"texto": resposta, "substituir": True} com a resposta inteira que substitui
+        o que veio antes
+    """
+    logger.info("💬 Gerando resposta sugerida em stream (label: %s)...", label)
+    
+    resposta_modelo = responder_por_modelo(label, texto_email)
+    if resposta_modelo is not None:
+        yield {"texto": resposta_modelo, "substituir": False}
+        return
+    
+    resposta_cache = await buscar_no_cache_async("resposta", texto_email, extra=label)
+    if resposta_cache is not None:
+        logger.info("⚡ Resposta sugerida encontrada no cache")
+        yield {"texto": resposta_cache, "substituir": False}
+        return
+    
+    limpador = LimpadorRespostaIncremental()
+    try:
+        prompt = _montar_prompt_resposta(label, texto_email)
         
-    except genai_errors.ClientError as e:
+        logger.info("🌐 Chamando API Gemini para gerar resposta (stream)...")
+        with medir_etapa("gemini_resposta"):
+            async for pedaco in gerar_conteudo_stream_async(prompt, instrucao=_instrucao_resposta(label)):
+                trecho = limpador.adicionar(pedaco)
+                if trecho:
+                    yield {"texto": trecho, "substituir": False}
+        trecho = limpador.finalizar()
+        if trecho:
+            yield {"texto": trecho, "substituir": False}
+    except Exception as e:
+        yield {"texto": _resposta_fallback(label, e), "substituir": True}
+        return
+    
+    if not limpador.texto:
+        logger.warning("⚠️ Resposta vazia da IA (stream), usando resposta padrão")
+        incrementar("fallbacks_total", tipo="resposta_padrao", motivo="resposta_vazia")
+        yield {"texto": _resposta_padrao(label), "substituir": True}
+        return
+    
+    salvar_no_cache("resposta", texto_email, limpador.texto, extra=label)
+    logger.info("✅ Resposta gerada em stream (tamanho final: %s chars)", len(limpador.texto))
+
+
+def _instrucao_resposta(label: str) -> str:
+    """Parte fixa do prompt de resposta para o label"""
+    return INSTRUCAO_RESPOSTA_PRODUTIVO if label == "Produtivo" else INSTRUCAO_RESPOSTA_IMPRODUTIVO
+
+
+def _montar_prompt_resposta(label: str, texto_email: str) -> str:
+    """
+    Monta a parte variável do prompt de resposta (a parte fixa vem de _instrucao_resposta)
+    
+    Args:
+        label: "Produtivo" ou "Improdutivo"
+        texto_email: Texto original do email (vai limpo e dentro de PROMPT_ORCAMENTO_TOKENS_RESPOSTA)
+    
+    Returns:
+        Trecho do email para o Gemini
+    """
+    logger.debug("📋 Montando prompt para gerar resposta (%s)...", label)
+    trecho = montar_trecho_email(texto_email, PROMPT_ORCAMENTO_TOKENS_RESPOSTA)
+    # O prompt anterior levava o email cortado em 1500 caracteres
+    registrar_economia("resposta", trecho.tokens, estimar_tokens((texto_email or "")[:1500]) - trecho.tokens)
+    prompt = f"""
+EMAIL RECEBIDO:
+\"\"\"{trecho.texto}\"\"\"
+""".strip()
+    
+    logger.debug("Prompt montado (tamanho: %s chars)", len(prompt))
+    return prompt
+
+
+def _finalizar_resposta(label: str, texto_email: str, resposta) -> str:
+    """
+    Limpa a resposta do Gemini, salva no cache e aplica fallback se vier vazia
+    
+    Args:
+        label: "Produtivo" ou "Improdutivo"
+        texto_email: Texto original do email (chave do cache)
+        resposta: Resposta do generate_content
+    
+    Returns:
+        Texto final da resposta sugerida
+    """
+    logger.debug("✅ Resposta recebida da API Gemini")
+    
+    texto_resposta = (resposta.text or "").strip()
+    logger.debug("Texto da resposta (tamanho: %s chars)", len(texto_resposta))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Resposta bruta (primeiros 300 chars): %s...", texto_resposta[:300])
+    
+    # Se a resposta vier vazia ou com texto extra, limpa
+    if not texto_resposta:
+        logger.warning("⚠️ Resposta vazia da IA, usando resposta padrão")
+        incrementar("fallbacks_total", tipo="resposta_padrao", motivo="resposta_vazia")
+        return _resposta_padrao(label)
+    
+    # Remove possíveis prefixos como "Resposta:" ou "Aqui está:"
+    logger.debug("🧹 Limpando resposta (removendo prefixos)...")
+    texto_resposta = limpar_resposta_gerada(texto_resposta)
+    
+    if not texto_resposta:
+        logger.warning("⚠️ Resposta ficou vazia após limpeza, usando resposta padrão")
+        incrementar("fallbacks_total", tipo="resposta_padrao", motivo="resposta_vazia")
+        return _resposta_padrao(label)
+    
+    salvar_no_cache("resposta", texto_email, texto_resposta, extra=label)
+    logger.info("✅ Resposta gerada com sucesso (tamanho final: %s chars)", len(texto_resposta))
+    return texto_resposta
+
+
+def _resposta_fallback(label: str, e: Exception) -> str:
+    """
+    Registra o erro da IA e retorna a resposta padrão
+    
+    Args:
+        label: "Produtivo" ou "Improdutivo"
+        e: Exceção capturada ao chamar o Gemini
+    
+    Returns:
+        Resposta padrão para o label
+    """
+    if isinstance(e, HTTPException):
+        # Quota esgotada em todas as chaves (429) ou disjuntor aberto (503)
+        logger.warning("⚠️ Gemini indisponível ao gerar resposta (HTTP %s), usando resposta padrão", e.status_code)
+        incrementar("fallbacks_total", tipo="resposta_padrao", motivo=f"http_{e.status_code}")
+        return _resposta_padrao(label)
+    
+    if eh_erro_cliente_gemini(e):
         # Se for erro 429, usa resposta padrão e loga aviso
         error_str = str(e)
         if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
             logger.warning("⚠️ Quota excedida ao gerar resposta, usando resposta padrão")
         else:
-            logger.warning(f"⚠️ Erro do cliente Gemini ao gerar resposta, usando resposta padrão: {error_str[:200]}")
-        return _resposta_padrao(label)
-    except Exception as e:
-        # Se der erro, retorna resposta padrão
-        logger.error("=" * 80)
-        logger.error(f"❌ ERRO ao gerar resposta com IA!")
-        logger.error(f"Tipo: {type(e).__name__}")
-        logger.error(f"Mensagem: {str(e)}")
-        import traceback
-        logger.error(f"Traceback completo:\n{traceback.format_exc()}")
-        logger.error("Usando resposta padrão como fallback...")
-        logger.error("=" * 80)
+            logger.warning("⚠️ Erro do cliente Gemini ao gerar resposta, usando resposta padrão: %s", error_str[:200])
+        incrementar("fallbacks_total", tipo="resposta_padrao", motivo="erro_cliente")
         return _resposta_padrao(label)
+    
+    # Se der erro, retorna resposta padrão
+    logger.error("=" * 80)
+    logger.error("❌ ERRO ao gerar resposta com IA!")
+    logger.error("Tipo: %s", type(e).__name__)
+    logger.error("Mensagem: %s", e)
+    import traceback
+    logger.error("Traceback completo:\n%s", traceback.format_exc())
+    logger.error("Usando resposta padrão como fallback...")
+    logger.error("=" * 80)
+    incrementar("fallbacks_total", tipo="resposta_padrao", motivo="erro")
+    return _resposta_padrao(label)
+
+
+def limpar_resposta_gerada(texto_resposta: str) -> str:
+    """
+    Remove linhas de prefixo como "Resposta:" ou "Aqui está:" da resposta gerada
+    
+    Args:
+        texto_resposta: Texto bruto gerado pela IA
+    
+    Returns:
+        Texto limpo (pode ficar vazio)
+    """
+    linhas = texto_resposta.split('\n')
+    linhas_limpas = [linha for linha in linhas if not linha.strip().lower().startswith(PREFIXOS_RESPOSTA)]
+    return '\n'.join(linhas_limpas).strip()
+
+
+class LimpadorRespostaIncremental:
+    """
+    Aplica limpar_resposta_gerada a um texto que chega em partes
+    
+    Juntando tudo o que adicionar() e finalizar() devolvem, o resultado é igual a
+    limpar_resposta_gerada(texto completo): o começo de cada linha fica retido só até dar
+    para saber se ela tem prefixo, e espaços/quebras de linha no fim ficam retidos até
+    chegar mais texto.
+    """
+    
+    def __init__(self):
+        self._linha = ""  # Começo da linha atual enquanto não dá para decidir se fica
+        self._manter_linha = None  # None = ainda não decidido
+        self._linhas_mantidas = 0
+        self._iniciado = False  # Já saiu algum caractere que não é espaço
+        self._espacos_pendentes = ""
+        self._partes = []
+    
+    @property
+    def texto(self) -> str:
+        """Texto limpo entregue até agora"""
+        return "".join(self._partes)
+    
+    def adicionar(self, pedaco: str) -> str:
+        """Recebe mais um pedaço do texto e retorna o trecho limpo que já pode ser enviado"""
+        saida = []
+        for i, parte in enumerate(pedaco.split("\n")):
+            if i:
+                self._fechar_linha(saida)
+            self._continuar_linha(parte, saida)
+        return self._entregar("".join(saida))
+    
+    def finalizar(self) -> str:
+        """Fecha a última linha e retorna o que ainda faltava enviar (sem espaços no fim)"""
+        saida = []
+        self._fechar_linha(saida)
+        return self._entregar("".join(saida))
+    
+    def _continuar_linha(self, parte: str, saida: list):
+        if self._manter_linha is False:
+            return
+        if self._manter_linha:
+            saida.append(parte)
+            return
+        self._linha += parte
+        self._manter_linha = _decidir_linha(self._linha, completa=False)
+        if self._manter_linha:
+            self._abrir_linha_mantida(saida)
+            saida.append(self._linha)
+    
+    def _fechar_linha(self, saida: list):
+        if self._manter_linha is None and _decidir_linha(self._linha, completa=True):
+            self._abrir_linha_mantida(saida)
+            saida.append(self._linha)
+        self._linha = ""
+        self._manter_linha = None
+    
+    def _abrir_linha_mantida(self, saida: list):
+        if self._linhas_mantidas:
+            saida.append("\n")
+        self._linhas_mantidas += 1
+    
+    def _entregar(self, texto: str) -> str:
+        """Equivalente ao strip() final: descarta espaços do início e retém os do fim"""
+        if not self._iniciado:
+            texto = texto.lstrip()
+            if not texto:
+                return ""
+            self._iniciado = True
+        texto = self._espacos_pendentes + texto
+        conteudo = texto.rstrip()
+        self._espacos_pendentes = texto[len(conteudo):]
+        if conteudo:
+            self._partes.append(conteudo)
+        return conteudo
+
+
+def _decidir_linha(linha: str, completa: bool):
+    """
+    Decide se uma linha da resposta fica (mesmo critério de limpar_resposta_gerada)
+    
+    Args:
+        linha: Linha inteira (completa=True) ou só o começo dela
+        completa: Se a linha já terminou
+    
+    Returns:
+        True para manter, False para descartar, None se o começo ainda não permite decidir
+    """
+    conteudo = linha.strip().lower() if completa else linha.lstrip().lower()
+    if conteudo.startswith(PREFIXOS_RESPOSTA):
+        return False
+    if completa or not any(prefixo.startswith(conteudo) for prefixo in PREFIXOS_RESPOSTA):
+        return True
+    return None
+
+
+def eh_resposta_padrao(label: str, texto: str) -> bool:
+    """True se o texto é a resposta padrão do label (usada quando a IA falha)"""
+    return texto == _resposta_padrao(label)
 
 
 def _resposta_padrao(label: str) -> str:
@@ -0,0 +1,315 @@
+"""
+Serviço de detecção de emails quase duplicados (MinHash + LSH)
+
+O cache de resultados só acerta textos idênticos; emails de modelo (mesmo texto com
+outro nome, número de chamado ou data) escapam dele. Este índice guarda a assinatura
+dos emails já classificados pelo Gemini e, para um email novo, procura um parecido:
+- Shingles: pares de radicais consecutivos gerados por preprocessar_texto_nlp, com os
+  números trocados por "#" (número de chamado, data e valor não contam como diferença)
+- Assinatura MinHash: o menor hash de cada uma das N funções de hash (multiply-shift
+  em NumPy) sobre os shingles; a fração de posições iguais entre duas assinaturas
+  estima a similaridade de Jaccard entre os conjuntos de shingles
+- LSH: a assinatura é dividida em bandas; emails com alguma banda igual viram
+  candidatos, e só eles são comparados (a busca não percorre o índice inteiro)
+- Memória limitada: LRU com TTL e tamanho máximo, como o cache de resultados
+
+Se a similaridade estimada passar de SIMILARIDADE_LIMIAR, a classificação guardada é
+reaproveitada (e, com SIMILARIDADE_REUTILIZAR_RESPOSTA, também a resposta sugerida).
+"""
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from app.config.configuracao import (
+    CACHE_TTL_SEGUNDOS,
+    SIMILARIDADE_HABILITADA,
+    SIMILARIDADE_LIMIAR,
+    SIMILARIDADE_TAMANHO_MAXIMO,
+    SIMILARIDADE_PERMUTACOES,
+    SIMILARIDADE_BANDAS,
+    SIMILARIDADE_REUTILIZAR_RESPOSTA,
+)
+from app.services.preprocessador_nlp import preprocessar_texto_nlp
+from app.services.metricas_servico import incrementar
+
+logger = logging.getLogger(__name__)
+
+# Radicais por shingle (emails com menos radicais que isso não entram no índice)
+TAMANHO_SHINGLE = 2
+
+# Marcador que substitui números (chamados, datas, valores) nos shingles
+MARCADOR_NUMERO = "#"
+
+# Semente das funções de hash (fixa: assinaturas comparáveis entre instâncias)
+SEMENTE_HASH = 1
+
+
+def gerar_shingles(texto: str, tamanho: int = TAMANHO_SHINGLE) -> Set[str]:
+    """
+    Gera o conjunto de shingles (sequências de `tamanho` radicais consecutivos, com os
+    números trocados por MARCADOR_NUMERO)
+    
+    Args:
+        texto: Texto original do email
+        tamanho: Radicais por shingle
+    
+    Returns:
+        Conjunto de shingles (vazio se o texto tiver menos de `tamanho` radicais)
+    """
+    radicais = [
+        MARCADOR_NUMERO if radical.isdigit() else radical
+        for radical in (preprocessar_texto_nlp(texto) or "").split()
+    ]
+    return {" ".join(radicais[i:i + tamanho]) for i in range(len(radicais) - tamanho + 1)}
+
+
+class GeradorMinHash:
+    """Calcula assinaturas MinHash com `permutacoes` funções de hash multiply-shift"""
+    
+    def __init__(self, permutacoes: int, semente: int = SEMENTE_HASH):
+        gerador = np.random.default_rng(semente)
+        limite = np.iinfo(np.uint64).max
+        # h(x) = ((a * x + b) mod 2^64) >> 32, com `a` ímpar: família universal de hash
+        self._a = gerador.integers(1, limite, size=permutacoes, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = gerador.integers(0, limite, size=permutacoes, dtype=np.uint64, endpoint=True)
+        self.permutacoes = permutacoes
+    
+    def assinatura(self, shingles: Set[str]) -> Optional[np.ndarray]:
+        """
+        Calcula a assinatura de um conjunto de shingles
+        
+        Returns:
+            Vetor uint32 com `permutacoes` posições, ou None se não houver shingles
+        """
+        if not shingles:
+            return None
+        valores = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        hashes = (valores[:, None] * self._a + self._b) >> np.uint64(32)
+        return hashes.min(axis=0).astype(np.uint32)
+
+
+def estimar_jaccard(assinatura_a: np.ndarray, assinatura_b: np.ndarray) -> float:
+    """Fração de posições iguais entre duas assinaturas (estimativa da similaridade de Jaccard)"""
+    return float(np.count_nonzero(assinatura_a == assinatura_b)) / len(assinatura_a)
+
+
+class IndiceSimilaridade:
+    """Índice LSH de assinaturas MinHash com LRU, TTL e tamanho máximo"""
+    
+    def __init__(
+        self,
+        tamanho_maximo: int,
+        ttl_segundos: int,
+        limiar: float,
+        permutacoes: int = 120,
+        bandas: int = 24,
+    ):
+        self.tamanho_maximo = max(1, tamanho_maximo)
+        self.ttl_segundos = ttl_segundos
+        self.limiar = limiar
+        self.bandas = max(1, min(bandas, permutacoes))
+        self.linhas_por_banda = max(1, permutacoes // self.bandas)
+        # Usa só as posições que cabem nas bandas (permutacoes múltiplo de bandas)
+        self.gerador = GeradorMinHash(self.bandas * self.linhas_por_banda)
+        # id -> (expira_em, assinatura, chaves das bandas, valor)
+        self._entradas: "OrderedDict[int, tuple]" = OrderedDict()
+        self._baldes: Dict[Tuple[int, bytes], Set[int]] = {}
+        self._proximo_id = 0
+        self._lock = threading.Lock()
+        self._contadores = {
+            "hits": 0,
+            "misses": 0,
+            "ignorados": 0,
+            "candidatos_comparados": 0,
+            "escritas": 0,
+            "evicoes": 0,
+            "expirados": 0,
+        }
+    
+    def _chaves_bandas(self, assinatura: np.ndarray) -> List[Tuple[int, bytes]]:
+        """Divide a assinatura em bandas; cada banda vira a chave de um balde"""
+        linhas = self.linhas_por_banda
+        return [
+            (banda, assinatura[banda * linhas:(banda + 1) * linhas].tobytes())
+            for banda in range(self.bandas)
+        ]
+    
+    def assinatura(self, texto: str) -> Optional[np.ndarray]:
+        """Assinatura MinHash do texto (None se o texto for curto demais para comparar)"""
+        return self.gerador.assinatura(gerar_shingles(texto))
+    
+    def buscar(self, texto: str) -> Optional[Tuple[float, dict]]:
+        """
+        Procura o email indexado mais parecido com `texto`
+        
+        Args:
+            texto: Texto original do email
+        
+        Returns:
+            Tupla (similaridade estimada, valor guardado) do melhor candidato acima do
+            limiar, ou None
+        """
+        assinatura = self.assinatura(texto)
+        if assinatura is None:
+            with self._lock:
+                self._contadores["ignorados"] += 1
+            return None
+        
+        chaves = self._chaves_bandas(assinatura)
+        agora = time.time()
+        with self._lock:
+            candidatos = set()
+            for chave in chaves:
+                candidatos.update(self._baldes.get(chave, ()))
+            
+            melhor_id, melhor_similaridade = None, 0.0
+            for id_entrada in candidatos:
+                expira_em, assinatura_guardada, _, _ = self._entradas[id_entrada]
+                if expira_em <= agora:
+                    self._remover(id_entrada)
+                    self._contadores["expirados"] += 1
+                    continue
+                similaridade = estimar_jaccard(assinatura, assinatura_guardada)
+                if similaridade > melhor_similaridade:
+                    melhor_id, melhor_similaridade = id_entrada, similaridade
+            self._contadores["candidatos_comparados"] += len(candidatos)
+            
+            if melhor_id is None or melhor_similaridade < self.limiar:
+                self._contadores["misses"] += 1
+                return None
+            self._entradas.move_to_end(melhor_id)
+            self._contadores["hits"] += 1
+            return melhor_similaridade, self._entradas[melhor_id][3]
+    
+    def adicionar(self, texto: str, valor: dict) -> bool:
+        """
+        Indexa um email já classificado
+        
+        Args:
+            texto: Texto original do email
+            valor: Resultado a reaproveitar (serializável; ex.: label, confidence, reason)
+        
+        Returns:
+            True se o email foi indexado (False se for curto demais)
+        """
+        assinatura = self.assinatura(texto)
+        if assinatura is None:
+            return False
+        chaves = self._chaves_bandas(assinatura)
+        expira_em = time.time() + self.ttl_segundos
+        with self._lock:
+            id_entrada = self._proximo_id
+            self._proximo_id += 1
+            self._entradas[id_entrada] = (expira_em, assinatura, chaves, valor)
+            for chave in chaves:
+                self._baldes.setdefault(chave, set()).add(id_entrada)
+            self._contadores["escritas"] += 1
+            while len(self._entradas) > self.tamanho_maximo:
+                self._remover(next(iter(self._entradas)))
+                self._contadores["evicoes"] += 1
+        return True
+    
+    def _remover(self, id_entrada: int):
+        """Remove a entrada e suas referências nos baldes (com o lock já adquirido)"""
+        _, _, chaves, _ = self._entradas.pop(id_entrada)
+        for chave in chaves:
+            balde = self._baldes.get(chave)
+            if balde is not None:
+                balde.discard(id_entrada)
+                if not balde:
+                    del self._baldes[chave]
+    
+    def limpar(self):
+        """Remove todas as entradas do índice"""
+        with self._lock:
+            self._entradas.clear()
+            self._baldes.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entradas)
+    
+    def estatisticas(self) -> dict:
+        """Retorna contadores de hits/misses e ocupação do índice"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            itens = len(self._entradas)
+            baldes = len(self._baldes)
+        total = contadores["hits"] + contadores["misses"]
+        return {
+            "habilitado": SIMILARIDADE_HABILITADA,
+            **contadores,
+            "taxa_acerto": round(contadores["hits"] / total, 4) if total else 0.0,
+            "itens": itens,
+            "baldes": baldes,
+            "tamanho_maximo": self.tamanho_maximo,
+            "limiar": self.limiar,
+            "permutacoes": self.gerador.permutacoes,
+            "bandas": self.bandas,
+            "reutilizar_resposta": SIMILARIDADE_REUTILIZAR_RESPOSTA,
+        }
+
+
+# Instância global do índice (compartilhada pelos serviços)
+indice_similaridade = IndiceSimilaridade(
+    SIMILARIDADE_TAMANHO_MAXIMO,
+    CACHE_TTL_SEGUNDOS,
+    SIMILARIDADE_LIMIAR,
+    SIMILARIDADE_PERMUTACOES,
+    SIMILARIDADE_BANDAS,
+)
+
+
+def buscar_similar(texto: str) -> Optional[dict]:
+    """
+    Procura um email parecido já classificado (None se desativado ou sem candidato)
+    
+    Args:
+        texto: Texto original do email
+    
+    Returns:
+        Dicionário com label, confidence e reason (e suggested_reply, se
+        SIMILARIDADE_REUTILIZAR_RESPOSTA estiver ativo e a resposta tiver sido guardada)
+    """
+    if not SIMILARIDADE_HABILITADA:
+        return None
+    encontrado = indice_similaridade.buscar(texto)
+    incrementar("similaridade_consultas_total", resultado="miss" if encontrado is None else "hit")
+    if encontrado is None:
+        return None
+    similaridade, valor = encontrado
+    logger.info("🧬 Email parecido já classificado (similaridade %.2f): %s", similaridade, valor["label"])
+    resultado = {
+        "label": valor["label"],
+        "confidence": valor["confidence"],
+        "reason": valor.get("reason") or "",
+    }
+    if SIMILARIDADE_REUTILIZAR_RESPOSTA and valor.get("suggested_reply"):
+        resultado["suggested_reply"] = valor["suggested_reply"]
+    return resultado
+
+
+def registrar_similar(texto: str, classificacao: dict, resposta_sugerida: Optional[str] = None):
+    """
+    Indexa um email classificado pelo Gemini (ignora se o índice estiver desativado)
+    
+    Args:
+        texto: Texto original do email
+        classificacao: Dicionário com label, confidence e reason
+        resposta_sugerida: Resposta gerada (guardada só com SIMILARIDADE_REUTILIZAR_RESPOSTA;
+            quem chama não deve passar a resposta padrão de quando o Gemini falha)
+    """
+    if not SIMILARIDADE_HABILITADA:
+        return
+    valor = {
+        "label": classificacao["label"],
+        "confidence": classificacao["confidence"],
+        "reason": classificacao.get("reason") or "",
+    }
+    if SIMILARIDADE_REUTILIZAR_RESPOSTA and resposta_sugerida:
+        valor["suggested_reply"] = resposta_sugerida
+    indice_similaridade.adicionar(texto, valor)
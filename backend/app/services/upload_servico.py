@@ -0,0 +1,166 @@
+"""
+Serviço para receber uploads de arquivos com limite de tamanho
+
+- A extensão (EXTENSOES_PERMITIDAS) é validada antes de ler qualquer byte
+- O Starlette já guarda o upload em um SpooledTemporaryFile (memória até 1MB, depois
+  arquivo temporário): o tamanho é conferido pela posição final desse arquivo (413 se
+  passar de TAMANHO_MAXIMO_ARQUIVO) e ele é passado direto ao extrator, sem cópia
+- LimiteUploadMiddleware rejeita requisições multipart grandes demais antes mesmo
+  do FastAPI interpretar o formulário, e também corpos de qualquer tipo acima do limite
+  nas rotas que leem o corpo inteiro (ex.: /classify-batch)
+"""
+import json
+import logging
+import os
+from typing import BinaryIO, Dict, Optional
+from fastapi import HTTPException, UploadFile
+from app.config.configuracao import EXTENSOES_PERMITIDAS, TAMANHO_MAXIMO_ARQUIVO
+from app.services.metricas_servico import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+# Folga para os cabeçalhos/delimitadores do multipart além do próprio arquivo
+MARGEM_MULTIPART = 64 * 1024
+
+
+def erro_arquivo_grande(tamanho_maximo: int = TAMANHO_MAXIMO_ARQUIVO) -> HTTPException:
+    """HTTPException 413 padrão para arquivos acima do limite"""
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo muito grande. Tamanho máximo permitido: {tamanho_maximo // (1024 * 1024)}MB"
+    )
+
+
+def erro_corpo_grande(tamanho_maximo: int) -> HTTPException:
+    """HTTPException 413 para corpos de requisição (não multipart) acima do limite"""
+    return HTTPException(
+        status_code=413,
+        detail=f"Corpo da requisição muito grande. Tamanho máximo permitido: {tamanho_maximo // (1024 * 1024)}MB"
+    )
+
+
+def validar_extensao(nome_arquivo: str) -> str:
+    """
+    Valida a extensão do arquivo contra EXTENSOES_PERMITIDAS
+    
+    Args:
+        nome_arquivo: Nome do arquivo enviado
+    
+    Returns:
+        Extensão em minúsculas (ex.: ".pdf")
+    
+    Raises:
+        HTTPException: 400 se a extensão não for permitida
+    """
+    extensao = os.path.splitext(nome_arquivo or "")[1].lower()
+    if extensao not in EXTENSOES_PERMITIDAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato não suportado. Use arquivos {' ou '.join(EXTENSOES_PERMITIDAS)}"
+        )
+    return extensao
+
+
+async def ler_upload_limitado(file: UploadFile, tamanho_maximo: int = TAMANHO_MAXIMO_ARQUIVO) -> BinaryIO:
+    """
+    Confere extensão e tamanho do upload e devolve o arquivo já guardado pelo Starlette
+    
+    Args:
+        file: Arquivo recebido pelo endpoint
+        tamanho_maximo: Tamanho máximo em bytes
+    
+    Returns:
+        O próprio file.file, posicionado no início (sem copiar o conteúdo). Quem chama
+        pode fechá-lo depois da extração.
+    
+    Raises:
+        HTTPException: 400 se a extensão não for permitida ou o arquivo estiver vazio,
+            413 se passar do tamanho máximo
+    """
+    validar_extensao(file.filename)
+    
+    # Se o tamanho já é conhecido, rejeita sem tocar no arquivo
+    if file.size is not None and file.size > tamanho_maximo:
+        logger.warning("⚠️ Upload rejeitado: %s bytes (máximo: %s)", file.size, tamanho_maximo)
+        raise erro_arquivo_grande(tamanho_maximo)
+    
+    arquivo = file.file
+    with medir_etapa("leitura_upload"):
+        total = arquivo.seek(0, os.SEEK_END)
+        arquivo.seek(0)
+    
+    if total > tamanho_maximo:
+        logger.warning("⚠️ Upload rejeitado: %s bytes (máximo: %s)", total, tamanho_maximo)
+        raise erro_arquivo_grande(tamanho_maximo)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Arquivo vazio ou não foi possível ler")
+    
+    logger.debug("📥 Upload recebido: %s bytes", total)
+    return arquivo
+
+
+class LimiteUploadMiddleware:
+    """
+    Middleware ASGI que limita o tamanho do corpo de requisições multipart
+    
+    Rejeita com 413 pelo Content-Length antes de ler o corpo e, se o tamanho não for
+    informado (chunked), interrompe a leitura assim que o limite é ultrapassado.
+    
+    Args:
+        tamanho_maximo: Limite padrão do corpo
+        limites_por_caminho: Limites específicos por caminho (ex.: envio de vários arquivos)
+        limites_corpo_por_caminho: Limites por caminho que valem para qualquer tipo de
+            corpo (ex.: JSON/NDJSON do lote), sem a folga do multipart
+    """
+    
+    def __init__(
+        self,
+        app,
+        tamanho_maximo: int = TAMANHO_MAXIMO_ARQUIVO + MARGEM_MULTIPART,
+        limites_por_caminho: Optional[Dict[str, int]] = None,
+        limites_corpo_por_caminho: Optional[Dict[str, int]] = None,
+    ):
+        self.app = app
+        self.tamanho_maximo = tamanho_maximo
+        self.limites_por_caminho = limites_por_caminho or {}
+        self.limites_corpo_por_caminho = limites_corpo_por_caminho or {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        caminho = scope.get("path", "")
+        cabecalhos = dict(scope.get("headers") or [])
+        if caminho in self.limites_corpo_por_caminho:
+            tamanho_maximo = self.limites_corpo_por_caminho[caminho]
+            erro = erro_corpo_grande(tamanho_maximo)
+        elif cabecalhos.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            tamanho_maximo = self.limites_por_caminho.get(caminho, self.tamanho_maximo)
+            erro = erro_arquivo_grande(tamanho_maximo - MARGEM_MULTIPART)
+        else:
+            return await self.app(scope, receive, send)
+        
+        content_length = cabecalhos.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > tamanho_maximo:
+            logger.warning("⚠️ Requisição rejeitada pelo Content-Length: %s bytes (%s)", int(content_length), caminho)
+            corpo = json.dumps({"detail": erro.detail}, ensure_ascii=False).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode())],
+            })
+            await send({"type": "http.response.body", "body": corpo})
+            return
+        
+        recebido = 0
+        
+        async def receive_limitado():
+            nonlocal recebido
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                recebido += len(mensagem.get("body", b""))
+                if recebido > tamanho_maximo:
+                    raise erro
+            return mensagem
+        
+        await self.app(scope, receive_limitado, send)
@@ -0,0 +1 @@
+"""Benchmarks (scripts de medição de desempenho)"""
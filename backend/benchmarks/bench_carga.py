@@ -0,0 +1,182 @@
+"""
+Teste de carga dos endpoints de classificação com o Gemini falso
+
+Chama a aplicação FastAPI em processo (httpx + ASGITransport, sem rede) com o cliente
+falso de benchmarks.fake_gemini no lugar do pool de chaves, em vários níveis de
+concorrência, e mede para cada endpoint:
+- latência p50/p95/p99 por requisição
+- requisições por segundo (e emails por segundo no lote)
+- respostas por status HTTP
+
+Cada requisição usa um email diferente e o cache vem desligado (CACHE_HABILITADO=false),
+para medir o caminho completo até o Gemini.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_carga
+"""
+import asyncio
+import logging
+import os
+import time
+
+# Precisa vir antes de importar app.*
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("CACHE_HABILITADO", "false")
+os.environ.setdefault("GEMINI_RETRY_BASE_SEGUNDOS", "0.01")
+os.environ.setdefault("GEMINI_RETRY_MAXIMO_SEGUNDOS", "0.2")
+os.environ.setdefault("GEMINI_CHAVE_ESPERA_SEGUNDOS", "0.05")
+
+import httpx  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.bench_preprocessador import gerar_texto  # noqa: E402
+from benchmarks.estatisticas import resumir_latencias  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso  # noqa: E402
+from benchmarks.fixtures import gerar_pdf  # noqa: E402
+
+# Emails por requisição no cenário de lote
+TAMANHO_LOTE = 20
+
+# Tamanho dos emails gerados (bytes)
+TAMANHO_EMAIL = 1_000
+
+
+def _requisicoes_texto(quantidade: int, semente: int) -> list:
+    return [
+        {"url": "/api/emails/classify-text", "json": {"texto": gerar_texto(TAMANHO_EMAIL, semente + i)}}
+        for i in range(quantidade)
+    ]
+
+
+def _requisicoes_arquivo_txt(quantidade: int, semente: int) -> list:
+    return [
+        {
+            "url": "/api/emails/classify-file",
+            "files": {"file": ("email.txt", gerar_texto(TAMANHO_EMAIL, semente + i).encode("utf-8"), "text/plain")},
+        }
+        for i in range(quantidade)
+    ]
+
+
+def _requisicoes_arquivo_pdf(quantidade: int, semente: int) -> list:
+    return [
+        {
+            "url": "/api/emails/classify-file",
+            "files": {"file": ("email.pdf", gerar_pdf(2, prefixo=f"Email {semente + i} linha"), "application/pdf")},
+        }
+        for i in range(quantidade)
+    ]
+
+
+def _requisicoes_lote(quantidade: int, semente: int) -> list:
+    return [
+        {
+            "url": "/api/emails/classify-batch",
+            "json": [
+                {"texto": gerar_texto(TAMANHO_EMAIL, semente + i * TAMANHO_LOTE + j)} for j in range(TAMANHO_LOTE)
+            ],
+        }
+        for i in range(quantidade)
+    ]
+
+
+# (nome, função que monta as requisições, emails por requisição)
+CENARIOS = [
+    ("classify-text", _requisicoes_texto, 1),
+    ("classify-file (txt)", _requisicoes_arquivo_txt, 1),
+    ("classify-file (pdf)", _requisicoes_arquivo_pdf, 1),
+    (f"classify-batch ({TAMANHO_LOTE} emails)", _requisicoes_lote, TAMANHO_LOTE),
+]
+
+
+async def _disparar(requisicoes: list, concorrencia: int) -> tuple:
+    """
+    Envia as requisições com no máximo `concorrencia` em andamento
+    
+    Returns:
+        Tupla (latências em segundos, contagem por status HTTP, duração total)
+    """
+    pendentes = iter(requisicoes)
+    latencias, status = [], {}
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+        async def trabalhar():
+            for requisicao in pendentes:
+                inicio = time.perf_counter()
+                resposta = await cliente.post(**requisicao)
+                latencias.append(time.perf_counter() - inicio)
+                status[str(resposta.status_code)] = status.get(str(resposta.status_code), 0) + 1
+        
+        inicio_total = time.perf_counter()
+        await asyncio.gather(*(trabalhar() for _ in range(concorrencia)))
+        return latencias, status, time.perf_counter() - inicio_total
+
+
+def executar_benchmark(
+    niveis_concorrencia=(1, 8, 32),
+    requisicoes: int = 200,
+    latencia_segundos: float = 0.05,
+    jitter_segundos: float = 0.02,
+    taxa_429: float = 0.0,
+    taxa_5xx: float = 0.0,
+    chaves: int = 1,
+) -> list:
+    """
+    Roda cada cenário em cada nível de concorrência e imprime a tabela
+    
+    Args:
+        niveis_concorrencia: Requisições simultâneas em cada rodada
+        requisicoes: Requisições por rodada (no lote: requisicoes / TAMANHO_LOTE, no mínimo
+            uma por worker)
+        latencia_segundos: Latência média do Gemini falso
+        jitter_segundos: Variação aleatória somada à latência
+        taxa_429: Fração das chamadas ao Gemini que falham com 429
+        taxa_5xx: Fração das chamadas ao Gemini que falham com 503
+        chaves: Chaves falsas no pool
+    
+    Returns:
+        Lista de resultados (um por cenário e nível)
+    """
+    # Avisos de retry/cooldown e logs por requisição poluiriam a tabela
+    logging.disable(logging.ERROR)
+    print(
+        f"Gemini falso: latência {latencia_segundos * 1000:.0f}ms (+até {jitter_segundos * 1000:.0f}ms), "
+        f"429 em {taxa_429:.0%}, 5xx em {taxa_5xx:.0%}, {chaves} chave(s)\n"
+    )
+    print(
+        f"{'Cenário':<28} | {'Conc.':>5} | {'Req.':>5} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'p99 (ms)':>9} | "
+        f"{'Req/s':>8} | {'Emails/s':>8} | Status"
+    )
+    print("-" * 120)
+    resultados = []
+    semente = 0
+    for nome, montar, emails_por_requisicao in CENARIOS:
+        for concorrencia in niveis_concorrencia:
+            quantidade = requisicoes if emails_por_requisicao == 1 else max(concorrencia, requisicoes // emails_por_requisicao)
+            lista = montar(quantidade, semente)
+            semente += quantidade * emails_por_requisicao
+            falso = ClienteGeminiFalso(
+                latencia_segundos=latencia_segundos, jitter_segundos=jitter_segundos,
+                taxa_429=taxa_429, taxa_5xx=taxa_5xx, semente=semente,
+            )
+            instalar_cliente_falso(falso, chaves=chaves)
+            latencias, status, duracao = asyncio.run(_disparar(lista, concorrencia))
+            resumo = resumir_latencias(latencias, duracao)
+            resumo["emails_por_segundo"] = round(resumo["rps"] * emails_por_requisicao, 2)
+            resultados.append({
+                "cenario": nome,
+                "concorrencia": concorrencia,
+                **resumo,
+                "status": status,
+                "chamadas_ao_gemini": falso.contadores["chamadas"],
+            })
+            texto_status = ", ".join(f"{codigo}: {total}" for codigo, total in sorted(status.items()))
+            print(
+                f"{nome:<28} | {concorrencia:>5} | {quantidade:>5} | {resumo['p50_ms']:>9.1f} | {resumo['p95_ms']:>9.1f} | "
+                f"{resumo['p99_ms']:>9.1f} | {resumo['rps']:>8.1f} | {resumo['emails_por_segundo']:>8.1f} | {texto_status}"
+            )
+    logging.disable(logging.NOTSET)
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
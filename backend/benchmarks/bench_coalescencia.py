@@ -0,0 +1,91 @@
+"""
+Benchmark da coalescência de chamadas idênticas (single-flight) com o Gemini falso
+
+Simula um email em massa: N requisições /classify-text com o MESMO texto chegando juntas,
+com o cache ligado (como em produção). Compara a coalescência desligada e ligada:
+chamadas ao Gemini, chamadas economizadas e latência p50/p95.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_coalescencia
+"""
+import asyncio
+import logging
+import os
+import time
+
+# Precisa vir antes de importar app.*
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("GEMINI_RETRY_BASE_SEGUNDOS", "0.01")
+
+import httpx  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.cache_servico import cache_resultados  # noqa: E402
+from app.services.coalescencia_servico import grupo_chamadas  # noqa: E402
+from benchmarks.bench_preprocessador import gerar_texto  # noqa: E402
+from benchmarks.estatisticas import resumir_latencias  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso  # noqa: E402
+
+
+async def _disparar_identicas(texto: str, quantidade: int) -> tuple:
+    """Envia `quantidade` requisições iguais ao mesmo tempo; retorna (latências, status, duração)"""
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+        async def enviar():
+            inicio = time.perf_counter()
+            resposta = await cliente.post("/api/emails/classify-text", json={"texto": texto})
+            return time.perf_counter() - inicio, resposta.status_code
+        
+        inicio_total = time.perf_counter()
+        respostas = await asyncio.gather(*(enviar() for _ in range(quantidade)))
+        duracao = time.perf_counter() - inicio_total
+    status = {}
+    for _, codigo in respostas:
+        status[str(codigo)] = status.get(str(codigo), 0) + 1
+    return [latencia for latencia, _ in respostas], status, duracao
+
+
+def executar_benchmark(quantidades=(10, 50), latencia_segundos: float = 0.2) -> list:
+    """Roda cada quantidade com a coalescência desligada e ligada e imprime a tabela"""
+    logging.disable(logging.ERROR)
+    print(f"Gemini falso: latência {latencia_segundos * 1000:.0f}ms, requisições idênticas simultâneas\n")
+    print(
+        f"{'Coalescência':<12} | {'Req.':>5} | {'Chamadas ao Gemini':>18} | {'Economizadas':>12} | "
+        f"{'p50 (ms)':>9} | {'p95 (ms)':>9} | Status"
+    )
+    print("-" * 95)
+    habilitado_original = grupo_chamadas.habilitado
+    resultados = []
+    for quantidade in quantidades:
+        for habilitado in (False, True):
+            cache_resultados.limpar()
+            grupo_chamadas.habilitado = habilitado
+            falso = ClienteGeminiFalso(latencia_segundos=latencia_segundos, jitter_segundos=0.0, semente=quantidade)
+            instalar_cliente_falso(falso)
+            texto = gerar_texto(1_000, semente=quantidade)
+            latencias, status, duracao = asyncio.run(_disparar_identicas(texto, quantidade))
+            resumo = resumir_latencias(latencias, duracao)
+            # Sem coalescência, cada requisição faz as duas chamadas (classificação + resposta)
+            chamadas_sem_coalescencia = quantidade * 2
+            resultado = {
+                "coalescencia": habilitado,
+                "requisicoes": quantidade,
+                "chamadas_ao_gemini": falso.contadores["chamadas"],
+                "chamadas_economizadas": chamadas_sem_coalescencia - falso.contadores["chamadas"],
+                **resumo,
+                "status": status,
+            }
+            resultados.append(resultado)
+            texto_status = ", ".join(f"{codigo}: {total}" for codigo, total in sorted(status.items()))
+            print(
+                f"{'ligada' if habilitado else 'desligada':<12} | {quantidade:>5} | {resultado['chamadas_ao_gemini']:>18} | "
+                f"{resultado['chamadas_economizadas']:>12} | {resumo['p50_ms']:>9.1f} | {resumo['p95_ms']:>9.1f} | {texto_status}"
+            )
+    grupo_chamadas.habilitado = habilitado_original
+    cache_resultados.limpar()
+    logging.disable(logging.NOTSET)
+    print(f"\nContadores do grupo: {grupo_chamadas.estatisticas()}")
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,188 @@
+"""
+Benchmark do cache de contexto (instrução fixa em system_instruction / cached content)
+
+Com o Gemini falso, classifica e gera a resposta de vários emails em três formatos e
+compara os tokens informados em usage_metadata (métrica gemini_tokens_total):
+- "prompt único": instrução e email no mesmo texto (formato anterior dos prompts)
+- "system_instruction": instrução separada do email (GEMINI_CACHE_CONTEXTO=false)
+- "cache de contexto": instrução registrada como cached content (GEMINI_CACHE_CONTEXTO=true)
+
+Depois verifica o comportamento do cache de contexto com o cliente falso:
+- um registro por API key e instrução (mesmo com chamadas simultâneas), reaproveitado
+  nas chamadas seguintes
+- renovação do TTL antes de expirar
+- instrução abaixo do mínimo de tokens: usa system_instruction e não tenta de novo a cada chamada
+- registro que sumiu no Gemini: a chamada registra a instrução de novo e é repetida
+
+Sai com código 1 se alguma verificação falhar.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_contexto
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Precisa vir antes de importar app.*
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("METRICAS_HABILITADAS", "true")
+
+from app.services import gemini_servico  # noqa: E402
+from app.services.classificador_servico import INSTRUCAO_CLASSIFICACAO, _montar_prompt_classificacao  # noqa: E402
+from app.services.contexto_servico import CacheContexto  # noqa: E402
+from app.services.metricas_servico import metricas  # noqa: E402
+from app.services.resposta_servico import _instrucao_resposta, _montar_prompt_resposta  # noqa: E402
+from benchmarks.bench_preprocessador import gerar_texto  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso  # noqa: E402
+
+# Chamadas de cada email: (instrução, função que monta a parte variável)
+CHAMADAS = (
+    ("classificacao", INSTRUCAO_CLASSIFICACAO, _montar_prompt_classificacao),
+    ("resposta", _instrucao_resposta("Produtivo"), lambda texto: _montar_prompt_resposta("Produtivo", texto)),
+)
+
+
+def _instalar(habilitado: bool, chaves: int = 1, ttl_segundos: int = 3600, renovar_segundos: int = 300, **opcoes) -> ClienteGeminiFalso:
+    falso = ClienteGeminiFalso(**opcoes)
+    instalar_cliente_falso(falso, chaves=chaves)
+    gemini_servico.cache_contexto = CacheContexto(habilitado, ttl_segundos, renovar_segundos)
+    metricas.limpar()
+    return falso
+
+
+async def _chamar(texto: str, formato: str):
+    for _, instrucao, montar in CHAMADAS:
+        prompt = montar(texto)
+        if formato == "prompt único":
+            await gemini_servico.gerar_conteudo_async(f"{instrucao}\n\n{prompt}")
+        else:
+            await gemini_servico.gerar_conteudo_async(prompt, instrucao=instrucao)
+
+
+def comparar_formatos(emails: int = 50) -> list:
+    """Tokens por formato, somados a partir do usage_metadata das respostas"""
+    textos = [gerar_texto(1_000, semente=i) for i in range(emails)]
+    print(f"{emails} emails de 1KB, classificação + resposta (Gemini falso, ~4 caracteres por token)\n")
+    print(
+        f"{'Formato':<20} | {'Tokens prompt':>13} | {'Do cache':>9} | {'Sem cache':>9} | "
+        f"{'Caracteres enviados':>19} | {'Registros':>9}"
+    )
+    print("-" * 95)
+    resultados = []
+    for formato in ("prompt único", "system_instruction", "cache de contexto"):
+        falso = _instalar(formato == "cache de contexto")
+        
+        async def rodar():
+            for texto in textos:
+                await _chamar(texto, formato)
+        
+        asyncio.run(rodar())
+        tokens_prompt = metricas.somar("gemini_tokens_total", tipo="prompt")
+        tokens_cache = metricas.somar("gemini_tokens_total", tipo="cache")
+        resultado = {
+            "formato": formato,
+            "tokens_prompt": int(tokens_prompt),
+            "tokens_cache": int(tokens_cache),
+            "tokens_sem_cache": int(tokens_prompt - tokens_cache),
+            "caracteres_enviados": int(metricas.somar("gemini_caracteres_enviados_total")),
+            "registros_criados": falso.contadores["caches_criados"],
+        }
+        resultados.append(resultado)
+        print(
+            f"{formato:<20} | {resultado['tokens_prompt']:>13} | {resultado['tokens_cache']:>9} | "
+            f"{resultado['tokens_sem_cache']:>9} | {resultado['caracteres_enviados']:>19} | {resultado['registros_criados']:>9}"
+        )
+    return resultados
+
+
+def _verificar(descricao: str, condicao: bool, falhas: list):
+    print(f"{'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas.append(descricao)
+
+
+def verificar_comportamento() -> list:
+    """Verifica registro, reaproveitamento, renovação e fallbacks; retorna as falhas"""
+    falhas = []
+    texto = gerar_texto(500, semente=1)
+    
+    # Um registro por chave e instrução, reaproveitado nas chamadas seguintes
+    falso = _instalar(True, chaves=2, latencia_segundos=0.01)
+    
+    async def varias_chamadas(simultaneas: int = 1):
+        for _ in range(10):
+            await asyncio.gather(*(_chamar(texto, "cache de contexto") for _ in range(simultaneas)))
+    
+    asyncio.run(varias_chamadas(simultaneas=4))
+    estatisticas = gemini_servico.cache_contexto.estatisticas()
+    _verificar(
+        f"no máximo 2 chaves x 2 instruções = 4 registros, sem duplicados (criados: "
+        f"{falso.contadores['caches_criados']}, ativos: {estatisticas['registros_ativos']})",
+        0 < falso.contadores["caches_criados"] == estatisticas["registros_ativos"] <= 4, falhas,
+    )
+    _verificar(
+        f"chamadas seguintes usam o registro (reutilizados: {estatisticas['reutilizados']} de 80)",
+        estatisticas["reutilizados"] >= 80 - 4 * 4, falhas,
+    )
+    _verificar(
+        "o cache aparece no usage_metadata (cached_content_token_count)",
+        metricas.somar("gemini_tokens_total", tipo="cache") > 0, falhas,
+    )
+    
+    # Renovação antes de expirar
+    falso = _instalar(True, ttl_segundos=2, renovar_segundos=1)
+    asyncio.run(_chamar(texto, "cache de contexto"))
+    time.sleep(1.2)
+    asyncio.run(_chamar(texto, "cache de contexto"))
+    _verificar(
+        f"TTL renovado perto de expirar (criados: {falso.contadores['caches_criados']}, "
+        f"renovados: {falso.contadores['caches_renovados']})",
+        falso.contadores["caches_criados"] == 2 and falso.contadores["caches_renovados"] == 2, falhas,
+    )
+    
+    # Instrução abaixo do mínimo de tokens do modelo
+    falso = _instalar(True, minimo_tokens_cache=4096)
+    asyncio.run(varias_chamadas())
+    estatisticas = gemini_servico.cache_contexto.estatisticas()
+    _verificar(
+        f"instrução pequena demais: chamadas seguem com system_instruction (sucessos: {falso.contadores['sucessos']} de 20)",
+        falso.contadores["sucessos"] == 20 and metricas.somar("gemini_tokens_total", tipo="cache") == 0, falhas,
+    )
+    _verificar(
+        f"instrução pequena demais: o registro não é tentado a cada chamada (falhas: {estatisticas['falhas']})",
+        estatisticas["falhas"] == 2, falhas,
+    )
+    
+    # Registro que sumiu no Gemini (ex.: apagado por fora)
+    falso = _instalar(True)
+    asyncio.run(_chamar(texto, "cache de contexto"))
+    falso._caches.clear()
+    try:
+        asyncio.run(_chamar(texto, "cache de contexto"))
+        erro = None
+    except Exception as e:
+        erro = e
+    _verificar(
+        f"registro perdido: a chamada registra de novo e é repetida (criados: {falso.contadores['caches_criados']}, "
+        f"erro: {type(erro).__name__ if erro else 'nenhum'})",
+        erro is None and falso.contadores["caches_criados"] == 4, falhas,
+    )
+    return falhas
+
+
+def executar_benchmark() -> dict:
+    """Compara os formatos e roda as verificações; imprime o resultado"""
+    logging.disable(logging.ERROR)
+    try:
+        formatos = comparar_formatos()
+        print()
+        falhas = verificar_comportamento()
+    finally:
+        logging.disable(logging.NOTSET)
+    return {"formatos": formatos, "falhas": falhas}
+
+
+if __name__ == "__main__":
+    sys.exit(1 if executar_benchmark()["falhas"] else 0)
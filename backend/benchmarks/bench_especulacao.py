@@ -0,0 +1,136 @@
+"""
+Benchmark da resposta especulativa (resposta gerada junto com a classificação)
+
+Com o Gemini falso (o label depende de palavras de cortesia no email), processa um
+corpus com pedidos, emails de cortesia e emails de cortesia com pedido (em que o palpite
+de prever_label erra) com RESPOSTA_ESPECULATIVA desligada e ligada, em alguns níveis de
+concorrência: latência p50/p95 de ponta a ponta, chamadas ao Gemini, acertos, descartes
+(taxa de desperdício) e ganho médio registrado em resposta_especulativa_ganho_segundos.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_especulacao
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+# Precisa vir antes de importar app.*
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("METRICAS_HABILITADAS", "true")
+
+from app.services import processamento_servico  # noqa: E402
+from app.services.cache_servico import cache_resultados  # noqa: E402
+from app.services.metricas_servico import metricas  # noqa: E402
+from benchmarks.estatisticas import resumir_latencias  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso  # noqa: E402
+
+PEDIDOS = [
+    "Bom dia, gostaria de saber o status da minha requisição {numero}.",
+    "Não consigo acessar o sistema desde ontem, aparece erro 500. Podem verificar?",
+    "Segue em anexo o contrato {numero} para análise.",
+    "Preciso da segunda via do boleto do contrato {numero}.",
+]
+CORTESIAS = [
+    "Muito obrigado pela ajuda com o chamado {numero}!",
+    "Parabéns a toda a equipe pelo excelente atendimento.",
+    "Desejo a todos um Feliz Natal e um próspero Ano Novo!",
+    "Recebido, obrigado.",
+]
+# Cortesia com pedido: prever_label diz Produtivo, o Gemini falso diz Improdutivo
+CORTESIAS_COM_PEDIDO = [
+    "Obrigado pelo retorno! Vocês poderiam me enviar o comprovante do chamado {numero}?",
+    "Parabéns pelo evento. Quando será o próximo?",
+]
+
+_PALAVRAS_CORTESIA = ("obrigad", "parabéns", "feliz natal", "recebido")
+
+
+def _responder(prompt: str) -> str:
+    """Gemini falso: Improdutivo se o email tiver palavras de cortesia"""
+    email = prompt.rsplit("EMAIL", 1)[-1].lower()
+    if '"label"' in prompt:
+        improdutivo = any(palavra in email for palavra in _PALAVRAS_CORTESIA)
+        return json.dumps({
+            "label": "Improdutivo" if improdutivo else "Produtivo",
+            "confidence": 0.9,
+            "reason": "Cortesia" if improdutivo else "Pedido",
+        })
+    return "Olá! Recebemos sua mensagem.\n\nAtenciosamente"
+
+
+def gerar_corpus(quantidade: int, semente: int = 3) -> list:
+    """Emails distintos: 60% pedidos, 30% cortesia e 10% cortesia com pedido"""
+    gerador = random.Random(semente)
+    corpus = []
+    for i in range(quantidade):
+        sorteio = gerador.random()
+        grupo = PEDIDOS if sorteio < 0.6 else CORTESIAS if sorteio < 0.9 else CORTESIAS_COM_PEDIDO
+        corpus.append(gerador.choice(grupo).format(numero=gerador.randint(10_000, 99_999)) + f"\n\n[mensagem {i}]")
+    return corpus
+
+
+async def _processar(corpus: list, concorrencia: int) -> tuple:
+    semaforo = asyncio.Semaphore(concorrencia)
+    
+    async def processar(texto):
+        async with semaforo:
+            inicio = time.perf_counter()
+            await processamento_servico.processar_email_async(texto)
+            return time.perf_counter() - inicio
+    
+    inicio_total = time.perf_counter()
+    latencias = await asyncio.gather(*(processar(texto) for texto in corpus))
+    return latencias, time.perf_counter() - inicio_total
+
+
+def executar_benchmark(niveis=(1, 8), emails: int = 60, latencia_segundos: float = 0.05) -> list:
+    """Roda cada nível de concorrência com a especulação desligada e ligada"""
+    logging.disable(logging.ERROR)
+    corpus = gerar_corpus(emails)
+    print(f"{emails} emails (60% pedidos, 30% cortesia, 10% cortesia com pedido), Gemini falso com latência {latencia_segundos * 1000:.0f}ms\n")
+    print(
+        f"{'Especulação':<11} | {'Conc.':>5} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'Chamadas':>8} | "
+        f"{'Acertos':>7} | {'Descartes':>9} | {'Desperdício':>11} | {'Ganho médio (ms)':>16}"
+    )
+    print("-" * 110)
+    original = processamento_servico.RESPOSTA_ESPECULATIVA
+    resultados = []
+    for concorrencia in niveis:
+        for especular in (False, True):
+            processamento_servico.RESPOSTA_ESPECULATIVA = especular
+            cache_resultados.limpar()
+            metricas.limpar()
+            falso = ClienteGeminiFalso(latencia_segundos=latencia_segundos, gerar_texto=_responder)
+            instalar_cliente_falso(falso)
+            latencias, duracao = asyncio.run(_processar(corpus, concorrencia))
+            resumo = resumir_latencias(latencias, duracao)
+            acertos = int(metricas.somar("resposta_especulativa_total", resultado="acerto"))
+            descartes = int(metricas.somar("resposta_especulativa_total", resultado="descartada"))
+            observacoes, ganho_total = metricas.resumir_histograma("resposta_especulativa_ganho_segundos")
+            resultado = {
+                "especulacao": especular,
+                "concorrencia": concorrencia,
+                "chamadas_ao_gemini": falso.contadores["chamadas"],
+                "acertos": acertos,
+                "descartes": descartes,
+                "taxa_desperdicio": round(descartes / (acertos + descartes), 4) if acertos + descartes else 0.0,
+                "ganho_medio_ms": round(ganho_total / observacoes * 1000, 1) if observacoes else 0.0,
+                **resumo,
+            }
+            resultados.append(resultado)
+            print(
+                f"{'ligada' if especular else 'desligada':<11} | {concorrencia:>5} | {resumo['p50_ms']:>9.1f} | "
+                f"{resumo['p95_ms']:>9.1f} | {resultado['chamadas_ao_gemini']:>8} | {acertos:>7} | {descartes:>9} | "
+                f"{resultado['taxa_desperdicio'] * 100:>10.1f}% | {resultado['ganho_medio_ms']:>16.1f}"
+            )
+    processamento_servico.RESPOSTA_ESPECULATIVA = original
+    cache_resultados.limpar()
+    logging.disable(logging.NOTSET)
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,55 @@
+"""
+Benchmark da extração de texto de PDFs (extrair_texto_de_arquivo)
+
+Compara a extração completa (todas as páginas) com a extração limitada pelo
+orçamento de caracteres (EXTRACAO_LIMITE_CARACTERES) em PDFs de várias páginas.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_extrator
+"""
+import time
+from app.config.configuracao import EXTRACAO_LIMITE_CARACTERES
+from app.services.extrator_servico import extrair_texto_de_arquivo
+from benchmarks.fixtures import gerar_pdf
+
+
+def medir(conteudo: bytes, limite_caracteres: int, repeticoes: int) -> tuple:
+    """Retorna (melhor tempo em segundos, caracteres extraídos)"""
+    melhor = float("inf")
+    caracteres = 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        texto = extrair_texto_de_arquivo("fixture.pdf", conteudo, limite_caracteres=limite_caracteres)
+        melhor = min(melhor, time.perf_counter() - inicio)
+        caracteres = len(texto)
+    return melhor, caracteres
+
+
+def executar_benchmark(paginas=(1, 10, 50, 200), limite_caracteres: int = EXTRACAO_LIMITE_CARACTERES) -> list:
+    """Mede a extração completa e a limitada para cada tamanho de PDF"""
+    resultados = []
+    limite = limite_caracteres or 20000
+    print(f"Orçamento de caracteres: {limite}\n")
+    print(f"{'Páginas':>8} | {'Completa (ms)':>14} | {'Chars':>8} | {'Limitada (ms)':>14} | {'Chars':>7} | {'Ganho':>6}")
+    print("-" * 74)
+    for quantidade in paginas:
+        conteudo = gerar_pdf(quantidade)
+        repeticoes = 3 if quantidade <= 50 else 1
+        tempo_completo, chars_completo = medir(conteudo, 0, repeticoes)
+        tempo_limitado, chars_limitado = medir(conteudo, limite, repeticoes)
+        resultados.append({
+            "paginas": quantidade,
+            "completa_ms": round(tempo_completo * 1000, 2),
+            "limitada_ms": round(tempo_limitado * 1000, 2),
+            "caracteres_completa": chars_completo,
+            "caracteres_limitada": chars_limitado,
+        })
+        print(
+            f"{quantidade:>8} | {tempo_completo * 1000:>14.1f} | {chars_completo:>8} | "
+            f"{tempo_limitado * 1000:>14.1f} | {chars_limitado:>7} | {tempo_completo / tempo_limitado:>5.1f}x"
+        )
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
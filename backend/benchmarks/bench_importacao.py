@@ -0,0 +1,103 @@
+"""
+Benchmark do tempo de importação da API (python -X importtime)
+
+Importa app.main em interpretadores novos (sem GEMINI_API_KEY, como em uma partida a
+frio) e verifica:
+- a mediana do tempo de importação contra o orçamento (IMPORTACAO_ORCAMENTO_MS)
+- que os módulos pesados (MODULOS_ADIADOS) não são carregados na importação; eles só
+  entram no primeiro uso (ou no pré-carregamento em segundo plano, depois que a API sobe)
+
+Mostra também quanto custa cada módulo adiado e os módulos mais caros da importação.
+Sai com código 1 se o orçamento for estourado ou um módulo adiado for importado.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_importacao
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Orçamento da importação de app.main (mediana), em milissegundos
+ORCAMENTO_MS = float(os.getenv("IMPORTACAO_ORCAMENTO_MS", "700"))
+
+# Módulos que não podem ser importados junto com app.main
+MODULOS_ADIADOS = ("google.genai", "pdfplumber", "numpy", "requests")
+
+_PADRAO_LINHA = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def medir_importacao(modulo: str) -> Tuple[float, Dict[str, float], List[Tuple[str, float]]]:
+    """
+    Importa o módulo em um interpretador novo com -X importtime
+    
+    Args:
+        modulo: Módulo a importar
+    
+    Returns:
+        Tupla (tempo total em ms, {módulo: tempo acumulado em ms}, [(módulo, ms) dos
+        importados diretamente por ele])
+    """
+    ambiente = {chave: valor for chave, valor in os.environ.items() if chave not in ("GEMINI_API_KEY", "GOOGLE_API_KEY", "GEMINI_API_KEYS")}
+    ambiente["PYTHONPATH"] = os.getcwd()
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, env=ambiente, check=True,
+    ).stderr
+    modulos, diretos = {}, []
+    for linha in saida.splitlines():
+        encontrado = _PADRAO_LINHA.match(linha)
+        if not encontrado:
+            continue
+        acumulado, profundidade, nome = int(encontrado.group(2)) / 1000, len(encontrado.group(3)) // 2, encontrado.group(4)
+        modulos[nome] = acumulado
+        # Os filhos aparecem antes do pai: acumula os de profundidade 1 até chegar no módulo
+        if profundidade == 0:
+            if nome == modulo:
+                break
+            diretos = []
+        elif profundidade == 1:
+            diretos.append((nome, acumulado))
+    return modulos.get(modulo, 0.0), modulos, diretos
+
+
+def executar_benchmark(rodadas: int = 5, orcamento_ms: float = ORCAMENTO_MS) -> dict:
+    """Mede a importação de app.main e dos módulos adiados; imprime o resultado"""
+    tempos: List[float] = []
+    modulos: Dict[str, float] = {}
+    diretos: List[Tuple[str, float]] = []
+    for _ in range(rodadas):
+        total, modulos, diretos = medir_importacao("app.main")
+        tempos.append(total)
+    mediana = statistics.median(tempos)
+    importados = [modulo for modulo in MODULOS_ADIADOS if modulo in modulos]
+    
+    print(f"Importação de app.main ({rodadas} rodadas): mediana {mediana:.0f}ms, mín {min(tempos):.0f}ms, máx {max(tempos):.0f}ms")
+    print(f"Orçamento: {orcamento_ms:.0f}ms -> {'✅ dentro' if mediana <= orcamento_ms else '❌ estourado'}\n")
+    
+    print(f"{'Módulo adiado':<16} | {'Custo isolado (ms)':>18} | Importado com app.main?")
+    print("-" * 66)
+    adiados = {}
+    for modulo in MODULOS_ADIADOS:
+        adiados[modulo] = round(medir_importacao(modulo)[0], 1)
+        print(f"{modulo:<16} | {adiados[modulo]:>18.1f} | {'❌ sim' if modulo in importados else '✅ não'}")
+    
+    print(f"\n{'Mais caros (importados direto por app.main)':<48} | {'Acumulado (ms)':>14}")
+    print("-" * 66)
+    for nome, acumulado in sorted(diretos, key=lambda item: -item[1])[:10]:
+        print(f"{nome:<48} | {acumulado:>14.1f}")
+    
+    return {
+        "mediana_ms": round(mediana, 1),
+        "tempos_ms": [round(tempo, 1) for tempo in tempos],
+        "orcamento_ms": orcamento_ms,
+        "modulos_adiados_importados": importados,
+        "custo_modulos_adiados_ms": adiados,
+    }
+
+
+if __name__ == "__main__":
+    resultado = executar_benchmark()
+    sys.exit(1 if resultado["mediana_ms"] > resultado["orcamento_ms"] or resultado["modulos_adiados_importados"] else 0)
@@ -0,0 +1,166 @@
+"""
+Benchmark do custo dos logs por requisição
+
+Compara a configuração antiga (basicConfig em DEBUG, mensagens em f-string montadas
+sempre, escrita na thread da requisição) com a atual (INFO, argumentos preguiçosos no
+estilo %, escrita em outra thread via QueueHandler):
+
+1. Replay: as chamadas de log de uma requisição de /classify (controller + pipeline),
+   isoladas do resto do processamento
+2. Ponta a ponta: processar_email com o cliente Gemini falso (sem rede, sem cache),
+   nas duas configurações
+
+Os logs vão para /dev/null, então o custo medido é o de montar e despachar cada registro
+(o custo real, escrevendo no terminal ou em arquivo, é maior).
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_logs
+"""
+import logging
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("CACHE_HABILITADO", "false")
+os.environ.setdefault("METRICAS_HABILITADAS", "false")
+
+from app.config.logs import configurar_logs, encerrar_logs  # noqa: E402
+from app.services.processamento_servico import processar_email  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso, resposta_padrao  # noqa: E402
+from benchmarks.bench_preprocessador import gerar_texto  # noqa: E402
+
+logger = logging.getLogger("benchmarks.bench_logs")
+
+PROMPT = "Classifique o email abaixo e responda em JSON com label, confidence e reason.\n" * 20
+RESPOSTA_GEMINI = resposta_padrao('"label"')
+
+
+def _requisicao_antiga(texto: str):
+    """Chamadas de log de uma requisição antes da mudança (f-strings, banners)"""
+    logger.info("=" * 80)
+    logger.info("📧 NOVA REQUISIÇÃO DE CLASSIFICAÇÃO DE TEXTO")
+    logger.info("=" * 80)
+    logger.info(f"Tamanho do texto recebido: {len(texto)} caracteres")
+    logger.debug(f"Texto recebido (primeiros 200 chars): {texto[:200]}...")
+    logger.info("🔍 Classificando email e gerando resposta sugerida com IA...")
+    logger.info("🤖 Iniciando classificação com IA...")
+    logger.debug(f"Texto original (tamanho: {len(texto)} chars)")
+    logger.debug("📝 Aplicando pré-processamento NLP...")
+    logger.debug(f"Texto pré-processado (tamanho: {len(texto)} chars)")
+    logger.debug("📋 Montando prompt para a IA...")
+    logger.debug(f"Prompt montado (tamanho: {len(PROMPT)} chars)")
+    logger.info("🌐 Chamando API Gemini para classificação...")
+    logger.debug(f"Enviando requisição para modelo: {'gemini-2.5-flash'} (chave {'#1 (chave-...fake)'})")
+    logger.debug("✅ Resposta recebida da API Gemini")
+    logger.debug(f"Texto da resposta (tamanho: {len(RESPOSTA_GEMINI)} chars)")
+    logger.debug(f"Resposta bruta (primeiros 500 chars): {RESPOSTA_GEMINI[:500]}...")
+    logger.debug(f"✅ JSON parseado com sucesso: {dict(label='Produtivo', confidence=0.9)}")
+    logger.debug(f"Label recebido: {'Produtivo'}")
+    logger.debug(f"Confidence recebido: {0.9} (tipo: {type(0.9)})")
+    logger.debug(f"Confidence normalizado: {0.9}")
+    logger.info(f"✅ Classificação concluída: Produtivo (confiança: {0.9})")
+    logger.info(f"✅ Classificação concluída: Produtivo (confiança: {0.9})")
+    logger.debug(f"Resposta sugerida: {RESPOSTA_GEMINI[:200]}...")
+    logger.info("✅ Requisição processada com SUCESSO!")
+    logger.info("=" * 80)
+
+
+def _requisicao_nova(texto: str):
+    """As mesmas chamadas no formato atual (argumentos preguiçosos, banner enxuto)"""
+    logger.info("📧 Nova requisição de classificação de texto (%d caracteres)", len(texto))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Texto recebido (primeiros 200 chars): %s...", texto[:200])
+    logger.info("🤖 Iniciando classificação com IA...")
+    logger.debug("Texto original (tamanho: %d chars)", len(texto))
+    logger.debug("📝 Aplicando pré-processamento NLP...")
+    logger.debug("Texto pré-processado (tamanho: %d chars)", len(texto))
+    logger.debug("📋 Montando prompt para a IA...")
+    logger.debug("Prompt montado (tamanho: %d chars)", len(PROMPT))
+    logger.info("🌐 Chamando API Gemini para classificação...")
+    logger.debug("Enviando requisição para modelo: %s (chave %s)", "gemini-2.5-flash", "#1 (chave-...fake)")
+    logger.debug("✅ Resposta recebida da API Gemini")
+    logger.debug("Texto da resposta (tamanho: %d chars)", len(RESPOSTA_GEMINI))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Resposta bruta (primeiros 500 chars): %s...", RESPOSTA_GEMINI[:500])
+    logger.debug("✅ JSON parseado com sucesso: %s", dict(label="Produtivo", confidence=0.9))
+    logger.debug("Label recebido: %s", "Produtivo")
+    logger.debug("Confidence recebido: %s (tipo: %s)", 0.9, float)
+    logger.debug("Confidence normalizado: %s", 0.9)
+    logger.info("✅ Classificação concluída: %s (confiança: %s)", "Produtivo", 0.9)
+    logger.info("✅ Classificação concluída: %s (confiança: %s)", "Produtivo", 0.9)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Resposta sugerida: %s...", RESPOSTA_GEMINI[:200])
+
+
+def _configurar_antigo(destino):
+    """Equivalente ao antigo logging.basicConfig(level=DEBUG), escrevendo em `destino`"""
+    encerrar_logs()
+    raiz = logging.getLogger()
+    for antigo in list(raiz.handlers):
+        raiz.removeHandler(antigo)
+    handler = logging.StreamHandler(destino)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', '%Y-%m-%d %H:%M:%S'))
+    raiz.addHandler(handler)
+    raiz.setLevel(logging.DEBUG)
+
+
+def _configurar_atual(destino, nivel: str = "INFO", formato: str = "texto", assincrono: bool = True):
+    """configurar_logs() com a saída redirecionada para `destino`"""
+    stderr_original = sys.stderr
+    sys.stderr = destino
+    try:
+        configurar_logs(nivel=nivel, formato=formato, assincrono=assincrono)
+    finally:
+        sys.stderr = stderr_original
+
+
+def _medir(funcao, repeticoes: int, rodadas: int = 5) -> float:
+    """Mediana do tempo por chamada (em microssegundos) entre as rodadas"""
+    tempos = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / repeticoes * 1e6)
+    return statistics.median(tempos)
+
+
+def executar_benchmark(repeticoes_replay: int = 2000, repeticoes_processamento: int = 300) -> list:
+    """Roda as duas medições nas configurações antiga e atual e imprime a tabela"""
+    texto = gerar_texto(2000)
+    destino = open(os.devnull, "w", encoding="utf-8")
+    configuracoes = [
+        ("Antes: DEBUG síncrono, f-strings", lambda: _configurar_antigo(destino), _requisicao_antiga),
+        ("Atual em DEBUG (síncrono)", lambda: _configurar_atual(destino, "DEBUG", assincrono=False), _requisicao_nova),
+        ("Atual: INFO com fila", lambda: _configurar_atual(destino), _requisicao_nova),
+        ("Atual: INFO com fila, JSON", lambda: _configurar_atual(destino, formato="json"), _requisicao_nova),
+    ]
+    instalar_cliente_falso(ClienteGeminiFalso())
+    
+    resultados = []
+    print(f"Replay: {repeticoes_replay} requisições | processar_email: {repeticoes_processamento} emails (cliente falso)\n")
+    print(f"{'Configuração':<34} | {'Replay (µs/req)':>15} | {'processar_email (µs)':>20}")
+    print("-" * 77)
+    try:
+        for nome, configurar, requisicao in configuracoes:
+            configurar()
+            replay = _medir(lambda: requisicao(texto), repeticoes_replay)
+            contador = iter(range(10 ** 9))
+            ponta_a_ponta = _medir(lambda: processar_email(f"{texto} #{next(contador)}"), repeticoes_processamento, rodadas=3)
+            encerrar_logs()
+            resultados.append({
+                "configuracao": nome,
+                "replay_us_por_requisicao": round(replay, 1),
+                "processar_email_us": round(ponta_a_ponta, 1),
+            })
+            print(f"{nome:<34} | {replay:>15.1f} | {ponta_a_ponta:>20.1f}")
+    finally:
+        _configurar_atual(sys.stderr)
+        destino.close()
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,62 @@
+"""
+Microbenchmarks das etapas locais (sem Gemini), com percentis de latência
+
+- preprocessar_texto_nlp: emails de 1KB, 10KB e 100KB
+- extrair_texto_de_arquivo: .txt de 10KB e PDFs de 1, 10 e 50 páginas (com o orçamento
+  de caracteres padrão)
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_micro
+"""
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("METRICAS_HABILITADAS", "false")
+
+from app.services.extrator_servico import extrair_texto_de_arquivo  # noqa: E402
+from app.services.preprocessador_nlp import preprocessar_texto_nlp  # noqa: E402
+from benchmarks.bench_preprocessador import gerar_texto  # noqa: E402
+from benchmarks.estatisticas import medir_latencias  # noqa: E402
+from benchmarks.fixtures import gerar_pdf  # noqa: E402
+
+
+def _casos(repeticoes: int) -> list:
+    """(nome, função, repetições) de cada microbenchmark"""
+    casos = []
+    for tamanho in (1_000, 10_000, 100_000):
+        texto = gerar_texto(tamanho, semente=tamanho)
+        casos.append((
+            f"preprocessar_texto_nlp {tamanho // 1000}KB",
+            lambda texto=texto: preprocessar_texto_nlp(texto),
+            repeticoes if tamanho <= 10_000 else max(5, repeticoes // 10),
+        ))
+    
+    conteudo_txt = gerar_texto(10_000, semente=7).encode("utf-8")
+    casos.append(("extrair_texto_de_arquivo txt 10KB", lambda: extrair_texto_de_arquivo("email.txt", conteudo_txt), repeticoes))
+    for paginas in (1, 10, 50):
+        conteudo_pdf = gerar_pdf(paginas)
+        casos.append((
+            f"extrair_texto_de_arquivo pdf {paginas}p",
+            lambda conteudo_pdf=conteudo_pdf: extrair_texto_de_arquivo("email.pdf", conteudo_pdf),
+            max(5, repeticoes // (5 if paginas > 1 else 1)),
+        ))
+    return casos
+
+
+def executar_benchmark(repeticoes: int = 50) -> list:
+    """Mede cada caso e imprime p50/p95/p99"""
+    resultados = []
+    print(f"{'Caso':<36} | {'Amostras':>8} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'p99 (ms)':>9} | {'Ops/s':>9}")
+    print("-" * 95)
+    for nome, funcao, quantidade in _casos(repeticoes):
+        resumo = medir_latencias(funcao, quantidade)
+        resultados.append({"caso": nome, **resumo})
+        print(
+            f"{nome:<36} | {resumo['amostras']:>8} | {resumo['p50_ms']:>9.3f} | {resumo['p95_ms']:>9.3f} | "
+            f"{resumo['p99_ms']:>9.3f} | {resumo['rps']:>9.1f}"
+        )
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,208 @@
+"""
+Benchmark das respostas por modelo (Improdutivo sem a segunda chamada ao Gemini)
+
+Com o Gemini falso classificando tudo como Improdutivo, processa um corpus sintético
+de agradecimentos, felicitações, votos de festas e confirmações (com nomes, números de
+chamado, assinaturas e histórico citado) e alguns emails com pedido, com as respostas
+por modelo desligadas e ligadas (RESPOSTA_MODELOS_LABELS): chamadas ao Gemini, emails
+respondidos por modelo, latência p50/p95 e custo de responder_por_modelo.
+
+Depois verifica que as respostas por modelo citam o nome e os números de chamado e que
+emails com pedido ou pergunta continuam indo para o Gemini. Sai com código 1 se alguma
+verificação falhar.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_modelos_resposta
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+# Precisa vir antes de importar app.*
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("METRICAS_HABILITADAS", "true")
+
+from app.services import modelos_resposta_servico  # noqa: E402
+from app.services.cache_servico import cache_resultados  # noqa: E402
+from app.services.metricas_servico import metricas  # noqa: E402
+from app.services.modelos_resposta_servico import detectar_intencao, responder_por_modelo  # noqa: E402
+from app.services.processamento_servico import processar_email_async  # noqa: E402
+from benchmarks.estatisticas import medir_latencias, resumir_latencias  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso  # noqa: E402
+
+NOMES = ["Ana Paula Souza", "João da Silva", "Carla Mendes", "Pedro Henrique", "Mariana Costa", "Rafael Lima"]
+
+# (intenção esperada, texto) - {chamado} é trocado por um número
+CORPOS = [
+    ("agradecimento", "Muito obrigado pela ajuda com o chamado {chamado}! Deu tudo certo."),
+    ("agradecimento", "Agradeço o excelente atendimento de hoje, foi muito rápido."),
+    ("agradecimento", "Valeu pelo retorno, problema resolvido por aqui."),
+    ("felicitacao", "Parabéns pela promoção, muito merecida!"),
+    ("felicitacao", "Meus parabéns a toda a equipe pelo prêmio de melhor atendimento."),
+    ("festas", "Desejo a todos um Feliz Natal e um próspero Ano Novo!"),
+    ("festas", "Boas festas a toda a equipe!"),
+    ("festas", "Feliz Páscoa a todos vocês."),
+    ("confirmacao", "Recebido, obrigado."),
+    ("confirmacao", "Ciente. Pode encerrar o protocolo nº {chamado}."),
+    ("confirmacao", "Ok, de acordo com a proposta."),
+]
+
+# Improdutivos que ainda pedem algo: a resposta precisa do Gemini
+CORPOS_COM_PEDIDO = [
+    "Obrigado pela ajuda! Vocês poderiam me enviar o comprovante?",
+    "Parabéns pelo evento. Quando será o próximo?",
+    "Obrigado, mas ainda não recebi o boleto do chamado {chamado}.",
+]
+
+ASSINATURAS = ["\n\nAbraços,\n{nome}", "\n\nAtt\n{nome}\nTel: (11) 9{telefone:04d}-0000", ""]
+HISTORICO = (
+    "\n\nEm seg., 3 de jun. de 2024 às 10:00, Suporte <suporte@empresa.com> escreveu:\n"
+    "> Seu chamado {chamado} foi resolvido. Alguma dúvida?\n> Atenciosamente\n> Suporte"
+)
+
+
+def gerar_corpus(quantidade: int = 300, proporcao_com_pedido: float = 0.15, semente: int = 7) -> list:
+    """Gera (intenção esperada ou None, nome, chamado, texto) para emails improdutivos distintos"""
+    gerador = random.Random(semente)
+    corpus = []
+    for i in range(quantidade):
+        nome = gerador.choice(NOMES)
+        chamado = str(gerador.randint(10_000, 999_999))
+        if gerador.random() < proporcao_com_pedido:
+            intencao, corpo = None, gerador.choice(CORPOS_COM_PEDIDO)
+        else:
+            intencao, corpo = gerador.choice(CORPOS)
+        assinatura = gerador.choice(ASSINATURAS)
+        texto = (
+            corpo.format(chamado=chamado)
+            + assinatura.format(nome=nome, telefone=i)
+            + (HISTORICO.format(chamado=chamado) if gerador.random() < 0.3 else "")
+            + f"\n\n[mensagem {i}]"
+        )
+        corpus.append({
+            "intencao": intencao,
+            "nome": nome.split()[0] if assinatura else None,
+            "chamado": chamado if "{chamado}" in corpo else None,
+            "texto": texto,
+        })
+    return corpus
+
+
+def _responder_improdutivo(prompt: str) -> str:
+    """Gemini falso: classifica tudo como Improdutivo e gera uma resposta genérica"""
+    if '"label"' in prompt:
+        return json.dumps({"label": "Improdutivo", "confidence": 0.95, "reason": "Mensagem de cortesia"})
+    return "Olá! Obrigado pela mensagem.\n\nAtenciosamente"
+
+
+async def _processar(corpus: list) -> tuple:
+    async def processar(item):
+        inicio = time.perf_counter()
+        resultado = await processar_email_async(item["texto"])
+        return time.perf_counter() - inicio, resultado
+    
+    inicio_total = time.perf_counter()
+    respostas = await asyncio.gather(*(processar(item) for item in corpus))
+    return respostas, time.perf_counter() - inicio_total
+
+
+def comparar(corpus: list, latencia_segundos: float = 0.05) -> list:
+    """Processa o corpus com as respostas por modelo desligadas e ligadas"""
+    print(f"{len(corpus)} emails improdutivos, Gemini falso com latência {latencia_segundos * 1000:.0f}ms\n")
+    print(
+        f"{'Modelos':<10} | {'Chamadas ao Gemini':>18} | {'Por modelo':>10} | {'p50 (ms)':>9} | "
+        f"{'p95 (ms)':>9} | Por intenção"
+    )
+    print("-" * 100)
+    labels_originais = modelos_resposta_servico.RESPOSTA_MODELOS_LABELS
+    resultados = []
+    for labels in ([], ["Improdutivo"]):
+        modelos_resposta_servico.RESPOSTA_MODELOS_LABELS = labels
+        cache_resultados.limpar()
+        metricas.limpar()
+        falso = ClienteGeminiFalso(latencia_segundos=latencia_segundos, gerar_texto=_responder_improdutivo)
+        instalar_cliente_falso(falso)
+        respostas, duracao = asyncio.run(_processar(corpus))
+        resumo = resumir_latencias([latencia for latencia, _ in respostas], duracao)
+        por_intencao = {
+            intencao: int(metricas.somar("respostas_modelo_total", intencao=intencao))
+            for intencao in modelos_resposta_servico.MODELOS
+        }
+        resultado = {
+            "modelos": bool(labels),
+            "emails": len(corpus),
+            "chamadas_ao_gemini": falso.contadores["chamadas"],
+            "respostas_por_modelo": sum(por_intencao.values()),
+            "por_intencao": por_intencao,
+            **resumo,
+        }
+        resultados.append(resultado)
+        print(
+            f"{'ligados' if labels else 'desligados':<10} | {resultado['chamadas_ao_gemini']:>18} | "
+            f"{resultado['respostas_por_modelo']:>10} | {resumo['p50_ms']:>9.1f} | {resumo['p95_ms']:>9.1f} | "
+            f"{', '.join(f'{nome}: {total}' for nome, total in por_intencao.items())}"
+        )
+    modelos_resposta_servico.RESPOSTA_MODELOS_LABELS = labels_originais
+    cache_resultados.limpar()
+    
+    textos = [item["texto"] for item in corpus]
+    indice = iter(range(10**9))
+    custo = medir_latencias(lambda: responder_por_modelo("Improdutivo", textos[next(indice) % len(textos)]), 2_000)
+    print(f"\nresponder_por_modelo: p50 {custo['p50_ms'] * 1000:.1f}µs, p95 {custo['p95_ms'] * 1000:.1f}µs por email")
+    return resultados
+
+
+def _verificar(descricao: str, condicao: bool, falhas: list):
+    print(f"{'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas.append(descricao)
+
+
+def verificar_comportamento(corpus: list) -> list:
+    """Confere intenção, nome e números de chamado de cada email; retorna as falhas"""
+    falhas = []
+    intencoes_erradas = [item for item in corpus if detectar_intencao(item["texto"]) != item["intencao"]]
+    _verificar(
+        f"intenção detectada como esperado ({len(corpus) - len(intencoes_erradas)} de {len(corpus)})",
+        not intencoes_erradas, falhas,
+    )
+    com_pedido = [item for item in corpus if item["intencao"] is None]
+    _verificar(
+        f"emails com pedido ou pergunta vão para o Gemini ({len(com_pedido)} emails)",
+        all(responder_por_modelo("Improdutivo", item["texto"]) is None for item in com_pedido), falhas,
+    )
+    respondidos = [(item, responder_por_modelo("Improdutivo", item["texto"])) for item in corpus if item["intencao"]]
+    respondidos = [(item, resposta) for item, resposta in respondidos if resposta is not None]
+    sem_nome = [item for item, resposta in respondidos if item["nome"] and f"Olá, {item['nome']}!" not in resposta]
+    _verificar(f"respostas citam o nome da assinatura (faltou em {len(sem_nome)})", not sem_nome, falhas)
+    sem_chamado = [
+        item for item, resposta in respondidos
+        if item["chamado"] and item["intencao"] in ("agradecimento", "confirmacao") and item["chamado"] not in resposta
+    ]
+    _verificar(f"respostas citam o número do chamado (faltou em {len(sem_chamado)})", not sem_chamado, falhas)
+    _verificar(
+        "labels fora de RESPOSTA_MODELOS_LABELS continuam com o Gemini",
+        all(responder_por_modelo("Produtivo", item["texto"]) is None for item in corpus), falhas,
+    )
+    return falhas
+
+
+def executar_benchmark() -> dict:
+    """Compara as respostas por modelo desligadas e ligadas e roda as verificações"""
+    logging.disable(logging.ERROR)
+    try:
+        corpus = gerar_corpus()
+        resultados = comparar(corpus)
+        print()
+        falhas = verificar_comportamento(corpus)
+    finally:
+        logging.disable(logging.NOTSET)
+    return {"resultados": resultados, "falhas": falhas}
+
+
+if __name__ == "__main__":
+    sys.exit(1 if executar_benchmark()["falhas"] else 0)
@@ -0,0 +1,197 @@
+"""
+Benchmark da interpretação da resposta de classificação (JSON validado, reparo e nova tentativa)
+
+1. Custo de interpretar uma resposta válida: parser anterior (json.loads do trecho entre
+   chaves + checagem do label e da confiança, reproduzido em _parser_anterior) vs
+   ClassificacaoIA.model_validate_json, e custo do reparo nas respostas fora do formato.
+2. Com o Gemini falso devolvendo parte das respostas fora do formato (texto em volta,
+   bloco ```, aspas simples, vírgula sobrando e texto sem JSON), classifica um corpus e
+   conta os caminhos em classificacao_parse_total, as chamadas ao Gemini e os erros 500,
+   e quantas respostas o parser anterior teria aceitado.
+
+Sai com código 1 se alguma verificação falhar.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_parse_classificacao
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import zlib
+
+# Precisa vir antes de importar app.*
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("METRICAS_HABILITADAS", "true")
+
+from fastapi import HTTPException  # noqa: E402
+from app.models.schemas import ClassificacaoIA  # noqa: E402
+from app.services import classificador_servico  # noqa: E402
+from app.services.cache_servico import cache_resultados  # noqa: E402
+from app.services.classificador_servico import (  # noqa: E402
+    AVISO_NOVA_TENTATIVA,
+    _reparar_classificacao,
+    classificar_email_com_ia_async,
+)
+from app.services.metricas_servico import metricas  # noqa: E402
+from benchmarks.estatisticas import medir_latencias  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso  # noqa: E402
+
+VALIDA = '{"label": "Produtivo", "confidence": 0.92, "reason": "Pedido de status da requisição"}'
+
+# (formato, proporção, texto da resposta)
+FORMATOS = [
+    ("valido", 0.70, VALIDA),
+    ("texto_em_volta", 0.08, "Claro! Segue a classificação:\n```json\n" + VALIDA + "\n```\nQualquer dúvida, estou à disposição."),
+    ("aspas_simples", 0.08, "{'label': 'Produtivo', 'confidence': 0.92, 'reason': 'Pedido de status da requisição'}"),
+    ("virgula_sobrando", 0.07, '{"label": "Produtivo", "confidence": 0.92, "reason": "Pedido de status",}'),
+    ("sem_json", 0.07, "Produtivo - o cliente pede o status da requisição."),
+]
+
+
+def _formato_do_email(email: str) -> tuple:
+    """Sorteia (estável pelo marcador [mensagem N] do email) o formato da resposta do Gemini falso"""
+    marcador = re.search(r"\[mensagem \d+\]", email)
+    sorteio = (zlib.crc32(marcador.group().encode("utf-8")) % 10_000) / 10_000
+    acumulado = 0.0
+    for formato, proporcao, texto in FORMATOS:
+        acumulado += proporcao
+        if sorteio < acumulado:
+            return formato, texto
+    return FORMATOS[-1][0], FORMATOS[-1][2]
+
+
+def _responder(prompt: str) -> str:
+    """Gemini falso: responde no formato sorteado; na nova tentativa, sempre válido"""
+    if AVISO_NOVA_TENTATIVA.strip() in prompt:
+        return VALIDA
+    return _formato_do_email(prompt)[1]
+
+
+def _parser_anterior(texto: str) -> dict:
+    """Parser usado antes de ClassificacaoIA: json.loads entre chaves, label fora da lista vira Improdutivo"""
+    if "{" in texto and "}" in texto:
+        texto = texto[texto.find("{"):texto.rfind("}") + 1]
+    dados = json.loads(texto)
+    label = dados.get("label", "Improdutivo")
+    if label not in ["Produtivo", "Improdutivo"]:
+        label = "Improdutivo"
+    confidence = max(0.0, min(1.0, float(dados.get("confidence", 0.5))))
+    return {"label": label, "confidence": confidence, "reason": dados.get("reason", "")}
+
+
+def _aceita_pelo_parser_anterior(texto: str) -> bool:
+    try:
+        _parser_anterior(texto)
+        return True
+    except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
+        return False
+
+
+def medir_interpretacao(repeticoes: int = 20_000) -> dict:
+    """Custo por resposta (µs) do parser anterior, da validação direta e do reparo"""
+    custos = {
+        "anterior": medir_latencias(lambda: _parser_anterior(VALIDA), repeticoes),
+        "validacao_direta": medir_latencias(lambda: ClassificacaoIA.model_validate_json(VALIDA), repeticoes),
+    }
+    for formato, _, texto in FORMATOS[1:4]:
+        custos[f"reparo_{formato}"] = medir_latencias(lambda texto=texto: _reparar_classificacao(texto), repeticoes // 4)
+    print(f"{'Interpretação':<26} | {'p50 (µs)':>9} | {'p95 (µs)':>9}")
+    print("-" * 52)
+    for nome, custo in custos.items():
+        print(f"{nome:<26} | {custo['p50_ms'] * 1000:>9.2f} | {custo['p95_ms'] * 1000:>9.2f}")
+    return custos
+
+
+async def _classificar(corpus: list) -> list:
+    async def classificar(texto):
+        try:
+            return await classificar_email_com_ia_async(texto)
+        except HTTPException as he:
+            return he
+    
+    return await asyncio.gather(*(classificar(texto) for texto in corpus))
+
+
+def classificar_corpus(emails: int = 500, latencia_segundos: float = 0.01) -> dict:
+    """Classifica emails distintos com o Gemini falso devolvendo respostas fora do formato"""
+    corpus = [f"Bom dia, qual o status da requisição {10_000 + i}? [mensagem {i}]" for i in range(emails)]
+    formatos = {}
+    for texto in corpus:
+        formato = _formato_do_email(texto)[0]
+        formatos[formato] = formatos.get(formato, 0) + 1
+    textos_por_formato = {formato: texto for formato, _, texto in FORMATOS}
+    aceitas_antes = sum(
+        quantidade for formato, quantidade in formatos.items() if _aceita_pelo_parser_anterior(textos_por_formato[formato])
+    )
+    
+    cache_resultados.limpar()
+    metricas.limpar()
+    falso = ClienteGeminiFalso(latencia_segundos=latencia_segundos, gerar_texto=_responder)
+    instalar_cliente_falso(falso)
+    resultados = asyncio.run(_classificar(corpus))
+    cache_resultados.limpar()
+    
+    caminhos = {
+        caminho: int(metricas.somar("classificacao_parse_total", caminho=caminho))
+        for caminho in ("direto", "reparado", "nova_tentativa", "falha")
+    }
+    resultado = {
+        "emails": emails,
+        "formatos": formatos,
+        "caminhos": caminhos,
+        "chamadas_ao_gemini": falso.contadores["chamadas"],
+        "erros_500": sum(1 for item in resultados if isinstance(item, HTTPException)),
+        "aceitas_pelo_parser_anterior": aceitas_antes,
+    }
+    print(f"\n{emails} emails, formatos das respostas: {', '.join(f'{nome}: {total}' for nome, total in formatos.items())}")
+    print(f"Caminhos: {', '.join(f'{nome}: {total}' for nome, total in caminhos.items())}")
+    print(
+        f"Chamadas ao Gemini: {resultado['chamadas_ao_gemini']} | erros 500: {resultado['erros_500']} | "
+        f"parser anterior aceitaria {aceitas_antes} de {emails} (erros 500: {emails - aceitas_antes})"
+    )
+    return resultado
+
+
+def _verificar(descricao: str, condicao: bool, falhas: list):
+    print(f"{'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas.append(descricao)
+
+
+def verificar(resultado: dict) -> list:
+    """Confere caminhos, chamadas e erros da classificação do corpus; retorna as falhas"""
+    falhas = []
+    formatos, caminhos = resultado["formatos"], resultado["caminhos"]
+    reparaveis = sum(formatos.get(formato, 0) for formato in ("texto_em_volta", "aspas_simples", "virgula_sobrando"))
+    _verificar(f"respostas válidas pelo caminho direto ({caminhos['direto']})", caminhos["direto"] == formatos.get("valido", 0), falhas)
+    _verificar(f"respostas reparáveis sem nova chamada ({caminhos['reparado']})", caminhos["reparado"] == reparaveis, falhas)
+    _verificar(
+        f"só respostas sem JSON perguntam de novo ({caminhos['nova_tentativa']})",
+        caminhos["nova_tentativa"] == formatos.get("sem_json", 0)
+        and resultado["chamadas_ao_gemini"] == resultado["emails"] + caminhos["nova_tentativa"],
+        falhas,
+    )
+    _verificar(f"nenhum erro 500 ({resultado['erros_500']})", resultado["erros_500"] == 0 and caminhos["falha"] == 0, falhas)
+    return falhas
+
+
+def executar_benchmark() -> dict:
+    """Mede a interpretação, classifica o corpus e roda as verificações"""
+    logging.disable(logging.ERROR)
+    try:
+        custos = medir_interpretacao()
+        resultado = classificar_corpus()
+        print()
+        falhas = verificar(resultado)
+        if classificador_servico.CLASSIFICACAO_NOVAS_TENTATIVAS < 1:
+            print("(CLASSIFICACAO_NOVAS_TENTATIVAS=0: respostas sem JSON viram erro 500)")
+    finally:
+        logging.disable(logging.NOTSET)
+    return {"custos": custos, "corpus": resultado, "falhas": falhas}
+
+
+if __name__ == "__main__":
+    sys.exit(1 if executar_benchmark()["falhas"] else 0)
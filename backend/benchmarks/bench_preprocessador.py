@@ -0,0 +1,161 @@
+"""
+Benchmark do pré-processador NLP (preprocessar_texto_nlp)
+
+1. Verifica que a implementação atual (uma passada) gera EXATAMENTE a mesma saída
+   que a implementação original (duas passadas de regex + split/join + loop de sufixos)
+2. Mede o tempo das duas implementações em entradas de 10KB a 1MB
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_preprocessador
+"""
+import random
+import re
+import sys
+import time
+from app.services.preprocessador_nlp import (
+    STOP_WORDS_PT,
+    normalizar_texto,
+    preprocessar_texto_nlp,
+    aplicar_stemming_simples,
+)
+
+
+# ---------------------------------------------------------------------------
+# Implementação original (referência para a saída "golden")
+# ---------------------------------------------------------------------------
+
+def _remover_stop_words_legado(texto: str) -> str:
+    palavras = texto.lower().split()
+    return ' '.join([palavra for palavra in palavras if palavra not in STOP_WORDS_PT])
+
+
+def _normalizar_texto_legado(texto: str) -> str:
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    texto = re.sub(r'\s+', ' ', texto)
+    return texto.strip()
+
+
+def _stemming_legado(palavra: str) -> str:
+    palavra = palavra.lower()
+    sufixos = ['ção', 'ções', 'mente', 'mente', 'ando', 'endo', 'indo',
+               'ado', 'ido', 'ada', 'ida', 'ados', 'idos', 'adas', 'idas',
+               'ar', 'er', 'ir', 'ou', 'am', 'em', 'im']
+    for sufixo in sufixos:
+        if palavra.endswith(sufixo) and len(palavra) > len(sufixo) + 2:
+            palavra = palavra[:-len(sufixo)]
+            break
+    return palavra
+
+
+def preprocessar_texto_nlp_legado(texto: str) -> str:
+    if not texto or not texto.strip():
+        return texto
+    texto_normalizado = _normalizar_texto_legado(texto)
+    texto_sem_stop_words = _remover_stop_words_legado(texto_normalizado)
+    palavras = texto_sem_stop_words.split()
+    return ' '.join([_stemming_legado(palavra) for palavra in palavras])
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+CASOS_ESPECIAIS = [
+    "",
+    "   \n\t ",
+    "Olá, gostaria de saber o status da minha requisição #12345!",
+    "PARABÉNS pela PROMOÇÃO!!! Felicidades :)",
+    "Obrigado!!!\n\n--\nAtenciosamente,\nJoão da Silva\nTel: (11) 99999-0000",
+    "snake_case e_mail foo__bar _x_ 3.14 1,000 R$ 1.500,00",
+    "Ações, informações, situações; realmente, rapidamente, calmamente.",
+    "Não consigo acessar o sistema desde segunda-feira (erro 500).",
+    "São Paulo, 25/12 — “aspas curvas” e ‘simples’ … reticências",
+    "emoji 😀 no meio📧do texto ✅ ok",
+    "Tabs\tand\x0bvertical\x0cfeed\x1cseparators em space",
+    "ÇÃO ção ções mente ando endo indo ado ido ada ida ados idos adas idas ar er ir ou am em im",
+    "falando comendo partindo amado querido amada querida amados queridos amadas queridas",
+    "estudar comer partir ficou falam fazem vim",
+    "İstanbul ΣΊΣΥΦΟΣ Straße ﬁnal",
+]
+
+VOCABULARIO = (
+    "olá bom dia gostaria de saber o status da minha requisição chamado protocolo "
+    "não consigo acessar sistema erro pagamento boleto fatura contrato análise "
+    "obrigado obrigada parabéns felicitações feliz natal ano novo agradecimento "
+    "informações atualizações rapidamente realmente solicitação aprovação crédito "
+    "conta cadastro documentos anexo segue enviando verificando processando "
+    "a o de da do para por com em que um uma é foi são está estão"
+).split()
+PONTUACAO = [" ", " ", " ", ", ", ". ", "! ", "? ", "\n", " - ", " #", " (", ") ", ": "]
+
+
+def gerar_texto(tamanho_bytes: int, semente: int = 0) -> str:
+    """Gera um email sintético com aproximadamente tamanho_bytes (UTF-8)"""
+    gerador = random.Random(semente)
+    partes = []
+    total = 0
+    while total < tamanho_bytes:
+        palavra = gerador.choice(VOCABULARIO)
+        if gerador.random() < 0.1:
+            palavra = palavra.capitalize()
+        if gerador.random() < 0.05:
+            palavra = str(gerador.randint(1, 99999))
+        parte = palavra + gerador.choice(PONTUACAO)
+        partes.append(parte)
+        total += len(parte.encode("utf-8"))
+    return "".join(partes)
+
+
+def verificar_equivalencia() -> int:
+    """Compara a saída nova com a original; retorna o número de divergências"""
+    casos = list(CASOS_ESPECIAIS) + [gerar_texto(2_000, semente) for semente in range(200)]
+    divergencias = 0
+    for caso in casos:
+        if preprocessar_texto_nlp(caso) != preprocessar_texto_nlp_legado(caso):
+            divergencias += 1
+            print(f"❌ Divergência em preprocessar_texto_nlp: {caso[:80]!r}")
+        if caso.strip() and normalizar_texto(caso) != _normalizar_texto_legado(caso):
+            divergencias += 1
+            print(f"❌ Divergência em normalizar_texto: {caso[:80]!r}")
+        for palavra in caso.split():
+            if aplicar_stemming_simples(palavra) != _stemming_legado(palavra):
+                divergencias += 1
+                print(f"❌ Divergência em aplicar_stemming_simples: {palavra!r}")
+    print(f"✅ Equivalência verificada em {len(casos)} textos ({divergencias} divergências)")
+    return divergencias
+
+
+def medir(funcao, texto: str, repeticoes: int) -> float:
+    """Retorna o melhor tempo (segundos) entre as repetições"""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(texto)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def executar_benchmark(tamanhos=(10_000, 100_000, 1_000_000)) -> list:
+    """Mede as duas implementações e retorna uma lista de resultados"""
+    resultados = []
+    print(f"\n{'Tamanho':>10} | {'Original (ms)':>14} | {'Atual (ms)':>11} | {'Ganho':>6}")
+    print("-" * 52)
+    for tamanho in tamanhos:
+        texto = gerar_texto(tamanho, semente=tamanho)
+        repeticoes = 20 if tamanho <= 100_000 else 5
+        tempo_legado = medir(preprocessar_texto_nlp_legado, texto, repeticoes)
+        tempo_atual = medir(preprocessar_texto_nlp, texto, repeticoes)
+        resultados.append({
+            "tamanho_bytes": tamanho,
+            "original_ms": round(tempo_legado * 1000, 3),
+            "atual_ms": round(tempo_atual * 1000, 3),
+            "ganho": round(tempo_legado / tempo_atual, 2),
+        })
+        print(f"{tamanho:>10} | {tempo_legado * 1000:>14.2f} | {tempo_atual * 1000:>11.2f} | {tempo_legado / tempo_atual:>5.2f}x")
+    return resultados
+
+
+if __name__ == "__main__":
+    if verificar_equivalencia():
+        sys.exit(1)
+    executar_benchmark()
@@ -0,0 +1,118 @@
+"""
+Benchmark da montagem do email nos prompts (orçamento de tokens vs corte fixo)
+
+Para cada tipo de email sintético (curto, com assinatura e aviso legal, com histórico
+de respostas citadas, longo com o pedido no final), compara o corte fixo anterior
+(classificação: original + pré-processado, 2000 caracteres cada; resposta: 1500
+caracteres) com o prompt atual:
+- tokens estimados do email em cada prompt
+- se a frase com o pedido do cliente chegou ao prompt
+- tempo de montagem do trecho
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_prompt
+"""
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("METRICAS_HABILITADAS", "false")
+
+from app.config.configuracao import PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO, PROMPT_ORCAMENTO_TOKENS_RESPOSTA  # noqa: E402
+from app.services.preprocessador_nlp import preprocessar_para_classificacao  # noqa: E402
+from app.services.prompt_servico import estimar_tokens, limpar_email, montar_trecho_email  # noqa: E402
+
+PEDIDO = "Preciso que verifiquem com urgência o erro no pagamento do boleto do contrato 884512?"
+
+ASSINATURA = """
+Atenciosamente,
+Carla Mendes
+Coordenadora Financeira | Empresa Exemplo S.A.
+Tel: (11) 4002-8922 | www.exemplo.com.br
+"""
+
+AVISO_LEGAL = """
+AVISO LEGAL: Esta mensagem e seus anexos são confidenciais e destinados exclusivamente ao
+destinatário. Se você recebeu esta mensagem por engano, notifique o remetente e apague-a.
+A divulgação, cópia ou distribuição do conteúdo é proibida.
+"""
+
+CITACAO = """
+Em ter., 4 de jun. de 2024 às 09:12, Suporte <suporte@exemplo.com> escreveu:
+> Prezada Carla, recebemos sua mensagem anterior e estamos analisando o caso.
+> Em breve retornaremos com mais informações sobre o andamento da solicitação.
+> Atenciosamente, Equipe de Suporte
+>
+> Em seg., 3 de jun. de 2024 às 17:40, Carla Mendes <carla@cliente.com> escreveu:
+>> Boa tarde, o sistema de cobrança está apresentando instabilidade desde ontem.
+>> Várias tentativas de emissão de segunda via falharam com mensagens diferentes.
+""" * 4
+
+CONTEXTO = " ".join(
+    f"No mês {i} registramos o histórico de lançamentos da filial, conciliado com o extrato do banco."
+    for i in range(1, 60)
+)
+
+EMAILS = {
+    "curto": f"Olá, bom dia. {PEDIDO}",
+    "assinatura + aviso legal": f"Olá, bom dia.\n\n{PEDIDO}\n{ASSINATURA}{AVISO_LEGAL}",
+    "histórico citado": f"Olá, bom dia.\n\n{PEDIDO}\n{ASSINATURA}{CITACAO}",
+    "longo, pedido no final": f"Olá, bom dia.\n\n{CONTEXTO}\n\n{PEDIDO}\n{ASSINATURA}",
+}
+
+
+def _tokens_corte_fixo(texto: str) -> tuple:
+    """Tokens (classificação, resposta) do email no corte fixo anterior"""
+    classificacao = estimar_tokens(texto[:2000]) + estimar_tokens(preprocessar_para_classificacao(texto[:2000]))
+    return classificacao, estimar_tokens(texto[:1500])
+
+
+def _medir_us(funcao, repeticoes: int = 500) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def executar_benchmark() -> list:
+    resultados = []
+    print(f"{'Email':<26} | {'Classif. antes':>14} | {'Classif. agora':>14} | {'Resp. antes':>11} | {'Resp. agora':>11} | {'Pedido antes/agora':>18} | {'Montagem (µs)':>13}")
+    print("-" * 125)
+    for nome, texto in EMAILS.items():
+        classificacao_antes, resposta_antes = _tokens_corte_fixo(texto)
+        trecho_classificacao = montar_trecho_email(texto, PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO)
+        trecho_resposta = montar_trecho_email(texto, PROMPT_ORCAMENTO_TOKENS_RESPOSTA)
+        classificacao_agora = trecho_classificacao.tokens
+        if trecho_classificacao.cortado:
+            # O prompt leva também o pré-processado do email limpo, se couber em metade do orçamento
+            tokens_preprocessado = estimar_tokens(preprocessar_para_classificacao(limpar_email(texto)))
+            if tokens_preprocessado <= PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO // 2:
+                classificacao_agora += tokens_preprocessado
+        
+        def montar():
+            limpar_email.cache_clear()
+            montar_trecho_email(texto, PROMPT_ORCAMENTO_TOKENS_CLASSIFICACAO)
+        
+        pedido_antes = PEDIDO in texto[:1500]
+        pedido_agora = PEDIDO in trecho_resposta.texto
+        montagem_us = _medir_us(montar)
+        resultados.append({
+            "email": nome,
+            "classificacao_tokens_antes": classificacao_antes,
+            "classificacao_tokens_agora": classificacao_agora,
+            "resposta_tokens_antes": resposta_antes,
+            "resposta_tokens_agora": trecho_resposta.tokens,
+            "pedido_no_prompt_antes": pedido_antes,
+            "pedido_no_prompt_agora": pedido_agora,
+            "montagem_us": round(montagem_us, 1),
+        })
+        pedido = f"{'sim' if pedido_antes else 'não'}/{'sim' if pedido_agora else 'não'}"
+        print(
+            f"{nome:<26} | {classificacao_antes:>14} | {classificacao_agora:>14} | {resposta_antes:>11} | "
+            f"{trecho_resposta.tokens:>11} | {pedido:>18} | {montagem_us:>13.1f}"
+        )
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,88 @@
+"""
+Benchmark da resiliência das chamadas ao Gemini (retry, pool de chaves, disjuntor)
+
+Usa o cliente falso (benchmarks.fake_gemini) para injetar 429 e 5xx e mede, para cada
+cenário, quantas chamadas terminam com sucesso, quantas novas tentativas foram feitas e
+o tempo total. As esperas de backoff são reduzidas para o benchmark rodar rápido.
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_resiliencia
+"""
+import asyncio
+import logging
+import os
+import time
+
+# Esperas curtas para o benchmark (precisa vir antes de importar app.*)
+os.environ.setdefault("GEMINI_RETRY_BASE_SEGUNDOS", "0.01")
+os.environ.setdefault("GEMINI_RETRY_MAXIMO_SEGUNDOS", "0.2")
+os.environ.setdefault("GEMINI_CHAVE_ESPERA_SEGUNDOS", "0.02")
+os.environ.setdefault("GEMINI_MAX_TENTATIVAS", "5")
+os.environ.setdefault("GEMINI_DISJUNTOR_ABERTO_SEGUNDOS", "0.5")
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+
+from app.services import gemini_servico  # noqa: E402
+from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso  # noqa: E402
+
+# Os avisos de cada retry/cooldown poluiriam a tabela
+logging.disable(logging.ERROR)
+
+CENARIOS = [
+    # (nome, chaves, taxa_429, taxa_5xx)
+    ("Saudável", 1, 0.0, 0.0),
+    ("429 em 20% (1 chave)", 1, 0.2, 0.0),
+    ("429 em 20% (3 chaves)", 3, 0.2, 0.0),
+    ("5xx em 20%", 1, 0.0, 0.2),
+    ("Fora do ar (100% 5xx)", 1, 0.0, 1.0),
+]
+
+
+async def _executar_chamadas(quantidade: int) -> tuple:
+    """Dispara as chamadas em paralelo; retorna (sucessos, falhas por tipo)"""
+    async def chamar(i: int):
+        try:
+            await gemini_servico.gerar_conteudo_async(f"Email {i}: qual o status do chamado?")
+            return "ok"
+        except Exception as e:
+            return getattr(e, "status_code", None) or type(e).__name__
+
+    resultados = await asyncio.gather(*(chamar(i) for i in range(quantidade)))
+    falhas = {}
+    for resultado in resultados:
+        if resultado != "ok":
+            falhas[str(resultado)] = falhas.get(str(resultado), 0) + 1
+    return resultados.count("ok"), falhas
+
+
+def executar_benchmark(quantidade: int = 200, latencia_segundos: float = 0.005) -> list:
+    """Roda cada cenário e imprime a tabela de resultados"""
+    resultados = []
+    print(f"{quantidade} chamadas por cenário, latência simulada de {latencia_segundos * 1000:.0f}ms\n")
+    print(f"{'Cenário':<24} | {'Sucesso':>7} | {'Falhas':<18} | {'Chamadas':>8} | {'Retries':>7} | {'Disjuntor':<11} | {'Tempo (s)':>9}")
+    print("-" * 102)
+    for nome, chaves, taxa_429, taxa_5xx in CENARIOS:
+        falso = ClienteGeminiFalso(latencia_segundos=latencia_segundos, taxa_429=taxa_429, taxa_5xx=taxa_5xx)
+        instalar_cliente_falso(falso, chaves=chaves)
+        inicio = time.perf_counter()
+        sucessos, falhas = asyncio.run(_executar_chamadas(quantidade))
+        duracao = time.perf_counter() - inicio
+        estatisticas = gemini_servico.estatisticas_gemini()
+        resultados.append({
+            "cenario": nome,
+            "sucessos": sucessos,
+            "falhas": falhas,
+            "chamadas_ao_gemini": falso.contadores["chamadas"],
+            "retentativas": estatisticas["retentativas"],
+            "disjuntor": estatisticas["disjuntor"],
+            "duracao_segundos": round(duracao, 3),
+        })
+        texto_falhas = ", ".join(f"{codigo}: {total}" for codigo, total in falhas.items()) or "-"
+        print(
+            f"{nome:<24} | {sucessos:>7} | {texto_falhas:<18} | {falso.contadores['chamadas']:>8} | "
+            f"{estatisticas['retentativas']:>7} | {estatisticas['disjuntor']['estado']:<11} | {duracao:>9.2f}"
+        )
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
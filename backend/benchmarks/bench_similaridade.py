@@ -0,0 +1,123 @@
+"""
+Benchmark do índice de emails quase duplicados (MinHash + LSH)
+
+1. Qualidade: emails de modelo (o mesmo texto com outro nome, número de chamado e data)
+   devem ser encontrados; emails diferentes não
+2. Custo da busca em função do tamanho do índice (1k a 50k emails), comparado com a
+   varredura linear (comparar a assinatura com todas as guardadas, vetorizado em NumPy)
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.bench_similaridade
+"""
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "chave-falsa-benchmark")
+os.environ.setdefault("METRICAS_HABILITADAS", "false")
+
+import numpy as np  # noqa: E402
+from app.services.similaridade_servico import IndiceSimilaridade  # noqa: E402
+from benchmarks.bench_preprocessador import gerar_texto  # noqa: E402
+
+MODELOS = [
+    "Olá, meu nome é {nome}. Gostaria de saber o status da requisição #{numero} aberta em {data}. "
+    "O sistema continua apresentando erro ao gerar o relatório mensal de pagamentos e preciso "
+    "dessa informação para fechar o balanço da área financeira. Aguardo retorno.",
+    "Prezados, segue em anexo o comprovante de pagamento referente ao contrato {numero}, com "
+    "vencimento em {data}. Peço que confirmem o recebimento e atualizem o cadastro do cliente "
+    "{nome} no sistema de cobrança. Obrigado pela atenção.",
+    "Bom dia equipe! Passando para agradecer o excelente atendimento prestado na semana passada. "
+    "A {nome} ficou muito satisfeita com a agilidade na resolução do chamado {numero}. "
+    "Desejo a todos um ótimo fim de semana e boas festas em {data}.",
+]
+
+NOMES = ["Ana Souza", "Bruno Lima", "Carla Dias", "Diego Alves", "Elisa Rocha", "Fábio Melo", "Gabriela Nunes"]
+
+
+def gerar_variacao(modelo: str, gerador: random.Random) -> str:
+    """Preenche o modelo com nome, número e data aleatórios"""
+    return modelo.format(
+        nome=gerador.choice(NOMES),
+        numero=gerador.randint(1000, 999999),
+        data=f"{gerador.randint(1, 28):02d}/{gerador.randint(1, 12):02d}",
+    )
+
+
+def avaliar_qualidade(variacoes_por_modelo: int = 200, distintos: int = 500) -> dict:
+    """Indexa um exemplo de cada modelo e mede acertos nas variações e falsos positivos"""
+    indice = IndiceSimilaridade(10_000, 3600, limiar=0.7)
+    gerador = random.Random(0)
+    for i, modelo in enumerate(MODELOS):
+        indice.adicionar(gerar_variacao(modelo, gerador), {"modelo": i})
+    
+    acertos = sum(
+        1
+        for i, modelo in enumerate(MODELOS)
+        for _ in range(variacoes_por_modelo)
+        if (encontrado := indice.buscar(gerar_variacao(modelo, gerador))) is not None and encontrado[1]["modelo"] == i
+    )
+    falsos_positivos = sum(1 for semente in range(distintos) if indice.buscar(gerar_texto(400, 10_000 + semente)))
+    return {
+        "variacoes_encontradas": round(acertos / (variacoes_por_modelo * len(MODELOS)), 4),
+        "falsos_positivos": round(falsos_positivos / distintos, 4),
+    }
+
+
+def _mediana_us(funcao, entradas: list, rodadas: int = 3) -> float:
+    """Mediana (entre rodadas) do tempo médio por chamada, em microssegundos"""
+    tempos = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        for entrada in entradas:
+            funcao(entrada)
+        tempos.append((time.perf_counter() - inicio) / len(entradas) * 1e6)
+    return statistics.median(tempos)
+
+
+def medir_busca(tamanhos=(1_000, 10_000, 50_000), consultas: int = 300) -> list:
+    """Mede a busca com LSH e a varredura linear para cada tamanho de índice"""
+    gerador = random.Random(1)
+    resultados = []
+    print(f"{'Índice':>8} | {'Assinatura (µs)':>15} | {'Busca LSH (µs)':>14} | {'Varredura linear (µs)':>21} | {'Memória (MB)':>12}")
+    print("-" * 84)
+    for tamanho in tamanhos:
+        indice = IndiceSimilaridade(tamanho, 3600, limiar=0.7)
+        for semente in range(tamanho):
+            indice.adicionar(gerar_texto(400, semente), {"label": "Produtivo"})
+        
+        # Metade das consultas são variações de emails indexados, metade são novas
+        textos = [gerar_texto(400, gerador.randrange(tamanho)) + " obrigado" for _ in range(consultas // 2)]
+        textos += [gerar_texto(400, 1_000_000 + i) for i in range(consultas - len(textos))]
+        assinaturas = [indice.assinatura(texto) for texto in textos]
+        
+        matriz = np.stack([entrada[1] for entrada in indice._entradas.values()])
+        assinatura_us = _mediana_us(indice.assinatura, textos)
+        busca_us = _mediana_us(indice.buscar, textos)
+        linear_us = _mediana_us(
+            lambda assinatura: int(np.argmax(np.count_nonzero(matriz == assinatura, axis=1))), assinaturas
+        ) + assinatura_us
+        memoria_mb = (matriz.nbytes + len(indice._baldes) * 100) / 1024 / 1024
+        resultados.append({
+            "tamanho_indice": tamanho,
+            "assinatura_us": round(assinatura_us, 1),
+            "busca_lsh_us": round(busca_us, 1),
+            "varredura_linear_us": round(linear_us, 1),
+            "memoria_estimada_mb": round(memoria_mb, 1),
+        })
+        print(f"{tamanho:>8} | {assinatura_us:>15.1f} | {busca_us:>14.1f} | {linear_us:>21.1f} | {memoria_mb:>12.1f}")
+    return resultados
+
+
+def executar_benchmark() -> dict:
+    qualidade = avaliar_qualidade()
+    print(
+        f"Qualidade (limiar 0.7): {qualidade['variacoes_encontradas']:.1%} das variações de modelo encontradas, "
+        f"{qualidade['falsos_positivos']:.1%} de falsos positivos em emails distintos\n"
+    )
+    return {"qualidade": qualidade, "busca": medir_busca()}
+
+
+if __name__ == "__main__":
+    executar_benchmark()
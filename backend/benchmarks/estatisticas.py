@@ -0,0 +1,73 @@
+"""
+Estatísticas comuns aos benchmarks (percentis de latência e vazão)
+"""
+import math
+import statistics
+import time
+from typing import Callable, List, Sequence
+
+
+def percentil(amostras_ordenadas: Sequence[float], p: float) -> float:
+    """
+    Percentil pelo método nearest-rank
+    
+    Args:
+        amostras_ordenadas: Amostras em ordem crescente
+        p: Percentil entre 0 e 100
+    
+    Returns:
+        Valor da amostra no percentil (0.0 se não houver amostras)
+    """
+    if not amostras_ordenadas:
+        return 0.0
+    posicao = max(1, math.ceil(p / 100 * len(amostras_ordenadas)))
+    return amostras_ordenadas[posicao - 1]
+
+
+def resumir_latencias(latencias_segundos: List[float], duracao_segundos: float = 0.0) -> dict:
+    """
+    Resumo das latências em milissegundos (p50/p95/p99, média, mínimo e máximo)
+    
+    Args:
+        latencias_segundos: Latência de cada execução
+        duracao_segundos: Tempo total da rodada (se > 0, inclui as requisições por segundo)
+    
+    Returns:
+        Dicionário com amostras, p50_ms, p95_ms, p99_ms, media_ms, min_ms, max_ms e rps
+    """
+    ordenadas = sorted(latencias_segundos)
+    resumo = {
+        "amostras": len(ordenadas),
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 3),
+        "p95_ms": round(percentil(ordenadas, 95) * 1000, 3),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 3),
+        "media_ms": round(statistics.fmean(ordenadas) * 1000, 3) if ordenadas else 0.0,
+        "min_ms": round(ordenadas[0] * 1000, 3) if ordenadas else 0.0,
+        "max_ms": round(ordenadas[-1] * 1000, 3) if ordenadas else 0.0,
+    }
+    if duracao_segundos > 0:
+        resumo["rps"] = round(len(ordenadas) / duracao_segundos, 2)
+    return resumo
+
+
+def medir_latencias(funcao: Callable[[], object], repeticoes: int, aquecimento: int = 2) -> dict:
+    """
+    Executa a função várias vezes e resume as latências
+    
+    Args:
+        funcao: Função sem argumentos a medir
+        repeticoes: Execuções medidas
+        aquecimento: Execuções descartadas antes da medição (caches, imports)
+    
+    Returns:
+        Resumo de resumir_latencias (rps = execuções por segundo em série)
+    """
+    for _ in range(aquecimento):
+        funcao()
+    latencias = []
+    inicio_total = time.perf_counter()
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        latencias.append(time.perf_counter() - inicio)
+    return resumir_latencias(latencias, time.perf_counter() - inicio_total)
@@ -0,0 +1,311 @@
+"""
+Cliente Gemini falso para benchmarks e testes manuais (não faz chamadas de rede)
+
+Imita client.models.generate_content e client.aio.models.generate_content (e o
+generate_content_stream assíncrono), com latência configurável e injeção de erros 429
+(RESOURCE_EXHAUSTED) e 5xx usando as mesmas classes de exceção do google-genai
+(ClientError/ServerError).
+
+Também imita o cache de contexto (client.caches / client.aio.caches: create e update,
+com TTL e mínimo de tokens) e devolve usage_metadata com os tokens estimados do prompt,
+da instrução de sistema (cached_content_token_count quando vem do cache) e da resposta.
+
+Uso:
+    from benchmarks.fake_gemini import ClienteGeminiFalso, instalar_cliente_falso
+    falso = ClienteGeminiFalso(latencia_segundos=0.05, taxa_429=0.1, taxa_5xx=0.05)
+    instalar_cliente_falso(falso, chaves=2)
+"""
+import asyncio
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from typing import Callable, Optional
+import requests
+from google.genai import errors as genai_errors
+
+
+def resposta_padrao(prompt: str) -> str:
+    """
+    Responde de acordo com o tipo de prompt (chamada única, classificação ou resposta)
+    
+    O prompt recebido inclui a instrução de sistema (ou a do cache de contexto) antes do
+    conteúdo da chamada.
+    """
+    if "suggested_reply" in prompt:
+        return json.dumps({
+            "label": "Produtivo",
+            "confidence": 0.9,
+            "reason": "Pedido de status",
+            "suggested_reply": "Olá! Recebemos sua solicitação e vamos verificar.\n\nAtenciosamente",
+        })
+    if '"label"' in prompt:
+        return json.dumps({"label": "Produtivo", "confidence": 0.9, "reason": "Pedido de status"})
+    return "Olá! Recebemos sua solicitação e vamos verificar.\n\nAtenciosamente"
+
+
+def _resposta_http(codigo: int, status: str, mensagem: str, retry_delay: Optional[float] = None) -> requests.Response:
+    """Monta um requests.Response com o corpo de erro no formato da API do Gemini"""
+    detalhes = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_delay}s"}] if retry_delay else []
+    resposta = requests.Response()
+    resposta.status_code = codigo
+    resposta._content = json.dumps({
+        "error": {"code": codigo, "status": status, "message": mensagem, "details": detalhes}
+    }).encode("utf-8")
+    return resposta
+
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens "cobrados" pelo Gemini falso (~4 caracteres por token)"""
+    return math.ceil(len(texto) / 4)
+
+
+class UsoFalso:
+    """Imita GenerateContentResponseUsageMetadata"""
+    
+    def __init__(self, prompt_token_count: int, cached_content_token_count: Optional[int], candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.cached_content_token_count = cached_content_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class RespostaFalsa:
+    """Imita GenerateContentResponse (text e usage_metadata)"""
+    
+    def __init__(self, texto: str, usage_metadata: Optional[UsoFalso] = None):
+        self.text = texto
+        self.usage_metadata = usage_metadata
+
+
+class ConteudoEmCacheFalso:
+    """Imita CachedContent (name e expire_time como instante do relógio monotônico)"""
+    
+    def __init__(self, name: str, instrucao: str, expira_em: float):
+        self.name = name
+        self.instrucao = instrucao
+        self.expira_em = expira_em
+
+
+class _ModelosFalsos:
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+    
+    def generate_content(self, model: str, contents, config=None):
+        time.sleep(self._cliente.sortear_latencia())
+        return self._cliente.responder(contents, config)
+
+
+class _ModelosFalsosAsync:
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+    
+    async def generate_content(self, model: str, contents, config=None):
+        await asyncio.sleep(self._cliente.sortear_latencia())
+        return self._cliente.responder(contents, config)
+    
+    async def generate_content_stream(self, model: str, contents, config=None):
+        """Como no SDK, a chamada só acontece ao ler o primeiro pedaço"""
+        async def gerar():
+            await asyncio.sleep(self._cliente.sortear_latencia())
+            texto = self._cliente.responder(contents, config).text
+            pedacos = [texto[i:i + self._cliente.tamanho_pedaco] for i in range(0, len(texto), self._cliente.tamanho_pedaco)]
+            for i, pedaco in enumerate(pedacos):
+                if i:
+                    await asyncio.sleep(self._cliente.intervalo_pedacos_segundos)
+                yield RespostaFalsa(pedaco)
+        return gerar()
+
+
+class _CachesFalsos:
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+    
+    def create(self, model: str, config=None) -> ConteudoEmCacheFalso:
+        return self._cliente.criar_cache(config)
+    
+    def update(self, name: str, config=None) -> ConteudoEmCacheFalso:
+        return self._cliente.renovar_cache(name, config)
+
+
+class _CachesFalsosAsync:
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+    
+    async def create(self, model: str, config=None) -> ConteudoEmCacheFalso:
+        await asyncio.sleep(self._cliente.sortear_latencia())
+        return self._cliente.criar_cache(config)
+    
+    async def update(self, name: str, config=None) -> ConteudoEmCacheFalso:
+        await asyncio.sleep(self._cliente.sortear_latencia())
+        return self._cliente.renovar_cache(name, config)
+
+
+class _AioFalso:
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self.models = _ModelosFalsosAsync(cliente)
+        self.caches = _CachesFalsosAsync(cliente)
+
+
+class ClienteGeminiFalso:
+    """
+    Cliente falso com latência e falhas injetadas
+    
+    Args:
+        latencia_segundos: Latência média de cada chamada
+        jitter_segundos: Variação aleatória somada à latência
+        taxa_429: Fração das chamadas que falham com 429 RESOURCE_EXHAUSTED
+        taxa_5xx: Fração das chamadas que falham com 503 UNAVAILABLE
+        retry_delay_segundos: retryDelay informado nos erros 429 (None = sem sugestão)
+        gerar_texto: Função prompt -> texto da resposta
+        tamanho_pedaco: Caracteres por pedaço no generate_content_stream
+        intervalo_pedacos_segundos: Espera entre os pedaços do stream
+        minimo_tokens_cache: Mínimo de tokens para criar um cached content (como no Gemini)
+        semente: Semente do gerador aleatório (resultados reproduzíveis)
+    """
+    
+    def __init__(
+        self,
+        latencia_segundos: float = 0.0,
+        jitter_segundos: float = 0.0,
+        taxa_429: float = 0.0,
+        taxa_5xx: float = 0.0,
+        retry_delay_segundos: Optional[float] = None,
+        gerar_texto: Callable[[str], str] = resposta_padrao,
+        tamanho_pedaco: int = 16,
+        intervalo_pedacos_segundos: float = 0.0,
+        minimo_tokens_cache: int = 0,
+        semente: int = 42,
+    ):
+        self.latencia_segundos = latencia_segundos
+        self.jitter_segundos = jitter_segundos
+        self.taxa_429 = taxa_429
+        self.taxa_5xx = taxa_5xx
+        self.retry_delay_segundos = retry_delay_segundos
+        self.gerar_texto = gerar_texto
+        self.tamanho_pedaco = tamanho_pedaco
+        self.intervalo_pedacos_segundos = intervalo_pedacos_segundos
+        self.minimo_tokens_cache = minimo_tokens_cache
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self._caches = {}
+        self._sequencia_caches = itertools.count(1)
+        self.contadores = {
+            "chamadas": 0, "sucessos": 0, "erros_429": 0, "erros_5xx": 0,
+            "caches_criados": 0, "caches_renovados": 0,
+            "tokens_prompt": 0, "tokens_cache": 0, "tokens_resposta": 0,
+        }
+        self.models = _ModelosFalsos(self)
+        self.caches = _CachesFalsos(self)
+        self.aio = _AioFalso(self)
+    
+    def sortear_latencia(self) -> float:
+        with self._lock:
+            return self.latencia_segundos + self._aleatorio.uniform(0, self.jitter_segundos)
+    
+    def criar_cache(self, config) -> ConteudoEmCacheFalso:
+        """Registra a instrução de sistema como cached content (400 se for pequena demais)"""
+        instrucao = getattr(config, "system_instruction", None) or ""
+        tokens = estimar_tokens(instrucao)
+        if tokens < self.minimo_tokens_cache:
+            raise genai_errors.ClientError(400, _resposta_http(
+                400, "INVALID_ARGUMENT",
+                f"Cached content is too small. total_token_count={tokens}, min_total_token_count={self.minimo_tokens_cache}",
+            ))
+        with self._lock:
+            nome = f"cachedContents/falso-{next(self._sequencia_caches)}"
+            conteudo = ConteudoEmCacheFalso(nome, instrucao, time.monotonic() + self._ttl_segundos(config))
+            self._caches[nome] = conteudo
+            self.contadores["caches_criados"] += 1
+        return conteudo
+    
+    def renovar_cache(self, nome: str, config) -> ConteudoEmCacheFalso:
+        """Renova o TTL de um cached content (404 se não existir ou já tiver expirado)"""
+        with self._lock:
+            conteudo = self._cache_valido(nome)
+            conteudo.expira_em = time.monotonic() + self._ttl_segundos(config)
+            self.contadores["caches_renovados"] += 1
+        return conteudo
+    
+    def _cache_valido(self, nome: str) -> ConteudoEmCacheFalso:
+        conteudo = self._caches.get(nome)
+        if conteudo is None or conteudo.expira_em <= time.monotonic():
+            raise genai_errors.ClientError(404, _resposta_http(404, "NOT_FOUND", f"CachedContent not found: {nome}"))
+        return conteudo
+    
+    @staticmethod
+    def _ttl_segundos(config) -> float:
+        ttl = getattr(config, "ttl", None) or "3600s"
+        return float(str(ttl).rstrip("s"))
+    
+    def responder(self, contents, config=None) -> RespostaFalsa:
+        """Sorteia o resultado da chamada: 429, 5xx ou resposta normal"""
+        prompt = contents if isinstance(contents, str) else str(contents)
+        instrucao = getattr(config, "system_instruction", None) or ""
+        nome_cache = getattr(config, "cached_content", None)
+        with self._lock:
+            if nome_cache:
+                instrucao_cache = self._cache_valido(nome_cache).instrucao
+            self.contadores["chamadas"] += 1
+            sorteio = self._aleatorio.random()
+            if sorteio < self.taxa_429:
+                self.contadores["erros_429"] += 1
+                erro = genai_errors.ClientError(429, _resposta_http(
+                    429, "RESOURCE_EXHAUSTED", "Quota exceeded (falso)", self.retry_delay_segundos
+                ))
+            elif sorteio < self.taxa_429 + self.taxa_5xx:
+                self.contadores["erros_5xx"] += 1
+                erro = genai_errors.ServerError(503, _resposta_http(503, "UNAVAILABLE", "Overloaded (falso)"))
+            else:
+                self.contadores["sucessos"] += 1
+                erro = None
+        if erro is not None:
+            raise erro
+        if nome_cache:
+            instrucao = instrucao_cache
+        texto = self.gerar_texto(f"{instrucao}\n\n{prompt}" if instrucao else prompt)
+        tokens_cache = estimar_tokens(instrucao) if nome_cache else 0
+        uso = UsoFalso(
+            prompt_token_count=estimar_tokens(prompt) + estimar_tokens(instrucao),
+            cached_content_token_count=tokens_cache or None,
+            candidates_token_count=estimar_tokens(texto),
+        )
+        with self._lock:
+            self.contadores["tokens_prompt"] += uso.prompt_token_count
+            self.contadores["tokens_cache"] += tokens_cache
+            self.contadores["tokens_resposta"] += uso.candidates_token_count
+        return RespostaFalsa(texto, uso)
+
+
+def instalar_cliente_falso(cliente: ClienteGeminiFalso, chaves: int = 1, rpm: int = 0, rpd: int = 0):
+    """
+    Substitui o pool de chaves do gemini_servico por um pool que usa o cliente falso
+    
+    Também reinicia o disjuntor, os contadores de novas tentativas e os registros do cache
+    de contexto (que pertencem às chaves do pool anterior).
+    
+    Args:
+        cliente: Cliente falso usado por todas as chaves
+        chaves: Quantidade de chaves falsas no pool
+        rpm: Limite de requisições por minuto de cada chave (0 = sem limite)
+        rpd: Limite de requisições por dia de cada chave (0 = sem limite)
+    """
+    from app.services import gemini_servico
+    from app.services.pool_chaves_servico import PoolChavesGemini
+    from app.services.resiliencia_servico import Disjuntor
+    
+    gemini_servico.pool_chaves = PoolChavesGemini(
+        [f"chave-falsa-{i:04d}" for i in range(1, chaves + 1)],
+        gemini_servico.pool_chaves.espera_padrao_segundos,
+        fabrica_cliente=lambda chave: cliente,
+        rpm=rpm,
+        rpd=rpd,
+    )
+    gemini_servico.disjuntor = Disjuntor(
+        gemini_servico.disjuntor.limite_falhas, gemini_servico.disjuntor.tempo_aberto_segundos
+    )
+    for nome in gemini_servico._contadores_retry:
+        gemini_servico._contadores_retry[nome] = 0
+    gemini_servico.cache_contexto.limpar()
@@ -0,0 +1,67 @@
+"""
+Fixtures para os benchmarks (geradas em memória, sem dependências extras)
+"""
+
+
+def _escapar_pdf(texto: str) -> str:
+    """Escapa caracteres especiais de strings PDF"""
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def gerar_pdf(paginas: int, linhas_por_pagina: int = 40, prefixo: str = "Linha") -> bytes:
+    """
+    Gera um PDF válido com texto simples (fonte Helvetica) em várias páginas
+
+    Args:
+        paginas: Número de páginas
+        linhas_por_pagina: Linhas de texto por página
+        prefixo: Texto que inicia cada linha
+
+    Returns:
+        Conteúdo do PDF em bytes
+    """
+    objetos = []  # Conteúdo de cada objeto (o número do objeto é a posição + 1)
+
+    def adicionar(conteudo: bytes) -> int:
+        objetos.append(conteudo)
+        return len(objetos)
+
+    catalogo = adicionar(b"")  # preenchido depois (precisa do número do nó de páginas)
+    nos_paginas = adicionar(b"")
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    filhos = []
+    for numero in range(1, paginas + 1):
+        linhas = [
+            f"{prefixo} {i} da pagina {numero}: status da requisicao, contrato e pagamento do cliente."
+            for i in range(1, linhas_por_pagina + 1)
+        ]
+        comandos = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        for linha in linhas:
+            comandos.append(f"({_escapar_pdf(linha)}) Tj T*")
+        comandos.append("ET")
+        fluxo = "\n".join(comandos).encode("latin-1")
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+        filhos.append(adicionar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (nos_paginas, fonte, conteudo)
+        ))
+
+    objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % nos_paginas
+    objetos[nos_paginas - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % filho for filho in filhos), len(filhos)
+    )
+
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for numero, conteudo in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + conteudo + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b"%010d 00000 n \n" % posicao
+    saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objetos) + 1, catalogo, inicio_xref
+    )
+    return bytes(saida)
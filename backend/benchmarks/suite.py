@@ -0,0 +1,157 @@
+"""
+Suíte de benchmarks: carga dos endpoints + microbenchmarks, com resultado em JSON
+
+Roda benchmarks.bench_carga (Gemini falso com latência e falhas configuráveis) e
+benchmarks.bench_micro, e grava tudo em um JSON com o commit, a versão do Python e o
+perfil usado. Com --comparar, mostra a diferença para um JSON anterior (ex.: de outro
+commit) e sai com código 1 se alguma latência p50 piorar ou alguma vazão cair mais
+que a tolerância (o p95/p99 de poucas amostras varia demais entre execuções para
+decidir sozinho; ele aparece na tabela para acompanhamento).
+
+Execute a partir da pasta backend/:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --niveis 1 16 64 --latencia 0.2 --taxa-429 0.1
+    python -m benchmarks.suite --saida atual.json --comparar benchmarks/resultados/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+from benchmarks import bench_carga, bench_micro
+
+# Pasta padrão dos resultados (ignorada pelo git)
+PASTA_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+# Diferenças de p50 menores que isso são ruído de medição (ex.: 7µs -> 8µs = +14%)
+DIFERENCA_MINIMA_MS = 0.05
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def _chave(resultado: dict) -> str:
+    """Identificador de um resultado para comparar execuções"""
+    if "caso" in resultado:
+        return resultado["caso"]
+    return f"{resultado['cenario']} @ {resultado['concorrencia']}"
+
+
+def _variacao(atual: float, anterior: float) -> float:
+    return atual / anterior - 1 if anterior else 0.0
+
+
+def comparar(atual: dict, anterior: dict, tolerancia: float) -> List[str]:
+    """
+    Compara duas execuções da suíte
+    
+    Args:
+        atual: JSON da execução atual
+        anterior: JSON da execução de referência
+        tolerancia: Piora relativa aceita (0.1 = 10%)
+    
+    Returns:
+        Lista de regressões encontradas (vazia se nenhuma passou da tolerância)
+    """
+    regressoes = []
+    print(f"\nComparação com {anterior.get('commit', '?')} ({anterior.get('data', '?')}), tolerância {tolerancia:.0%}\n")
+    print(
+        f"{'Resultado':<42} | {'p50 antes':>10} | {'p50 agora':>10} | {'Δ p50':>7} | {'Δ p95':>7} | "
+        f"{'Vazão antes':>11} | {'Vazão agora':>11} | {'Δ vazão':>7}"
+    )
+    print("-" * 125)
+    for secao in ("carga", "micro"):
+        anteriores = {_chave(resultado): resultado for resultado in anterior.get(secao, [])}
+        for resultado in atual.get(secao, []):
+            chave = _chave(resultado)
+            referencia = anteriores.get(chave)
+            if referencia is None:
+                continue
+            delta_p50 = _variacao(resultado["p50_ms"], referencia["p50_ms"])
+            delta_p95 = _variacao(resultado["p95_ms"], referencia["p95_ms"])
+            delta_rps = _variacao(resultado["rps"], referencia.get("rps", 0))
+            marca = ""
+            piorou_p50 = delta_p50 > tolerancia and resultado["p50_ms"] - referencia["p50_ms"] >= DIFERENCA_MINIMA_MS
+            if piorou_p50 or delta_rps < -tolerancia:
+                marca = " ⚠️"
+                regressoes.append(f"{chave}: p50 {delta_p50:+.1%}, vazão {delta_rps:+.1%}")
+            print(
+                f"{chave:<42} | {referencia['p50_ms']:>10.2f} | {resultado['p50_ms']:>10.2f} | {delta_p50:>+7.1%} | "
+                f"{delta_p95:>+7.1%} | {referencia.get('rps', 0):>11.1f} | {resultado['rps']:>11.1f} | {delta_rps:>+7.1%}{marca}"
+            )
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks (carga com Gemini falso + microbenchmarks)")
+    parser.add_argument("--niveis", type=int, nargs="+", default=[1, 8, 32], help="Níveis de concorrência da carga")
+    parser.add_argument("--requisicoes", type=int, default=200, help="Requisições por cenário e nível")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência média do Gemini falso (segundos)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Variação aleatória da latência (segundos)")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração das chamadas com 429")
+    parser.add_argument("--taxa-5xx", type=float, default=0.0, help="Fração das chamadas com 503")
+    parser.add_argument("--chaves", type=int, default=1, help="Chaves falsas no pool")
+    parser.add_argument("--repeticoes-micro", type=int, default=50, help="Repetições de cada microbenchmark")
+    parser.add_argument("--sem-carga", action="store_true", help="Roda só os microbenchmarks")
+    parser.add_argument("--sem-micro", action="store_true", help="Roda só a carga")
+    parser.add_argument("--saida", help="Arquivo JSON (padrão: benchmarks/resultados/<data>-<commit>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Piora relativa aceita na comparação")
+    args = parser.parse_args(argv)
+    
+    commit = _commit_atual()
+    resultado = {
+        "commit": commit,
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "perfil_gemini": {
+            "latencia_segundos": args.latencia,
+            "jitter_segundos": args.jitter,
+            "taxa_429": args.taxa_429,
+            "taxa_5xx": args.taxa_5xx,
+            "chaves": args.chaves,
+        },
+        "carga": [],
+        "micro": [],
+    }
+    if not args.sem_carga:
+        print("=" * 40 + " CARGA " + "=" * 40)
+        resultado["carga"] = bench_carga.executar_benchmark(
+            niveis_concorrencia=args.niveis, requisicoes=args.requisicoes, latencia_segundos=args.latencia,
+            jitter_segundos=args.jitter, taxa_429=args.taxa_429, taxa_5xx=args.taxa_5xx, chaves=args.chaves,
+        )
+    if not args.sem_micro:
+        print("\n" + "=" * 40 + " MICRO " + "=" * 40)
+        resultado["micro"] = bench_micro.executar_benchmark(repeticoes=args.repeticoes_micro)
+    
+    saida = args.saida or os.path.join(PASTA_RESULTADOS, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados salvos em {saida}")
+    
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        if regressoes:
+            print(f"\n⚠️ {len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            return 1
+        print("\n✅ Nenhuma regressão acima da tolerância")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
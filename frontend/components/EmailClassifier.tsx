@@ -62,54 +62,123 @@ export default function EmailClassifier() {
     localStorage.removeItem("email-classifier-history");
   };
 
+  // Lê a mensagem de erro sem assumir JSON (evita "Unexpected token <")
+  const readError = async (response: Response): Promise<Error> => {
+    const contentType = response.headers.get("content-type") || "";
+    const raw = await response.text();
+
+    if (contentType.includes("application/json")) {
+      try {
+        const errorData = JSON.parse(raw);
+        const detail = errorData?.detail;
+        return new Error(
+          typeof detail === "string"
+            ? detail
+            : detail?.mensagem || "Erro ao processar email"
+        );
+      } catch {
+        return new Error(`Erro ao processar email (HTTP ${response.status})`);
+      }
+    }
+
+    return new Error(
+      `Erro ao processar email (HTTP ${response.status}): ${raw.slice(0, 200)}`
+    );
+  };
+
+  // Classifica texto via Server-Sent Events: mostra a classificação assim que
+  // sai e vai preenchendo a resposta sugerida conforme a IA gera
+  const classifyTextStream = async (
+    text: string
+  ): Promise<ClassificationResult> => {
+    const response = await fetch("/api/emails/classify-text/stream", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+      },
+      body: JSON.stringify({ texto: text }),
+    });
+
+    if (!response.ok || !response.body) {
+      throw await readError(response);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let partial: ClassificationResult | null = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Eventos SSE são separados por linha em branco
+      let separator = buffer.indexOf("\n\n");
+      while (separator !== -1) {
+        const rawEvent = buffer.slice(0, separator);
+        buffer = buffer.slice(separator + 2);
+        separator = buffer.indexOf("\n\n");
+
+        const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+        const data = rawEvent.match(/^data: (.*)$/m)?.[1];
+        if (!event || !data) continue;
+        const payload = JSON.parse(data);
+
+        if (event === "classificacao") {
+          partial = { ...payload, suggested_reply: "" };
+        } else if (event === "resposta" && partial) {
+          partial = {
+            ...partial,
+            suggested_reply: payload.substituir
+              ? payload.texto
+              : partial.suggested_reply + payload.texto,
+          };
+        } else if (event === "fim") {
+          return payload as ClassificationResult;
+        } else if (event === "erro") {
+          throw new Error(
+            typeof payload.erro === "string"
+              ? payload.erro
+              : payload.erro?.mensagem || "Erro ao processar email"
+          );
+        }
+        setResult(partial);
+      }
+    }
+
+    throw new Error("Conexão encerrada antes do fim da resposta");
+  };
+
   const handleClassification = async (text: string, file?: File) => {
     setLoading(true);
     setError(null);
     setResult(null);
 
     try {
-      let response: Response;
+      let data: ClassificationResult;
 
       if (file) {
         // Upload de arquivo
         const formData = new FormData();
         formData.append("file", file);
 
-        response = await fetch("/api/emails/classify-file", {
+        const response = await fetch("/api/emails/classify-file", {
           method: "POST",
           body: formData,
         });
-      } else {
-        // Envio de texto
-        response = await fetch("/api/emails/classify-text", {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-          },
-          body: JSON.stringify({ texto: text }),
-        });
-      }
 
-      // Trata erro sem assumir JSON (evita "Unexpected token <")
-      if (!response.ok) {
-        const contentType = response.headers.get("content-type") || "";
-        const raw = await response.text();
-
-        if (contentType.includes("application/json")) {
-          try {
-            const errorData = JSON.parse(raw);
-            throw new Error(errorData?.detail || "Erro ao processar email");
-          } catch {
-            throw new Error(`Erro ao processar email (HTTP ${response.status})`);
-          }
+        if (!response.ok) {
+          throw await readError(response);
         }
 
-        throw new Error(
-          `Erro ao processar email (HTTP ${response.status}): ${raw.slice(0, 200)}`
-        );
+        data = await response.json();
+      } else {
+        // Envio de texto (resposta sugerida em stream)
+        data = await classifyTextStream(text);
       }
 
-      const data: ClassificationResult = await response.json();
       setResult(data);
 
       const inputText = file ? `Arquivo: ${file.name}` : text;